@@ -48,10 +48,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'germoplasm.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'germoplasm.middleware.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,11 +82,79 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# 'timeout': tempo (em segundos) que uma transação espera pela escrita. As
+# transações que alocam códigos começam com BEGIN IMMEDIATE (ver
+# germoplasm.models.allocation_atomic). O banco de testes é um arquivo, e não
+# um banco em memória, para que os testes de concorrência o abram em vários
+# threads e processos.
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# Réplicas de leitura (ver germoplasm/routing.py). DATABASE_REPLICAS lista, separados
+# por vírgula, arquivos SQLite copiados do principal com
+# 'python manage.py sync_sqlite_replicas'; eles são abertos somente para leitura.
+# Réplicas PostgreSQL são declaradas em DATABASES e acrescentadas a DATABASE_REPLICAS.
+SQLITE_REPLICAS = {
+    f'replica{i}': path
+    for i, path in enumerate(
+        (path.strip() for path in os.getenv('DATABASE_REPLICAS', '').split(',') if path.strip()), start=1
+    )
+}
+for alias, path in SQLITE_REPLICAS.items():
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{path}?mode=ro',
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = list(SQLITE_REPLICAS)
+DATABASE_ROUTERS = ['germoplasm.routing.ReplicaRouter']
+# Requisições que leem das réplicas: relatórios, exportações e a API.
+DATABASE_REPLICA_PATHS = [
+    '/brapi/',
+    '/exports/',
+    '/admin/germoplasm/geneticmaterial/ifo/',
+    '/admin/germoplasm/geneticmaterial/reaction-matrix/',
+    '/admin/germoplasm/plantinginventory/',
+]
+# POSTs que apenas leem (buscas da BrAPI).
+DATABASE_REPLICA_READONLY_POST_PATHS = ['/brapi/v2/search/']
+# Tempo em que um cliente fica no banco principal depois de gravar.
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DATABASE_REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 'locmem' (padrão) mantém o cache na memória de cada processo; 'file' grava em
+# disco e é compartilhado entre os processos do servidor, sem depender de
+# servidores de cache externos.
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            str(BASE_DIR / 'cache') if CACHE_BACKEND == 'file' else 'breeding-program',
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+        },
     }
 }
 
@@ -128,6 +198,20 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Matrizes de genótipos SNP (arquivos mapeados em memória, ver germoplasm/genotypes.py).
+GENOTYPE_ROOT = os.getenv('GENOTYPE_ROOT', str(BASE_DIR / 'genotypes'))
+
+# Mês em que começa a safra no controle de qualidade da fenologia (1 = ano civil;
+# ex.: 6 agrupa de junho a maio do ano seguinte).
+PHENOLOGY_SEASON_START_MONTH = int(os.getenv('PHENOLOGY_SEASON_START_MONTH', '1'))
+
+# Os handlers calculam o hash SHA-256 de cada arquivo enviado enquanto ele é
+# recebido, usado pelo armazenamento deduplicado das fotos.
+FILE_UPLOAD_HANDLERS = [
+    'germoplasm.storage.HashingMemoryFileUploadHandler',
+    'germoplasm.storage.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
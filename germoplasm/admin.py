@@ -1,52 +1,140 @@
+import csv
+import datetime
+import re
+import tempfile
+
 # Imports do Django
 from django.contrib import admin, messages
-from django.db import transaction
-from django.db.models import Max
-from django.http import HttpResponseRedirect
+from django.contrib.admin.utils import unquote
+from django.core.exceptions import PermissionDenied
+from django.db import router
+from django.db.models import Exists, OuterRef, Q
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
 from .models import (
-    DiseaseReaction, 
+    AuditEntry,
+    BreedingValue,
+    BreedingValueRun,
+    Disease,
+    DiseaseReaction,
     GeneticMaterial,
     GeneticMaterialPhoto,
+    GenotypeMatrix,
     Location,
     Marker,
     PhenologicalEvent,
+    PhenologyFlag,
     PhenologyObservation,
     Planting,
+    PlantingInventory,
     Population,
     S_Allele,
+    WeatherSeries,
+    allocation_atomic,
+)
+from .forms import (
+    LocationAdminForm,
+    LocationImportForm,
+    MutationCreationForm,
+    PhotoImportForm,
+    ReactionMatrixForm,
+)
+from . import (
+    audit,
+    breeding_values,
+    detail_cache,
+    diversity,
+    gene_dropping,
+    geo,
+    ifo,
+    inventory,
+    location_import,
+    pedigree_graph,
+    phenology_qc,
+    photo_import,
+    reaction_matrix,
+    services,
+    streaming,
+    weather,
 )
-from .forms import LocationAdminForm, MutationCreationForm
-from . import services
-
-class ChildrenAsFatherInline(admin.TabularInline):
-    """Inline para mostrar os filhos onde o material é o pai."""
-    model = GeneticMaterial
-    fk_name = 'father'
-    fields = ('name', 'material_type', 'get_display_code')
-    readonly_fields = ('name', 'material_type', 'get_display_code')
-    verbose_name = "Filho (como pai)"
-    verbose_name_plural = "Filhos (onde este material é o pai)"
-    can_delete = False
-    extra = 0
 
-class ChildrenAsMotherInline(admin.TabularInline):
-    """Inline para mostrar os filhos onde o material é a mãe."""
-    model = GeneticMaterial
-    fk_name = 'mother'
-    fields = ('name', 'material_type', 'get_display_code')
-    readonly_fields = ('name', 'material_type', 'get_display_code')
-    verbose_name = "Filho (como mãe)"
-    verbose_name_plural = "Filhos (onde este material é a mãe)"
-    can_delete = False
-    extra = 0
+# 'latitude, longitude[, raio]' em graus decimais e km.
+COORDINATE_SEARCH = re.compile(
+    r'^\s*(?P<latitude>-?\d+(?:\.\d+)?)\s*[,;]\s*(?P<longitude>-?\d+(?:\.\d+)?)'
+    r'(?:\s*[,;]\s*(?P<radius>\d+(?:\.\d+)?)\s*(?:km)?)?\s*$',
+    re.IGNORECASE,
+)
+
+class SoftDeleteModelAdmin(admin.ModelAdmin):
+    """
+    Admin base para modelos com exclusão lógica (BaseMaterial).
+
+    - A listagem e as páginas de edição usam ``all_objects``, para que
+      registros inativos possam ser consultados e reativados.
+    - O autocomplete oferece apenas registros ativos.
+    - Os campos de seleção aceitam registros inativos, para que vínculos já
+      existentes com materiais inativos continuem válidos ao salvar.
+    Os inlines usam o manager padrão e, portanto, exibem apenas registros ativos.
+    """
+    def get_queryset(self, request):
+        qs = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            qs = qs.order_by(*ordering)
+        return qs
+
+    def get_search_results(self, request, queryset, search_term):
+        if getattr(request.resolver_match, 'url_name', None) == 'autocomplete':
+            queryset = queryset.filter(is_active=True)
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_field_queryset(self, db, db_field, request):
+        queryset = super().get_field_queryset(db, db_field, request)
+        related_model = db_field.remote_field.model
+        if not hasattr(related_model, 'all_objects'):
+            return queryset
+        ordering = queryset.query.order_by if queryset is not None else ()
+        return related_model.all_objects.using(db).order_by(*ordering)
+
+class AuditHistoryMixin:
+    """
+    Acrescenta à página "Histórico" do admin o histórico de alterações
+    (AuditEntry) e a consulta do estado do registro em uma data (?at=AAAA-MM-DD).
+    """
+    object_history_template = 'admin/germoplasm/audit_history.html'
+    audit_history_limit = 200
+
+    def get_audit_history(self, obj):
+        return audit.object_history(self.model, obj.pk)
+
+    def history_view(self, request, object_id, extra_context=None):
+        obj = self.get_object(request, unquote(object_id))
+        context = {}
+        if obj is not None:
+            entries = self.get_audit_history(obj)[:self.audit_history_limit]
+            context['audit_entries'] = [(entry, audit.describe(entry)) for entry in entries]
+            try:
+                at = parse_date(request.GET.get('at', ''))
+            except ValueError:
+                at = None
+            if at:
+                when = timezone.make_aware(datetime.datetime.combine(at, datetime.time.max))
+                state = audit.state_at(self.model, obj.pk, when)
+                context['audit_date'] = at
+                context['audit_state'] = audit.describe_state(self.model, state) if state else None
+        return super().history_view(request, object_id, {**context, **(extra_context or {})})
 
 class DiseaseReactionInline(admin.TabularInline):
     model = DiseaseReaction
     extra = 0
+    autocomplete_fields = ('disease',)
     verbose_name = "Reação a Doença"
     verbose_name_plural = "Reações a Doenças"
 
@@ -69,26 +157,6 @@ class GeneticMaterialForSAllelesInline(admin.TabularInline):
     def has_add_permission(self, request, obj):
         return False
 
-class MutationsInline(admin.TabularInline):
-    """
-    Inline para mostrar as mutações originadas a partir deste material.
-    """
-    model = GeneticMaterial
-    fk_name = 'mutated_from'
-
-    fields = ('name', 'material_type', 'get_display_code', 'observations')
-    readonly_fields = ('name', 'material_type', 'get_display_code', 'observations')
-
-    verbose_name = "Mutação Gerada"
-    verbose_name_plural = "Mutações Geradas a Partir deste Material"
-
-    can_delete = False
-    extra = 0
-    max_num = 0
-
-    def has_add_permission(self, request, obj):
-        return False
-
 class PhenologyObservationInline(admin.TabularInline):
     model = PhenologyObservation
     extra = 0
@@ -103,17 +171,93 @@ class PlantingInline(admin.TabularInline):
     verbose_name = "Local de Plantio"
     verbose_name_plural = "Locais de Plantio (Onde Tem)"
 
-class SeplanSearchFilter(admin.SimpleListFilter):
+class AltitudeBandFilter(admin.SimpleListFilter):
+    title = 'Altitude do local'
+    parameter_name = 'altitude_band'
+
+    def lookups(self, request, model_admin):
+        choices = []
+        for index, (low, high) in enumerate(geo.ALTITUDE_BANDS):
+            if low is None:
+                label = f"Abaixo de {high} m"
+            elif high is None:
+                label = f"{low} m ou mais"
+            else:
+                label = f"{low} m a menos de {high} m"
+            choices.append((str(index), label))
+        return choices
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            low, high = geo.ALTITUDE_BANDS[int(self.value())]
+        except (ValueError, IndexError):
+            return queryset
+        return geo.in_altitude_band(queryset, low, high)
+
+class PhenologyFlagFilter(admin.SimpleListFilter):
+    title = 'Controle de qualidade'
+    parameter_name = 'qc'
 
+    def lookups(self, request, model_admin):
+        return [('any', "Com alertas"), *PhenologyFlag.Rule.choices, ('none', "Sem alertas")]
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value is None:
+            return queryset
+        flags = PhenologyFlag.objects.filter(observation=OuterRef('pk'))
+        if value == 'none':
+            return queryset.filter(~Exists(flags))
+        if value in PhenologyFlag.Rule.values:
+            flags = flags.filter(rule=value)
+        elif value != 'any':
+            return queryset
+        return queryset.filter(Exists(flags))
+
+class MaterialRecordsFilter(admin.SimpleListFilter):
+    """Filtra pelas contagens e pelo genótipo S da ficha de listagem (``MaterialListing``)."""
+    title = 'Registros'
+    parameter_name = 'records'
+    conditions = {
+        'photos': ("Com fotos", Q(listing__num_photos__gt=0)),
+        'no_photos': ("Sem fotos", Q(listing__num_photos=0)),
+        'plantings': ("Com plantios", Q(listing__num_plantings__gt=0)),
+        'no_plantings': ("Sem plantios", Q(listing__num_plantings=0)),
+        'offspring': ("Com descendentes", Q(listing__num_offspring__gt=0)),
+        's_genotype': ("Com genótipo S", ~Q(listing__s_genotype='')),
+        'no_s_genotype': ("Sem genótipo S", Q(listing__s_genotype='')),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(value, label) for value, (label, _) in self.conditions.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() in self.conditions:
+            return queryset.filter(self.conditions[self.value()][1])
+        return queryset
+
+class SeplanSearchFilter(admin.SimpleListFilter):
+    """
+    Filtro por código Seplan com busca e paginação (select2), em vez de listar
+    todos os códigos a cada renderização da listagem. As opções vêm da view
+    'seplan_codes_view' do PopulationAdmin.
+    """
     title = _('Código Seplan')
     parameter_name = 'seplan_search'
+    template = 'admin/germoplasm/seplan_filter.html'
 
     def lookups(self, request, model_admin):
-        qs = model_admin.get_queryset(
-            request
-        ).exclude(seplan_code__isnull=True).exclude(seplan_code__exact='')
-        unique_codes = qs.values_list('seplan_code', flat=True).order_by('seplan_code').distinct()
-        return [(code, f"Seplan {code}") for code in unique_codes]
+        # Apenas o valor selecionado; as demais opções são carregadas sob demanda.
+        value = self.value()
+        return [(value, f"Seplan {value}")] if value else []
+
+    def has_output(self):
+        return True
+
+    def lookup_url(self):
+        return reverse('admin:germoplasm_population_seplan_codes')
 
     def queryset(self, request, queryset):
         if self.value():
@@ -178,47 +322,52 @@ def promote_seedling_to_hybrid(modeladmin, request, queryset):
         return
 
     population = queryset.first()
-    
-    # 1. Encontra o próximo número sequencial para o híbrido nesta população
-    last_hybrid = population.generated_hybrids.aggregate(
-        max_accession=Max('accession_code')
-    )
-    
-    next_num = 1
-    if last_hybrid['max_accession']:
-        try:
-            # Extrai o número depois de 'H' (ex: C1xL5A25H1 -> 1)
-            last_num_str = last_hybrid['max_accession'].split('H')[-1]
-            next_num = int(last_num_str) + 1
-        except (ValueError, IndexError):
-            # Fallback caso o formato do código seja inesperado
-            pass
 
-    # 2. Gera o código e o nome do novo híbrido
-    new_accession_code = f"{population.code}H{next_num}"
-    
-    # 3. Cria o novo material genético
-    new_hybrid = GeneticMaterial.objects.create(
-        name=new_accession_code, # Nome padrão
-        material_type=GeneticMaterial.MaterialType.HYBRID,
-        accession_code=new_accession_code,
-        population=population,
-        mother=population.parent1, # Assumindo parent1 como mãe, pode ser ajustado
-        father=population.parent2, # Assumindo parent2 como pai
-    )
-    
+    # O número vem do contador da população, bloqueado durante a transação:
+    # cadastros simultâneos nunca recebem o mesmo código.
+    new_hybrid = services.retry_on_conflict(lambda: services.create_hybrid(population))
+
     messages.success(
         request,
         f"Híbrido {new_hybrid.accession_code} criado com sucesso a partir da população {population.code}."
     )
 
+def _ifo_transition(request, queryset, target, done):
+    total = queryset.count()
+    updated = ifo.apply_transition(queryset, target)
+    if updated:
+        messages.success(request, f"{updated} material(is) {done}.")
+    if updated < total:
+        messages.warning(
+            request,
+            f"{total - updated} material(is) ignorado(s): apenas Seleções e Cultivares ativas "
+            "do programa, na etapa anterior do fluxo IFO, podem receber esta atualização."
+        )
+
+@admin.action(description='IFO: registrar envio (data de hoje)')
+def ifo_mark_sent(modeladmin, request, queryset):
+    _ifo_transition(request, queryset, GeneticMaterial.IfoStatus.QUARANTINE, "enviado(s) para a IFO")
+
+@admin.action(description='IFO: liberar da quarentena')
+def ifo_mark_released(modeladmin, request, queryset):
+    _ifo_transition(request, queryset, GeneticMaterial.IfoStatus.RELEASED, "liberado(s) da quarentena")
+
+@admin.action(description='IFO: registrar descarte (data de hoje)')
+def ifo_mark_discarded(modeladmin, request, queryset):
+    _ifo_transition(request, queryset, GeneticMaterial.IfoStatus.DISCARDED, "descartado(s) na IFO")
+
 # --- Configurações do Admin ---
 
 @admin.register(GeneticMaterial)
-class GeneticMaterialAdmin(admin.ModelAdmin):
-    list_display = ('name', 'get_display_code', 'material_type', 'is_active')
-    list_filter = ('material_type', 'is_active', 'is_epagri_material')
-    search_fields = ('name', 'internal_code', 'accession_code')
+class GeneticMaterialAdmin(AuditHistoryMixin, SoftDeleteModelAdmin):
+    # As colunas derivadas e os filtros de registros vêm da ficha de listagem
+    # (MaterialListing), unida pela chave primária: uma consulta por página.
+    list_display = (
+        'name', 'listing_code', 'material_type', 'listing_mother', 'listing_father', 'listing_population',
+        'listing_s_genotype', 'listing_photos', 'listing_plantings', 'listing_offspring', 'is_active',
+    )
+    list_filter = ('material_type', 'is_active', 'is_epagri_material', 'ifo_status', MaterialRecordsFilter)
+    search_fields = ('name', 'internal_code', 'accession_code', 'listing__search_text')
     autocomplete_fields = ('mother', 'father', 'population', 's_alleles')
     
     inlines = [
@@ -226,12 +375,12 @@ class GeneticMaterialAdmin(admin.ModelAdmin):
         PhenologyObservationInline,
         PlantingInline,
         DiseaseReactionInline,
-        ChildrenAsMotherInline,
-        ChildrenAsFatherInline,
-        MutationsInline
     ]
     
-    actions = ['create_mutation_action', promote_to_selection, promote_to_cultivar]
+    actions = [
+        'create_mutation_action', promote_to_selection, promote_to_cultivar,
+        ifo_mark_sent, ifo_mark_released, ifo_mark_discarded,
+    ]
 
     base_fieldsets = (
         ('Identificação', {
@@ -261,6 +410,7 @@ class GeneticMaterialAdmin(admin.ModelAdmin):
     ifo_fieldset = (
         ('Controle IFO', {
             'fields': (
+                'ifo_status',
                 'ifo_sent', 'ifo_sent_date',
                 'ifo_quarantine_released',
                 'ifo_discarded', 'ifo_discarded_date'
@@ -269,7 +419,156 @@ class GeneticMaterialAdmin(admin.ModelAdmin):
             'description': 'Essa seção só está disponível para Seleções e Cultivares do programa da Epagri.'
         }),
     )
-    readonly_fields = ('internal_code', 'accession_code')
+    breeding_values_fieldset = (
+        ('Valores Genéticos Preditos (BLUP)', {
+            'fields': ('predicted_breeding_values',),
+            'classes': ('collapse',),
+            'description': (
+                'Predição a partir da genealogia e das reações registradas. '
+                'Escala: R=1, MR=2, MS=3, S=4; valores negativos indicam tendência à resistência.'
+            ),
+        }),
+    )
+    s_allele_probabilities_fieldset = (
+        ('Probabilidades de Alelos S (Gene Dropping)', {
+            'fields': ('s_allele_probabilities',),
+            'classes': ('collapse',),
+            'description': (
+                'Simulação da transmissão dos alelos S a partir dos genótipos informados nos ancestrais. '
+                'Útil para híbridos ainda não genotipados.'
+            ),
+        }),
+    )
+    summary_fieldset = (
+        ('Descendência e Resumo', {
+            'fields': ('material_summary',),
+            'description': 'Filhos e mutações registrados a partir deste material.',
+        }),
+    )
+    readonly_fields = (
+        'internal_code', 'accession_code', 'ifo_status', 'predicted_breeding_values',
+        's_allele_probabilities', 'material_summary',
+    )
+
+    def get_search_fields(self, request):
+        # O texto de busca da ficha inclui os códigos dos parentais e da
+        # população: no autocomplete (mãe, pai, ...) ele traria também os
+        # descendentes do material procurado.
+        if getattr(request.resolver_match, 'url_name', None) == 'autocomplete':
+            return ('name', 'internal_code', 'accession_code')
+        return super().get_search_fields(request)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('listing')
+
+    @staticmethod
+    def _listing(obj, name, default='-'):
+        listing = getattr(obj, 'listing', None)
+        value = getattr(listing, name) if listing else None
+        return default if value in (None, '') else value
+
+    @admin.display(description="Código", ordering='listing__display_code')
+    def listing_code(self, obj):
+        return self._listing(obj, 'display_code', obj.get_display_code())
+
+    @admin.display(description="Mãe", ordering='listing__mother_code')
+    def listing_mother(self, obj):
+        return self._listing(obj, 'mother_code')
+
+    @admin.display(description="Pai", ordering='listing__father_code')
+    def listing_father(self, obj):
+        return self._listing(obj, 'father_code')
+
+    @admin.display(description="População", ordering='listing__population_code')
+    def listing_population(self, obj):
+        return self._listing(obj, 'population_code')
+
+    @admin.display(description="Genótipo S", ordering='listing__s_genotype')
+    def listing_s_genotype(self, obj):
+        return self._listing(obj, 's_genotype')
+
+    @admin.display(description="Fotos", ordering='listing__num_photos')
+    def listing_photos(self, obj):
+        return self._listing(obj, 'num_photos')
+
+    @admin.display(description="Plantios", ordering='listing__num_plantings')
+    def listing_plantings(self, obj):
+        return self._listing(obj, 'num_plantings')
+
+    @admin.display(description="Descendentes", ordering='listing__num_offspring')
+    def listing_offspring(self, obj):
+        return self._listing(obj, 'num_offspring')
+
+    def get_audit_history(self, obj):
+        # Inclui as alterações de fotos, plantios, observações e reações do material.
+        return audit.material_history(obj.pk)
+
+    @admin.display(description="Resumo")
+    def material_summary(self, obj):
+        # Fragmento em cache; os sinais invalidam quando o material ou seus relacionados mudam.
+        return mark_safe(detail_cache.render_material_summary(obj)) if obj and obj.pk else ""
+
+    @admin.display(description="Valores genéticos")
+    def predicted_breeding_values(self, obj):
+        values = breeding_values.current_breeding_values(obj) if obj and obj.pk else []
+        if not values:
+            return "Nenhum cálculo disponível para este material."
+        rows = format_html_join(
+            '',
+            '<tr><td>{}</td><td>{:+.3f}</td><td>{:.2f}</td><td>{}</td></tr>',
+            (
+                (value.disease_name, value.ebv, value.predicted_score, value.get_predicted_reaction())
+                for value in values
+            ),
+        )
+        return format_html(
+            '<table><thead><tr><th>Doença</th><th>EBV</th><th>Escore predito</th>'
+            '<th>Reação provável</th></tr></thead><tbody>{}</tbody></table>',
+            rows,
+        )
+
+    @admin.display(description="Alelos S prováveis")
+    def s_allele_probabilities(self, obj):
+        # A simulação roda só quando pedida (botão), não a cada abertura da página.
+        if not obj or not obj.pk:
+            return "-"
+        return format_html(
+            '<button type="button" class="button" id="s-allele-probabilities-button" data-url="{}">'
+            'Calcular probabilidades</button><div id="s-allele-probabilities"></div>',
+            reverse('admin:germoplasm_geneticmaterial_salleleprobabilities', args=[obj.pk]),
+        )
+
+    def s_allele_probabilities_view(self, request, object_id):
+        """
+        Fragmento HTML com as probabilidades de alelos S do material, calculadas
+        sob demanda (em cache por versão da genealogia e dos alelos).
+        """
+        material = self.get_object(request, object_id)
+        if material is None:
+            return HttpResponse("Material não encontrado.", status=404)
+        if not self.has_view_permission(request, material):
+            raise PermissionDenied
+        # Dentro da requisição, sem pool de processos.
+        result = gene_dropping.allele_probabilities(material, workers=1)
+        if not result.replicates:
+            return HttpResponse("Nenhum genótipo S informado na genealogia deste material.")
+        if not result.consistent:
+            return HttpResponse("Os genótipos S informados nos ancestrais são incompatíveis com a genealogia.")
+        carriers = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td></tr>',
+            ((allele, f"{probability:.1%}") for allele, probability in result.carriers),
+        )
+        genotypes = format_html_join(
+            '', '<tr><td>{}{}</td><td>{}</td></tr>',
+            ((first, second, f"{probability:.1%}") for (first, second), probability in result.genotypes),
+        )
+        return HttpResponse(format_html(
+            '<table><thead><tr><th>Alelo</th><th>Probabilidade de portar</th></tr></thead><tbody>{}</tbody></table>'
+            '<table><thead><tr><th>Genótipo</th><th>Probabilidade</th></tr></thead><tbody>{}</tbody></table>'
+            '<p>{} réplicas ({} efetivas); {} de {} ancestrais genotipados.</p>',
+            carriers, genotypes, result.replicates, round(result.effective_replicates),
+            result.typed_ancestors, result.ancestors,
+        ))
 
     def get_fieldsets(self, request, obj=None):
         """
@@ -288,6 +587,10 @@ class GeneticMaterialAdmin(admin.ModelAdmin):
             if is_epagri and is_correct_type:
                 fieldsets.append(*self.ifo_fieldset)
                 pass
+
+            fieldsets.append(*self.breeding_values_fieldset)
+            fieldsets.append(*self.s_allele_probabilities_fieldset)
+            fieldsets.append(*self.summary_fieldset)
                 
         return tuple(fieldsets)
 
@@ -302,6 +605,41 @@ class GeneticMaterialAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.create_mutation_form_view),
                 name='germoplasm_geneticmaterial_createmutation',
             ),
+            path(
+                '<int:object_id>/pedigree/',
+                self.admin_site.admin_view(self.pedigree_view),
+                name='germoplasm_geneticmaterial_pedigree',
+            ),
+            path(
+                'import-photos/',
+                self.admin_site.admin_view(self.import_photos_view),
+                name='germoplasm_geneticmaterial_importphotos',
+            ),
+            path(
+                '<int:object_id>/s-allele-probabilities/',
+                self.admin_site.admin_view(self.s_allele_probabilities_view),
+                name='germoplasm_geneticmaterial_salleleprobabilities',
+            ),
+            path(
+                '<int:object_id>/detail.json',
+                self.admin_site.admin_view(self.detail_view),
+                name='germoplasm_geneticmaterial_detail',
+            ),
+            path(
+                'ifo/',
+                self.admin_site.admin_view(self.ifo_dashboard_view),
+                name='germoplasm_geneticmaterial_ifo',
+            ),
+            path(
+                'reaction-matrix/',
+                self.admin_site.admin_view(self.reaction_matrix_view),
+                name='germoplasm_geneticmaterial_reactionmatrix',
+            ),
+            path(
+                'diversity/',
+                self.admin_site.admin_view(self.diversity_view),
+                name='germoplasm_geneticmaterial_diversity',
+            ),
         ]
         return custom_urls + urls
     
@@ -335,12 +673,8 @@ class GeneticMaterialAdmin(admin.ModelAdmin):
             form = MutationCreationForm(request.POST)
             if form.is_valid():
                 try:
-                    with transaction.atomic():
-                        mutation_count = GeneticMaterial.objects.filter(mutated_from=origin_material).count()
-                        next_mutation_num = mutation_count + 1
-                        
-                        origin_code = origin_material.get_display_code()
-                        new_mutation_code = f"{origin_code}M{next_mutation_num}"
+                    with allocation_atomic():
+                        new_mutation_code = services.next_mutation_code(origin_material)
 
                         new_mutant = GeneticMaterial()
                         new_mutant.material_type = origin_material.material_type
@@ -404,15 +738,268 @@ class GeneticMaterialAdmin(admin.ModelAdmin):
         }
         return render(request, 'admin/germoplasm/create_mutation_form.html', context)
 
+    def pedigree_view(self, request, object_id):
+        """
+        Exibe o gráfico de genealogia (SVG em cache) do material.
+        """
+        material = self.get_object(request, object_id)
+        if material is None:
+            return self._get_obj_does_not_exist_redirect(request, self.model._meta, object_id)
+        if not self.has_view_permission(request, material):
+            raise PermissionDenied
+
+        try:
+            depth = int(request.GET.get('depth', pedigree_graph.DEFAULT_DEPTH))
+        except ValueError:
+            depth = pedigree_graph.DEFAULT_DEPTH
+        depth = max(1, min(depth, pedigree_graph.MAX_DEPTH))
+        svg = pedigree_graph.get_pedigree_svg(material.pk, depth)
+
+        if request.GET.get('format') == 'svg':
+            return HttpResponse(svg, content_type='image/svg+xml')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f"Genealogia de '{material.name}'",
+            'opts': self.model._meta,
+            'material': material,
+            'svg': svg,
+            'depth': depth,
+            'depth_options': range(1, pedigree_graph.MAX_DEPTH + 1),
+        }
+        return render(request, 'admin/germoplasm/pedigree.html', context)
+
+    def detail_view(self, request, object_id):
+        """
+        Representação JSON (em cache) do material e de seus relacionados.
+        """
+        material = self.get_object(request, object_id)
+        if material is None:
+            return JsonResponse({'error': 'Material não encontrado.'}, status=404)
+        if not self.has_view_permission(request, material):
+            raise PermissionDenied
+        return JsonResponse(detail_cache.get_material_detail(material))
+
+    def import_photos_view(self, request):
+        """
+        Importa fotos em lote a partir de um ZIP enviado pelo usuário.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        report = None
+        if request.method == 'POST':
+            form = PhotoImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                # Dentro da requisição, sem pool de processos: cada envio
+                # iniciaria um pool 'spawn' com django.setup() em cada processo.
+                # Lotes grandes ficam para o comando import_photos.
+                with tempfile.NamedTemporaryFile(suffix='.zip') as archive:
+                    for chunk in form.cleaned_data['archive'].chunks():
+                        archive.write(chunk)
+                    archive.flush()
+                    report = photo_import.import_photos(
+                        archive.name, workers=1, dry_run=form.cleaned_data['dry_run']
+                    )
+                level = messages.SUCCESS if not report.invalid else messages.WARNING
+                self.message_user(
+                    request,
+                    f"{report.created} foto(s) {'seriam criadas' if form.cleaned_data['dry_run'] else 'criada(s)'}; "
+                    f"{report.duplicates} já existente(s); {len(report.invalid)} inválida(s); "
+                    f"{len(report.unmatched) + len(report.ambiguous)} sem correspondência.",
+                    level=level,
+                )
+        else:
+            form = PhotoImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Importar fotos em lote",
+            'opts': self.model._meta,
+            'form': form,
+            'report': report,
+        }
+        return render(request, 'admin/germoplasm/import_photos.html', context)
+
+    def ifo_dashboard_view(self, request):
+        """
+        Painel do fluxo IFO: materiais por etapa, tempo em quarentena e atrasados.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        counts = ifo.stage_counts()
+        changelist_url = reverse('admin:germoplasm_geneticmaterial_changelist')
+        stages = [
+            (label, counts[value], f"{changelist_url}?is_epagri_material__exact=1&ifo_status__exact={value}")
+            for value, label in GeneticMaterial.IfoStatus.choices
+        ]
+        overdue = ifo.overdue()
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Painel IFO",
+            'opts': self.model._meta,
+            'stages': stages,
+            'distribution': ifo.quarantine_distribution(),
+            'overdue': overdue.only('name', 'material_type', 'internal_code', 'accession_code', 'ifo_sent_date')[
+                :ifo.OVERDUE_LIST_LIMIT
+            ],
+            'overdue_count': overdue.count(),
+            'overdue_days': ifo.QUARANTINE_OVERDUE_DAYS,
+        }
+        return render(request, 'admin/germoplasm/ifo_dashboard.html', context)
+
+    reaction_matrix_limit = 500
+
+    def reaction_matrix_view(self, request):
+        """
+        Matriz material × doença com filtro por limiares de reação em várias
+        doenças (ex: resistente à sarna e até MR à mancha da gala).
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        form = ReactionMatrixForm(request.GET or None)
+        diseases = form.diseases
+        matrix = reaction_matrix.get_matrix()
+        rows = []
+        total = None
+        if form.is_valid():
+            queryset = GeneticMaterial.objects.all()
+            if form.cleaned_data['material_type']:
+                queryset = queryset.filter(material_type=form.cleaned_data['material_type'])
+            materials = reaction_matrix.matching_materials(form.thresholds(), queryset).order_by('name')
+            total = materials.count()
+            for material in materials.only(
+                'name', 'material_type', 'internal_code', 'accession_code'
+            )[:self.reaction_matrix_limit]:
+                rows.append((material, matrix.levels(material.pk, [disease.pk for disease in diseases])))
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Matriz de reações a doenças",
+            'opts': self.model._meta,
+            'form': form,
+            'diseases': diseases,
+            'rows': rows,
+            'total': total,
+            'limit': self.reaction_matrix_limit,
+        }
+        return render(request, 'admin/germoplasm/reaction_matrix.html', context)
+
+    def diversity_view(self, request):
+        """
+        Contribuição dos fundadores e diversidade genética por ano de
+        cruzamento (materiais das populações cruzadas em cada ano).
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        material_type = request.GET.get('material_type', '')
+        if material_type not in GeneticMaterial.MaterialType.values:
+            material_type = ''
+        results = list(diversity.analyze_cohorts(diversity.cross_year_cohorts(material_type or None)).values())
+        labels = diversity.founder_labels(results)
+        rows = [
+            (result, [(labels.get(pk, pk), share * 100) for pk, share in result.top_founders(3)])
+            for result in results
+        ]
+        program = rows[-1][0] if rows else None
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Diversidade genética do programa",
+            'opts': self.model._meta,
+            'rows': rows,
+            'program_founders': [
+                (labels.get(pk, pk), share * 100) for pk, share in (program.top_founders() if program else ())
+            ],
+            'material_types': GeneticMaterial.MaterialType.choices,
+            'material_type': material_type,
+        }
+        return render(request, 'admin/germoplasm/diversity.html', context)
+
     class Media:
-        js = ('germoplasm/js/ifo_logic.js',)
+        js = ('germoplasm/js/ifo_logic.js', 'germoplasm/js/s_allele_probabilities.js')
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
     form = LocationAdminForm
 
-    list_display = ('name', 'city', 'state', 'latitude', 'longitude')
+    list_display = ('name', 'city', 'state', 'latitude', 'longitude', 'altitude')
     search_fields = ('name', 'city', 'state')
+    search_help_text = (
+        "Busque por nome, cidade ou estado, ou por coordenadas no formato "
+        "'latitude, longitude[, raio em km]' (ex: -27.59, -48.55, 30) para "
+        "listar os locais mais próximos."
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Busca por proximidade quando o termo é uma coordenada. Vale também para
+        o autocomplete, ou seja, para os seletores de local de Plantios e
+        Observações Fenológicas.
+        """
+        match = COORDINATE_SEARCH.match(search_term)
+        if not match:
+            return super().get_search_results(request, queryset, search_term)
+        latitude, longitude = float(match['latitude']), float(match['longitude'])
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return super().get_search_results(request, queryset, search_term)
+
+        radius = float(match['radius']) if match['radius'] else geo.PICKER_RADIUS_KM
+        found = geo.locations_within(latitude, longitude, radius, queryset)
+        if not found:
+            nearest = geo.nearest_location(latitude, longitude, queryset)
+            found = [nearest] if nearest else []
+        return geo.order_by_ids(queryset, [location.pk for location, _ in found]), False
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_view),
+                name='germoplasm_location_import',
+            ),
+        ]
+        return custom_urls + urls
+
+    def import_view(self, request):
+        """
+        Importa locais em lote a partir de uma planilha CSV.
+        """
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+
+        report = None
+        if request.method == 'POST':
+            form = LocationImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    rows = location_import.read_rows(form.cleaned_data['spreadsheet'].file)
+                except (UnicodeDecodeError, csv.Error) as error:
+                    form.add_error('spreadsheet', f"Não foi possível ler a planilha: {error}")
+                else:
+                    dry_run = form.cleaned_data['dry_run']
+                    report = location_import.import_locations(rows, dry_run=dry_run)
+                    self.message_user(
+                        request,
+                        f"{report.created} local(is) {'seriam criados' if dry_run else 'criado(s)'}, "
+                        f"{report.updated} {'seriam atualizados' if dry_run else 'atualizado(s)'}, "
+                        f"{len(report.rejects)} linha(s) rejeitada(s).",
+                        level=messages.WARNING if report.rejects else messages.SUCCESS,
+                    )
+        else:
+            form = LocationImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Importar locais",
+            'opts': self.model._meta,
+            'form': form,
+            'report': report,
+        }
+        return render(request, 'admin/germoplasm/import_locations.html', context)
 
     fieldsets = (
         (None, {
@@ -435,22 +1022,57 @@ class LocationAdmin(admin.ModelAdmin):
     readonly_fields = ('latitude', 'longitude')
 
 @admin.register(Marker)
-class MarkerAdmin(admin.ModelAdmin):
+class MarkerAdmin(SoftDeleteModelAdmin):
     list_display = ('name', 'marker_type')
     search_fields = ('name',)
 
+@admin.register(Disease)
+class DiseaseAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+
 @admin.register(PhenologicalEvent)
 class PhenologicalEventAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sequence', 'first_month', 'last_month', 'allow_repeats')
     search_fields = ('name',)
+    ordering = ('sequence', 'name')
+
+@admin.action(description='Controle de qualidade: verificar novamente')
+def recheck_phenology_quality(modeladmin, request, queryset):
+    keys = {
+        phenology_qc.group_of(*row)
+        for row in queryset.values_list('genetic_material_id', 'location_id', 'observation_date')
+    }
+    report = phenology_qc.recheck_groups(keys)
+    messages.success(
+        request,
+        f"{report.observations} observação(ões) de {report.groups} grupo(s) verificada(s): "
+        f"{sum(report.flags.values())} alerta(s)."
+    )
 
 @admin.register(PhenologyObservation)
-class PhenologyObservationAdmin(admin.ModelAdmin):
-    list_display = ('genetic_material', 'event', 'location', 'observation_date')
+class PhenologyObservationAdmin(SoftDeleteModelAdmin):
+    list_display = ('genetic_material', 'event', 'location', 'observation_date', 'quality_flags')
+    list_filter = (PhenologyFlagFilter, AltitudeBandFilter)
     search_fields = ('genetic_material__name', 'event__name', 'location__name')
     autocomplete_fields = ('genetic_material', 'location', 'event')
+    readonly_fields = ('quality_flags',)
+    actions = [recheck_phenology_quality]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('qc_flags')
+
+    @admin.display(description="Alertas")
+    def quality_flags(self, obj):
+        # A mensagem de cada alerta aparece ao passar o mouse.
+        flags = obj.qc_flags.all() if obj and obj.pk else []
+        return format_html_join(
+            mark_safe('<br>'), '<span title="{}">{}</span>',
+            ((flag.message, flag.get_rule_display()) for flag in flags),
+        ) or "-"
 
 @admin.register(Population)
-class PopulationAdmin(admin.ModelAdmin):
+class PopulationAdmin(AuditHistoryMixin, SoftDeleteModelAdmin):
     list_display = (
         'code', 'seplan_code', 'parent1', 'parent2', 'cross_date', 
         'flowers_quantity', 'fruit_quantity', 'seed_quantity'
@@ -461,9 +1083,209 @@ class PopulationAdmin(admin.ModelAdmin):
     readonly_fields = ('code',)
     actions = [promote_seedling_to_hybrid]
 
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        # O cadastro aloca o código do cruzamento: a transação do admin começa
+        # reservando a escrita (ver allocation_atomic).
+        if request.method == 'POST' and object_id is None:
+            with allocation_atomic(router.db_for_write(self.model)):
+                return super().changeform_view(request, object_id, form_url, extra_context)
+        return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'seplan-codes/',
+                self.admin_site.admin_view(self.seplan_codes_view),
+                name='germoplasm_population_seplan_codes',
+            ),
+        ]
+        return custom_urls + urls
+
+    def seplan_codes_view(self, request):
+        """
+        Fonte paginada (formato select2) das opções do filtro por código Seplan.
+        """
+        if not self.has_view_permission(request):
+            return JsonResponse({'error': 'Permissão negada.'}, status=403)
+        try:
+            page = int(request.GET.get('page', 1))
+        except ValueError:
+            page = 1
+        codes, has_more = services.search_seplan_codes(request.GET.get('term', ''), page)
+        return JsonResponse({
+            'results': [{'id': code, 'text': f"Seplan {code}"} for code in codes],
+            'pagination': {'more': has_more},
+        })
+
+    class Media:
+        css = {
+            'screen': ('admin/css/vendor/select2/select2.css', 'admin/css/autocomplete.css'),
+        }
+        js = (
+            'admin/js/vendor/jquery/jquery.js',
+            'admin/js/vendor/select2/select2.full.js',
+            'admin/js/jquery.init.js',
+            'germoplasm/js/seplan_filter.js',
+        )
+
 @admin.register(S_Allele)
-class S_AlleleAdmin(admin.ModelAdmin):
+class S_AlleleAdmin(SoftDeleteModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
     autocomplete_fields = ('markers',)
     inlines = [GeneticMaterialForSAllelesInline]
+
+@admin.register(BreedingValueRun)
+class BreedingValueRunAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'heritability', 'num_materials', 'num_records', 'duration_seconds')
+    readonly_fields = (
+        'created_at', 'heritability', 'num_materials', 'num_records', 'means', 'duration_seconds'
+    )
+
+    def has_add_permission(self, request):
+        # Os cálculos são gerados pelo comando 'compute_breeding_values'.
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(GenotypeMatrix)
+class GenotypeMatrixAdmin(admin.ModelAdmin):
+    list_display = (
+        'name', 'source_format', 'num_materials', 'num_markers', 'missing_rate', 'grm_computed_at', 'created_at'
+    )
+    list_filter = ('source_format',)
+    search_fields = ('name', 'source_file')
+    readonly_fields = (
+        'name', 'source_format', 'source_file', 'created_at', 'num_materials', 'num_markers',
+        'missing_rate', 'grm_computed_at'
+    )
+
+    def has_add_permission(self, request):
+        # As matrizes são gravadas pelo comando 'import_genotypes'.
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(WeatherSeries)
+class WeatherSeriesAdmin(admin.ModelAdmin):
+    list_display = ('location', 'year', 'resolution', 'observed', 'coverage', 'source_file', 'updated_at')
+    list_filter = ('resolution', 'location')
+    search_fields = ('location__name', 'source_file')
+    list_select_related = ('location',)
+    fields = ('location', 'year', 'resolution', 'observed', 'coverage', 'source_file', 'updated_at')
+    readonly_fields = fields
+
+    @admin.display(description="Cobertura")
+    def coverage(self, obj):
+        return f"{obj.observed / weather.steps_in_year(obj.year, obj.resolution):.1%}"
+
+    def has_add_permission(self, request):
+        # As séries são gravadas pelo comando 'import_weather'.
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(BreedingValue)
+class BreedingValueAdmin(admin.ModelAdmin):
+    list_display = ('genetic_material', 'disease_name', 'ebv', 'predicted_score', 'run')
+    list_filter = ('run', 'disease_name', 'genetic_material__material_type')
+    search_fields = ('genetic_material__name', 'genetic_material__internal_code', 'genetic_material__accession_code')
+    list_select_related = ('genetic_material', 'run')
+    ordering = ('disease_name', 'ebv')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PlantingInventory)
+class PlantingInventoryAdmin(admin.ModelAdmin):
+    list_display = (
+        'location', 'genetic_material', 'material_type', 'rootstock',
+        'num_plants', 'num_plantings', 'last_planting_date',
+    )
+    list_filter = (
+        ('location', admin.RelatedOnlyFieldListFilter),
+        'material_type',
+        ('rootstock', admin.AllValuesFieldListFilter),
+    )
+    search_fields = (
+        'genetic_material__name', 'genetic_material__internal_code',
+        'genetic_material__accession_code', 'location__name',
+    )
+    list_select_related = ('location', 'genetic_material')
+    ordering = ('location__name', 'genetic_material__name', 'rootstock')
+
+    # A tabela é derivada dos plantios e mantida pelos sinais.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'export/',
+                self.admin_site.admin_view(self.export_view),
+                name='germoplasm_plantinginventory_export',
+            ),
+        ]
+        return custom_urls + urls
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context=extra_context)
+        if hasattr(response, 'context_data') and 'cl' in response.context_data:
+            response.context_data['inventory_totals'] = inventory.totals(
+                response.context_data['cl'].queryset
+            )
+        return response
+
+    def export_view(self, request):
+        """
+        Exporta em CSV as linhas do inventário com os mesmos filtros e busca
+        aplicados na listagem.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        queryset = self.get_changelist_instance(request).queryset
+        writer = csv.writer(streaming.Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in inventory.csv_rows(queryset)),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'attachment; filename="inventario_plantas.csv"'
+        return response
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(admin.ModelAdmin):
+    list_display = ('timestamp', 'model', 'object_id', 'material_id', 'action', 'user', 'changed_fields')
+    list_filter = ('action', 'model')
+    search_fields = ('=object_id', '=material_id', 'user__username')
+    list_select_related = ('user',)
+    date_hierarchy = 'timestamp'
+    readonly_fields = ('timestamp', 'model', 'object_id', 'material_id', 'action', 'user', 'changes')
+
+    @admin.display(description="Campos")
+    def changed_fields(self, obj):
+        return ", ".join(label for label, _, _ in audit.describe(obj))
+
+    # O histórico é somente inclusão e gravado pelos sinais.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,328 @@
+"""
+Histórico de alterações (auditoria) dos materiais genéticos, populações e
+registros relacionados a um material.
+
+Os sinais comparam o estado gravado (lido uma única vez no ``pre_save``) com o
+novo e geram diferenças compactas por campo. Os registros não são gravados um
+a um: dentro de uma transação eles só são entregues no commit (e descartados
+no rollback) e, dentro de ``buffered()`` — usado pelo ``AuditMiddleware`` a
+cada requisição —, acumulam-se e são gravados com um único ``bulk_create`` no
+final.
+
+``state_at`` reconstrói o estado de um registro em uma data percorrendo o
+histórico de trás para frente a partir do estado atual.
+"""
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+
+from django.db import transaction
+from django.db.models import SET_NULL
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+
+from .models import (
+    AuditEntry,
+    CompactJSONEncoder,
+    DiseaseReaction,
+    GeneticMaterial,
+    GeneticMaterialPhoto,
+    PhenologyObservation,
+    Planting,
+    Population,
+)
+
+AUDITED_MODELS = (
+    GeneticMaterial,
+    Population,
+    DiseaseReaction,
+    GeneticMaterialPhoto,
+    PhenologyObservation,
+    Planting,
+)
+UNTRACKED_FIELDS = {'created_at', 'updated_at'}
+M2M_FIELDS = {GeneticMaterial: ('s_alleles',)}
+BULK_BATCH_SIZE = 1000
+
+_buffer = ContextVar('audit_buffer', default=None)
+_user = ContextVar('audit_user', default=None)
+
+
+@cache
+def tracked_fields(model) -> tuple:
+    """Attribute names of the concrete fields recorded in the history of ``model``."""
+    return tuple(
+        field.attname for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in UNTRACKED_FIELDS
+    )
+
+
+def _normalize(values: dict) -> dict:
+    # Mesma representação do JSON gravado (datas em ISO, Decimal em texto...).
+    return json.loads(json.dumps(values, cls=CompactJSONEncoder))
+
+
+def _value(instance, attname):
+    value = getattr(instance, attname)
+    return value.name if isinstance(value, FieldFile) else value
+
+
+def snapshot(instance, fields=None) -> dict:
+    """Normalized values of the tracked fields of ``instance``."""
+    fields = fields or tracked_fields(type(instance))
+    return _normalize({name: _value(instance, name) for name in fields})
+
+
+def stored_state(instance):
+    """Stored values of the tracked fields of ``instance``, or None if it is new."""
+    if instance._state.adding or not instance.pk:
+        return None
+    model = type(instance)
+    return model._base_manager.filter(pk=instance.pk).values(*tracked_fields(model)).first()
+
+
+def _material_column(model):
+    """Column holding the material of a row of ``model`` (None for populations)."""
+    if model is GeneticMaterial:
+        return 'pk'
+    return 'genetic_material_id' if 'genetic_material_id' in tracked_fields(model) else None
+
+
+def _material_id(instance):
+    column = _material_column(type(instance))
+    return getattr(instance, column) if column else None
+
+
+def _filled(values: dict) -> dict:
+    # A criação guarda apenas os campos preenchidos.
+    return {name: value for name, value in values.items() if value not in (None, '', False)}
+
+
+def _entry(model, object_id, material_id, action, changes) -> AuditEntry:
+    return AuditEntry(
+        timestamp=timezone.now(),
+        model=model._meta.label_lower,
+        object_id=object_id,
+        material_id=material_id,
+        action=action,
+        user_id=_user.get(),
+        changes=changes,
+    )
+
+
+def _write(entries) -> None:
+    AuditEntry.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+
+
+def _deliver(entries) -> None:
+    buffer = _buffer.get()
+    if buffer is not None:
+        buffer.extend(entries)
+    else:
+        _write(entries)
+
+
+def _record(entries) -> None:
+    if not entries:
+        return
+    if transaction.get_connection().in_atomic_block:
+        # Callbacks de savepoints desfeitos são descartados pelo Django.
+        transaction.on_commit(lambda: _deliver(entries))
+    else:
+        _deliver(entries)
+
+
+@contextmanager
+def buffered(user_id=None):
+    """
+    Accumulates the history entries recorded inside the block and writes them
+    with one ``bulk_create`` on exit. Nested blocks share the outer buffer.
+    """
+    user_token = _user.set(user_id) if user_id is not None else None
+    if _buffer.get() is not None:
+        try:
+            yield
+        finally:
+            if user_token:
+                _user.reset(user_token)
+        return
+
+    buffer = []
+    buffer_token = _buffer.set(buffer)
+    try:
+        yield
+    finally:
+        _buffer.reset(buffer_token)
+        if user_token:
+            _user.reset(user_token)
+        # As entradas já correspondem a gravações confirmadas.
+        if buffer:
+            _write(buffer)
+
+
+def record_save(instance, created, stored, update_fields=None) -> None:
+    """Records the creation of ``instance`` or the diff against ``stored``."""
+    model = type(instance)
+    fields = tracked_fields(model)
+    if update_fields and stored is not None:
+        names = {model._meta.get_field(name).attname for name in update_fields}
+        fields = [name for name in fields if name in names]
+    current = snapshot(instance, fields)
+
+    if created or stored is None:
+        _record([_entry(model, instance.pk, _material_id(instance), AuditEntry.Action.CREATE, _filled(current))])
+        return
+    previous = _normalize({name: stored[name] for name in fields})
+    changes = {
+        name: [previous[name], current[name]]
+        for name in fields if previous[name] != current[name]
+    }
+    if changes:
+        _record([_entry(model, instance.pk, _material_id(instance), AuditEntry.Action.UPDATE, changes)])
+
+
+def record_delete(instance) -> None:
+    """Records the deletion of ``instance`` with its full state."""
+    model = type(instance)
+    changes = snapshot(instance)
+    for name in M2M_FIELDS.get(model, ()):
+        changes[name] = sorted(getattr(instance, name).values_list('pk', flat=True))
+    entries = [_entry(model, instance.pk, _material_id(instance), AuditEntry.Action.DELETE, changes)]
+
+    # Vínculos SET_NULL são anulados pelo Django com UPDATE, sem sinais.
+    for relation in model._meta.related_objects:
+        related_model = relation.related_model
+        if relation.on_delete is not SET_NULL or related_model not in AUDITED_MODELS:
+            continue
+        attname = relation.field.attname
+        column = _material_column(related_model)
+        rows = related_model._base_manager.filter(**{attname: instance.pk}).values_list('pk', column or 'pk')
+        entries += [
+            _entry(
+                related_model, pk, material_id if column else None,
+                AuditEntry.Action.UPDATE, {attname: [instance.pk, None]},
+            )
+            for pk, material_id in rows
+        ]
+    _record(entries)
+
+
+def record_m2m(model, field_name, changes_by_object: dict) -> None:
+    """Records ``{object_id: (old_ids, new_ids)}`` changes of a many-to-many field."""
+    _record([
+        _entry(
+            model, object_id, object_id if _material_column(model) == 'pk' else None,
+            AuditEntry.Action.UPDATE, {field_name: [sorted(old), sorted(new)]},
+        )
+        for object_id, (old, new) in changes_by_object.items()
+        if set(old) != set(new)
+    ])
+
+
+def record_created(objects) -> None:
+    """Records objects created with ``bulk_create`` (which sends no signals)."""
+    _record([
+        _entry(type(instance), instance.pk, _material_id(instance), AuditEntry.Action.CREATE, _filled(snapshot(instance)))
+        for instance in objects
+    ])
+
+
+def update(queryset, **values) -> int:
+    """
+    ``queryset.update(**values)`` recording the diff of every updated row.
+    The previous values are read with one query before the update; ``values``
+    must be plain values (not expressions).
+    """
+    model = queryset.model
+    attnames = {model._meta.get_field(name).attname: value for name, value in values.items()}
+    fields = [name for name in tracked_fields(model) if name in attnames]
+    column = _material_column(model)
+    extra = [column] if column and column != 'pk' else []
+    with transaction.atomic():
+        rows = list(queryset.values('pk', *fields, *extra))
+        updated = queryset.update(**values)
+        current = _normalize({name: attnames[name] for name in fields})
+        entries = []
+        for row in rows:
+            previous = _normalize({name: row[name] for name in fields})
+            changes = {
+                name: [previous[name], current[name]]
+                for name in fields if previous[name] != current[name]
+            }
+            if changes:
+                material_id = row[column] if column else None
+                entries.append(_entry(model, row['pk'], material_id, AuditEntry.Action.UPDATE, changes))
+        _record(entries)
+    return updated
+
+
+def material_history(material_id):
+    """History of a material and of its related records, newest first."""
+    return AuditEntry.objects.filter(material_id=material_id).select_related('user')
+
+
+def object_history(model, object_id):
+    return AuditEntry.objects.filter(
+        model=model._meta.label_lower, object_id=object_id
+    ).select_related('user')
+
+
+def state_at(model, object_id, when):
+    """
+    State (tracked fields and many-to-many ids) of the record at ``when``, or
+    None if it did not exist then. Records changed before the history started
+    are reconstructed from their current state.
+    """
+    entries = AuditEntry.objects.filter(model=model._meta.label_lower, object_id=object_id)
+    current = model._base_manager.filter(pk=object_id).values(*tracked_fields(model)).first()
+    if current is not None:
+        state = _normalize(current)
+        for name in M2M_FIELDS.get(model, ()):
+            related = model._meta.get_field(name)
+            through = related.remote_field.through
+            source = related.m2m_field_name() + '_id'
+            target = related.m2m_reverse_field_name() + '_id'
+            state[name] = sorted(through.objects.filter(**{source: object_id}).values_list(target, flat=True))
+    else:
+        deletion = entries.filter(action=AuditEntry.Action.DELETE).order_by('-timestamp', '-id').first()
+        if deletion is None or deletion.timestamp <= when:
+            return None
+        state = dict(deletion.changes)
+        entries = entries.filter(id__lt=deletion.id)
+
+    for entry in entries.filter(timestamp__gt=when).order_by('-timestamp', '-id').iterator():
+        if entry.action == AuditEntry.Action.CREATE:
+            return None
+        if entry.action == AuditEntry.Action.UPDATE:
+            for name, (old, _new) in entry.changes.items():
+                state[name] = old
+    return state
+
+
+def _model_for(label):
+    return next((model for model in AUDITED_MODELS if model._meta.label_lower == label), None)
+
+
+def field_label(model, name) -> str:
+    """Verbose name of the field with name or attribute name ``name``."""
+    if model is not None:
+        for field in [*model._meta.concrete_fields, *model._meta.many_to_many]:
+            if name in (field.name, field.attname):
+                return str(field.verbose_name)
+    return name
+
+
+def describe(entry) -> list:
+    """Returns ``[(field label, before, after), ...]`` for displaying ``entry``."""
+    model = _model_for(entry.model)
+    if entry.action == AuditEntry.Action.UPDATE:
+        return [(field_label(model, name), old, new) for name, (old, new) in entry.changes.items()]
+    if entry.action == AuditEntry.Action.CREATE:
+        return [(field_label(model, name), None, value) for name, value in entry.changes.items()]
+    return [(field_label(model, name), value, None) for name, value in entry.changes.items()]
+
+
+def describe_state(model, state) -> list:
+    """Returns ``[(field label, value), ...]`` for displaying a :func:`state_at` result."""
+    return [(field_label(model, name), value) for name, value in state.items()]
@@ -0,0 +1,450 @@
+"""
+Recursos da API BrAPI v2 (https://brapi.org) sobre os dados do BAG.
+
+- ``germplasm``: materiais genéticos ativos, com códigos, origem e mutação;
+- ``pedigree``: nós da genealogia (mãe, pai, população e mutantes);
+- ``locations``: locais;
+- ``observationunits``: plantios (uma unidade por plantio);
+- ``observations``: observações fenológicas (a variável é o evento e o valor
+  é a data observada).
+
+Cada recurso declara a consulta base, os filtros aceitos e uma função que
+serializa uma página inteira com um número fixo de consultas.
+
+As buscas assíncronas (``POST /search/<recurso>``) percorrem os ids do
+resultado uma única vez, com cursor no servidor (``iterator``), e guardam a
+lista compacta de ids no cache sob o ``searchResultsDbId``. Cada página do
+resultado é então uma consulta por chave primária, com custo constante
+qualquer que seja o número da página, e o resultado não muda entre páginas.
+"""
+import math
+import uuid
+from array import array
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Q, Subquery
+from django.utils.dateparse import parse_date
+
+from .models import GeneticMaterial, Location, PhenologyObservation, Planting
+
+BRAPI_VERSION = '2.1'
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+SEARCH_CACHE_TIMEOUT = 60 * 60
+ID_CHUNK_SIZE = 5000
+
+# Situação biológica da acessão (descritor SAMPSTAT do MCPD).
+BIOLOGICAL_STATUS = {
+    GeneticMaterial.MaterialType.CULTIVAR: ('500', 'Advanced or improved cultivar'),
+    GeneticMaterial.MaterialType.SELECTION: ('410', "Breeder's line"),
+    GeneticMaterial.MaterialType.HYBRID: ('412', 'Hybrid'),
+}
+
+
+class BrapiError(Exception):
+    """Request error reported to the client with ``status``."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _db_ids(values) -> list:
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise BrapiError(f"Identificador inválido em {list(values)}.")
+
+
+def _texts(values) -> list:
+    return [str(value) for value in values]
+
+
+def _date(values):
+    value = parse_date(str(values[-1])[:10])
+    if value is None:
+        raise BrapiError(f"Data inválida: '{values[-1]}'.")
+    return value
+
+
+@dataclass(frozen=True)
+class Resource:
+    queryset: object
+    # Parâmetro BrAPI da busca -> (lookup do ORM, conversor dos valores). Nos
+    # GET as listas são passadas no singular (sem o 's' final).
+    filters: dict
+    serialize: object
+    permission: str
+
+    def filter(self, params: dict):
+        """Applies the BrAPI filters in ``params`` (name -> list of values)."""
+        queryset = self.queryset()
+        for name, (lookup, convert) in self.filters.items():
+            values = [value for value in params.get(name) or () if value not in (None, '')]
+            if values:
+                queryset = queryset.filter(**{lookup: convert(values)})
+        return queryset.order_by('pk')
+
+
+def _display_code(material_type, internal_code, accession_code, name):
+    # Mesma regra de GeneticMaterial.get_display_code().
+    if material_type == GeneticMaterial.MaterialType.HYBRID:
+        return accession_code or name
+    return internal_code or name
+
+
+MATERIAL_FIELDS = ('pk', 'name', 'material_type', 'internal_code', 'accession_code')
+
+
+def _material_refs(ids) -> dict:
+    """``{pk: (name, display code)}`` of the given materials, inactive included."""
+    ids = {pk for pk in ids if pk}
+    rows = GeneticMaterial.all_objects.filter(pk__in=ids).values_list(*MATERIAL_FIELDS)
+    return {
+        pk: (name, _display_code(material_type, internal_code, accession_code, name))
+        for pk, name, material_type, internal_code, accession_code in rows
+    }
+
+
+def _pedigree_string(row, refs):
+    if not (row['mother_id'] or row['father_id']):
+        return None
+    mother = refs.get(row['mother_id'], (None, 'NA'))[1]
+    father = refs.get(row['father_id'], (None, 'NA'))[1]
+    return f"{mother}/{father}"
+
+
+GERMPLASM_VALUES = (
+    *MATERIAL_FIELDS, 'mother_id', 'father_id', 'mutated_from_id', 'population_id',
+    'population__code', 'population__cross_date', 'is_epagri_material', 'ifo_status',
+)
+
+
+def serialize_germplasm(queryset) -> list:
+    rows = list(queryset.values(*GERMPLASM_VALUES))
+    refs = _material_refs(pk for row in rows for pk in (row['mother_id'], row['father_id']))
+    data = []
+    for row in rows:
+        code = _display_code(row['material_type'], row['internal_code'], row['accession_code'], row['name'])
+        status, status_label = BIOLOGICAL_STATUS.get(row['material_type'], (None, None))
+        synonyms = [
+            {'synonym': row[name], 'type': name}
+            for name in ('internal_code', 'accession_code') if row[name]
+        ]
+        data.append({
+            'germplasmDbId': str(row['pk']),
+            'germplasmName': row['name'],
+            'defaultDisplayName': code,
+            'accessionNumber': code,
+            'biologicalStatusOfAccessionCode': status,
+            'biologicalStatusOfAccessionDescription': status_label,
+            'pedigree': _pedigree_string(row, refs),
+            'seedSource': row['population__code'],
+            'synonyms': synonyms,
+            'additionalInfo': {
+                'materialType': row['material_type'],
+                'isEpagriMaterial': row['is_epagri_material'],
+                'ifoStatus': row['ifo_status'],
+                'populationDbId': _str_or_none(row['population_id']),
+                'mutatedFromDbId': _str_or_none(row['mutated_from_id']),
+            },
+        })
+    return data
+
+
+def serialize_pedigree(queryset) -> list:
+    rows = list(queryset.values(*GERMPLASM_VALUES))
+    ids = [row['pk'] for row in rows]
+    progeny = {}
+    children = (
+        GeneticMaterial.objects
+        .filter(Q(mother_id__in=ids) | Q(father_id__in=ids) | Q(mutated_from_id__in=ids))
+        .order_by('pk')
+        .values_list('pk', 'name', 'mother_id', 'father_id', 'mutated_from_id')
+    )
+    for pk, name, mother_id, father_id, mutated_from_id in children:
+        for parent_id, parent_type in ((mother_id, 'FEMALE'), (father_id, 'MALE'), (mutated_from_id, 'CLONAL')):
+            if parent_id:
+                progeny.setdefault(parent_id, []).append(
+                    {'germplasmDbId': str(pk), 'germplasmName': name, 'parentType': parent_type}
+                )
+    refs = _material_refs(
+        pk for row in rows for pk in (row['mother_id'], row['father_id'], row['mutated_from_id'])
+    )
+
+    data = []
+    for row in rows:
+        parents = [
+            {'germplasmDbId': str(parent_id), 'germplasmName': refs[parent_id][0], 'parentType': parent_type}
+            for parent_id, parent_type in (
+                (row['mother_id'], 'FEMALE'), (row['father_id'], 'MALE'), (row['mutated_from_id'], 'CLONAL'),
+            )
+            if parent_id in refs
+        ]
+        cross_date = row['population__cross_date']
+        data.append({
+            'germplasmDbId': str(row['pk']),
+            'germplasmName': row['name'],
+            'defaultDisplayName': _display_code(
+                row['material_type'], row['internal_code'], row['accession_code'], row['name']
+            ),
+            'pedigreeString': _pedigree_string(row, refs),
+            'familyCode': row['population__code'],
+            'crossingYear': cross_date.year if cross_date else None,
+            'parents': parents,
+            'progeny': progeny.get(row['pk'], []),
+        })
+    return data
+
+
+def _coordinates(latitude, longitude, altitude):
+    if latitude is None or longitude is None:
+        return None
+    point = [float(longitude), float(latitude)]
+    if altitude is not None:
+        point.append(float(altitude))
+    return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': point}}
+
+
+def serialize_locations(queryset) -> list:
+    rows = queryset.values_list('pk', 'name', 'city', 'state', 'latitude', 'longitude', 'altitude', 'geohash')
+    return [
+        {
+            'locationDbId': str(pk),
+            'locationName': name,
+            'coordinates': _coordinates(latitude, longitude, altitude),
+            'additionalInfo': {'city': city, 'state': state, 'geohash': geohash},
+        }
+        for pk, name, city, state, latitude, longitude, altitude, geohash in rows
+    ]
+
+
+def serialize_observation_units(queryset) -> list:
+    rows = queryset.values_list(
+        'pk', 'genetic_material_id', 'genetic_material__name', 'location_id', 'location__name',
+        'num_plants', 'planting_date', 'rootstock',
+    )
+    return [
+        {
+            'observationUnitDbId': str(pk),
+            'observationUnitName': f"{material_name} - {location_name}",
+            'germplasmDbId': str(material_id),
+            'germplasmName': material_name,
+            'locationDbId': str(location_id),
+            'locationName': location_name,
+            'observationUnitPosition': {
+                'observationLevel': {'levelName': 'plot', 'levelCode': str(pk)},
+            },
+            'additionalInfo': {
+                'numPlants': num_plants,
+                'plantingDate': _iso_or_none(planting_date),
+                'rootstock': rootstock,
+            },
+        }
+        for pk, material_id, material_name, location_id, location_name, num_plants, planting_date, rootstock in rows
+    ]
+
+
+def serialize_observations(queryset) -> list:
+    # A observação fenológica não aponta para um plantio: a unidade é o
+    # plantio ativo mais recente do mesmo material no mesmo local.
+    unit = (
+        Planting.objects
+        .filter(genetic_material=OuterRef('genetic_material'), location=OuterRef('location'))
+        .order_by('-planting_date', '-pk')
+        .values('pk')[:1]
+    )
+    rows = queryset.annotate(unit_id=Subquery(unit)).values_list(
+        'pk', 'genetic_material_id', 'genetic_material__name', 'unit_id',
+        'event_id', 'event__name', 'observation_date', 'location_id', 'location__name',
+    )
+    return [
+        {
+            'observationDbId': str(pk),
+            'germplasmDbId': str(material_id),
+            'germplasmName': material_name,
+            'observationUnitDbId': _str_or_none(unit_id),
+            'observationVariableDbId': str(event_id),
+            'observationVariableName': event_name,
+            'observationTimeStamp': observation_date.isoformat(),
+            'value': observation_date.isoformat(),
+            'additionalInfo': {'locationDbId': str(location_id), 'locationName': location_name},
+        }
+        for (pk, material_id, material_name, unit_id, event_id, event_name,
+             observation_date, location_id, location_name) in rows
+    ]
+
+
+def _str_or_none(value):
+    return None if value is None else str(value)
+
+
+def _iso_or_none(value):
+    return None if value is None else value.isoformat()
+
+
+GERMPLASM_FILTERS = {
+    'germplasmDbIds': ('pk__in', _db_ids),
+    'germplasmNames': ('name__in', _texts),
+    'accessionNumbers': ('accession_code__in', _texts),
+    'internalCodes': ('internal_code__in', _texts),
+}
+
+RESOURCES = {
+    'germplasm': Resource(
+        queryset=lambda: GeneticMaterial.objects.all(),
+        filters=GERMPLASM_FILTERS,
+        serialize=serialize_germplasm,
+        permission='germoplasm.view_geneticmaterial',
+    ),
+    'pedigree': Resource(
+        queryset=lambda: GeneticMaterial.objects.all(),
+        filters=GERMPLASM_FILTERS,
+        serialize=serialize_pedigree,
+        permission='germoplasm.view_geneticmaterial',
+    ),
+    'locations': Resource(
+        queryset=lambda: Location.objects.all(),
+        filters={
+            'locationDbIds': ('pk__in', _db_ids),
+            'locationNames': ('name__in', _texts),
+        },
+        serialize=serialize_locations,
+        permission='germoplasm.view_location',
+    ),
+    'observationunits': Resource(
+        queryset=lambda: Planting.objects.filter(genetic_material__is_active=True),
+        filters={
+            'observationUnitDbIds': ('pk__in', _db_ids),
+            'germplasmDbIds': ('genetic_material_id__in', _db_ids),
+            'locationDbIds': ('location_id__in', _db_ids),
+        },
+        serialize=serialize_observation_units,
+        permission='germoplasm.view_planting',
+    ),
+    'observations': Resource(
+        queryset=lambda: PhenologyObservation.objects.filter(genetic_material__is_active=True),
+        filters={
+            'observationDbIds': ('pk__in', _db_ids),
+            'germplasmDbIds': ('genetic_material_id__in', _db_ids),
+            'locationDbIds': ('location_id__in', _db_ids),
+            'observationVariableDbIds': ('event_id__in', _db_ids),
+            'observationTimeStampRangeStart': ('observation_date__gte', _date),
+            'observationTimeStampRangeEnd': ('observation_date__lte', _date),
+        },
+        serialize=serialize_observations,
+        permission='germoplasm.view_phenologyobservation',
+    ),
+}
+
+
+# Recursos com consulta individual -> nome do identificador na URL.
+DETAIL_PARAMS = {
+    'germplasm': 'germplasmDbId',
+    'locations': 'locationDbId',
+    'observationunits': 'observationUnitDbId',
+    'observations': 'observationDbId',
+}
+
+
+def get_resource(name: str) -> Resource:
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise BrapiError(f"Recurso BrAPI desconhecido: '{name}'.", status=404)
+
+
+def paging(page, page_size) -> tuple:
+    """Validates the BrAPI ``page`` (0-based) and ``pageSize`` parameters."""
+    try:
+        page = int(page or 0)
+        page_size = int(page_size or DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise BrapiError("'page' e 'pageSize' devem ser números inteiros.")
+    if page < 0 or not 0 < page_size <= MAX_PAGE_SIZE:
+        raise BrapiError(f"'page' deve ser >= 0 e 'pageSize' entre 1 e {MAX_PAGE_SIZE}.")
+    return page, page_size
+
+
+def envelope(result, page=0, page_size=0, total=0, messages=(), message_type='INFO') -> dict:
+    """BrAPI response body: metadata (pagination, status) and ``result``."""
+    return {
+        'metadata': {
+            'datafiles': [],
+            'pagination': {
+                'currentPage': page,
+                'pageSize': page_size,
+                'totalCount': total,
+                'totalPages': math.ceil(total / page_size) if page_size else 0,
+            },
+            'status': [{'message': message, 'messageType': message_type} for message in messages],
+        },
+        'result': result,
+    }
+
+
+def list_page(resource: Resource, params: dict, page: int, page_size: int) -> dict:
+    queryset = resource.filter(params)
+    total = queryset.count()
+    start = page * page_size
+    data = resource.serialize(queryset[start:start + page_size]) if start < total else []
+    return envelope({'data': data}, page, page_size, total)
+
+
+def detail(resource: Resource, db_id) -> dict:
+    [pk] = _db_ids([db_id])
+    data = resource.serialize(resource.queryset().filter(pk=pk))
+    if not data:
+        raise BrapiError("Registro não encontrado.", status=404)
+    return envelope(data[0])
+
+
+def _search_key(search_id: str) -> str:
+    return f'germoplasm:brapi-search:{search_id}'
+
+
+def create_search(name: str, params: dict) -> tuple:
+    """
+    Runs the search once and stores the ids of the result (in order) in the
+    cache. Returns ``(searchResultsDbId, totalCount)``.
+    """
+    queryset = get_resource(name).filter(params)
+    ids = array('q', queryset.values_list('pk', flat=True).iterator(chunk_size=ID_CHUNK_SIZE))
+    search_id = uuid.uuid4().hex
+    cache.set(_search_key(search_id), (name, ids.tobytes()), SEARCH_CACHE_TIMEOUT)
+    return search_id, len(ids)
+
+
+def search_page(name: str, search_id: str, page: int, page_size: int) -> dict:
+    """One page of a stored search; rows deleted meanwhile are left out."""
+    stored = cache.get(_search_key(search_id))
+    if stored is None or stored[0] != name:
+        raise BrapiError("Busca não encontrada ou expirada.", status=404)
+    ids = array('q')
+    ids.frombytes(stored[1])
+    chunk = ids[page * page_size:(page + 1) * page_size].tolist()
+    resource = get_resource(name)
+    data = resource.serialize(resource.queryset().filter(pk__in=chunk).order_by('pk')) if chunk else []
+    return envelope({'data': data}, page, page_size, len(ids))
+
+
+def server_info() -> dict:
+    calls = []
+    for name in RESOURCES:
+        calls += [
+            {'service': name, 'methods': ['GET'], 'versions': [BRAPI_VERSION]},
+            {'service': f'search/{name}', 'methods': ['POST'], 'versions': [BRAPI_VERSION]},
+            {'service': f'search/{name}/{{searchResultsDbId}}', 'methods': ['GET'], 'versions': [BRAPI_VERSION]},
+        ]
+        if name in DETAIL_PARAMS:
+            calls.append({
+                'service': f'{name}/{{{DETAIL_PARAMS[name]}}}', 'methods': ['GET'], 'versions': [BRAPI_VERSION],
+            })
+    for call in calls:
+        call.update(contentTypes=['application/json'], dataTypes=['application/json'])
+    return envelope({
+        'serverName': 'Programa de Melhoramento Genético - BAG',
+        'serverDescription': 'BrAPI v2: germoplasma, genealogia, locais e observações fenológicas.',
+        'calls': calls,
+    })
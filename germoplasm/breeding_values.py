@@ -0,0 +1,156 @@
+"""
+Predição de valores genéticos (BLUP de genealogia) para reação a doenças.
+
+As reações ordinais registradas em ``DiseaseReaction`` são convertidas para a
+escala R=1, MR=2, MS=3, S=4 e analisadas, doença a doença, com o modelo
+animal ``y = 1μ + Za + e``. A inversa da matriz de parentesco é montada
+diretamente da genealogia (regras de Henderson) e as equações de modelos
+mistos são resolvidas com um solver esparso, de modo que híbridos ainda não
+avaliados recebem uma predição a partir de seus parentes.
+"""
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+from scipy.sparse.linalg import cg
+
+from .models import BreedingValue, BreedingValueRun, DiseaseReaction, GeneticMaterial
+from .pedigree import Pedigree, UNKNOWN, load_pedigree, relationship_inverse
+
+REACTION_SCORES = {
+    DiseaseReaction.ReactionLevel.RESISTANT: 1.0,
+    DiseaseReaction.ReactionLevel.MODERATELY_RESISTANT: 2.0,
+    DiseaseReaction.ReactionLevel.MODERATELY_SUSCEPTIBLE: 3.0,
+    DiseaseReaction.ReactionLevel.SUSCEPTIBLE: 4.0,
+}
+
+DEFAULT_HERITABILITY = 0.3
+BULK_BATCH_SIZE = 5000
+SOLVER_TOLERANCE = 1e-8
+SOLVER_MAX_ITERATIONS = 5000
+
+
+def solve_mixed_model(ainv: sparse.spmatrix, rows: np.ndarray, y: np.ndarray, lam: float):
+    """
+    Solves Henderson's mixed model equations for a single overall mean.
+
+    ``rows`` are the pedigree rows of each record and ``lam`` is
+    σ²e/σ²a. Returns ``(mean, ebv)``.
+
+    The system is symmetric positive definite, so it is solved with the
+    preconditioned conjugate gradient (diagonal preconditioner), as usual in
+    animal breeding software: the cost per iteration is linear in the number
+    of non-zeros and there is no fill-in, unlike a direct factorization.
+    """
+    n = ainv.shape[0]
+    counts = np.bincount(rows, minlength=n).astype(float)
+    sums = np.bincount(rows, weights=y, minlength=n)
+
+    # [ N    1'Z         ] [μ]   [Σy ]
+    # [ Z'1  Z'Z + λA⁻¹  ] [a] = [Z'y]
+    border = sparse.csc_matrix(counts.reshape(-1, 1))
+    lhs = sparse.bmat([
+        [sparse.csc_matrix([[counts.sum()]]), border.T],
+        [border, sparse.diags(counts) + lam * ainv],
+    ], format='csc')
+    rhs = np.concatenate(([y.sum()], sums))
+
+    preconditioner = sparse.diags(1.0 / lhs.diagonal())
+    solution, info = cg(
+        lhs, rhs, M=preconditioner, rtol=SOLVER_TOLERANCE, maxiter=SOLVER_MAX_ITERATIONS
+    )
+    if info > 0:
+        raise ValueError(
+            f"O solver não convergiu em {info} iterações; verifique a genealogia e os registros."
+        )
+    return float(solution[0]), solution[1:]
+
+
+def _load_records(pedigree: Pedigree) -> dict:
+    """Groups the scored reactions by disease as ``{disease: (rows, scores)}``."""
+    grouped = defaultdict(lambda: ([], []))
+    reactions = (
+        DiseaseReaction.objects
+        .exclude(reaction='')
+        .values_list('genetic_material_id', 'disease__name', 'reaction')
+    )
+    for material_id, disease_name, reaction in reactions.iterator(chunk_size=BULK_BATCH_SIZE):
+        row = pedigree.index.get(material_id, UNKNOWN)
+        if row == UNKNOWN:
+            continue
+        rows, scores = grouped[disease_name]
+        rows.append(row)
+        scores.append(REACTION_SCORES[reaction])
+
+    return {
+        disease: (np.asarray(rows, dtype=np.int64), np.asarray(scores))
+        for disease, (rows, scores) in grouped.items()
+    }
+
+
+def predict_breeding_values(heritability: float = DEFAULT_HERITABILITY) -> BreedingValueRun:
+    """
+    Runs the pedigree BLUP for every disease and stores the results as a new
+    ``BreedingValueRun``. Mutations receive the value of their original genotype.
+    """
+    if not 0 < heritability < 1:
+        raise ValueError("A herdabilidade deve estar entre 0 e 1 (exclusivo).")
+
+    started = time.perf_counter()
+    pedigree = load_pedigree()
+    ainv = relationship_inverse(pedigree)
+    lam = (1 - heritability) / heritability
+    records = _load_records(pedigree)
+
+    # Cada linha da genealogia pode representar vários materiais (clones).
+    materials_by_row = sorted(pedigree.index.items(), key=lambda item: item[1])
+    material_ids = np.fromiter((pk for pk, _ in materials_by_row), dtype=np.int64)
+    material_rows = np.fromiter((row for _, row in materials_by_row), dtype=np.int64)
+
+    results = {}
+    for disease, (rows, y) in records.items():
+        mean, ebv = solve_mixed_model(ainv, rows, y, lam)
+        results[disease] = (mean, ebv[material_rows])
+
+    with transaction.atomic():
+        run = BreedingValueRun.objects.create(
+            heritability=heritability,
+            num_materials=len(pedigree),
+            num_records=sum(len(rows) for rows, _ in records.values()),
+            means={disease: mean for disease, (mean, _) in results.items()},
+        )
+        for disease, (mean, ebv) in results.items():
+            BreedingValue.objects.bulk_create(
+                (
+                    BreedingValue(
+                        run=run,
+                        genetic_material_id=pk,
+                        disease_name=disease,
+                        ebv=value,
+                        predicted_score=mean + value,
+                    )
+                    for pk, value in zip(material_ids.tolist(), ebv.tolist())
+                ),
+                batch_size=BULK_BATCH_SIZE,
+            )
+        run.duration_seconds = time.perf_counter() - started
+        run.save(update_fields=['duration_seconds'])
+
+    return run
+
+
+def current_breeding_values(material: GeneticMaterial):
+    """Returns the breeding values of ``material`` from the latest run."""
+    latest = BreedingValueRun.objects.order_by('-created_at').first()
+    if latest is None:
+        return BreedingValue.objects.none()
+    return latest.breeding_values.filter(genetic_material=material).order_by('disease_name')
+
+
+def prune_runs(keep: int) -> int:
+    """Deletes all but the ``keep`` most recent runs. Returns how many were removed."""
+    stale = BreedingValueRun.objects.order_by('-created_at').values_list('pk', flat=True)[keep:]
+    _, deleted = BreedingValueRun.objects.filter(pk__in=list(stale)).delete()
+    return deleted.get(BreedingValueRun._meta.label, 0)
@@ -0,0 +1,44 @@
+"""
+Helpers para chaves de cache versionadas.
+
+Em vez de apagar entradas uma a uma, cada objeto cacheado tem um "token de
+versão" guardado no próprio cache. As chaves das entradas incluem o token, de
+modo que basta trocar o token para invalidar tudo o que depende dele. Os tokens
+são baseados no relógio (e não em contadores), assim um token expulso do cache
+nunca volta a coincidir com uma versão antiga.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _new_token() -> int:
+    return time.time_ns()
+
+
+def get_version(key: str) -> int:
+    """Returns the current version token stored under ``key``, creating it if needed."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_token(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(keys) -> dict:
+    """Same as ``get_version`` for many keys, with a single round-trip when possible."""
+    keys = list(keys)
+    versions = cache.get_many(keys)
+    missing = {key: _new_token() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def bump_versions(keys) -> None:
+    """Invalidates every entry that depends on the given version keys."""
+    keys = list(keys)
+    if keys:
+        token = _new_token()
+        cache.set_many({key: token for key in keys}, None)
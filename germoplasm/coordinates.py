@@ -0,0 +1,173 @@
+"""
+Conversão vetorizada de coordenadas entre graus decimais e DMS (graus,
+minutos e segundos).
+
+Usado tanto pelo ``LocationAdminForm`` (um local por vez) quanto pela
+importação em lote de locais (colunas inteiras), para que os dois caminhos
+produzam exatamente os mesmos valores.
+"""
+import re
+
+import numpy as np
+
+DECIMAL_PLACES = 6
+SECONDS_PLACES = 2
+LIMITS = {'lat': 90.0, 'lon': 180.0}
+# Direções que tornam a coordenada negativa (Sul, Oeste/West) e as positivas.
+NEGATIVE_DIRECTIONS = {'lat': {'S'}, 'lon': {'O', 'W'}}
+POSITIVE_DIRECTIONS = {'lat': {'N'}, 'lon': {'L', 'E'}}
+FORM_DIRECTIONS = {'lat': ('N', 'S'), 'lon': ('L', 'O')}
+
+DECIMAL_PATTERN = re.compile(r'^\s*([+-]?\d+(?:[.,]\d+)?)\s*°?\s*([NSLEOW])?\s*$', re.IGNORECASE)
+DMS_PATTERN = re.compile(
+    r"""^\s*([NSLEOW])?\s*
+        ([+-])?(\d+(?:[.,]\d+)?)\s*(?:°|º|d|\s)\s*
+        (?:(\d+(?:[.,]\d+)?)\s*(?:'|′|m|\s)\s*)?
+        (?:(\d+(?:[.,]\d+)?)\s*(?:"|″|'')?\s*)?
+        ([NSLEOW])?\s*$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def dms_to_decimal(degrees, minutes, seconds, negative) -> np.ndarray:
+    """
+    Converts arrays of DMS components to decimal degrees rounded to the
+    precision stored in ``Location``. ``negative`` marks South/West values.
+    """
+    degrees = np.asarray(degrees, dtype=float)
+    minutes = np.asarray(minutes, dtype=float)
+    seconds = np.asarray(seconds, dtype=float)
+    value = degrees + minutes / 60 + seconds / 3600
+    value = np.where(np.asarray(negative, dtype=bool), -value, value)
+    return np.round(value, DECIMAL_PLACES)
+
+
+def decimal_to_dms(values):
+    """
+    Converts an array of decimal degrees to ``(degrees, minutes, seconds,
+    negative)`` arrays. Seconds are rounded to two places, carrying into
+    minutes and degrees when they round up to 60.
+    """
+    values = np.asarray(values, dtype=float)
+    negative = values < 0
+    total_seconds = np.round(np.abs(values) * 3600, SECONDS_PLACES)
+    degrees = np.floor(total_seconds / 3600)
+    minutes = np.floor((total_seconds - degrees * 3600) / 60)
+    seconds = np.round(total_seconds - degrees * 3600 - minutes * 60, SECONDS_PLACES)
+    return degrees.astype(int), minutes.astype(int), seconds, negative
+
+
+def out_of_range(values, axis: str) -> np.ndarray:
+    """Mask of values outside [-90, 90] (latitude) or [-180, 180] (longitude)."""
+    return np.abs(np.asarray(values, dtype=float)) > LIMITS[axis]
+
+
+def _number(text):
+    return float(text.replace(',', '.')) if text else 0.0
+
+
+def parse_column(texts, axis: str):
+    """
+    Parses a column of coordinate texts, decimal (``-27.5869``, ``27,5869 S``)
+    or DMS (``27°35'12.8"S``, ``-27°35'12.8"``, ``S 27 35 12.8``). A sign
+    that contradicts the direction (``-27.5 N``) is rejected.
+
+    Returns ``(values, errors)``: ``values`` is a float array with NaN where
+    the text is blank or invalid and ``errors`` maps row positions to the
+    reason of the rejection.
+    """
+    count = len(texts)
+    degrees = np.zeros(count)
+    minutes = np.zeros(count)
+    seconds = np.zeros(count)
+    negative = np.zeros(count, dtype=bool)
+    valid = np.zeros(count, dtype=bool)
+    errors = {}
+
+    # Extração dos componentes (texto); as contas e validações são vetorizadas.
+    for i, text in enumerate(texts):
+        text = (text or '').strip()
+        if not text:
+            continue
+        match = DECIMAL_PATTERN.match(text)
+        if match:
+            number, direction = _number(match[1]), match[2]
+            parts = (abs(number), 0.0, 0.0)
+            sign = match[1][0] if match[1][0] in '+-' else ''
+        else:
+            match = DMS_PATTERN.match(text)
+            if not match or (match[1] and match[6]):
+                errors[i] = f"coordenada inválida: '{text}'"
+                continue
+            direction = match[1] or match[6]
+            parts = (_number(match[3]), _number(match[4]), _number(match[5]))
+            sign = match[2] or ''
+        sign_negative = sign == '-'
+        if direction:
+            direction = direction.upper()
+            if direction in NEGATIVE_DIRECTIONS[axis]:
+                conflict = sign == '+'
+                sign_negative = True
+            elif direction in POSITIVE_DIRECTIONS[axis]:
+                conflict = sign == '-'
+            else:
+                errors[i] = f"direção '{direction}' inválida para {'latitude' if axis == 'lat' else 'longitude'}"
+                continue
+            # Como em 'S 27 35 12 N': o sinal e a direção não podem se contradizer.
+            if conflict:
+                errors[i] = f"sinal '{sign}' contradiz a direção '{direction}'"
+                continue
+        degrees[i], minutes[i], seconds[i] = parts
+        negative[i] = sign_negative
+        valid[i] = True
+
+    bad_parts = valid & ((minutes >= 60) | (seconds >= 60))
+    values = dms_to_decimal(degrees, minutes, seconds, negative)
+    bad_range = valid & out_of_range(values, axis)
+    for i in np.flatnonzero(bad_parts):
+        errors[int(i)] = "minutos e segundos devem ser menores que 60"
+    for i in np.flatnonzero(bad_range & ~bad_parts):
+        errors[int(i)] = f"fora do intervalo ±{LIMITS[axis]:.0f}°"
+
+    values[~valid | bad_parts | bad_range] = np.nan
+    return values, errors
+
+
+def _numeric(column) -> np.ndarray:
+    """Converts a column of numbers or numeric texts (blank = 0) to floats."""
+    return np.array(
+        [_number(str(value).strip()) if value not in (None, '') else 0.0 for value in column],
+        dtype=float,
+    )
+
+
+def components_to_decimal(degrees, minutes, seconds, directions, axis: str):
+    """
+    Converts columns of separate DMS components (as in ``LocationAdminForm``)
+    to decimal degrees.
+
+    Rows whose components are all blank or zero have no coordinate (NaN), as
+    in the form. Returns ``(values, errors)`` like :func:`parse_column`.
+    """
+    degrees, minutes, seconds = _numeric(degrees), _numeric(minutes), _numeric(seconds)
+    directions = np.array([(direction or '').strip().upper() for direction in directions], dtype=object)
+    errors = {}
+
+    present = (degrees != 0) | (minutes != 0) | (seconds != 0)
+    negative = np.isin(directions, list(NEGATIVE_DIRECTIONS[axis]))
+    known = negative | np.isin(directions, list(POSITIVE_DIRECTIONS[axis])) | (directions == '')
+    bad_parts = present & (
+        (degrees < 0) | (minutes < 0) | (seconds < 0) | (minutes >= 60) | (seconds >= 60)
+    )
+    values = dms_to_decimal(degrees, minutes, seconds, negative)
+    bad_range = present & out_of_range(values, axis)
+
+    for i in np.flatnonzero(present & ~known):
+        errors[int(i)] = f"direção '{directions[i]}' inválida para {'latitude' if axis == 'lat' else 'longitude'}"
+    for i in np.flatnonzero(bad_parts):
+        errors[int(i)] = "graus, minutos e segundos devem ser positivos; minutos e segundos, menores que 60"
+    for i in np.flatnonzero(bad_range & ~bad_parts):
+        errors[int(i)] = f"fora do intervalo ±{LIMITS[axis]:.0f}°"
+
+    values[~present | ~known | bad_parts | bad_range] = np.nan
+    return values, errors
@@ -0,0 +1,161 @@
+"""
+Cache da representação de leitura de um GeneticMaterial.
+
+A representação (dicionário serializável em JSON) e o fragmento HTML de resumo
+exibido na página de edição são guardados com uma chave que combina o id, o
+``updated_at`` do material e dois tokens de versão:
+
+- o token do material, trocado pelos sinais quando um modelo relacionado
+  (fotos, plantios, reações, observações, alelos S, descendentes) muda;
+- um token global, trocado quando tabelas de apoio usadas nos rótulos
+  (locais, eventos, alelos S, populações, doenças) mudam.
+"""
+from django.core.cache import cache
+from django.db.models import Q
+from django.template.loader import render_to_string
+
+from . import caching, streaming
+from .models import GeneticMaterial
+
+DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+GLOBAL_VERSION_KEY = 'germoplasm:material-detail-global-version'
+LATEST_OBSERVATIONS = 20
+# Campos do material que aparecem nas representações dos parentais e dos filhos
+# (os descendentes listados são só os ativos, com as suas observações).
+RELATED_FIELDS = (
+    'name', 'material_type', 'internal_code', 'accession_code',
+    'mother_id', 'father_id', 'mutated_from_id', 'population_id', 'is_active', 'observations',
+)
+
+
+def version_key(material_id: int) -> str:
+    return f'germoplasm:material-detail-version:{material_id}'
+
+
+def _cache_key(kind: str, material: GeneticMaterial) -> str:
+    versions = caching.get_versions([version_key(material.pk), GLOBAL_VERSION_KEY])
+    return (
+        f'germoplasm:material-{kind}:{material.pk}:{material.updated_at.timestamp()}:'
+        f'{versions[version_key(material.pk)]}:{versions[GLOBAL_VERSION_KEY]}'
+    )
+
+
+def _material_ref(material):
+    if material is None:
+        return None
+    return {'id': material.pk, 'name': material.name, 'code': material.get_display_code()}
+
+
+def build_material_detail(material: GeneticMaterial) -> dict:
+    """Builds the read representation of ``material`` straight from the database."""
+    offspring = list(
+        GeneticMaterial.objects
+        .filter(Q(mother=material) | Q(father=material) | Q(mutated_from=material))
+        .only(
+            'id', 'name', 'material_type', 'internal_code', 'accession_code', 'observations',
+            'mother_id', 'father_id', 'mutated_from_id',
+        )
+        .order_by('name')
+    )
+
+    def offspring_ref(child):
+        return {
+            **_material_ref(child),
+            'material_type': child.get_material_type_display(),
+            'observations': child.observations,
+        }
+
+    observations = (
+        material.phenology_observations
+        .select_related('location', 'event')
+        .order_by('-observation_date')
+    )
+    return {
+        'id': material.pk,
+        'name': material.name,
+        'material_type': material.material_type,
+        'material_type_display': material.get_material_type_display(),
+        'display_code': material.get_display_code(),
+        'internal_code': material.internal_code,
+        'accession_code': material.accession_code,
+        'is_active': material.is_active,
+        'is_epagri_material': material.is_epagri_material,
+        'population': (
+            {'id': material.population_id, 'code': material.population.code}
+            if material.population_id else None
+        ),
+        'mother': _material_ref(material.mother),
+        'father': _material_ref(material.father),
+        'mutated_from': _material_ref(material.mutated_from),
+        's_alleles': list(material.s_alleles.values_list('name', flat=True)),
+        'disease_reactions': [
+            {
+                'disease': reaction.disease.name,
+                'reaction': reaction.reaction,
+                'reaction_display': reaction.get_reaction_display(),
+            }
+            for reaction in material.disease_reactions.select_related('disease').order_by('disease__name')
+        ],
+        'plantings': [
+            {
+                'location': planting.location.name,
+                'num_plants': planting.num_plants,
+                'planting_date': planting.planting_date.isoformat() if planting.planting_date else None,
+                'rootstock': planting.rootstock,
+            }
+            for planting in material.plantings.select_related('location')
+        ],
+        'phenology_observations': {
+            'total': observations.count(),
+            'latest': [
+                {
+                    'event': observation.event.name,
+                    'location': observation.location.name,
+                    'date': observation.observation_date.isoformat(),
+                }
+                for observation in observations[:LATEST_OBSERVATIONS]
+            ],
+        },
+        'photos': [
+            {'url': streaming.photo_url(photo.pk), 'caption': photo.caption}
+            for photo in material.photos.all()
+        ],
+        'offspring': {
+            'as_mother': [offspring_ref(child) for child in offspring if child.mother_id == material.pk],
+            'as_father': [offspring_ref(child) for child in offspring if child.father_id == material.pk],
+            'mutations': [offspring_ref(child) for child in offspring if child.mutated_from_id == material.pk],
+        },
+        'updated_at': material.updated_at.isoformat(),
+    }
+
+
+def get_material_detail(material: GeneticMaterial) -> dict:
+    """Returns the cached read representation of ``material``."""
+    key = _cache_key('detail', material)
+    detail = cache.get(key)
+    if detail is None:
+        detail = build_material_detail(material)
+        cache.set(key, detail, DETAIL_CACHE_TIMEOUT)
+    return detail
+
+
+def render_material_summary(material: GeneticMaterial) -> str:
+    """Returns the cached HTML fragment shown on the material's change page."""
+    key = _cache_key('summary', material)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(
+            'admin/germoplasm/material_summary.html',
+            {'detail': get_material_detail(material)},
+        )
+        cache.set(key, html, DETAIL_CACHE_TIMEOUT)
+    return html
+
+
+def invalidate(material_ids) -> None:
+    """Invalidates the cached representation of the given materials."""
+    caching.bump_versions(version_key(pk) for pk in set(material_ids) if pk)
+
+
+def invalidate_all() -> None:
+    caching.bump_versions([GLOBAL_VERSION_KEY])
@@ -0,0 +1,187 @@
+"""
+Contribuição dos fundadores e diversidade genética de coortes do programa.
+
+Para uma coorte (ex.: os materiais das populações cruzadas em um ano), o
+genoma médio dos seus membros é repartido entre os fundadores da genealogia
+(materiais sem mãe nem pai conhecidos). Os pesos da coorte são propagados dos
+filhos para os pais, metade para cada um, da geração mais nova para a mais
+antiga (``w = Tᵀc``, com ``A = TDTᵀ``); várias coortes são propagadas juntas,
+como colunas de uma mesma matriz, numa única passada por geração.
+
+Com ``w``:
+
+- contribuição do fundador k: ``p_k = w_k``; a metade que chega a um parental
+  desconhecido vai para ``unknown_share``;
+- número efetivo de fundadores: ``f_e = 1 / Σ q_k²``, com ``q`` as
+  contribuições normalizadas entre os fundadores conhecidos (Lacy, 1989);
+- coancestria média da coorte: ``θ = cᵀAc / 2 = Σ D_i w_i² / 2`` (Colleau,
+  2002, sem montar A) e equivalentes genômicos de fundadores
+  ``f_g = 1 / 2θ`` (Caballero & Toro, 2000), que também mede a perda de
+  alelos por deriva.
+
+Mutantes são clones da origem (``Pedigree.index``). Os resultados ficam no
+cache por coorte, sob um token de versão trocado a cada mudança de genealogia,
+de coorte (data de cruzamento, tipo, exclusão lógica) ou de materiais.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caching
+from .models import GeneticMaterial
+from .pedigree import UNKNOWN, Pedigree, inbreeding_coefficients, load_pedigree
+
+VERSION_KEY = 'germoplasm:diversity-version'
+CACHE_TIMEOUT = 60 * 60 * 24
+TOP_FOUNDERS = 10
+
+# Genealogia da versão atual no processo: (versão, Pedigree, D).
+_local = [None, None, None]
+
+
+@dataclass(frozen=True)
+class CohortDiversity:
+    key: str
+    label: str
+    # Membros da coorte (materiais ativos) encontrados na genealogia.
+    size: int
+    # ((pk do fundador, contribuição), ...) em ordem decrescente, só as positivas.
+    contributions: tuple
+    unknown_share: float
+    effective_founders: float
+    founder_genome_equivalents: float
+    mean_coancestry: float
+
+    def top_founders(self, limit: int = TOP_FOUNDERS) -> tuple:
+        return self.contributions[:limit]
+
+
+def invalidate() -> None:
+    # Após o commit, como na matriz de reações: ninguém recalcula com dados antigos sob o token novo.
+    transaction.on_commit(lambda: caching.bump_versions([VERSION_KEY]))
+
+
+def _pedigree():
+    """Pedigree and Mendelian sampling variances (D) of the current version."""
+    version = caching.get_version(VERSION_KEY)
+    if _local[0] != version:
+        pedigree = load_pedigree()
+        _, variances = inbreeding_coefficients(pedigree, parents_only=True)
+        _local[:] = [version, pedigree, variances]
+    return version, _local[1], _local[2]
+
+
+def propagate_to_ancestors(pedigree: Pedigree, weights: np.ndarray):
+    """
+    Spreads the cohort ``weights`` (rows × cohorts) from each row to its
+    parents, half to each, youngest generation first. Returns ``(w, unknown)``:
+    ``w[i]`` is the fraction of each cohort's genome that passed through row
+    ``i`` and ``unknown`` the fraction that reached missing parents of
+    half-founders. Founders keep what reaches them.
+    """
+    w = np.array(weights, dtype=np.float64)
+    unknown = np.zeros(w.shape[1])
+    is_founder = (pedigree.dam == UNKNOWN) & (pedigree.sire == UNKNOWN)
+    for rows in reversed(list(pedigree.generations())):
+        rows = rows[~is_founder[rows]]
+        if not len(rows):
+            continue
+        share = 0.5 * w[rows]
+        for parent in (pedigree.dam[rows], pedigree.sire[rows]):
+            known = parent != UNKNOWN
+            # Os pais estão sempre em gerações anteriores: as linhas somadas
+            # aqui ainda não foram propagadas.
+            np.add.at(w, parent[known], share[known])
+            unknown += share[~known].sum(axis=0)
+    return w, unknown
+
+
+def _summarize(key, label, size, founder_ids, contributions, unknown, variances, w) -> CohortDiversity:
+    order = np.argsort(-contributions, kind='stable')
+    order = order[contributions[order] > 0]
+    known = contributions.sum()
+    if not size or known <= 0:
+        return CohortDiversity(key, label, size, (), float(unknown), 0.0, 0.0, 0.0)
+    normalized = contributions / known
+    coancestry = float((variances * w * w).sum()) / 2
+    return CohortDiversity(
+        key=key,
+        label=label,
+        size=size,
+        contributions=tuple((int(founder_ids[i]), float(contributions[i])) for i in order),
+        unknown_share=float(unknown),
+        effective_founders=float(1 / (normalized * normalized).sum()),
+        founder_genome_equivalents=float(1 / (2 * coancestry)) if coancestry > 0 else 0.0,
+        mean_coancestry=coancestry,
+    )
+
+
+def analyze_cohorts(cohorts: dict) -> dict:
+    """
+    ``cohorts`` maps a cache key to ``(label, material pks)``; returns the
+    ``CohortDiversity`` of each one. Cached cohorts are read from the cache;
+    the others are propagated together in a single pass.
+    """
+    version = caching.get_version(VERSION_KEY)
+    cache_keys = {key: f'germoplasm:diversity:{version}:{key}' for key in cohorts}
+    cached = cache.get_many(list(cache_keys.values()))
+    results = {key: cached[cache_key] for key, cache_key in cache_keys.items() if cache_key in cached}
+    pending = [key for key in cohorts if key not in results]
+    if not pending:
+        return results
+
+    version, pedigree, variances = _pedigree()
+    weights = np.zeros((len(pedigree), len(pending)))
+    sizes = []
+    for column, key in enumerate(pending):
+        rows = pedigree.rows_for(cohorts[key][1])
+        rows = rows[rows != UNKNOWN]
+        sizes.append(len(rows))
+        if len(rows):
+            np.add.at(weights[:, column], rows, 1.0 / len(rows))
+
+    w, unknown = propagate_to_ancestors(pedigree, weights)
+    founders = np.flatnonzero((pedigree.dam == UNKNOWN) & (pedigree.sire == UNKNOWN))
+    computed = {}
+    for column, key in enumerate(pending):
+        computed[key] = _summarize(
+            key, cohorts[key][0], sizes[column], pedigree.ids[founders], w[founders, column],
+            unknown[column], variances, w[:, column],
+        )
+    cache.set_many(
+        {f'germoplasm:diversity:{version}:{key}': result for key, result in computed.items()},
+        CACHE_TIMEOUT,
+    )
+    return {**results, **computed}
+
+
+def cross_year_cohorts(material_type: str = None) -> dict:
+    """
+    One cohort per cross year: the active materials of the populations crossed
+    that year (only of ``material_type`` when given), plus the whole program.
+    """
+    queryset = GeneticMaterial.objects.filter(population__isnull=False)
+    if material_type:
+        queryset = queryset.filter(material_type=material_type)
+    suffix = f':{material_type}' if material_type else ''
+    by_year = {}
+    for year, pk in queryset.values_list('population__cross_date__year', 'pk').order_by():
+        by_year.setdefault(year, []).append(pk)
+    cohorts = {
+        f'cross-year:{year}{suffix}': (str(year), pks) for year, pks in sorted(by_year.items())
+    }
+    cohorts[f'program{suffix}'] = ("Programa", [pk for pks in by_year.values() for pk in pks])
+    return cohorts
+
+
+def founder_labels(results, limit: int = TOP_FOUNDERS) -> dict:
+    """Display labels of the ``limit`` main founders of each of the ``results``."""
+    pks = {pk for result in results for pk, _ in result.top_founders(limit)}
+    return {
+        material.pk: str(material)
+        for material in GeneticMaterial.all_objects.filter(pk__in=pks).only(
+            'name', 'material_type', 'internal_code', 'accession_code'
+        )
+    }
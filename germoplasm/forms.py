@@ -1,5 +1,10 @@
+import zipfile
+
+import numpy as np
 from django import forms
-from .models import Location
+
+from . import coordinates
+from .models import Disease, GeneticMaterial, Location
 
 class LocationAdminForm(forms.ModelForm):
     lat_degrees = forms.IntegerField(
@@ -57,23 +62,42 @@ class LocationAdminForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         """
         Sobrescreve o __init__ para preencher os campos DMS a partir dos
-        valores decimais slavos no banco de dados quando o formulário é carregado.
+        valores decimais salvos no banco de dados quando o formulário é carregado.
         """
         super().__init__(*args, **kwargs)
         instance = kwargs.get('instance')
         if instance and instance.latitude is not None and instance.longitude is not None:
-            lat_abs = abs(instance.latitude)
-            self.initial['lat_degrees'] = int(lat_abs)
-            self.initial['lat_minutes'] = int((lat_abs * 60) % 60)
-            self.initial['lat_seconds'] = round((lat_abs * 3600) % 60, 2)
-            self.initial['lat_direction'] = 'N' if instance.latitude >= 0 else 'S'
-
-            lon_abs = abs(instance.longitude)
-            self.initial['lon_degrees'] = int(lon_abs)
-            self.initial['lon_minutes'] = int((lon_abs * 60) % 60)
-            self.initial['lon_seconds'] = round((lon_abs * 3600) % 60, 2)
-            self.initial['lon_direction'] = 'L' if instance.longitude >= 0 else 'O'
-    
+            for axis, value in (('lat', instance.latitude), ('lon', instance.longitude)):
+                degrees, minutes, seconds, negative = coordinates.decimal_to_dms([value])
+                positive_direction, negative_direction = coordinates.FORM_DIRECTIONS[axis]
+                self.initial[f'{axis}_degrees'] = int(degrees[0])
+                self.initial[f'{axis}_minutes'] = int(minutes[0])
+                self.initial[f'{axis}_seconds'] = float(seconds[0])
+                self.initial[f'{axis}_direction'] = negative_direction if negative[0] else positive_direction
+
+    def _decimal_coordinate(self, axis):
+        """
+        Converte os campos DMS de um eixo com a mesma rotina da importação em
+        lote. Retorna ``(valor ou None, erro ou None)``.
+        """
+        values, errors = coordinates.components_to_decimal(
+            [self.cleaned_data.get(f'{axis}_degrees')],
+            [self.cleaned_data.get(f'{axis}_minutes')],
+            [self.cleaned_data.get(f'{axis}_seconds')],
+            [self.cleaned_data.get(f'{axis}_direction')],
+            axis,
+        )
+        value = None if np.isnan(values[0]) else float(values[0])
+        return value, errors.get(0)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for axis in ('lat', 'lon'):
+            _, error = self._decimal_coordinate(axis)
+            if error:
+                self.add_error(f'{axis}_degrees', error)
+        return cleaned_data
+
     def save(self, commit=True):
         """
         Sobrescreve o save() para converter os dados DMS para decimal
@@ -81,31 +105,8 @@ class LocationAdminForm(forms.ModelForm):
         """
         instance = super().save(commit=False)
 
-        lat_d = self.cleaned_data.get('lat_degrees') or 0
-        lat_m = self.cleaned_data.get('lat_minutes') or 0
-        lat_s = self.cleaned_data.get('lat_seconds') or 0.0
-        lat_dir = self.cleaned_data.get('lat_direction')
-
-        lon_d = self.cleaned_data.get('lon_degrees') or 0
-        lon_m = self.cleaned_data.get('lon_minutes') or 0
-        lon_s = self.cleaned_data.get('lon_seconds') or 0.0
-        lon_dir = self.cleaned_data.get('lon_direction')
-
-        if lat_d or lat_m or lat_s:
-            decimal_lat = float(lat_d) + float(lat_m)/60 + float(lat_s)/3600
-            if lat_dir == 'S':
-                decimal_lat = -decimal_lat
-            instance.latitude = decimal_lat
-        else:
-            instance.latitude = None
-
-        if lon_d or lon_m or lon_s:
-            decimal_lon = float(lon_d) + float(lon_m)/60 + float(lon_s)/3600
-            if lon_dir == 'O':
-                decimal_lon = -decimal_lon
-            instance.longitude = decimal_lon
-        else:
-            instance.longitude = None
+        instance.latitude, _ = self._decimal_coordinate('lat')
+        instance.longitude, _ = self._decimal_coordinate('lon')
 
         if commit:
             instance.save()
@@ -122,4 +123,73 @@ class MutationCreationForm(forms.Form):
         label="Caractere Mutante",
         help_text="Descreva a principal característica da mutação. Ex: 'Resistência a MFG', 'Maior coloração'",
         widget=forms.Textarea(attrs={'rows': 4})
-    )
\ No newline at end of file
+    )
+class PhotoImportForm(forms.Form):
+    archive = forms.FileField(
+        label="Arquivo ZIP",
+        help_text=(
+            "Fotos nomeadas pelo código interno ou de acesso do material "
+            "(ex: 'C1xS5A25H1_fruto.jpg'). O restante do nome vira a legenda."
+        )
+    )
+    dry_run = forms.BooleanField(
+        label="Apenas simular",
+        required=False,
+        help_text="Valida e associa os arquivos sem criar fotos."
+    )
+
+    def clean_archive(self):
+        archive = self.cleaned_data['archive']
+        if not zipfile.is_zipfile(archive):
+            raise forms.ValidationError("Envie um arquivo ZIP válido.")
+        archive.seek(0)
+        return archive
+
+class LocationImportForm(forms.Form):
+    spreadsheet = forms.FileField(
+        label="Planilha CSV",
+        help_text=(
+            "Colunas: name, city, state, altitude e latitude/longitude (decimal ou "
+            "DMS, ex: 27°35'12.8\"S) ou lat_degrees, lat_minutes, lat_seconds, "
+            "lat_direction e os equivalentes lon_*. Locais com o mesmo nome são atualizados."
+        )
+    )
+    dry_run = forms.BooleanField(
+        label="Apenas simular",
+        required=False,
+        help_text="Valida a planilha sem gravar."
+    )
+
+class ReactionMatrixForm(forms.Form):
+    """
+    Um limiar por doença (a pior reação aceita) e o tipo de material. Os campos
+    das doenças são criados dinamicamente: ``disease_<pk>``.
+    """
+    THRESHOLD_CHOICES = (
+        ('', "Qualquer"),
+        ('1', "Resistente (R)"),
+        ('2', "Até Moderadamente Resistente (MR)"),
+        ('3', "Até Moderadamente Suscetível (MS)"),
+        ('4', "Com registro (qualquer reação)"),
+    )
+    material_type = forms.ChoiceField(
+        label="Tipo de Material",
+        required=False,
+        choices=(('', "Todos"), *GeneticMaterial.MaterialType.choices)
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.diseases = list(Disease.objects.order_by('name'))
+        for disease in self.diseases:
+            self.fields[f'disease_{disease.pk}'] = forms.ChoiceField(
+                label=disease.name, required=False, choices=self.THRESHOLD_CHOICES
+            )
+
+    def thresholds(self) -> dict:
+        """``{disease_id: worst accepted code}`` of the filled fields."""
+        return {
+            disease.pk: int(self.cleaned_data[f'disease_{disease.pk}'])
+            for disease in self.diseases
+            if self.cleaned_data.get(f'disease_{disease.pk}')
+        }
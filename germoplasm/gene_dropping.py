@@ -0,0 +1,322 @@
+"""
+Probabilidades de alelos S (ou de outro loco único) por simulação de gene
+dropping.
+
+Para um material, a simulação percorre os seus ancestrais da geração mais
+antiga para a mais nova: cada filho recebe, ao acaso, um dos dois alelos da
+mãe e um do pai; parentais desconhecidos e fundadores sem genótipo sorteiam
+alelos com as frequências observadas nos materiais genotipados
+(``GeneticMaterial.s_alleles``).
+
+Os genótipos conhecidos entram como evidência (ponderação por
+verossimilhança): o material genotipado fica com o seu genótipo em todas as
+réplicas, e a réplica é ponderada pela probabilidade de os pais simulados o
+transmitirem. Assim, um fundador sem genótipo cujos descendentes foram
+genotipados recebe os alelos compatíveis com eles. Materiais com um único
+alelo informado só precisam carregá-lo (réplicas sem ele têm peso zero);
+materiais com mais de dois alelos (triploides) não são usados como evidência.
+Só a evidência dos ancestrais do material é considerada.
+
+As réplicas são simuladas em lotes vetorizados (milhares por passada NumPy,
+uma passada por geração) distribuídos em um pool de processos. Cada lote tem
+a sua semente derivada de ``SeedSequence([seed, pk])``, de modo que o
+resultado não depende do número de processos. Os resultados ficam no cache
+por material, sob um token de versão trocado a cada mudança de genealogia ou
+de alelos S.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import django
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caching
+from .models import GeneticMaterial, S_Allele
+from .pedigree import UNKNOWN, Pedigree, load_pedigree
+
+VERSION_KEY = 'germoplasm:gene-dropping-version'
+CACHE_TIMEOUT = 60 * 60 * 24 * 7
+REPLICATES = 20_000
+BATCH_SIZE = 5_000
+SEED = 1
+TOP_GENOTYPES = 5
+
+# Genealogia e genótipos da versão atual no processo: (versão, Pedigree, genótipos, alelos).
+_local = [None, None, None, None]
+
+
+@dataclass(frozen=True)
+class AlleleProbabilities:
+    material_id: int
+    # Genótipo informado no cadastro (nomes dos alelos).
+    observed: tuple
+    # ((alelo, probabilidade de carregá-lo), ...) em ordem decrescente.
+    carriers: tuple
+    # ((alelo, alelo), probabilidade) dos genótipos mais prováveis.
+    genotypes: tuple
+    replicates: int
+    # Tamanho efetivo da amostra ponderada (Kish); baixo quando a evidência é pouco provável.
+    effective_replicates: float
+    ancestors: int
+    typed_ancestors: int
+
+    @property
+    def consistent(self) -> bool:
+        """False when no replicate agrees with the genotypes of the ancestors."""
+        return self.effective_replicates > 0
+
+
+@dataclass
+class _Subpedigree:
+    dam: np.ndarray
+    sire: np.ndarray
+    # Linhas de cada geração, da mais antiga para a mais nova.
+    generations: list
+    # Genótipos informados (índices de alelo, -1 quando ausente).
+    first: np.ndarray
+    second: np.ndarray
+    frequencies: np.ndarray
+    target: int
+
+
+def invalidate() -> None:
+    transaction.on_commit(lambda: caching.bump_versions([VERSION_KEY]))
+
+
+def _state():
+    """Pedigree, typed genotypes (pk -> allele pks) and allele list of the current version."""
+    version = caching.get_version(VERSION_KEY)
+    if _local[0] != version:
+        pedigree = load_pedigree()
+        typed = {}
+        for material_id, allele_id in GeneticMaterial.s_alleles.through.objects.values_list(
+            'geneticmaterial_id', 's_allele_id'
+        ).order_by('s_allele_id'):
+            typed.setdefault(material_id, []).append(allele_id)
+        alleles = dict(S_Allele.all_objects.values_list('pk', 'name'))
+        _local[:] = [version, pedigree, typed, alleles]
+    return _local[0], _local[1], _local[2], _local[3]
+
+
+def _row_genotypes(pedigree: Pedigree, typed: dict, allele_index: dict) -> dict:
+    """
+    Allele indices of each typed pedigree row. Mutations share the row of
+    their origin, so their alleles are merged with it.
+    """
+    by_row = {}
+    for pk, allele_ids in typed.items():
+        row = pedigree.index.get(pk, UNKNOWN)
+        if row != UNKNOWN:
+            by_row.setdefault(row, set()).update(allele_index[a] for a in allele_ids if a in allele_index)
+    return by_row
+
+
+def allele_frequencies(by_row: dict, size: int) -> np.ndarray:
+    """Allele frequencies among the typed diploid genotypes (one allele counted as half)."""
+    counts = np.zeros(size)
+    for alleles in by_row.values():
+        if len(alleles) <= 2:
+            for allele in alleles:
+                counts[allele] += 2 / len(alleles) if len(alleles) == 1 else 1
+    total = counts.sum()
+    return counts / total if total else counts
+
+
+def _ancestors(pedigree: Pedigree, row: int) -> np.ndarray:
+    seen = {row}
+    stack = [row]
+    while stack:
+        current = stack.pop()
+        for parent in (pedigree.dam[current], pedigree.sire[current]):
+            if parent != UNKNOWN and parent not in seen:
+                seen.add(int(parent))
+                stack.append(int(parent))
+    # As linhas da genealogia já estão em ordem topológica.
+    return np.array(sorted(seen), dtype=np.int64)
+
+
+def _subpedigree(pedigree: Pedigree, row: int, by_row: dict, frequencies: np.ndarray) -> _Subpedigree:
+    rows = _ancestors(pedigree, row)
+    local = {r: i for i, r in enumerate(rows.tolist())}
+    remap = np.vectorize(lambda r: local.get(r, UNKNOWN), otypes=[np.int64])
+    first = np.full(len(rows), UNKNOWN, dtype=np.int64)
+    second = np.full(len(rows), UNKNOWN, dtype=np.int64)
+    for i, r in enumerate(rows.tolist()):
+        alleles = sorted(by_row.get(r, ()))
+        if 1 <= len(alleles) <= 2:
+            first[i] = alleles[0]
+            second[i] = alleles[-1] if len(alleles) == 2 else UNKNOWN
+    generation = pedigree.generation[rows]
+    bounds = np.flatnonzero(np.diff(generation)) + 1
+    return _Subpedigree(
+        dam=remap(pedigree.dam[rows]),
+        sire=remap(pedigree.sire[rows]),
+        generations=np.split(np.arange(len(rows)), bounds),
+        first=first,
+        second=second,
+        frequencies=frequencies,
+        target=local[row],
+    )
+
+
+def _transmission(alleles, parent, allele, frequencies):
+    """Probability (rows × replicates) that ``parent`` passes ``allele`` on."""
+    known = parent != UNKNOWN
+    probability = np.repeat(frequencies[allele][:, None], alleles.shape[2], axis=1)
+    if known.any():
+        parental = alleles[parent[known]]
+        probability[known] = 0.5 * (
+            (parental[:, 0] == allele[known, None]).astype(float)
+            + (parental[:, 1] == allele[known, None])
+        )
+    return probability
+
+
+def drop_genes(sub: _Subpedigree, replicates: int, seed) -> tuple:
+    """
+    Simulates ``replicates`` transmissions through ``sub`` in one vectorized
+    pass per generation. Returns ``(log_scale, genotype_weights, sum_w, sum_w2)``:
+    the weights of the target's genotypes (``lo * K + hi``) and of all
+    replicates, scaled by ``exp(-log_scale)`` to avoid underflow.
+    """
+    rng = np.random.default_rng(seed)
+    k = len(sub.frequencies)
+    alleles = np.empty((len(sub.dam), 2, replicates), dtype=np.int16)
+    log_weight = np.zeros(replicates)
+
+    for rows in sub.generations:
+        for slot, parents in enumerate((sub.dam[rows], sub.sire[rows])):
+            known = parents != UNKNOWN
+            drawn = np.empty((len(rows), replicates), dtype=np.int16)
+            if known.any():
+                pick = rng.integers(0, 2, size=(int(known.sum()), 1, replicates))
+                drawn[known] = np.take_along_axis(alleles[parents[known]], pick, axis=1)[:, 0]
+            if (~known).any():
+                drawn[~known] = rng.choice(k, size=(int((~known).sum()), replicates), p=sub.frequencies)
+            alleles[rows, slot] = drawn
+
+        full = (sub.first[rows] != UNKNOWN) & (sub.second[rows] != UNKNOWN)
+        if full.any():
+            # Genótipo completo: fixado, com o peso da probabilidade de os pais o transmitirem.
+            typed = rows[full]
+            a, b = sub.first[typed], sub.second[typed]
+            dam, sire = sub.dam[typed], sub.sire[typed]
+            probability = (
+                _transmission(alleles, dam, a, sub.frequencies) * _transmission(alleles, sire, b, sub.frequencies)
+            )
+            swapped = a != b
+            probability[swapped] += (
+                _transmission(alleles, dam[swapped], b[swapped], sub.frequencies)
+                * _transmission(alleles, sire[swapped], a[swapped], sub.frequencies)
+            )
+            with np.errstate(divide='ignore'):
+                log_weight += np.log(probability).sum(axis=0)
+            alleles[typed, 0] = a[:, None]
+            alleles[typed, 1] = b[:, None]
+
+        partial = (sub.first[rows] != UNKNOWN) & ~full
+        if partial.any():
+            # Um único alelo informado: a réplica precisa carregá-lo.
+            typed = rows[partial]
+            carries = (alleles[typed] == sub.first[typed, None, None]).any(axis=1)
+            log_weight[~carries.all(axis=0)] = -np.inf
+
+    lo = np.minimum(alleles[sub.target, 0], alleles[sub.target, 1]).astype(np.int64)
+    hi = np.maximum(alleles[sub.target, 0], alleles[sub.target, 1]).astype(np.int64)
+    log_scale = log_weight.max()
+    if not np.isfinite(log_scale):
+        return 0.0, np.zeros(k * k), 0.0, 0.0
+    weight = np.exp(log_weight - log_scale)
+    return float(log_scale), np.bincount(lo * k + hi, weights=weight, minlength=k * k), weight.sum(), (weight * weight).sum()
+
+
+def _drop_batch(task):
+    return drop_genes(*task)
+
+
+def _executor(workers):
+    # 'spawn', e não 'fork': a simulação pode ser pedida num servidor com
+    # threads, e um fork ali pode herdar locks presos. Os processos configuram
+    # o Django no início.
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+    )
+
+
+def _simulate(sub: _Subpedigree, replicates: int, seed, batch_size: int, workers) -> tuple:
+    sizes = [batch_size] * (replicates // batch_size)
+    if replicates % batch_size:
+        sizes.append(replicates % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(sub, size, child) for size, child in zip(sizes, seeds)]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with _executor(workers) as executor:
+            batches = list(executor.map(_drop_batch, tasks))
+    else:
+        batches = [_drop_batch(task) for task in tasks]
+
+    # Junta os lotes na mesma escala de pesos.
+    valid = [batch for batch in batches if batch[2] > 0]
+    if not valid:
+        return np.zeros(len(sub.frequencies) ** 2), 0.0
+    scale = max(batch[0] for batch in valid)
+    genotype_weights = sum(np.exp(batch[0] - scale) * batch[1] for batch in valid)
+    sum_w = sum(np.exp(batch[0] - scale) * batch[2] for batch in valid)
+    sum_w2 = sum(np.exp(2 * (batch[0] - scale)) * batch[3] for batch in valid)
+    return genotype_weights / sum_w, float(sum_w * sum_w / sum_w2)
+
+
+def allele_probabilities(material: GeneticMaterial, replicates: int = REPLICATES, seed: int = SEED,
+                         batch_size: int = BATCH_SIZE, workers=None) -> AlleleProbabilities:
+    """
+    Probabilities that ``material`` carries each S-allele given its pedigree
+    and the genotypes of its ancestors. Results are cached per material,
+    number of replicates and seed.
+    """
+    version = caching.get_version(VERSION_KEY)
+    cache_key = f'germoplasm:gene-dropping:{version}:{material.pk}:{replicates}:{seed}'
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    version, pedigree, typed, names = _state()
+    allele_ids = sorted({allele for alleles in typed.values() for allele in alleles})
+    allele_index = {pk: i for i, pk in enumerate(allele_ids)}
+    observed = tuple(names.get(pk, str(pk)) for pk in typed.get(material.pk, ()))
+    row = pedigree.index.get(material.pk, UNKNOWN)
+
+    by_row = _row_genotypes(pedigree, typed, allele_index)
+    frequencies = allele_frequencies(by_row, len(allele_ids))
+    if row == UNKNOWN or not frequencies.any():
+        result = AlleleProbabilities(material.pk, observed, (), (), 0, 0.0, 0, 0)
+    else:
+        sub = _subpedigree(pedigree, row, by_row, frequencies)
+        probabilities, effective = _simulate(sub, replicates, [seed, material.pk], batch_size, workers)
+
+        k = len(allele_ids)
+        matrix = probabilities.reshape(k, k)
+        carriers = matrix.sum(axis=0) + matrix.sum(axis=1) - np.diag(matrix)
+        order = np.argsort(-carriers, kind='stable')
+        pairs = np.argsort(-probabilities, kind='stable')[:TOP_GENOTYPES]
+        name = [names.get(pk, str(pk)) for pk in allele_ids]
+        result = AlleleProbabilities(
+            material_id=material.pk,
+            observed=observed,
+            carriers=tuple((name[i], float(carriers[i])) for i in order if carriers[i] > 0),
+            genotypes=tuple(
+                ((name[i // k], name[i % k]), float(probabilities[i])) for i in pairs if probabilities[i] > 0
+            ),
+            replicates=replicates,
+            effective_replicates=effective,
+            ancestors=len(sub.dam) - 1,
+            typed_ancestors=int((sub.first != UNKNOWN).sum() - (sub.first[sub.target] != UNKNOWN)),
+        )
+
+    cache.set(f'germoplasm:gene-dropping:{version}:{material.pk}:{replicates}:{seed}', result, CACHE_TIMEOUT)
+    return result
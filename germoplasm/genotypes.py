@@ -0,0 +1,434 @@
+"""
+Armazenamento de genótipos SNP e matriz de parentesco genômico (VanRaden).
+
+Cada ``GenotypeMatrix`` é gravada em ``GENOTYPE_ROOT/<id>/``:
+
+- ``dosages.npy``: dosagens do alelo B (0, 1, 2; 3 = dado perdido)
+  compactadas em 2 bits, quatro genótipos por byte, uma linha por material;
+- ``materials.npy`` e ``markers.npy``: ids (ordenados) dos GeneticMaterial de
+  cada linha e dos Marker de cada coluna;
+- ``frequencies.npy`` e ``grm.npy``: frequências alélicas e a matriz G
+  (float32, materiais × materiais), gravadas por ``compute_grm``.
+
+Os arquivos são abertos com ``mmap``: um chip de 20 mil SNPs ocupa 5 kB por
+material, e a matriz G é calculada em blocos de linhas (``Z_i Z_jᵀ``) sem
+carregar as dosagens nem a própria G inteiras na memória. Cada linha da G
+devolvida por ``GenomicRelationship.rows`` é uma view do arquivo, sem cópia.
+
+Formatos de importação (detectados pelo conteúdo):
+
+- Illumina GenomeStudio *Final Report*: seções ``[Header]``/``[Data]``, uma
+  linha por amostra e SNP, com as colunas ``SNP Name``, ``Sample ID``,
+  ``Allele1 - AB`` e ``Allele2 - AB``;
+- matriz de marcadores × amostras (exportação do GenomeStudio ou ``calls.txt``
+  do Axiom Analysis Suite): a primeira coluna é o marcador e as demais, as
+  amostras, com chamadas ``AA``/``AB``/``BB`` ou ``0``/``1``/``2``
+  (``-1``, ``NC``, ``--`` ou vazio = perdido); linhas com ``#`` são ignoradas.
+
+As amostras são associadas aos materiais pelo código ou nome; marcadores
+desconhecidos são cadastrados como SNP.
+"""
+import csv
+import io
+import os
+import shutil
+from array import array
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import GenotypeMatrix, Marker
+from .pedigree_import import lookup_materials
+
+UNKNOWN = -1
+MISSING = 3
+CODES_PER_BYTE = 4
+DEFAULT_BLOCK_SIZE = 1024
+LOOKUP_CHUNK_SIZE = 5000
+
+DOSAGES_FILE = 'dosages.npy'
+MATERIALS_FILE = 'materials.npy'
+MARKERS_FILE = 'markers.npy'
+FREQUENCIES_FILE = 'frequencies.npy'
+GRM_FILE = 'grm.npy'
+
+CALLS = {
+    'AA': 0, 'AB': 1, 'BA': 1, 'BB': 2,
+    '0': 0, '1': 1, '2': 2,
+    '-1': MISSING, 'NC': MISSING, '--': MISSING, 'NA': MISSING, '': MISSING,
+}
+FINAL_REPORT_COLUMNS = ('snp name', 'sample id', 'allele1 - ab', 'allele2 - ab')
+
+# Byte compactado -> os quatro códigos que ele contém.
+_UNPACK = np.array(
+    [[(byte >> (2 * position)) & 0b11 for position in range(CODES_PER_BYTE)] for byte in range(256)],
+    dtype=np.uint8,
+)
+
+
+class GenotypeError(ValueError):
+    """Raised for unreadable genotype files and missing stored matrices."""
+
+
+def pack(codes: np.ndarray) -> np.ndarray:
+    """Packs a (materials × markers) array of codes 0-3 into 2 bits per genotype."""
+    rows, columns = codes.shape
+    width = -(-columns // CODES_PER_BYTE)
+    padded = np.full((rows, width * CODES_PER_BYTE), MISSING, dtype=np.uint8)
+    padded[:, :columns] = codes
+    padded = padded.reshape(rows, width, CODES_PER_BYTE)
+    return (padded[..., 0] | padded[..., 1] << 2 | padded[..., 2] << 4 | padded[..., 3] << 6).astype(np.uint8)
+
+
+def unpack(packed: np.ndarray, columns: int) -> np.ndarray:
+    """Inverse of :func:`pack`: codes 0-3 of the first ``columns`` markers."""
+    return _UNPACK[packed].reshape(len(packed), -1)[:, :columns]
+
+
+def _positions(sorted_ids: np.ndarray, ids) -> np.ndarray:
+    ids = np.asarray(list(ids), dtype=np.int64)
+    if not len(sorted_ids):
+        return np.full(len(ids), UNKNOWN, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == ids, positions, UNKNOWN)
+
+
+class GenotypeStore:
+    """
+    Read-only access to a stored matrix. ``material_ids``/``marker_ids`` are
+    the sorted ids of the rows and columns; ``packed`` is the memory-mapped
+    2-bit matrix.
+    """
+
+    def __init__(self, matrix: GenotypeMatrix):
+        self.matrix = matrix
+        path = os.path.join(matrix.directory, DOSAGES_FILE)
+        if not os.path.exists(path):
+            raise GenotypeError(f"Arquivos da matriz '{matrix}' não encontrados em {matrix.directory}.")
+        self.packed = np.load(path, mmap_mode='r')
+        self.material_ids = np.load(os.path.join(matrix.directory, MATERIALS_FILE))
+        self.marker_ids = np.load(os.path.join(matrix.directory, MARKERS_FILE))
+
+    def __len__(self) -> int:
+        return len(self.material_ids)
+
+    def rows_for(self, material_ids) -> np.ndarray:
+        """Rows of the given materials (``UNKNOWN`` for materials not genotyped)."""
+        return _positions(self.material_ids, material_ids)
+
+    def columns_for(self, marker_ids) -> np.ndarray:
+        return _positions(self.marker_ids, marker_ids)
+
+    def codes(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """Codes 0-3 (3 = missing) of the rows ``start:stop``."""
+        return unpack(self.packed[start:stop], len(self.marker_ids))
+
+    def dosages(self, material_ids, marker_ids=None) -> np.ndarray:
+        """Dosages of the B allele (float, NaN = missing) of the given materials."""
+        rows = self.rows_for(material_ids)
+        if (rows == UNKNOWN).any():
+            raise GenotypeError("Há materiais sem genótipos nesta matriz.")
+        codes = unpack(self.packed[rows], len(self.marker_ids))
+        if marker_ids is not None:
+            columns = self.columns_for(marker_ids)
+            if (columns == UNKNOWN).any():
+                raise GenotypeError("Há marcadores que não estão nesta matriz.")
+            codes = codes[:, columns]
+        values = codes.astype(np.float32)
+        values[codes == MISSING] = np.nan
+        return values
+
+    def blocks(self, block_size: int = DEFAULT_BLOCK_SIZE):
+        """Yields ``(start, codes)`` for consecutive blocks of rows."""
+        for start in range(0, len(self), block_size):
+            yield start, self.codes(start, start + block_size)
+
+    def centered(self, start: int, stop: int, frequencies: np.ndarray) -> np.ndarray:
+        """Rows of ``Z = M - 2p``; missing genotypes get the mean (0 in Z)."""
+        codes = self.codes(start, stop)
+        centered = codes.astype(np.float32) - np.float32(2) * frequencies
+        centered[codes == MISSING] = 0
+        return centered
+
+
+def allele_frequencies(store: GenotypeStore, block_size: int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+    """Frequency of the B allele of each marker over the non-missing genotypes."""
+    sums = np.zeros(len(store.marker_ids), dtype=np.float64)
+    counts = np.zeros(len(store.marker_ids), dtype=np.int64)
+    for _, codes in store.blocks(block_size):
+        called = codes != MISSING
+        sums += np.where(called, codes, 0).sum(axis=0)
+        counts += called.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / (2 * counts), 0).astype(np.float32)
+
+
+def compute_grm(matrix: GenotypeMatrix, block_size: int = DEFAULT_BLOCK_SIZE) -> 'GenomicRelationship':
+    """
+    Computes VanRaden's (2008) first genomic relationship matrix,
+    ``G = ZZᵀ / 2Σp(1-p)``, one tile of ``block_size`` rows by
+    ``block_size`` columns at a time, straight into a memory-mapped file.
+    """
+    store = GenotypeStore(matrix)
+    frequencies = allele_frequencies(store, block_size)
+    scale = 2 * float((frequencies.astype(np.float64) * (1 - frequencies)).sum())
+    if scale <= 0:
+        raise GenotypeError("Nenhum marcador polimórfico: a matriz G não pode ser calculada.")
+
+    n = len(store)
+    final = os.path.join(matrix.directory, GRM_FILE)
+    temporary = f"{final}.tmp"
+    grm = np.lib.format.open_memmap(temporary, mode='w+', dtype=np.float32, shape=(n, n))
+    for row_start in range(0, n, block_size):
+        row_stop = min(row_start + block_size, n)
+        z_rows = store.centered(row_start, row_stop, frequencies)
+        # G é simétrica: cada bloco fora da diagonal é gravado nas duas posições.
+        for column_start in range(row_start, n, block_size):
+            column_stop = min(column_start + block_size, n)
+            z_columns = z_rows if column_start == row_start else store.centered(column_start, column_stop, frequencies)
+            tile = z_rows @ z_columns.T / scale
+            grm[row_start:row_stop, column_start:column_stop] = tile
+            if column_start != row_start:
+                grm[column_start:column_stop, row_start:row_stop] = tile.T
+    grm.flush()
+    del grm
+    os.replace(temporary, final)
+    np.save(os.path.join(matrix.directory, FREQUENCIES_FILE), frequencies)
+
+    matrix.grm_computed_at = timezone.now()
+    matrix.save(update_fields=['grm_computed_at'])
+    return GenomicRelationship(matrix)
+
+
+class GenomicRelationship:
+    """The memory-mapped G of a matrix, indexed by GeneticMaterial id."""
+
+    def __init__(self, matrix: GenotypeMatrix):
+        path = os.path.join(matrix.directory, GRM_FILE)
+        if not matrix.grm_computed_at or not os.path.exists(path):
+            raise GenotypeError(f"A matriz G de '{matrix}' ainda não foi calculada.")
+        self.matrix = matrix
+        self.values = np.load(path, mmap_mode='r')
+        self.material_ids = np.load(os.path.join(matrix.directory, MATERIALS_FILE))
+
+    def __len__(self) -> int:
+        return len(self.material_ids)
+
+    def rows_for(self, material_ids) -> np.ndarray:
+        return _positions(self.material_ids, material_ids)
+
+    def row(self, material_id) -> np.ndarray:
+        """Relationships of one material with all the others (a view, no copy)."""
+        position = self.rows_for([material_id])[0]
+        if position == UNKNOWN:
+            raise GenotypeError(f"O material {material_id} não está nesta matriz.")
+        return self.values[position]
+
+    def rows(self, material_ids) -> list:
+        """One view per material (no copy), in the order given."""
+        return [self.row(material_id) for material_id in material_ids]
+
+    def submatrix(self, material_ids) -> np.ndarray:
+        """Relationships among the given materials (a small copy)."""
+        positions = self.rows_for(material_ids)
+        if (positions == UNKNOWN).any():
+            raise GenotypeError("Há materiais que não estão nesta matriz.")
+        return self.values[np.ix_(positions, positions)]
+
+
+# --- Importação --------------------------------------------------------------
+
+@dataclass
+class GenotypeImportReport:
+    matrix: GenotypeMatrix = None
+    materials: int = 0
+    markers: int = 0
+    created_markers: int = 0
+    invalid_calls: int = 0
+    missing_rate: float = 0.0
+    unmatched_samples: list = field(default_factory=list)
+    # (amostra, motivo)
+    rejected_samples: list = field(default_factory=list)
+
+
+def _text(file):
+    if isinstance(file.read(0), bytes):
+        return io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    return file
+
+
+def detect_format(file) -> str:
+    sample = file.read(64 * 1024)
+    file.seek(0)
+    if '[Data]' in sample or '[Header]' in sample:
+        return GenotypeMatrix.SourceFormat.FINAL_REPORT
+    return GenotypeMatrix.SourceFormat.MATRIX
+
+
+def _delimiter(line: str) -> str:
+    return max('\t,;', key=line.count)
+
+
+def read_final_report(file):
+    """
+    Returns ``(samples, markers, codes, invalid)`` of a Final Report: codes
+    is samples × markers and ``invalid`` counts unrecognized calls.
+    """
+    lines = iter(file)
+    for line in lines:
+        if line.strip().lower() == '[data]':
+            break
+    else:
+        raise GenotypeError("Seção [Data] não encontrada no Final Report.")
+    header_line = next(lines, '')
+    delimiter = _delimiter(header_line)
+    header = [name.strip().lower() for name in header_line.rstrip('\r\n').split(delimiter)]
+    missing = [name for name in FINAL_REPORT_COLUMNS if name not in header]
+    if missing:
+        raise GenotypeError(f"Colunas ausentes no Final Report: {', '.join(missing)}.")
+    snp_col, sample_col, first_col, second_col = (header.index(name) for name in FINAL_REPORT_COLUMNS)
+
+    samples, markers = {}, {}
+    sample_rows, marker_columns, codes = array('i'), array('i'), array('B')
+    invalid = 0
+    for fields in csv.reader(lines, delimiter=delimiter):
+        if not fields:
+            continue
+        sample_rows.append(samples.setdefault(fields[sample_col].strip(), len(samples)))
+        marker_columns.append(markers.setdefault(fields[snp_col].strip(), len(markers)))
+        code = CALLS.get(fields[first_col].strip() + fields[second_col].strip())
+        if code is None:
+            code = MISSING
+            invalid += 1
+        codes.append(code)
+
+    matrix = np.full((len(samples), len(markers)), MISSING, dtype=np.uint8)
+    matrix[np.frombuffer(sample_rows, dtype=np.int32), np.frombuffer(marker_columns, dtype=np.int32)] = (
+        np.frombuffer(codes, dtype=np.uint8)
+    )
+    return list(samples), list(markers), matrix, invalid
+
+
+def read_matrix(file, delimiter=None):
+    """Returns ``(samples, markers, codes, invalid)`` of a markers × samples matrix."""
+    lines = (line for line in file if line.strip() and not line.startswith('#'))
+    header_line = next(lines, '')
+    delimiter = delimiter or _delimiter(header_line)
+    samples = [name.strip() for name in header_line.rstrip('\r\n').split(delimiter)[1:]]
+    if not samples:
+        raise GenotypeError("Cabeçalho sem amostras.")
+
+    markers, columns = [], []
+    invalid = 0
+    lookup = np.vectorize(lambda call: CALLS.get(call.upper(), -1), otypes=[np.int16])
+    for line in lines:
+        fields = line.rstrip('\r\n').split(delimiter)
+        calls = [call.strip() for call in fields[1:len(samples) + 1]]
+        calls += [''] * (len(samples) - len(calls))
+        # As chamadas distintas de uma linha são poucas: traduz só os valores únicos.
+        values, inverse = np.unique(calls, return_inverse=True)
+        translated = lookup(values)
+        invalid += int(((translated == -1)[inverse]).sum())
+        translated[translated == -1] = MISSING
+        markers.append(fields[0].strip())
+        columns.append(translated.astype(np.uint8)[inverse])
+    if not markers:
+        raise GenotypeError("Nenhum marcador encontrado.")
+    return samples, markers, np.ascontiguousarray(np.vstack(columns).T), invalid
+
+
+def _existing_markers(names) -> dict:
+    ids = {}
+    for start in range(0, len(names), LOOKUP_CHUNK_SIZE):
+        chunk = names[start:start + LOOKUP_CHUNK_SIZE]
+        ids.update(Marker.all_objects.filter(name__in=chunk).values_list('name', 'id'))
+    return ids
+
+
+def _marker_ids(names) -> tuple:
+    """Ids of the markers named ``names``; missing ones are created as SNPs."""
+    ids = _existing_markers(names)
+    new = [Marker(name=name, marker_type=Marker.MarkerType.SNP) for name in names if name not in ids]
+    for marker in Marker.all_objects.bulk_create(new, batch_size=1000):
+        ids[marker.name] = marker.pk
+    return ids, len(new)
+
+
+def import_genotypes(path, name, source_format=None, delimiter=None, dry_run=False) -> GenotypeImportReport:
+    """
+    Reads an array export and stores it as a new ``GenotypeMatrix`` named
+    ``name``. Samples that match no material (or one already in the file)
+    are reported and left out.
+    """
+    report = GenotypeImportReport()
+    if GenotypeMatrix.objects.filter(name=name).exists():
+        raise GenotypeError(f"Já existe uma matriz de genótipos chamada '{name}'.")
+    with open(path, 'rb') as raw:
+        file = _text(raw)
+        source_format = source_format or detect_format(file)
+        if source_format == GenotypeMatrix.SourceFormat.FINAL_REPORT:
+            samples, marker_names, codes, report.invalid_calls = read_final_report(file)
+        else:
+            samples, marker_names, codes, report.invalid_calls = read_matrix(file, delimiter)
+
+    # Amostras -> materiais (uma linha por material).
+    found = lookup_materials(samples)
+    material_of = {}
+    keep = []
+    for row, sample in enumerate(samples):
+        materials = found.get(sample, [])
+        if not materials:
+            report.unmatched_samples.append(sample)
+        elif len(materials) > 1:
+            report.rejected_samples.append((sample, f"{len(materials)} materiais com esse nome"))
+        elif materials[0].pk in material_of:
+            report.rejected_samples.append((sample, f"mesmo material da amostra '{material_of[materials[0].pk]}'"))
+        else:
+            material_of[materials[0].pk] = sample
+            keep.append((materials[0].pk, row))
+    first_column = {}
+    for column, marker in enumerate(marker_names):
+        first_column.setdefault(marker, column)
+
+    report.materials = len(keep)
+    report.markers = len(first_column)
+    if not keep:
+        raise GenotypeError("Nenhuma amostra corresponde a um material cadastrado.")
+    if dry_run:
+        report.created_markers = len(first_column) - len(_existing_markers(list(first_column)))
+        return report
+
+    with transaction.atomic():
+        marker_ids, report.created_markers = _marker_ids(list(first_column))
+        # Linhas ordenadas pelo id do material e colunas pelo id do marcador.
+        keep.sort()
+        material_ids = np.array([pk for pk, _ in keep], dtype=np.int64)
+        columns = sorted(first_column.values(), key=lambda column: marker_ids[marker_names[column]])
+        marker_id_array = np.array([marker_ids[marker_names[column]] for column in columns], dtype=np.int64)
+        selected = codes[np.array([row for _, row in keep])][:, columns]
+        report.missing_rate = float((selected == MISSING).mean()) if selected.size else 0.0
+
+        matrix = GenotypeMatrix.objects.create(
+            name=name,
+            source_format=source_format,
+            source_file=os.path.basename(path),
+            num_materials=len(material_ids),
+            num_markers=len(marker_id_array),
+            missing_rate=report.missing_rate,
+        )
+        try:
+            os.makedirs(matrix.directory, exist_ok=True)
+            np.save(os.path.join(matrix.directory, MATERIALS_FILE), material_ids)
+            np.save(os.path.join(matrix.directory, MARKERS_FILE), marker_id_array)
+            np.save(os.path.join(matrix.directory, DOSAGES_FILE), pack(selected))
+        except Exception:
+            shutil.rmtree(matrix.directory, ignore_errors=True)
+            raise
+    report.matrix = matrix
+    return report
+
+
+def delete_files(matrix: GenotypeMatrix) -> None:
+    shutil.rmtree(matrix.directory, ignore_errors=True)
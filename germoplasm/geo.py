@@ -0,0 +1,100 @@
+"""
+Consultas espaciais sobre os Locais (busca por raio, local mais próximo e
+faixa de altitude).
+
+A busca por raio seleciona candidatos pelos prefixos de geohash que cobrem o
+círculo (consultas por intervalo no índice de ``Location.geohash``) e calcula
+a distância exata apenas para eles, com NumPy.
+"""
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, IntegerField, Q, When
+
+from . import geohash
+from .models import Location, Planting
+
+NEAREST_START_RADIUS_KM = 10.0
+PICKER_RADIUS_KM = 50.0
+# Faixas de altitude (m) usadas nos filtros do admin; None = sem limite. O
+# limite superior não pertence à faixa, para que cada altitude caia em uma só.
+ALTITUDE_BANDS = ((None, 500), (500, 900), (900, 1200), (1200, None))
+# Meia circunferência: nenhum ponto da Terra está mais longe que isso.
+MAX_RADIUS_KM = math.pi * geohash.EARTH_RADIUS_KM
+
+
+def _prefix_q(prefix: str) -> Q:
+    # Intervalo em vez de LIKE: usa o índice B-tree em qualquer banco.
+    if not prefix:
+        return ~Q(geohash='')
+    return Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+
+
+def locations_within(latitude, longitude, radius_km, queryset=None) -> list:
+    """
+    Returns ``[(location, distance_km), ...]`` for the locations within
+    ``radius_km`` of the point, nearest first.
+    """
+    if queryset is None:
+        queryset = Location.objects.all()
+    cells = geohash.covering_cells(float(latitude), float(longitude), float(radius_km))
+    candidates = list(queryset.filter(reduce(or_, (_prefix_q(cell) for cell in cells))))
+    if not candidates:
+        return []
+
+    distances = geohash.haversine_km(
+        float(latitude), float(longitude),
+        [location.latitude for location in candidates],
+        [location.longitude for location in candidates],
+    )
+    order = distances.argsort(kind='stable')
+    return [
+        (candidates[i], float(distances[i]))
+        for i in order
+        if distances[i] <= radius_km
+    ]
+
+
+def nearest_location(latitude, longitude, queryset=None):
+    """
+    Returns ``(location, distance_km)`` for the location nearest to the point,
+    or None when no location has coordinates. The search radius doubles until
+    a location is found; a hit within radius R is guaranteed to be the nearest.
+    """
+    radius = NEAREST_START_RADIUS_KM
+    while True:
+        found = locations_within(latitude, longitude, radius, queryset)
+        if found:
+            return found[0]
+        if radius >= MAX_RADIUS_KM:
+            return None
+        radius = min(radius * 2, MAX_RADIUS_KM)
+
+
+def in_altitude_band(queryset, min_altitude=None, max_altitude=None, lookup='location__altitude'):
+    """
+    Filters ``queryset`` to rows whose location altitude (metres) lies within
+    the band ``[min_altitude, max_altitude)``: adjacent bands do not overlap.
+    """
+    if min_altitude is not None:
+        queryset = queryset.filter(**{f'{lookup}__gte': min_altitude})
+    if max_altitude is not None:
+        queryset = queryset.filter(**{f'{lookup}__lt': max_altitude})
+    return queryset
+
+
+def plantings_in_altitude_band(min_altitude=None, max_altitude=None, queryset=None):
+    """Returns the plantings whose location lies within the altitude band (metres)."""
+    if queryset is None:
+        queryset = Planting.objects.all()
+    return in_altitude_band(queryset, min_altitude, max_altitude)
+
+
+def order_by_ids(queryset, ids):
+    """Filters ``queryset`` to ``ids`` keeping their order (e.g. by distance)."""
+    ordering = Case(
+        *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).order_by(ordering)
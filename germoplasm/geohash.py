@@ -0,0 +1,96 @@
+"""
+Codificação geohash e distâncias sobre a esfera.
+
+O geohash de cada Local é gravado em uma coluna indexada; locais próximos
+compartilham prefixos, de modo que uma busca por raio vira poucas consultas
+por intervalo de prefixo no índice. Este módulo não depende dos modelos.
+"""
+import math
+
+import numpy as np
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(latitude: float, longitude: float, precision: int = PRECISION) -> str:
+    """Encodes a point as a geohash of ``precision`` characters."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision: int) -> tuple:
+    """Returns ``(height, width)`` in degrees of a geohash cell."""
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> set:
+    """
+    Returns geohash prefixes whose cells cover the bounding box of the circle
+    of ``radius_km`` around the point. The precision is the finest one whose
+    cells are at least as large as the radius, so at most 3x3 cells are used.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlon = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+
+    precision = 0
+    for candidate in range(1, PRECISION + 1):
+        height, width = cell_size(candidate)
+        if height < dlat or width < dlon:
+            break
+        precision = candidate
+    if precision == 0:
+        return {''}  # raio maior que as células de 1 caractere: sem filtro.
+
+    height, width = cell_size(precision)
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    cells = set()
+    lat = south
+    while True:
+        lon = longitude - dlon
+        while True:
+            wrapped = (lon + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, wrapped, precision))
+            if lon >= longitude + dlon:
+                break
+            lon = min(lon + width, longitude + dlon)
+        if lat >= north:
+            break
+        lat = min(lat + height, north)
+    return cells
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes) -> np.ndarray:
+    """Great-circle distances (km) from one point to arrays of points."""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lon2 = np.radians(np.asarray(longitudes, dtype=float))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
@@ -0,0 +1,115 @@
+"""
+Painel do fluxo de quarentena na IFO.
+
+As consultas usam a coluna derivada ``GeneticMaterial.ifo_status`` e o índice
+parcial ``(ifo_status, ifo_sent_date)`` dos materiais ativos: as contagens por
+etapa e a distribuição do tempo em quarentena são agregações agrupadas, e a
+lista de atrasados é uma varredura de intervalo no índice.
+
+As transições em lote são um único UPDATE por ação, restrito aos materiais
+que estão na etapa de origem da transição.
+"""
+import datetime
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import audit
+from .models import GeneticMaterial
+
+Status = GeneticMaterial.IfoStatus
+
+# Tempo de quarentena a partir do qual o material é considerado atrasado.
+QUARANTINE_OVERDUE_DAYS = 730
+OVERDUE_LIST_LIMIT = 100
+# Faixas (em dias) da distribuição do tempo em quarentena; None = sem limite.
+QUARANTINE_BANDS = (
+    ("Até 6 meses", 0, 182),
+    ("6 a 12 meses", 183, 365),
+    ("1 a 2 anos", 366, QUARANTINE_OVERDUE_DAYS),
+    ("Mais de 2 anos", QUARANTINE_OVERDUE_DAYS + 1, None),
+)
+
+# Etapa de destino -> (etapas de origem, campos gravados). 'today' é trocado
+# pela data da transição.
+TRANSITIONS = {
+    Status.QUARANTINE: ((Status.NOT_SENT,), {'ifo_sent': True, 'ifo_sent_date': 'today'}),
+    Status.RELEASED: ((Status.QUARANTINE,), {'ifo_quarantine_released': True}),
+    Status.DISCARDED: (
+        (Status.QUARANTINE,), {'ifo_discarded': True, 'ifo_discarded_date': 'today'}
+    ),
+}
+
+
+def eligible_materials():
+    """Active materials that go through the IFO: program selections and cultivars."""
+    return GeneticMaterial.objects.filter(
+        is_epagri_material=True,
+        material_type__in=[GeneticMaterial.MaterialType.SELECTION, GeneticMaterial.MaterialType.CULTIVAR],
+    )
+
+
+def stage_counts(queryset=None) -> dict:
+    """Returns ``{status: count}`` for every stage, zeros included."""
+    if queryset is None:
+        queryset = eligible_materials()
+    counts = dict.fromkeys(Status.values, 0)
+    rows = queryset.values('ifo_status').annotate(total=Count('id')).order_by()
+    counts.update({row['ifo_status']: row['total'] for row in rows})
+    return counts
+
+
+def _sent_between(today, min_days, max_days) -> Q:
+    condition = Q()
+    if min_days is not None:
+        condition &= Q(ifo_sent_date__lte=today - datetime.timedelta(days=min_days))
+    if max_days is not None:
+        condition &= Q(ifo_sent_date__gte=today - datetime.timedelta(days=max_days))
+    return condition
+
+
+def quarantine_distribution(queryset=None, today=None) -> list:
+    """
+    Returns ``[(label, count), ...]`` of the materials in quarantine by time
+    since shipment, plus the ones without a shipment date. One aggregate query.
+    """
+    if queryset is None:
+        queryset = eligible_materials()
+    today = today or timezone.localdate()
+    aggregates = {
+        f'band_{i}': Count('id', filter=_sent_between(today, low, high))
+        for i, (_, low, high) in enumerate(QUARANTINE_BANDS)
+    }
+    aggregates['no_date'] = Count('id', filter=Q(ifo_sent_date=None))
+    result = queryset.filter(ifo_status=Status.QUARANTINE).aggregate(**aggregates)
+    distribution = [
+        (label, result[f'band_{i}']) for i, (label, _, _) in enumerate(QUARANTINE_BANDS)
+    ]
+    distribution.append(("Sem data de envio", result['no_date']))
+    return distribution
+
+
+def overdue(queryset=None, today=None):
+    """Materials in quarantine for more than ``QUARANTINE_OVERDUE_DAYS``, oldest first."""
+    if queryset is None:
+        queryset = eligible_materials()
+    today = today or timezone.localdate()
+    limit = today - datetime.timedelta(days=QUARANTINE_OVERDUE_DAYS)
+    return queryset.filter(
+        ifo_status=Status.QUARANTINE, ifo_sent_date__lt=limit
+    ).order_by('ifo_sent_date', 'pk')
+
+
+def apply_transition(queryset, target: str, date=None) -> int:
+    """
+    Moves the eligible materials of ``queryset`` that are in a source stage
+    of ``target`` to it, in a single UPDATE (recorded in the history).
+    Returns the number of materials updated; the others are left unchanged.
+    """
+    sources, values = TRANSITIONS[target]
+    date = date or timezone.localdate()
+    values = {name: date if value == 'today' else value for name, value in values.items()}
+    return audit.update(
+        eligible_materials().filter(pk__in=queryset.values('pk'), ifo_status__in=sources),
+        **values, ifo_status=target, updated_at=timezone.now(),
+    )
@@ -0,0 +1,111 @@
+"""
+Manutenção da tabela de resumo do inventário de plantas (PlantingInventory).
+
+Os totais são calculados no banco com agregações agrupadas por local, material
+e porta-enxerto. Os sinais recalculam apenas os pares (local, material)
+afetados por cada gravação; ``rebuild`` recalcula a tabela inteira.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Trim, Upper
+
+from .models import GeneticMaterial, Planting, PlantingInventory
+
+BULK_BATCH_SIZE = 1000
+CSV_HEADER = (
+    'Local', 'Material', 'Código', 'Tipo de Material', 'Porta-enxerto',
+    'Plantas', 'Plantios', 'Primeiro Plantio', 'Último Plantio',
+)
+
+
+def _aggregate(queryset):
+    """Grouped totals of the active plantings of active materials."""
+    return (
+        queryset
+        .filter(is_active=True, genetic_material__is_active=True)
+        .annotate(rootstock_key=Upper(Trim('rootstock')))
+        .values('location_id', 'genetic_material_id', 'genetic_material__material_type', 'rootstock_key')
+        .annotate(
+            plants=Sum('num_plants'),
+            plantings=Count('id'),
+            first_date=Min('planting_date'),
+            last_date=Max('planting_date'),
+        )
+        .order_by()
+    )
+
+
+def _summary_rows(aggregates):
+    for row in aggregates:
+        yield PlantingInventory(
+            location_id=row['location_id'],
+            genetic_material_id=row['genetic_material_id'],
+            material_type=row['genetic_material__material_type'],
+            rootstock=row['rootstock_key'],
+            num_plants=row['plants'],
+            num_plantings=row['plantings'],
+            first_planting_date=row['first_date'],
+            last_planting_date=row['last_date'],
+        )
+
+
+def _replace(summary_filter: Q, planting_filter: Q) -> None:
+    with transaction.atomic():
+        PlantingInventory.objects.filter(summary_filter).delete()
+        PlantingInventory.objects.bulk_create(
+            _summary_rows(_aggregate(Planting.all_objects.filter(planting_filter))),
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+
+def refresh_pairs(pairs) -> None:
+    """Recomputes the summary rows of the given ``(location_id, material_id)`` pairs."""
+    pairs = {(location_id, material_id) for location_id, material_id in pairs if location_id and material_id}
+    if not pairs:
+        return
+    summary_filter = reduce(or_, (Q(location_id=l, genetic_material_id=m) for l, m in pairs))
+    _replace(summary_filter, summary_filter)
+
+
+def refresh_materials(material_ids) -> None:
+    """Recomputes every summary row of the given materials."""
+    material_ids = [pk for pk in material_ids if pk]
+    if material_ids:
+        _replace(Q(genetic_material_id__in=material_ids), Q(genetic_material_id__in=material_ids))
+
+
+def rebuild() -> int:
+    """Rebuilds the whole summary table; returns the number of rows."""
+    _replace(Q(), Q())
+    return PlantingInventory.objects.count()
+
+
+def totals(queryset) -> dict:
+    """Totals of a (filtered) PlantingInventory queryset."""
+    return queryset.aggregate(
+        plants=Sum('num_plants'),
+        plantings=Sum('num_plantings'),
+        materials=Count('genetic_material', distinct=True),
+        locations=Count('location', distinct=True),
+    )
+
+
+def csv_rows(queryset):
+    """Yields the CSV header and one row per summary line of ``queryset``."""
+    yield CSV_HEADER
+    types = dict(PlantingInventory._meta.get_field('material_type').choices)
+    rows = queryset.values_list(
+        'location__name', 'genetic_material__name', 'genetic_material__internal_code',
+        'genetic_material__accession_code', 'material_type', 'rootstock',
+        'num_plants', 'num_plantings', 'first_planting_date', 'last_planting_date',
+    )
+    for (location, material, internal_code, accession_code, material_type, rootstock,
+         plants, plantings, first_date, last_date) in rows.iterator(chunk_size=2000):
+        code = accession_code if material_type == GeneticMaterial.MaterialType.HYBRID else internal_code
+        yield (
+            location, material, code or '', types.get(material_type, material_type),
+            rootstock, plants, plantings, first_date or '', last_date or '',
+        )
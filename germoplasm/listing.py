@@ -0,0 +1,146 @@
+"""
+Fichas de listagem dos materiais genéticos (MaterialListing).
+
+A listagem do admin mostra, para cada material, os códigos da mãe, do pai e
+da população, o genótipo S e as contagens de fotos, plantios e descendentes.
+Calculados na consulta, seriam junções, um M2M e três contagens por página;
+aqui ficam numa linha por material, ligada pela chave primária, de modo que
+a página e os filtros são uma única consulta indexada. A busca da listagem
+também procura no texto da ficha (códigos dos parentais, população, genótipo S);
+a do autocomplete, apenas nos códigos do próprio material.
+
+As fichas são recalculadas em lote, com uma consulta por coluna derivada, e
+gravadas com ``bulk_create`` (upsert). Os sinais agendam o recálculo dos
+materiais afetados para depois do commit, quando os códigos gerados no
+``save()`` já estão gravados; ``rebuild`` refaz a tabela inteira.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import GeneticMaterial, GeneticMaterialPhoto, MaterialListing, Planting
+
+BULK_BATCH_SIZE = 1000
+PARENT_FIELDS = ('mother_id', 'father_id', 'mutated_from_id')
+# Campos do material que aparecem na própria ficha ou nas fichas dos parentais e filhos.
+LISTED_FIELDS = (
+    'name', 'material_type', 'internal_code', 'accession_code',
+    'mother_id', 'father_id', 'mutated_from_id', 'population_id', 'is_active',
+)
+# Colunas que compõem o código de exibição, na ordem de ``display_code``.
+LABEL_FIELDS = ('name', 'material_type', 'internal_code', 'accession_code')
+
+
+def display_code(name, material_type, internal_code, accession_code) -> str:
+    """Same as ``GeneticMaterial.get_display_code`` from the column values."""
+    if material_type == GeneticMaterial.MaterialType.HYBRID:
+        return accession_code or name
+    return internal_code or name
+
+
+def _counts(model, material_ids) -> dict:
+    queryset = model.objects.all() if material_ids is None else model.objects.filter(genetic_material_id__in=material_ids)
+    return dict(queryset.values_list('genetic_material_id').annotate(total=Count('id')).order_by())
+
+
+def _offspring(material_ids) -> Counter:
+    """Active children and mutants of each material (a selfing counts once)."""
+    counts = Counter()
+    queryset = GeneticMaterial.objects.all()
+    if material_ids is not None:
+        material_ids = set(material_ids)
+        queryset = queryset.filter(
+            Q(mother_id__in=material_ids) | Q(father_id__in=material_ids) | Q(mutated_from_id__in=material_ids)
+        )
+    for parents in queryset.values_list(*PARENT_FIELDS).order_by().iterator(chunk_size=BULK_BATCH_SIZE * 10):
+        parents = set(parents)
+        parents.discard(None)
+        counts.update(parents if material_ids is None else parents & material_ids)
+    return counts
+
+
+def _genotypes(material_ids) -> dict:
+    through = GeneticMaterial.s_alleles.through
+    queryset = through.objects.filter(s_allele__is_active=True)
+    if material_ids is not None:
+        queryset = queryset.filter(geneticmaterial_id__in=material_ids)
+    genotypes = {}
+    rows = queryset.values_list('geneticmaterial_id', 's_allele__name').order_by('s_allele__name')
+    for material_id, allele in rows:
+        genotypes[material_id] = genotypes.get(material_id, '') + allele
+    return genotypes
+
+
+def _listings(material_ids=None):
+    """Listings of ``material_ids`` (of every material when None)."""
+    columns = (
+        'pk', *LABEL_FIELDS,
+        *(f'mother__{name}' for name in LABEL_FIELDS),
+        *(f'father__{name}' for name in LABEL_FIELDS),
+        'population__code', 'population__seplan_code',
+    )
+    rows = GeneticMaterial.all_objects.all()
+    if material_ids is not None:
+        rows = rows.filter(pk__in=material_ids)
+    photos = _counts(GeneticMaterialPhoto, material_ids)
+    plantings = _counts(Planting, material_ids)
+    offspring = _offspring(material_ids)
+    genotypes = _genotypes(material_ids)
+
+    for pk, *values in rows.values_list(*columns).order_by().iterator(chunk_size=BULK_BATCH_SIZE * 10):
+        own, mother, father, (population, seplan) = values[:4], values[4:8], values[8:12], values[12:]
+        listing = MaterialListing(
+            genetic_material_id=pk,
+            display_code=display_code(*own),
+            mother_code=display_code(*mother) if mother[0] else '',
+            father_code=display_code(*father) if father[0] else '',
+            population_code=population or '',
+            s_genotype=genotypes.get(pk, ''),
+            num_photos=photos.get(pk, 0),
+            num_plantings=plantings.get(pk, 0),
+            num_offspring=offspring[pk],
+        )
+        listing.search_text = ' '.join(dict.fromkeys(filter(None, (
+            own[0], own[2], own[3], listing.mother_code, listing.father_code,
+            listing.population_code, seplan, listing.s_genotype,
+        ))))
+        yield listing
+
+
+def refresh_materials(material_ids) -> None:
+    """Recomputes the listings of the given materials (deleted ones are skipped)."""
+    material_ids = sorted({pk for pk in material_ids if pk})
+    for start in range(0, len(material_ids), BULK_BATCH_SIZE):
+        MaterialListing.objects.bulk_create(
+            _listings(material_ids[start:start + BULK_BATCH_SIZE]),
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['genetic_material'],
+            update_fields=[
+                'display_code', 'mother_code', 'father_code', 'population_code', 's_genotype',
+                'num_photos', 'num_plantings', 'num_offspring', 'search_text', 'updated_at',
+            ],
+        )
+
+
+def schedule_refresh(material_ids) -> None:
+    """Recomputes the listings after the current transaction commits."""
+    material_ids = {pk for pk in material_ids if pk}
+    if material_ids:
+        transaction.on_commit(lambda: refresh_materials(material_ids))
+
+
+def children_of(material_ids) -> list:
+    """Every material (also inactive) with one of ``material_ids`` as mother or father."""
+    return list(GeneticMaterial.all_objects.filter(
+        Q(mother_id__in=material_ids) | Q(father_id__in=material_ids)
+    ).values_list('pk', flat=True))
+
+
+def rebuild() -> int:
+    """Recomputes the listing of every material in one pass; returns the number of rows."""
+    with transaction.atomic():
+        MaterialListing.objects.all().delete()
+        MaterialListing.objects.bulk_create(_listings(), batch_size=BULK_BATCH_SIZE)
+    return MaterialListing.objects.count()
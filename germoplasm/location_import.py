@@ -0,0 +1,180 @@
+"""
+Importação em lote de Locais a partir de uma planilha CSV.
+
+Colunas aceitas (cabeçalho, sem diferenciar maiúsculas):
+
+- ``name`` (obrigatória), ``city``, ``state``, ``altitude``;
+- coordenadas em ``latitude``/``longitude`` (decimal ou DMS em texto), ou
+  nos mesmos campos separados do formulário do admin: ``lat_degrees``,
+  ``lat_minutes``, ``lat_seconds``, ``lat_direction`` e os equivalentes ``lon_*``.
+
+As coordenadas são convertidas por coluna com as rotinas de
+``coordinates.py``, as mesmas usadas pelo ``LocationAdminForm``. Os locais são
+inseridos ou atualizados pelo nome com um único ``bulk_create`` por lote.
+"""
+import csv
+import io
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.db import transaction
+
+from . import coordinates
+from .models import Location
+
+BULK_BATCH_SIZE = 1000
+TEXT_FIELDS = ('city', 'state')
+DMS_COLUMNS = ('degrees', 'minutes', 'seconds', 'direction')
+
+
+@dataclass
+class LocationImportReport:
+    created: int = 0
+    updated: int = 0
+    # (linha da planilha, nome, motivo)
+    rejects: list = field(default_factory=list)
+
+
+def _column(rows, name):
+    return [row.get(name) or '' for row in rows]
+
+
+def _coordinates(rows, columns, axis):
+    """Returns ``(values, errors)`` for one axis, from whichever columns exist."""
+    text_column = 'latitude' if axis == 'lat' else 'longitude'
+    if text_column in columns:
+        return coordinates.parse_column(_column(rows, text_column), axis)
+    if f'{axis}_degrees' in columns:
+        return coordinates.components_to_decimal(
+            *(_column(rows, f'{axis}_{part}') for part in DMS_COLUMNS), axis
+        )
+    return np.full(len(rows), np.nan), {}
+
+
+def _altitudes(rows):
+    values = np.full(len(rows), np.nan)
+    errors = {}
+    for i, text in enumerate(_column(rows, 'altitude')):
+        text = text.strip().lower().removesuffix('m').strip().replace(',', '.')
+        if not text:
+            continue
+        try:
+            values[i] = float(text)
+        except ValueError:
+            errors[i] = f"altitude inválida: '{text}'"
+    bad = ~np.isnan(values) & ((values < -500) | (values > 9000))
+    for i in np.flatnonzero(bad):
+        errors[int(i)] = "altitude fora do intervalo de -500 a 9000 m"
+    return np.round(values), errors
+
+
+def read_rows(file, delimiter=None):
+    """
+    Reads the CSV (file-like object in text or binary mode) into a list of
+    dicts with lower-cased headers. The delimiter is detected when omitted.
+    """
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = file.read(64 * 1024)
+    file.seek(0)
+    if delimiter is None:
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+        except csv.Error:
+            delimiter = ','
+    reader = csv.DictReader(file, delimiter=delimiter)
+    return [
+        {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        for row in reader
+    ]
+
+
+def import_locations(rows, dry_run=False, batch_size=BULK_BATCH_SIZE) -> LocationImportReport:
+    """
+    Validates ``rows`` (dicts as returned by :func:`read_rows`) and upserts the
+    valid ones by name. Blank cells never overwrite data of existing locations.
+    """
+    report = LocationImportReport()
+    if not rows:
+        return report
+    columns = set(rows[0])
+    if 'name' not in columns:
+        report.rejects.append((1, '', "coluna 'name' ausente"))
+        return report
+
+    names = [row['name'] for row in rows]
+    latitudes, lat_errors = _coordinates(rows, columns, 'lat')
+    longitudes, lon_errors = _coordinates(rows, columns, 'lon')
+    altitudes, alt_errors = _altitudes(rows)
+
+    has_coordinates = bool(columns & {'latitude', 'lat_degrees'} and columns & {'longitude', 'lon_degrees'})
+    only_one = np.isnan(latitudes) != np.isnan(longitudes)
+
+    seen = set()
+    valid = []
+    for i, name in enumerate(names):
+        line = i + 2  # o cabeçalho é a linha 1
+        errors = [
+            error for error in (lat_errors.get(i), lon_errors.get(i), alt_errors.get(i)) if error
+        ]
+        if not name:
+            errors.insert(0, "nome em branco")
+        elif len(name) > Location._meta.get_field('name').max_length:
+            errors.insert(0, "nome longo demais")
+        elif name in seen:
+            errors.insert(0, "nome repetido na planilha")
+        if has_coordinates and only_one[i] and not errors:
+            errors.append("latitude e longitude devem ser informadas juntas")
+        if errors:
+            report.rejects.append((line, name, '; '.join(errors)))
+            continue
+        seen.add(name)
+        valid.append(i)
+
+    locations = []
+    for i in valid:
+        location = Location(
+            name=names[i],
+            latitude=None if np.isnan(latitudes[i]) else round(float(latitudes[i]), coordinates.DECIMAL_PLACES),
+            longitude=None if np.isnan(longitudes[i]) else round(float(longitudes[i]), coordinates.DECIMAL_PLACES),
+            altitude=None if np.isnan(altitudes[i]) else int(altitudes[i]),
+            **{field_name: rows[i].get(field_name, '')[:100] for field_name in TEXT_FIELDS},
+        )
+        # bulk_create não chama save(): o geohash é calculado aqui.
+        location.geohash = location.compute_geohash()
+        locations.append(location)
+
+    # Células em branco mantêm o valor atual dos locais existentes: as linhas
+    # são agrupadas pelos campos efetivamente preenchidos.
+    groups = {}
+    for location in locations:
+        fields = [name for name in TEXT_FIELDS if getattr(location, name)]
+        if location.latitude is not None:
+            fields += ['latitude', 'longitude', 'geohash']
+        if location.altitude is not None:
+            fields.append('altitude')
+        groups.setdefault(tuple(fields), []).append(location)
+
+    existing = set()
+    for start in range(0, len(locations), batch_size):
+        chunk = [location.name for location in locations[start:start + batch_size]]
+        existing.update(Location.objects.filter(name__in=chunk).values_list('name', flat=True))
+    report.updated = len(existing)
+    report.created = len(locations) - report.updated
+
+    if dry_run:
+        return report
+    with transaction.atomic():
+        for update_fields, group in groups.items():
+            if update_fields:
+                Location.objects.bulk_create(
+                    group,
+                    batch_size=batch_size,
+                    update_conflicts=True,
+                    unique_fields=['name'],
+                    update_fields=list(update_fields),
+                )
+            else:
+                # Apenas o nome: nada a atualizar nos locais existentes.
+                Location.objects.bulk_create(group, batch_size=batch_size, ignore_conflicts=True)
+    return report
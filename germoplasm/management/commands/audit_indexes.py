@@ -0,0 +1,141 @@
+import re
+from urllib.parse import parse_qsl
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+# Padrões de plano por banco: leitura completa de uma tabela e ordenação em memória.
+PLAN_PATTERNS = {
+    'sqlite': {
+        'scan': re.compile(r'\bSCAN (?P<table>\w+)\s*$'),
+        'sort': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    },
+    'postgresql': {
+        'scan': re.compile(r'Seq Scan on (?P<table>\w+)'),
+        'sort': re.compile(r'->\s+Sort\b|^\s*Sort\b'),
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa EXPLAIN nas consultas reais das listagens do admin (ordenação padrão "
+        "e cada filtro lateral) e relata leituras sequenciais e ordenações sem índice, "
+        "para detectar regressões de índices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--app', default='germoplasm',
+            help="App cujos ModelAdmins serão auditados (padrão: %(default)s)."
+        )
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help=(
+                "Ignora tabelas com menos linhas que isso: em tabelas pequenas o "
+                "planejador prefere leituras sequenciais (padrão: %(default)s)."
+            )
+        )
+        parser.add_argument(
+            '--include-search', action='store_true',
+            help=(
+                "Audita também a busca textual. Buscas 'contém' (LIKE '%%termo%%') "
+                "nunca usam índices B-tree e por isso ficam de fora por padrão."
+            )
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help="Atualiza as estatísticas do banco (ANALYZE) antes da auditoria."
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan', action='store_true',
+            help="Termina com erro se alguma consulta fizer leitura sequencial."
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help="Mostra o plano completo de cada consulta."
+        )
+
+    def handle(self, *args, **options):
+        patterns = PLAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(f"Banco '{connection.vendor}' não suportado pela auditoria.")
+
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        # Superusuário em memória: não é gravado no banco.
+        user = get_user_model()(is_active=True, is_staff=True, is_superuser=True)
+        factory = RequestFactory()
+
+        problems = 0
+        for model, model_admin in admin.site._registry.items():
+            if model._meta.app_label != options['app']:
+                continue
+            rows = model._base_manager.count()
+            if rows < options['min_rows']:
+                self.stdout.write(f"ignorado  {model._meta.label}: {rows} linha(s)")
+                continue
+
+            for label, params in self._scenarios(model_admin, factory, user, options['include_search']):
+                request = factory.get('/', params)
+                request.user = user
+                changelist = model_admin.get_changelist_instance(request)
+                page = changelist.queryset[:changelist.list_per_page]
+                plan = page.explain()
+                findings = self._findings(plan, patterns, model._meta.db_table, filtered=bool(params))
+
+                name = f"{model._meta.label} [{label}]"
+                if findings:
+                    problems += 1
+                    self.stdout.write(self.style.WARNING(f"SEQ SCAN  {name}: {', '.join(findings)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"ok        {name}"))
+                if options['verbose_plans'] or findings:
+                    self.stdout.write(f"    {page.query}")
+                    for line in plan.splitlines():
+                        self.stdout.write(f"    {line}")
+
+        self.stdout.write(f"\n{problems} consulta(s) com leitura sequencial ou ordenação sem índice.")
+        if problems and options['fail_on_seq_scan']:
+            raise CommandError("Foram encontradas leituras sequenciais nas consultas do admin.")
+
+    def _findings(self, plan, patterns, table, filtered):
+        """
+        Only the changelist's own table is checked: joined lookup tables are
+        small and scanning them is usually the right plan. An unfiltered scan
+        without a sort just reads the table in key order up to the page limit.
+        """
+        findings = []
+        sorts = any(patterns['sort'].search(line) for line in plan.splitlines())
+        scans = any(
+            match.group('table') == table
+            for line in plan.splitlines()
+            for match in [patterns['scan'].search(line)]
+            if match
+        )
+        if sorts:
+            findings.append("ordenação sem índice")
+        if scans and (filtered or sorts or connection.vendor == 'postgresql'):
+            findings.append(f"leitura sequencial de {table}")
+        return findings
+
+    def _scenarios(self, model_admin, factory, user, include_search):
+        """Yields ``(label, GET params)`` for the changelist variations to audit."""
+        yield 'listagem', {}
+
+        request = factory.get('/')
+        request.user = user
+        changelist = model_admin.get_changelist_instance(request)
+        for spec in changelist.filter_specs:
+            # A primeira opção de cada filtro é "Todos"; audita a primeira opção real.
+            for choice in list(spec.choices(changelist))[1:2]:
+                params = dict(parse_qsl(choice['query_string'].lstrip('?')))
+                yield f"filtro {spec.title}", params
+
+        if include_search and model_admin.get_search_fields(request):
+            yield 'busca', {'q': 'a'}
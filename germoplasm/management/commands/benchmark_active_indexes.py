@@ -0,0 +1,137 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from germoplasm.models import (
+    GeneticMaterial,
+    Location,
+    PhenologicalEvent,
+    PhenologyObservation,
+)
+
+BATCH_SIZE = 10000
+# Índices que servem as consultas medidas: os compostos de material/data e de
+# tipo/nome (que também atendem os registros ativos) e o parcial dos materiais
+# Epagri ativos. O índice da chave estrangeira da observação continua no lugar.
+MEASURED_INDEXES = (
+    (PhenologyObservation, 'pheno_material_date_idx'),
+    (GeneticMaterial, 'gm_type_name_idx'),
+    (GeneticMaterial, 'gm_active_epagri_idx'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o ganho dos índices usados pelas consultas de registros ativos "
+        "(MEASURED_INDEXES) sobre uma tabela de observações fenológicas sintética. "
+        "Todos os dados e alterações de esquema são desfeitos ao final (rollback)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--materials', type=int, default=5000)
+        parser.add_argument(
+            '--inactive-ratio', type=float, default=0.2,
+            help="Fração de registros excluídos logicamente (padrão: %(default)s)."
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            material_ids = self._populate(rng, options)
+            samples = [rng.choice(material_ids) for _ in range(options['repeat'])]
+
+            with_indexes = self._measure(samples)
+            self._drop_indexes()
+            without_indexes = self._measure(samples)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write("")
+        self.stdout.write(f"{'Consulta':<45} {'sem índice':>12} {'com índice':>12} {'ganho':>8}")
+        for label in with_indexes:
+            before, after = without_indexes[label], with_indexes[label]
+            self.stdout.write(
+                f"{label:<45} {before * 1000:>10.2f}ms {after * 1000:>10.2f}ms {before / after:>7.1f}x"
+            )
+
+    def _populate(self, rng, options):
+        self.stdout.write(f"Gerando {options['rows']} observações para {options['materials']} materiais...")
+        inactive_ratio = options['inactive_ratio']
+        types = list(GeneticMaterial.MaterialType.values)
+        materials = GeneticMaterial.all_objects.bulk_create(
+            (
+                GeneticMaterial(
+                    name=f"bench-{i}",
+                    material_type=rng.choice(types),
+                    is_active=rng.random() >= inactive_ratio,
+                    is_epagri_material=rng.random() < 0.1,
+                )
+                for i in range(options['materials'])
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        material_ids = [material.pk for material in materials]
+        location = Location.objects.create(name=f"bench-location-{time.time_ns()}")
+        event = PhenologicalEvent.objects.create(name=f"bench-event-{time.time_ns()}")
+
+        start = date(2000, 1, 1)
+        remaining = options['rows']
+        while remaining:
+            size = min(BATCH_SIZE, remaining)
+            PhenologyObservation.all_objects.bulk_create([
+                PhenologyObservation(
+                    genetic_material_id=rng.choice(material_ids),
+                    location=location,
+                    event=event,
+                    observation_date=start + timedelta(days=rng.randrange(9000)),
+                    is_active=rng.random() >= inactive_ratio,
+                )
+                for _ in range(size)
+            ])
+            remaining -= size
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        return material_ids
+
+    def _queries(self, material_id):
+        return {
+            "observações ativas de um material (top 50)": lambda: list(
+                PhenologyObservation.objects.filter(genetic_material_id=material_id)
+                .order_by('-observation_date').values_list('pk', flat=True)[:50]
+            ),
+            "contagem de observações ativas do material": lambda: (
+                PhenologyObservation.objects.filter(genetic_material_id=material_id).count()
+            ),
+            "híbridos ativos": lambda: (
+                GeneticMaterial.objects.filter(material_type=GeneticMaterial.MaterialType.HYBRID).count()
+            ),
+            "materiais Epagri ativos": lambda: (
+                GeneticMaterial.objects.filter(is_epagri_material=True).count()
+            ),
+        }
+
+    def _measure(self, samples):
+        totals = {}
+        for material_id in samples:
+            for label, query in self._queries(material_id).items():
+                started = time.perf_counter()
+                query()
+                totals[label] = totals.get(label, 0.0) + time.perf_counter() - started
+        return {label: total / len(samples) for label, total in totals.items()}
+
+    def _drop_indexes(self):
+        # DROP INDEX direto: o schema editor do SQLite não pode ser usado dentro
+        # de um bloco atômico, e o rollback final recria os índices.
+        with connection.cursor() as cursor:
+            for model, name in MEASURED_INDEXES:
+                if not any(index.name == name for index in model._meta.indexes):
+                    raise CommandError(f"O índice {name} não existe mais em {model.__name__}.")
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+            cursor.execute("ANALYZE")
@@ -0,0 +1,155 @@
+import asyncio
+import io
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from germoplasm.models import GeneticMaterial, GeneticMaterialPhoto
+from germoplasm.streaming import photo_url
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara quantos clientes lentos simultâneos um único worker atende no "
+        "ASGI (views assíncronas) e no WSGI (worker síncrono) ao baixar uma foto "
+        "ou a exportação de materiais. As aplicações são chamadas no próprio "
+        "processo, e cada cliente lê a resposta a uma taxa limitada. Os dados "
+        "temporários são removidos ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=20)
+        parser.add_argument(
+            '--rate', type=int, default=512 * 1024,
+            help="Velocidade de leitura de cada cliente, em bytes/s (padrão: %(default)s)."
+        )
+        parser.add_argument('--size', type=int, default=1024 * 1024, help="Tamanho da foto em bytes.")
+        parser.add_argument(
+            '--wsgi-threads', type=int, default=1,
+            help="Threads do worker WSGI (padrão: %(default)s, como um worker síncrono)."
+        )
+        parser.add_argument('--target', choices=('photo', 'materials'), default='photo')
+
+    def handle(self, *args, **options):
+        from core.asgi import application as asgi_application
+        from core.wsgi import application as wsgi_application
+
+        host = next((host for host in settings.ALLOWED_HOSTS if host and '*' not in host), 'localhost').lstrip('.')
+        user = get_user_model().objects.create_superuser(
+            username=f"benchmark-{time.time_ns()}", email='', password=None
+        )
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        material = photo = None
+        try:
+            if options['target'] == 'photo':
+                material = GeneticMaterial.objects.create(
+                    name=f"benchmark-{time.time_ns()}", material_type=GeneticMaterial.MaterialType.CULTIVAR
+                )
+                photo = GeneticMaterialPhoto(genetic_material=material)
+                photo.image.save('benchmark.jpg', ContentFile(os.urandom(options['size'])))
+                path = photo_url(photo.pk)
+            else:
+                path = '/exports/materials.csv'
+
+            clients, rate = options['clients'], options['rate']
+            self.stdout.write(f"{clients} clientes lendo {path} a {rate / 1024:.0f} KiB/s cada...")
+            results = {
+                'ASGI (1 loop)': self._run_asgi(asgi_application, path, host, cookie, clients, rate),
+                f"WSGI ({options['wsgi_threads']} thread(s))": self._run_wsgi(
+                    wsgi_application, path, host, cookie, clients, rate, options['wsgi_threads']
+                ),
+            }
+        finally:
+            if photo is not None:
+                photo.delete()
+            if material is not None:
+                GeneticMaterial.all_objects.filter(pk=material.pk).delete()
+            Session.objects.filter(session_key=client.session.session_key).delete()
+            user.delete()
+
+        self.stdout.write("")
+        self.stdout.write(f"{'Caminho':<20} {'tempo total':>12} {'clientes/s':>11} {'bytes/cliente':>14} {'status':>8}")
+        for label, (elapsed, sizes, statuses) in results.items():
+            self.stdout.write(
+                f"{label:<20} {elapsed:>11.2f}s {clients / elapsed:>11.1f} "
+                f"{sum(sizes) // max(len(sizes), 1):>14} {','.join(sorted(set(map(str, statuses)))):>8}"
+            )
+        asgi_time, wsgi_time = (elapsed for elapsed, _, _ in results.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"O worker ASGI atendeu os {clients} clientes {wsgi_time / asgi_time:.1f}x mais rápido."
+        ))
+
+    def _run_asgi(self, application, path, host, cookie, clients, rate):
+        async def fetch():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '',
+                'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+                'client': ('127.0.0.1', 0), 'server': (host, 80),
+            }
+            state = {'status': None, 'size': 0, 'sent': False}
+
+            async def receive():
+                if not state['sent']:
+                    state['sent'] = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # O cliente não desconecta; a espera é cancelada ao fim da resposta.
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    state['status'] = message['status']
+                elif message['type'] == 'http.response.body':
+                    body = message.get('body', b'')
+                    state['size'] += len(body)
+                    await asyncio.sleep(len(body) / rate)
+
+            await application(scope, receive, send)
+            return state['status'], state['size']
+
+        async def run():
+            return await asyncio.gather(*(fetch() for _ in range(clients)))
+
+        start = time.perf_counter()
+        responses = asyncio.run(run())
+        return time.perf_counter() - start, [size for _, size in responses], [status for status, _ in responses]
+
+    def _run_wsgi(self, application, path, host, cookie, clients, rate, threads):
+        def fetch(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': host, 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+                'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr, 'wsgi.multithread': threads > 1,
+                'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            status = []
+            body = application(environ, lambda line, headers, exc_info=None: status.append(line))
+            size = 0
+            try:
+                for chunk in body:
+                    size += len(chunk)
+                    time.sleep(len(chunk) / rate)
+            finally:
+                body.close()
+            return int(status[0].split()[0]), size
+
+        start = time.perf_counter()
+        # No WSGI o Django consome o iterador assíncrono e avisa a cada resposta.
+        with warnings.catch_warnings(), ThreadPoolExecutor(threads) as executor:
+            warnings.filterwarnings('ignore', message='StreamingHttpResponse must consume')
+            responses = list(executor.map(fetch, range(clients)))
+        return time.perf_counter() - start, [size for _, size in responses], [status for status, _ in responses]
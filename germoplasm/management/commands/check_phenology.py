@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from germoplasm import phenology_qc
+from germoplasm.models import PhenologyFlag
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica todas as observações fenológicas ativas (ordem dos eventos, "
+        "época, eventos repetidos e datas atípicas para o local) e refaz a "
+        "tabela de alertas. Necessário após cargas feitas fora do ORM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Relata os alertas sem gravar."
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        report = phenology_qc.check_all(dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - start
+
+        for rule, label in PhenologyFlag.Rule.choices:
+            self.stdout.write(f"{label:<16} {report.flags[rule]:>9}")
+        prefix = "[simulação] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report.observations} observação(ões) em {report.groups} grupo(s) verificada(s) em "
+            f"{elapsed:.1f}s: {sum(report.flags.values())} alerta(s)."
+        ))
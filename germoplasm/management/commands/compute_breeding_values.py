@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from germoplasm import breeding_values
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula os valores genéticos (BLUP de genealogia) para todas as doenças "
+        "e grava uma nova versão dos resultados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--heritability',
+            type=float,
+            default=breeding_values.DEFAULT_HERITABILITY,
+            help="Herdabilidade usada para todas as doenças (padrão: %(default)s).",
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=None,
+            help="Mantém apenas as N versões mais recentes após o cálculo.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            run = breeding_values.predict_breeding_values(options['heritability'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{run}: {run.num_records} reações, {run.num_materials} genótipos, "
+            f"{len(run.means)} doença(s) em {run.duration_seconds:.1f}s."
+        ))
+
+        if options['keep'] is not None:
+            removed = breeding_values.prune_runs(max(options['keep'], 1))
+            if removed:
+                self.stdout.write(f"{removed} versão(ões) antiga(s) removida(s).")
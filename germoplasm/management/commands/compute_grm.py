@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from germoplasm import genotypes
+from germoplasm.models import GenotypeMatrix
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula a matriz de parentesco genômico de VanRaden (G) de uma matriz de "
+        "genótipos, em blocos, gravando-a num arquivo mapeado em memória."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('matrix', help="Nome ou id da matriz de genótipos.")
+        parser.add_argument(
+            '--block-size', type=int, default=genotypes.DEFAULT_BLOCK_SIZE,
+            help="Materiais por bloco (padrão: %(default)s)."
+        )
+
+    def handle(self, *args, **options):
+        value = options['matrix']
+        matrix = GenotypeMatrix.objects.filter(name=value).first()
+        if matrix is None and value.isdigit():
+            matrix = GenotypeMatrix.objects.filter(pk=int(value)).first()
+        if matrix is None:
+            raise CommandError(f"Matriz de genótipos '{value}' não encontrada.")
+
+        start = time.perf_counter()
+        try:
+            grm = genotypes.compute_grm(matrix, block_size=options['block_size'])
+        except genotypes.GenotypeError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(
+            f"Matriz G de '{matrix}' calculada: {len(grm)} × {len(grm)} materiais "
+            f"em {time.perf_counter() - start:.1f}s."
+        ))
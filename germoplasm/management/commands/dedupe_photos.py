@@ -0,0 +1,119 @@
+import os
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from germoplasm import audit, detail_cache
+from germoplasm.models import GeneticMaterialPhoto
+from germoplasm.storage import PHOTO_DIR, TEMPORARY_SUFFIX, content_hash, content_path
+
+# Uploads em andamento gravam o arquivo antes do commit da foto: arquivos mais
+# novos que isso ainda podem ganhar uma referência.
+ORPHAN_GRACE_MINUTES = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Migra as fotos existentes para o armazenamento endereçado por conteúdo: "
+        "arquivos idênticos passam a ser um único arquivo compartilhado e as cópias "
+        "sem referência são removidas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Apenas relata o que seria feito, sem gravar nem apagar arquivos."
+        )
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help=f"Apaga arquivos em {PHOTO_DIR}/ que não pertencem a nenhuma foto."
+        )
+        parser.add_argument(
+            '--grace-minutes', type=int, default=ORPHAN_GRACE_MINUTES,
+            help="Arquivos sem referência modificados há menos tempo não são órfãos (padrão: %(default)s)."
+        )
+
+    @audit.buffered()
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = GeneticMaterialPhoto._meta.get_field('image').storage
+
+        # nome -> tamanho em bytes
+        replaced = {}
+        created = {}
+        touched_materials = set()
+        missing = 0
+        photos = GeneticMaterialPhoto.all_objects.exclude(image='').order_by('pk')
+        for photo in photos.iterator(chunk_size=500):
+            name = photo.image.name
+            if not storage.exists(name):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f"Arquivo ausente: {name} (foto {photo.pk})"))
+                continue
+
+            with storage.open(name, 'rb') as handle:
+                digest = content_hash(File(handle))
+            target = content_path(digest, name)
+            if target == name and photo.content_hash == digest:
+                continue
+
+            if target != name:
+                replaced[name] = storage.size(name)
+                if target not in created and not storage.exists(target):
+                    created[target] = replaced[name]
+                    if not dry_run:
+                        with storage.open(name, 'rb') as handle:
+                            storage.save(target, File(handle))
+            if not dry_run:
+                # update() evita reprocessar o arquivo no save() do modelo.
+                audit.update(
+                    GeneticMaterialPhoto.all_objects.filter(pk=photo.pk),
+                    image=target, content_hash=digest,
+                )
+            touched_materials.add(photo.genetic_material_id)
+
+        if not dry_run:
+            for name in replaced:
+                # O storage só apaga arquivos que nenhuma foto referencia mais.
+                storage.delete(name)
+            detail_cache.invalidate(touched_materials)
+
+        orphans = self._orphans(storage, timedelta(minutes=options['grace_minutes']))
+        if orphans and options['delete_orphans'] and not dry_run:
+            for name in orphans:
+                storage.delete(name)
+
+        prefix = "[simulação] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{len(replaced)} arquivo(s) migrado(s), {len(created)} arquivo(s) "
+            f"endereçado(s) por conteúdo criado(s); {missing} foto(s) sem arquivo; "
+            f"{len(orphans)} arquivo(s) órfão(s)"
+            f"{' apagado(s)' if options['delete_orphans'] and not dry_run else ''}."
+        ))
+        freed = sum(replaced.values()) - sum(created.values())
+        self.stdout.write(f"{prefix}Espaço liberado: {freed / 1024 / 1024:.1f} MB.")
+
+    def _orphans(self, storage, grace):
+        """
+        Files under the photo directory not referenced by any photo, except
+        temporary files and files modified within ``grace`` (uploads in progress).
+        """
+        referenced = set(GeneticMaterialPhoto.all_objects.values_list('image', flat=True))
+        cutoff = timezone.now() - grace
+        orphans = []
+        pending = [PHOTO_DIR]
+        while pending:
+            directory = pending.pop()
+            if not storage.exists(directory):
+                continue
+            subdirectories, files = storage.listdir(directory)
+            pending.extend(os.path.join(directory, name) for name in subdirectories)
+            orphans.extend(
+                path for path in (os.path.join(directory, name) for name in files)
+                if path not in referenced
+                and not path.endswith(TEMPORARY_SUFFIX)
+                and storage.get_modified_time(path) < cutoff
+            )
+        return orphans
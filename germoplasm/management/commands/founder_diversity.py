@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from germoplasm import diversity
+from germoplasm.models import GeneticMaterial
+
+
+class Command(BaseCommand):
+    help = (
+        "Relata, por ano de cruzamento e para o programa inteiro, a contribuição "
+        "dos fundadores, o número efetivo de fundadores (fe) e os equivalentes "
+        "genômicos de fundadores (fg)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--material-type', choices=GeneticMaterial.MaterialType.values, default=None,
+            help="Considera apenas materiais deste tipo (padrão: todos)."
+        )
+        parser.add_argument(
+            '--top', type=int, default=diversity.TOP_FOUNDERS,
+            help="Fundadores listados para o programa (padrão: %(default)s)."
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        results = list(diversity.analyze_cohorts(diversity.cross_year_cohorts(options['material_type'])).values())
+        elapsed = time.perf_counter() - start
+        labels = diversity.founder_labels(results, options['top'])
+
+        self.stdout.write(
+            f"{'Coorte':<10} {'materiais':>9} {'fe':>7} {'fg':>7} {'coancestria':>11} {'desconhecido':>12}  principal fundador"
+        )
+        for result in results:
+            top = result.top_founders(1)
+            founder = f"{labels.get(top[0][0], top[0][0])} ({top[0][1]:.1%})" if top else '-'
+            self.stdout.write(
+                f"{result.label:<10} {result.size:>9} {result.effective_founders:>7.1f} "
+                f"{result.founder_genome_equivalents:>7.1f} {result.mean_coancestry:>11.4f} "
+                f"{result.unknown_share:>12.1%}  {founder}"
+            )
+        if results:
+            self.stdout.write("")
+            self.stdout.write("Fundadores do programa:")
+            for pk, share in results[-1].top_founders(options['top']):
+                self.stdout.write(f"  {labels.get(pk, pk)}: {share:.1%}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(results)} coorte(s) analisada(s) em {elapsed:.2f}s."
+        ))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from germoplasm import genotypes
+from germoplasm.models import GenotypeMatrix
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa genótipos SNP de um Final Report do Illumina GenomeStudio ou de "
+        "uma matriz marcadores × amostras (GenomeStudio, Axiom), gravando as "
+        "dosagens compactadas em 2 bits numa nova matriz de genótipos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Arquivo exportado pelo software do chip.")
+        parser.add_argument('--name', required=True, help="Nome da nova matriz de genótipos.")
+        parser.add_argument(
+            '--format', choices=GenotypeMatrix.SourceFormat.values, default=None,
+            help="Formato do arquivo (padrão: detectado pelo conteúdo)."
+        )
+        parser.add_argument(
+            '--delimiter', default=None,
+            help="Separador de colunas da matriz (padrão: detectado automaticamente)."
+        )
+        parser.add_argument(
+            '--grm', action='store_true',
+            help="Calcula a matriz de parentesco genômico (G) após a importação."
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Lê o arquivo e associa as amostras sem gravar."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = genotypes.import_genotypes(
+                options['path'], options['name'], source_format=options['format'],
+                delimiter=options['delimiter'], dry_run=options['dry_run'],
+            )
+        except OSError as error:
+            raise CommandError(f"Não foi possível ler o arquivo: {error}")
+        except genotypes.GenotypeError as error:
+            raise CommandError(str(error))
+
+        for sample in report.unmatched_samples:
+            self.stdout.write(self.style.WARNING(f"Amostra '{sample}': nenhum material com esse código ou nome."))
+        for sample, reason in report.rejected_samples:
+            self.stdout.write(self.style.WARNING(f"Amostra '{sample}' ignorada: {reason}."))
+        if report.invalid_calls:
+            self.stdout.write(self.style.WARNING(
+                f"{report.invalid_calls} chamada(s) não reconhecida(s) gravada(s) como dado perdido."
+            ))
+
+        prefix = "[simulação] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report.materials} material(is) × {report.markers} marcador(es) "
+            f"({report.created_markers} novo(s)), {report.missing_rate:.1%} de dados perdidos."
+        ))
+        if options['grm'] and report.matrix:
+            grm = genotypes.compute_grm(report.matrix)
+            self.stdout.write(self.style.SUCCESS(f"Matriz G calculada ({len(grm)} materiais)."))
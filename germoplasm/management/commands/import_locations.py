@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from germoplasm import location_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa locais de uma planilha CSV, com coordenadas em decimal ou DMS, "
+        "inserindo ou atualizando pelo nome e relatando as linhas rejeitadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Arquivo CSV (cabeçalho na primeira linha).")
+        parser.add_argument(
+            '--delimiter', default=None,
+            help="Separador de colunas (padrão: detectado automaticamente)."
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Valida a planilha sem gravar."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                rows = location_import.read_rows(file, delimiter=options['delimiter'])
+        except OSError as error:
+            raise CommandError(f"Não foi possível ler o arquivo: {error}")
+
+        report = location_import.import_locations(rows, dry_run=options['dry_run'])
+
+        for line, name, reason in report.rejects:
+            self.stdout.write(self.style.WARNING(f"Linha {line} ({name or 'sem nome'}): {reason}"))
+        prefix = "[simulação] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report.created} local(is) criado(s), {report.updated} atualizado(s), "
+            f"{len(report.rejects)} linha(s) rejeitada(s)."
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from germoplasm import location_import, pedigree_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa uma genealogia de uma planilha CSV (name, code, mother, father, "
+        "mutated_from, type, population), criando os materiais dos ancestrais "
+        "para os descendentes e relatando parentais desconhecidos e ciclos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Arquivo CSV (cabeçalho na primeira linha).")
+        parser.add_argument(
+            '--delimiter', default=None,
+            help="Separador de colunas (padrão: detectado automaticamente)."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=pedigree_import.BULK_BATCH_SIZE,
+            help="Registros por INSERT (padrão: %(default)s)."
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Valida a planilha sem gravar."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                rows = location_import.read_rows(file, delimiter=options['delimiter'])
+        except OSError as error:
+            raise CommandError(f"Não foi possível ler o arquivo: {error}")
+
+        report = pedigree_import.import_pedigree(
+            rows, dry_run=options['dry_run'], batch_size=options['batch_size']
+        )
+
+        for line, label, reason in report.rejects:
+            self.stdout.write(self.style.WARNING(f"Linha {line} ({label or 'sem nome'}): {reason}"))
+        prefix = "[simulação] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report.created} material(is) em {report.generations} geração(ões), "
+            f"{report.populations} população(ões) nova(s), {len(report.rejects)} linha(s) rejeitada(s)."
+        ))
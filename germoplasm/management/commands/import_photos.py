@@ -0,0 +1,68 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from germoplasm import photo_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa fotos de um diretório ou arquivo ZIP, associando cada arquivo ao "
+        "material cujo código interno ou de acesso aparece no nome do arquivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Diretório ou arquivo ZIP com as fotos.")
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Processos para validar e recodificar as imagens (padrão: núcleos da CPU)."
+        )
+        parser.add_argument(
+            '--max-dimension', type=int, default=photo_import.MAX_DIMENSION,
+            help="Maior lado, em pixels, das imagens gravadas (padrão: %(default)s)."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=photo_import.BULK_BATCH_SIZE,
+            help="Fotos por bulk_create (padrão: %(default)s)."
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Valida e associa os arquivos sem gravar fotos."
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"Caminho não encontrado: {path}")
+
+        started = time.perf_counter()
+        report = photo_import.import_photos(
+            path,
+            workers=options['workers'],
+            max_dimension=options['max_dimension'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            # O comando roda em um único thread: 'fork' evita reimportar o Django nos processos.
+            start_method='fork',
+        )
+        elapsed = time.perf_counter() - started
+
+        for label, names in (
+            ("Sem material correspondente", report.unmatched),
+            ("Código ambíguo", report.ambiguous),
+            ("Ignorado (não é imagem)", report.ignored),
+        ):
+            for name in names:
+                self.stdout.write(self.style.WARNING(f"{label}: {name}"))
+        for name, error in report.invalid:
+            self.stdout.write(self.style.ERROR(f"Imagem inválida: {name} ({error})"))
+
+        processed = report.created + report.duplicates + len(report.invalid)
+        prefix = "[simulação] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report.created} foto(s) criada(s), {report.duplicates} já existente(s), "
+            f"{len(report.invalid)} inválida(s), {len(report.unmatched)} sem correspondência, "
+            f"{len(report.ambiguous)} ambígua(s), {len(report.ignored)} ignorada(s) "
+            f"em {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.0f} imagens/s)."
+        ))
@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from germoplasm import location_import, weather
+from germoplasm.models import Location
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa a série de temperaturas diárias (tmin/tmax) ou horárias de uma "
+        "estação meteorológica para um local, mesclando com os anos já gravados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('location', help="Nome ou id do local.")
+        parser.add_argument('path', help="Arquivo CSV da estação (cabeçalho na primeira linha).")
+        parser.add_argument(
+            '--delimiter', default=None,
+            help="Separador de colunas (padrão: detectado automaticamente)."
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Valida a planilha sem gravar."
+        )
+
+    def handle(self, *args, **options):
+        value = options['location']
+        location = Location.objects.filter(name=value).first()
+        if location is None and value.isdigit():
+            location = Location.objects.filter(pk=int(value)).first()
+        if location is None:
+            raise CommandError(f"Local '{value}' não encontrado.")
+
+        try:
+            with open(options['path'], 'rb') as file:
+                rows = location_import.read_rows(file, delimiter=options['delimiter'])
+        except OSError as error:
+            raise CommandError(f"Não foi possível ler o arquivo: {error}")
+
+        report = weather.import_weather(
+            location, rows, source_file=os.path.basename(options['path']), dry_run=options['dry_run']
+        )
+
+        for line, reason in report.rejects:
+            self.stdout.write(self.style.WARNING(f"Linha {line}: {reason}"))
+        prefix = "[simulação] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report.values} valor(es) importado(s) para '{location}': {report.created} ano(s) "
+            f"criado(s), {report.updated} atualizado(s), {len(report.rejects)} linha(s) rejeitada(s)."
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from germoplasm import listing
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói as fichas de listagem dos materiais genéticos (códigos dos "
+        "parentais e da população, genótipo S e contagens de fotos, plantios e "
+        "descendentes). Normalmente elas são mantidas pelos sinais; use após "
+        "cargas feitas fora do ORM."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = listing.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Fichas de listagem reconstruídas: {rows} material(is) em {elapsed:.2f}s."
+        ))
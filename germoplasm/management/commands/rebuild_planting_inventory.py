@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from germoplasm import inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói a tabela de resumo do inventário de plantas (por local, material "
+        "e porta-enxerto) a partir dos plantios ativos. Normalmente ela é mantida "
+        "pelos sinais; use após cargas feitas fora do ORM."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = inventory.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Inventário reconstruído: {rows} linha(s) em {elapsed:.2f}s."
+        ))
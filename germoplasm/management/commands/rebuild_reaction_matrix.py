@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from germoplasm import reaction_matrix
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os perfis de reação (matriz material × doença) de todos os "
+        "materiais. Normalmente eles são mantidos pelos sinais; use após cargas "
+        "feitas fora do ORM."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        profiles = reaction_matrix.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Matriz reconstruída: {profiles} material(is) com reações em {elapsed:.2f}s."
+        ))
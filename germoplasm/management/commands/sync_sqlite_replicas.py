@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia o banco SQLite principal para as réplicas de leitura configuradas "
+        "em DATABASE_REPLICAS (cópia consistente com a API de backup do SQLite). "
+        "Cada cópia é gravada em um arquivo temporário e trocada de uma vez, sem "
+        "afetar as leituras em andamento."
+    )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("O banco principal não é SQLite; use a replicação do próprio banco.")
+        if not settings.SQLITE_REPLICAS:
+            raise CommandError("Nenhuma réplica SQLite configurada (variável DATABASE_REPLICAS).")
+
+        source = sqlite3.connect(str(primary['NAME']))
+        try:
+            for alias, path in settings.SQLITE_REPLICAS.items():
+                start = time.perf_counter()
+                temporary = f"{path}.tmp"
+                target = sqlite3.connect(temporary)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                os.replace(temporary, path)
+                self.stdout.write(f"{alias}: {path} ({time.perf_counter() - start:.2f}s)")
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS(f"{len(settings.SQLITE_REPLICAS)} réplica(s) atualizada(s)."))
@@ -0,0 +1,80 @@
+import re
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from germoplasm import weather
+from germoplasm.models import GeneticMaterial, Location, PhenologicalEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula, para cada observação de um evento fenológico, os graus-dia ou o "
+        "frio acumulados desde uma data fixa da safra ou desde outro evento "
+        "observado no mesmo material e local."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('event', help="Nome ou id do evento (fim da acumulação, ex.: plena floração).")
+        parser.add_argument('--metric', choices=tuple(weather.METRICS), default='gdd')
+        start = parser.add_mutually_exclusive_group(required=True)
+        start.add_argument('--from-event', help="Evento de início (ex.: quebra de dormência).")
+        start.add_argument('--from-date', help="Início fixo da safra, em MM-DD (ex.: 05-01).")
+        parser.add_argument('--year', type=int, default=None, help="Apenas observações deste ano.")
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help="Observações listadas (padrão: %(default)s; 0 lista todas)."
+        )
+
+    def _event(self, value):
+        event = PhenologicalEvent.objects.filter(name=value).first()
+        if event is None and value.isdigit():
+            event = PhenologicalEvent.objects.filter(pk=int(value)).first()
+        if event is None:
+            raise CommandError(f"Evento '{value}' não encontrado.")
+        return event
+
+    def handle(self, *args, **options):
+        event = self._event(options['event'])
+        start_event = self._event(options['from_event']) if options['from_event'] else None
+        start = None
+        if options['from_date']:
+            match = re.fullmatch(r'(\d{1,2})-(\d{1,2})', options['from_date'])
+            if not match or not 1 <= int(match[1]) <= 12 or not 1 <= int(match[2]) <= 31:
+                raise CommandError(f"Data de início inválida: '{options['from_date']}' (use MM-DD).")
+            start = (int(match[1]), int(match[2]))
+
+        began = time.perf_counter()
+        result = weather.event_accumulation(
+            event, options['metric'], start_event=start_event, start=start, year=options['year']
+        )
+        elapsed = time.perf_counter() - began
+
+        shown = slice(None) if not options['limit'] else slice(options['limit'])
+        materials = dict(
+            GeneticMaterial.all_objects.filter(pk__in=result.material_ids[shown].tolist()).values_list('pk', 'name')
+        )
+        locations = dict(Location.objects.filter(pk__in=result.location_ids[shown].tolist()).values_list('pk', 'name'))
+        label = weather.METRICS[options['metric']]
+        self.stdout.write(f"{'Material':<30} {'Local':<20} {'início':>10} {'fim':>10} {label:>26}")
+        for pk, material, location, begin, end, value in zip(
+            result.observations[shown], result.material_ids[shown], result.location_ids[shown],
+            result.starts[shown], result.ends[shown], result.values[shown],
+        ):
+            self.stdout.write(
+                f"{materials.get(material, material):<30.30} {locations.get(location, location):<20.20} "
+                f"{str(begin) if not np.isnat(begin) else '-':>10} {str(end):>10} "
+                f"{f'{value:.1f}' if not np.isnan(value) else '-':>26}"
+            )
+
+        computed = ~np.isnan(result.values)
+        summary = (
+            f"média {result.values[computed].mean():.1f}, mínimo {result.values[computed].min():.1f}, "
+            f"máximo {result.values[computed].max():.1f}; " if computed.any() else ""
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result.values)} observação(ões) de '{event}': {summary}"
+            f"{int((~computed).sum())} sem início ou sem dados meteorológicos completos; "
+            f"calculado em {elapsed:.3f}s."
+        ))
@@ -0,0 +1,45 @@
+"""
+Middlewares do app germoplasm.
+"""
+from django.conf import settings
+
+from . import audit, routing
+
+
+class AuditMiddleware:
+    """
+    Agrupa o histórico de alterações de cada requisição: os registros são
+    gravados com um único ``bulk_create`` ao final, com o usuário autenticado.
+    Deve vir depois do ``AuthenticationMiddleware``.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        with audit.buffered(user_id):
+            return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Libera as leituras das réplicas para as requisições de relatórios, exportações
+    e API (``DATABASE_REPLICA_PATHS``), exceto para clientes que gravaram há
+    pouco. Requisições que gravam deixam o cliente no banco principal por
+    ``DATABASE_REPLICA_PIN_SECONDS``.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        read_only = routing.is_replica_path(request.path, request.method)
+        # Definido em toda requisição: a thread pode ter atendido outra antes.
+        routing.use_replicas(read_only and routing.PIN_COOKIE not in request.COOKIES)
+        response = self.get_response(request)
+        if routing.replicas() and not read_only and request.method not in routing.SAFE_METHODS:
+            response.set_cookie(
+                routing.PIN_COOKIE, '1',
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0016_alter_location_altitude_alter_location_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BreedingValueRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data do Cálculo')),
+                ('heritability', models.FloatField(verbose_name='Herdabilidade (h²)')),
+                ('num_materials', models.PositiveIntegerField(default=0, verbose_name='Materiais na Genealogia')),
+                ('num_records', models.PositiveIntegerField(default=0, verbose_name='Reações Utilizadas')),
+                ('means', models.JSONField(default=dict, help_text='Média da escala ordinal (R=1 ... S=4) estimada para cada doença.', verbose_name='Média por Doença')),
+                ('duration_seconds', models.FloatField(default=0, verbose_name='Duração (s)')),
+            ],
+            options={
+                'verbose_name': 'Cálculo de Valores Genéticos',
+                'verbose_name_plural': 'Cálculos de Valores Genéticos',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BreedingValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('disease_name', models.CharField(max_length=255, verbose_name='Nome da Doença')),
+                ('ebv', models.FloatField(verbose_name='Valor Genético (EBV)')),
+                ('predicted_score', models.FloatField(verbose_name='Reação Predita (escala 1-4)')),
+                ('genetic_material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='breeding_values', to='germoplasm.geneticmaterial', verbose_name='Material Genético')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='breeding_values', to='germoplasm.breedingvaluerun', verbose_name='Cálculo')),
+            ],
+            options={
+                'verbose_name': 'Valor Genético Predito',
+                'verbose_name_plural': 'Valores Genéticos Preditos',
+                'constraints': [models.UniqueConstraint(fields=('run', 'genetic_material', 'disease_name'), name='unique_breeding_value_per_run')],
+            },
+        ),
+    ]
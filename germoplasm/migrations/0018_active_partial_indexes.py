@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0017_breedingvaluerun_breedingvalue'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='diseasereaction',
+            name='unique_reaction_per_material_disease',
+        ),
+        migrations.AddIndex(
+            model_name='geneticmaterial',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['material_type'], name='gm_active_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticmaterial',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['is_epagri_material'], name='gm_active_epagri_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticmaterial',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['population'], name='gm_active_population_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticmaterialphoto',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['genetic_material'], name='photo_active_material_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phenologyobservation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['genetic_material', '-observation_date'], name='pheno_active_material_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planting',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['genetic_material'], name='planting_active_material_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='diseasereaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('genetic_material', 'disease_name'), name='unique_reaction_per_material_disease'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0018_active_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='breedingvalue',
+            index=models.Index(fields=['run', 'disease_name', 'ebv'], name='bv_run_disease_ebv_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticmaterial',
+            index=models.Index(fields=['name', '-id'], name='gm_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticmaterial',
+            index=models.Index(fields=['material_type', 'name', '-id'], name='gm_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phenologyobservation',
+            index=models.Index(fields=['-observation_date', '-id'], name='pheno_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phenologyobservation',
+            index=models.Index(fields=['genetic_material', '-observation_date'], name='pheno_material_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planting',
+            index=models.Index(fields=['location', '-planting_date'], name='planting_location_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='population',
+            index=models.Index(fields=['-cross_date', '-id'], name='population_cross_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='population',
+            index=models.Index(fields=['seplan_code', '-cross_date', '-id'], name='population_seplan_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:16
+
+import germoplasm.models
+import germoplasm.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0019_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geneticmaterialphoto',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='Hash do Conteúdo (SHA-256)'),
+        ),
+        migrations.AlterField(
+            model_name='geneticmaterialphoto',
+            name='image',
+            field=models.ImageField(storage=germoplasm.storage.ContentAddressedStorage(), upload_to=germoplasm.models.genetic_material_photo_path, verbose_name='Imagem'),
+        ),
+        migrations.AddIndex(
+            model_name='geneticmaterialphoto',
+            index=models.Index(fields=['image'], name='photo_image_idx'),
+        ),
+    ]
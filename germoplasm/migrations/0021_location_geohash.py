@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+from germoplasm import geohash
+
+
+def fill_geohash(apps, schema_editor):
+    Location = apps.get_model('germoplasm', 'Location')
+    locations = list(
+        Location.objects.exclude(latitude=None).exclude(longitude=None).only('latitude', 'longitude')
+    )
+    for location in locations:
+        location.geohash = geohash.encode(float(location.latitude), float(location.longitude))
+    Location.objects.bulk_update(locations, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0020_photo_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Calculado a partir da latitude e longitude; usado nas buscas por proximidade.', max_length=9, verbose_name='Geohash'),
+        ),
+        migrations.AlterField(
+            model_name='location',
+            name='altitude',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Altitude (metros)'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Trim, Upper
+
+
+def fill_inventory(apps, schema_editor):
+    Planting = apps.get_model('germoplasm', 'Planting')
+    PlantingInventory = apps.get_model('germoplasm', 'PlantingInventory')
+    rows = (
+        Planting.objects
+        .filter(is_active=True, genetic_material__is_active=True)
+        .annotate(rootstock_key=Upper(Trim('rootstock')))
+        .values('location_id', 'genetic_material_id', 'genetic_material__material_type', 'rootstock_key')
+        .annotate(
+            plants=Sum('num_plants'),
+            plantings=Count('id'),
+            first_date=Min('planting_date'),
+            last_date=Max('planting_date'),
+        )
+        .order_by()
+    )
+    PlantingInventory.objects.bulk_create(
+        (
+            PlantingInventory(
+                location_id=row['location_id'],
+                genetic_material_id=row['genetic_material_id'],
+                material_type=row['genetic_material__material_type'],
+                rootstock=row['rootstock_key'],
+                num_plants=row['plants'],
+                num_plantings=row['plantings'],
+                first_planting_date=row['first_date'],
+                last_planting_date=row['last_date'],
+            )
+            for row in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0021_location_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlantingInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('material_type', models.CharField(choices=[('CULTIVAR', 'Cultivar'), ('SELECTION', 'Seleção'), ('HYBRID', 'Híbrido')], max_length=10, verbose_name='Tipo de Material')),
+                ('rootstock', models.CharField(blank=True, help_text='Normalizado em maiúsculas, sem espaços nas pontas.', max_length=100, verbose_name='Porta-enxerto')),
+                ('num_plants', models.PositiveIntegerField(verbose_name='Número de Plantas')),
+                ('num_plantings', models.PositiveIntegerField(verbose_name='Número de Plantios')),
+                ('first_planting_date', models.DateField(blank=True, null=True, verbose_name='Primeiro Plantio')),
+                ('last_planting_date', models.DateField(blank=True, null=True, verbose_name='Último Plantio')),
+                ('genetic_material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='germoplasm.geneticmaterial', verbose_name='Material Genético')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='germoplasm.location', verbose_name='Local')),
+            ],
+            options={
+                'verbose_name': 'Inventário de Plantas',
+                'verbose_name_plural': 'Inventário de Plantas',
+                'ordering': ['location_id', 'genetic_material_id', 'rootstock'],
+                'indexes': [models.Index(fields=['material_type', 'location'], name='inventory_type_location_idx'), models.Index(fields=['rootstock', 'location'], name='inventory_rootstock_idx')],
+                'constraints': [models.UniqueConstraint(fields=('location', 'genetic_material', 'rootstock'), name='unique_inventory_row')],
+            },
+        ),
+        migrations.RunPython(fill_inventory, migrations.RunPython.noop),
+    ]
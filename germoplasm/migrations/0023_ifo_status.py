@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:30
+
+from django.db import migrations, models
+
+
+def fill_ifo_status(apps, schema_editor):
+    GeneticMaterial = apps.get_model('germoplasm', 'GeneticMaterial')
+    # Na ordem de precedência: cada etapa sobrescreve as anteriores.
+    GeneticMaterial.objects.filter(ifo_sent=True).update(ifo_status='QUARANTINE')
+    GeneticMaterial.objects.filter(ifo_quarantine_released=True).update(ifo_status='RELEASED')
+    GeneticMaterial.objects.filter(ifo_discarded=True).update(ifo_status='DISCARDED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0022_planting_inventory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geneticmaterial',
+            name='ifo_status',
+            field=models.CharField(choices=[('NOT_SENT', 'Não enviado'), ('QUARANTINE', 'Em quarentena'), ('RELEASED', 'Liberado'), ('DISCARDED', 'Descartado')], default='NOT_SENT', editable=False, help_text='Derivada dos campos de controle IFO; usada no painel e nos filtros.', max_length=10, verbose_name='Etapa IFO'),
+        ),
+        migrations.RunPython(fill_ifo_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='geneticmaterial',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['ifo_status', 'ifo_sent_date'], name='gm_active_ifo_status_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:32
+
+import django.db.models.deletion
+import django.utils.timezone
+import germoplasm.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0023_ifo_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data/Hora')),
+                ('model', models.CharField(help_text='Rótulo do modelo alterado (ex: germoplasm.geneticmaterial).', max_length=50, verbose_name='Modelo')),
+                ('object_id', models.BigIntegerField(verbose_name='ID do Registro')),
+                ('material_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID do Material Genético')),
+                ('action', models.CharField(choices=[('C', 'Criação'), ('U', 'Alteração'), ('D', 'Exclusão')], max_length=1, verbose_name='Ação')),
+                ('changes', models.JSONField(encoder=germoplasm.models.CompactJSONEncoder, verbose_name='Alterações')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Registro de Histórico',
+                'verbose_name_plural': 'Histórico de Alterações',
+                'ordering': ['-timestamp', '-id'],
+                'indexes': [models.Index(fields=['model', 'object_id', 'timestamp'], name='audit_object_idx'), models.Index(fields=['material_id', 'timestamp'], name='audit_material_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+def normalize_disease_names(apps, schema_editor):
+    """
+    Cria uma Doença por nome distinto (sem diferenciar maiúsculas e espaços)
+    e vincula as reações. Se a normalização juntar duas reações ativas do
+    mesmo material, a mais recente permanece ativa.
+    """
+    Disease = apps.get_model('germoplasm', 'Disease')
+    DiseaseReaction = apps.get_model('germoplasm', 'DiseaseReaction')
+
+    def clean(name):
+        return ' '.join(name.split()) or 'Não informada'
+
+    # Grafia mais usada de cada nome (em empate, a mais recente).
+    spellings = {}
+    reactions = DiseaseReaction.objects.order_by('-updated_at', '-id')
+    for name in reactions.values_list('disease_name', flat=True).iterator():
+        counts = spellings.setdefault(clean(name).lower(), {})
+        counts[clean(name)] = counts.get(clean(name), 0) + 1
+    diseases = {
+        key: Disease.objects.create(name=max(counts, key=counts.get))
+        for key, counts in spellings.items()
+    }
+
+    active = set()
+    for reaction in reactions.iterator():
+        key = clean(reaction.disease_name).lower()
+        reaction.disease = diseases[key]
+        fields = ['disease']
+        if reaction.is_active:
+            if (reaction.genetic_material_id, key) in active:
+                reaction.is_active = False
+                fields.append('is_active')
+            else:
+                active.add((reaction.genetic_material_id, key))
+        reaction.save(update_fields=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0024_audit_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Disease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Nome da Doença')),
+                ('description', models.TextField(blank=True, verbose_name='Descrição')),
+            ],
+            options={
+                'verbose_name': 'Doença',
+                'verbose_name_plural': 'Doenças',
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='unique_disease_name_ci')],
+            },
+        ),
+        migrations.AddField(
+            model_name='diseasereaction',
+            name='disease',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='reactions', to='germoplasm.disease', verbose_name='Doença'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='diseasereaction',
+            name='unique_reaction_per_material_disease',
+        ),
+        migrations.RunPython(normalize_disease_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0025_disease'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='diseasereaction',
+            name='disease_name',
+        ),
+        migrations.AlterField(
+            model_name='diseasereaction',
+            name='disease',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reactions', to='germoplasm.disease', verbose_name='Doença'),
+        ),
+        migrations.AddConstraint(
+            model_name='diseasereaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('genetic_material', 'disease'), name='unique_reaction_per_material_disease'),
+        ),
+    ]
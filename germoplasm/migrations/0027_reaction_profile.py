@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CODES = {'R': 1, 'MR': 2, 'MS': 3, 'S': 4}
+
+
+def fill_profiles(apps, schema_editor):
+    DiseaseReaction = apps.get_model('germoplasm', 'DiseaseReaction')
+    ReactionProfile = apps.get_model('germoplasm', 'ReactionProfile')
+    codes = {}
+    reactions = (
+        DiseaseReaction.objects.filter(is_active=True).exclude(reaction='')
+        .values_list('genetic_material_id', 'disease_id', 'reaction')
+    )
+    for material_id, disease_id, reaction in reactions.iterator():
+        codes.setdefault(material_id, {})[disease_id] = CODES[reaction]
+    profiles = []
+    for material_id, by_disease in codes.items():
+        digits = ['0'] * max(by_disease)
+        for disease_id, code in by_disease.items():
+            digits[disease_id - 1] = str(code)
+        profiles.append(ReactionProfile(genetic_material_id=material_id, codes=''.join(digits)))
+    ReactionProfile.objects.bulk_create(profiles, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0026_disease_reaction_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionProfile',
+            fields=[
+                ('genetic_material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reaction_profile', serialize=False, to='germoplasm.geneticmaterial', verbose_name='Material Genético')),
+                ('codes', models.TextField(blank=True, verbose_name='Códigos das Reações')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Atualização')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Reações',
+                'verbose_name_plural': 'Perfis de Reações',
+            },
+        ),
+        migrations.RunPython(fill_profiles, migrations.RunPython.noop),
+    ]
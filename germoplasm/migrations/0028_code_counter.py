@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0027_reaction_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeCounter',
+            fields=[
+                ('key', models.CharField(max_length=150, primary_key=True, serialize=False, verbose_name='Sequência')),
+                ('value', models.PositiveIntegerField(default=0, verbose_name='Último número')),
+            ],
+            options={
+                'verbose_name': 'Contador de códigos',
+                'verbose_name_plural': 'Contadores de códigos',
+            },
+        ),
+    ]
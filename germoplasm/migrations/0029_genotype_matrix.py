@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0028_code_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenotypeMatrix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Nome')),
+                ('source_format', models.CharField(choices=[('final-report', 'Illumina Final Report'), ('matrix', 'Matriz (marcadores × amostras)')], max_length=20, verbose_name='Formato de Origem')),
+                ('source_file', models.CharField(blank=True, max_length=255, verbose_name='Arquivo de Origem')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data da Importação')),
+                ('num_materials', models.PositiveIntegerField(default=0, verbose_name='Materiais')),
+                ('num_markers', models.PositiveIntegerField(default=0, verbose_name='Marcadores')),
+                ('missing_rate', models.FloatField(default=0, verbose_name='Taxa de Dados Perdidos')),
+                ('grm_computed_at', models.DateTimeField(blank=True, null=True, verbose_name='Matriz G Calculada em')),
+            ],
+            options={
+                'verbose_name': 'Matriz de Genótipos',
+                'verbose_name_plural': 'Matrizes de Genótipos',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
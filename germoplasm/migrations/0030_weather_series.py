@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0029_genotype_matrix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Ano')),
+                ('resolution', models.CharField(choices=[('daily', 'Diária'), ('hourly', 'Horária')], max_length=10, verbose_name='Resolução')),
+                ('temperature_min', models.BinaryField(blank=True, default=b'', verbose_name='Temperaturas Mínimas')),
+                ('temperature_max', models.BinaryField(blank=True, default=b'', verbose_name='Temperaturas Máximas')),
+                ('temperature', models.BinaryField(blank=True, default=b'', verbose_name='Temperaturas Horárias')),
+                ('observed', models.PositiveIntegerField(default=0, help_text='Dias (ou horas) com dados.', verbose_name='Registros')),
+                ('source_file', models.CharField(blank=True, max_length=255, verbose_name='Arquivo de Origem')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Atualização')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weather_series', to='germoplasm.location', verbose_name='Local')),
+            ],
+            options={
+                'verbose_name': 'Série Meteorológica',
+                'verbose_name_plural': 'Séries Meteorológicas',
+                'ordering': ['location', 'year', 'resolution'],
+                'constraints': [models.UniqueConstraint(fields=('location', 'year', 'resolution'), name='unique_weather_series')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0030_weather_series'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phenologicalevent',
+            name='allow_repeats',
+            field=models.BooleanField(default=False, help_text='Se desmarcado, mais de uma observação do evento no mesmo material, local e safra é sinalizada.', verbose_name='Pode Repetir na Safra'),
+        ),
+        migrations.AddField(
+            model_name='phenologicalevent',
+            name='first_month',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Janeiro'), (2, 'Fevereiro'), (3, 'Março'), (4, 'Abril'), (5, 'Maio'), (6, 'Junho'), (7, 'Julho'), (8, 'Agosto'), (9, 'Setembro'), (10, 'Outubro'), (11, 'Novembro'), (12, 'Dezembro')], help_text='Meses em que o evento pode ocorrer; a janela pode atravessar o ano (ex.: julho a fevereiro).', null=True, verbose_name='Primeiro Mês da Época'),
+        ),
+        migrations.AddField(
+            model_name='phenologicalevent',
+            name='last_month',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Janeiro'), (2, 'Fevereiro'), (3, 'Março'), (4, 'Abril'), (5, 'Maio'), (6, 'Junho'), (7, 'Julho'), (8, 'Agosto'), (9, 'Setembro'), (10, 'Outubro'), (11, 'Novembro'), (12, 'Dezembro')], null=True, verbose_name='Último Mês da Época'),
+        ),
+        migrations.AddField(
+            model_name='phenologicalevent',
+            name='sequence',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Eventos de ordem menor devem ser observados antes (ou no mesmo dia) dos de ordem maior, no mesmo material, local e safra. Vazio: sem verificação de ordem.', null=True, verbose_name='Ordem na Safra'),
+        ),
+        migrations.CreateModel(
+            name='PhenologyFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule', models.CharField(choices=[('order', 'Fora de ordem'), ('season', 'Fora da época'), ('duplicate', 'Evento repetido'), ('outlier', 'Data atípica')], max_length=10, verbose_name='Regra')),
+                ('message', models.CharField(max_length=255, verbose_name='Mensagem')),
+                ('score', models.FloatField(blank=True, null=True, verbose_name='Escore z')),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Verificado em')),
+                ('observation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='qc_flags', to='germoplasm.phenologyobservation', verbose_name='Observação')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Fenologia',
+                'verbose_name_plural': 'Alertas de Fenologia',
+                'indexes': [models.Index(fields=['rule', 'observation'], name='pheno_flag_rule_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:48
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+LABEL_FIELDS = ('name', 'material_type', 'internal_code', 'accession_code')
+
+
+def _code(name, material_type, internal_code, accession_code):
+    if material_type == 'HYBRID':
+        return accession_code or name
+    return internal_code or name
+
+
+def fill_listings(apps, schema_editor):
+    GeneticMaterial = apps.get_model('germoplasm', 'GeneticMaterial')
+    MaterialListing = apps.get_model('germoplasm', 'MaterialListing')
+    counts = {}
+    for model in ('GeneticMaterialPhoto', 'Planting'):
+        counts[model] = dict(
+            apps.get_model('germoplasm', model).objects.filter(is_active=True)
+            .values_list('genetic_material_id').annotate(total=Count('id')).order_by()
+        )
+    offspring = Counter()
+    parents = GeneticMaterial.objects.filter(is_active=True).values_list('mother_id', 'father_id', 'mutated_from_id')
+    for row in parents.iterator():
+        offspring.update({pk for pk in row if pk})
+    genotypes = {}
+    alleles = (
+        GeneticMaterial.s_alleles.through.objects.filter(s_allele__is_active=True)
+        .values_list('geneticmaterial_id', 's_allele__name').order_by('s_allele__name')
+    )
+    for material_id, allele in alleles.iterator():
+        genotypes[material_id] = genotypes.get(material_id, '') + allele
+
+    columns = (
+        'pk', *LABEL_FIELDS,
+        *(f'mother__{name}' for name in LABEL_FIELDS),
+        *(f'father__{name}' for name in LABEL_FIELDS),
+        'population__code', 'population__seplan_code',
+    )
+    listings = []
+    for pk, *values in GeneticMaterial.objects.values_list(*columns).iterator():
+        own, mother, father, (population, seplan) = values[:4], values[4:8], values[8:12], values[12:]
+        mother_code = _code(*mother) if mother[0] else ''
+        father_code = _code(*father) if father[0] else ''
+        genotype = genotypes.get(pk, '')
+        listings.append(MaterialListing(
+            genetic_material_id=pk,
+            display_code=_code(*own),
+            mother_code=mother_code,
+            father_code=father_code,
+            population_code=population or '',
+            s_genotype=genotype,
+            num_photos=counts['GeneticMaterialPhoto'].get(pk, 0),
+            num_plantings=counts['Planting'].get(pk, 0),
+            num_offspring=offspring[pk],
+            search_text=' '.join(dict.fromkeys(filter(None, (
+                own[0], own[2], own[3], mother_code, father_code, population, seplan, genotype,
+            )))),
+        ))
+    MaterialListing.objects.bulk_create(listings, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0031_phenology_qc'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialListing',
+            fields=[
+                ('genetic_material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='germoplasm.geneticmaterial', verbose_name='Material Genético')),
+                ('display_code', models.CharField(max_length=255, verbose_name='Código')),
+                ('mother_code', models.CharField(blank=True, max_length=255, verbose_name='Mãe')),
+                ('father_code', models.CharField(blank=True, max_length=255, verbose_name='Pai')),
+                ('population_code', models.CharField(blank=True, max_length=100, verbose_name='População')),
+                ('s_genotype', models.CharField(blank=True, help_text='Alelos S ativos do material, em ordem alfabética (ex.: S1S3).', max_length=100, verbose_name='Genótipo S')),
+                ('num_photos', models.PositiveIntegerField(default=0, verbose_name='Fotos')),
+                ('num_plantings', models.PositiveIntegerField(default=0, verbose_name='Plantios')),
+                ('num_offspring', models.PositiveIntegerField(default=0, help_text='Filhos e mutações ativos.', verbose_name='Descendentes')),
+                ('search_text', models.TextField(blank=True, help_text='Nome, códigos, parentais, população e genótipo S, para a busca do admin.', verbose_name='Texto de Busca')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Atualização')),
+            ],
+            options={
+                'verbose_name': 'Ficha de Listagem',
+                'verbose_name_plural': 'Fichas de Listagem',
+                'indexes': [models.Index(fields=['display_code'], name='listing_code_idx'), models.Index(fields=['population_code'], name='listing_population_idx')],
+            },
+        ),
+        migrations.RunPython(fill_listings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0032_material_listing'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='geneticmaterial',
+            name='gm_active_type_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='phenologyobservation',
+            name='pheno_active_material_idx',
+        ),
+    ]
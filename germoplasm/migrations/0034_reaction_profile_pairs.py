@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:12
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def _convert(apps, convert):
+    ReactionProfile = apps.get_model('germoplasm', 'ReactionProfile')
+    profiles = []
+    for profile in ReactionProfile.objects.exclude(codes='').iterator(chunk_size=BATCH_SIZE):
+        profile.codes = convert(profile.codes)
+        profiles.append(profile)
+        if len(profiles) == BATCH_SIZE:
+            ReactionProfile.objects.bulk_update(profiles, ['codes'])
+            profiles = []
+    ReactionProfile.objects.bulk_update(profiles, ['codes'])
+
+
+def digits_to_pairs(apps, schema_editor):
+    # Um dígito por doença na posição pk - 1 -> pares 'pk:código' das reações registradas.
+    _convert(apps, lambda digits: ','.join(
+        f'{position + 1}:{digit}' for position, digit in enumerate(digits) if digit != '0'
+    ))
+
+
+def pairs_to_digits(apps, schema_editor):
+    def convert(pairs):
+        codes = {int(pk): code for pk, code in (pair.split(':') for pair in pairs.split(','))}
+        return ''.join(codes.get(pk, '0') for pk in range(1, max(codes) + 1))
+
+    _convert(apps, convert)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('germoplasm', '0033_drop_overlapping_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(digits_to_pairs, pairs_to_digits),
+    ]
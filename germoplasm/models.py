@@ -1,22 +1,40 @@
 import os
-import uuid
-from django.db import models
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
-from django.core.exceptions import ValidationError
-from django.utils.text import slugify
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+
+from . import geohash
+from .storage import PHOTO_DIR, ContentAddressedStorage, content_hash, hash_from_path
+
+# Campos de GeneticMaterial dos quais 'ifo_status' é derivado.
+IFO_STATUS_FIELDS = ('ifo_sent', 'ifo_quarantine_released', 'ifo_discarded')
+# Tentativas de gravar um código alocado que já estava em uso (ex.: digitado
+# antes de existir o contador da sequência).
+CODE_ALLOCATION_ATTEMPTS = 5
+# Marca dos cruzamentos repetidos no mesmo ano: C1XS5A25, C1XS5A25R2, ...
+REPEATED_CROSS_MARKER = 'R'
 
 def genetic_material_photo_path(instance, filename):
     """
-    Gera um caminho de arquivo limpo e único usando o nome do material.
-    Exemplo: genetic_material_photos/gala-fuji/gala-fuji_a8b1.jpg
+    Caminho provisório da foto. O ContentAddressedStorage troca o nome pelo
+    hash do conteúdo, para que fotos idênticas compartilhem o mesmo arquivo.
+    Exemplo: genetic_material_photos/sha256/3f/3f9a...c2.jpg
     """
-    genetic_material = instance.genetic_material
+    return os.path.join(PHOTO_DIR, filename)
 
-    ext = os.path.splitext(filename)[1]
-    safe_name = slugify(genetic_material.name)
-    unique_suffix = uuid.uuid4().hex[:8]
-    new_filename = f"{safe_name}_{unique_suffix}{ext}"
-    return os.path.join('genetic_material_photos', str(genetic_material.id), new_filename)
+class ActiveManager(models.Manager):
+    """
+    Default manager of material-related models: hides logically deleted rows.
+    Use ``all_objects`` when inactive rows must be considered.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
 
 class BaseMaterial(models.Model):
     """
@@ -38,9 +56,38 @@ class BaseMaterial(models.Model):
         verbose_name="Última Atualização"
     )
 
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
     class Meta:
         abstract = True
 
+    def validate_unique(self, exclude=None):
+        """
+        The default manager only sees active rows, so Django's unique checks
+        skip inactive ones; they are checked here against ``_base_manager``,
+        so a taken value becomes a form error instead of an IntegrityError.
+        """
+        super().validate_unique(exclude=exclude)
+        unique_checks, _ = self._get_unique_checks(exclude=exclude)
+        errors = {}
+        for model_class, unique_check in unique_checks:
+            lookup = {}
+            for name in unique_check:
+                value = getattr(self, self._meta.get_field(name).attname)
+                if value is None or (value == '' and connection.features.interprets_empty_strings_as_nulls):
+                    break
+                lookup[name] = value
+            else:
+                queryset = model_class._base_manager.filter(**lookup, is_active=False)
+                if not self._state.adding and self.pk is not None:
+                    queryset = queryset.exclude(pk=self.pk)
+                if queryset.exists():
+                    key = unique_check[0] if len(unique_check) == 1 else NON_FIELD_ERRORS
+                    errors.setdefault(key, []).append(self.unique_error_message(model_class, unique_check))
+        if errors:
+            raise ValidationError(errors)
+
 class Marker(BaseMaterial):
     """
     Represents a molecular marker used for identification.
@@ -113,6 +160,12 @@ class GeneticMaterial(BaseMaterial):
         CULTIVAR = 'CULTIVAR', 'Cultivar'
         SELECTION = 'SELECTION', 'Seleção'
         HYBRID = 'HYBRID', 'Híbrido'
+
+    class IfoStatus(models.TextChoices):
+        NOT_SENT = 'NOT_SENT', 'Não enviado'
+        QUARANTINE = 'QUARANTINE', 'Em quarentena'
+        RELEASED = 'RELEASED', 'Liberado'
+        DISCARDED = 'DISCARDED', 'Descartado'
     
     name = models.CharField(
         max_length=255,
@@ -230,6 +283,15 @@ class GeneticMaterial(BaseMaterial):
         verbose_name="Data de Descarte no IFO"
     )
 
+    ifo_status = models.CharField(
+        max_length=10,
+        choices=IfoStatus.choices,
+        default=IfoStatus.NOT_SENT,
+        editable=False,
+        verbose_name="Etapa IFO",
+        help_text="Derivada dos campos de controle IFO; usada no painel e nos filtros."
+    )
+
     def __str__(self) -> str:
         return f"{self.name} ({self.get_display_code()})"
     
@@ -238,6 +300,16 @@ class GeneticMaterial(BaseMaterial):
             return self.accession_code or self.name
         return self.internal_code or self.name
     
+    def compute_ifo_status(self) -> str:
+        """Stage of the IFO pipeline implied by the IFO flags."""
+        if self.ifo_discarded:
+            return self.IfoStatus.DISCARDED
+        if self.ifo_quarantine_released:
+            return self.IfoStatus.RELEASED
+        if self.ifo_sent:
+            return self.IfoStatus.QUARANTINE
+        return self.IfoStatus.NOT_SENT
+
     def _clean_register(self) -> None:
             # Conta quantos tipos de origem foram preenchidos
             origins = [
@@ -291,25 +363,84 @@ class GeneticMaterial(BaseMaterial):
             # Se não há população, garantimos que o material não seja classificado como do programa.
             self.is_epagri_material = False
 
+        self.ifo_status = self.compute_ifo_status()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(IFO_STATUS_FIELDS) & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'ifo_status'}
+
         # Lógica de geração de código (mantendo a sua versão simplificada)
         is_new = self._state.adding
-        super().save(*args, **kwargs) # Salva primeiro para obter um ID.
-
-        if is_new and not self.internal_code:
-            code_to_set = None
-            if self.material_type == self.MaterialType.CULTIVAR:
-                code_to_set = f'C{self.id}'
-            elif self.material_type == self.MaterialType.SELECTION:
-                code_to_set = f'S{self.id}'
-            
-            if code_to_set:
-                GeneticMaterial.objects.filter(pk=self.pk).update(internal_code=code_to_set)
-                self.internal_code = code_to_set
+        # O material e o seu código são gravados na mesma transação: o que é
+        # adiado para o commit pelos sinais já encontra o código.
+        with transaction.atomic():
+            super().save(*args, **kwargs) # Salva primeiro para obter um ID.
+
+            if is_new and not self.internal_code:
+                code_to_set = None
+                if self.material_type == self.MaterialType.CULTIVAR:
+                    code_to_set = f'C{self.id}'
+                elif self.material_type == self.MaterialType.SELECTION:
+                    code_to_set = f'S{self.id}'
+
+                if code_to_set:
+                    GeneticMaterial.all_objects.filter(pk=self.pk).update(internal_code=code_to_set)
+                    self.internal_code = code_to_set
     
     class Meta:
         verbose_name = "Material Genético"
         verbose_name_plural = "Materiais Genéticos (BAG)"
         ordering = ['name']
+        # O admin acrescenta '-pk' à ordenação para torná-la determinística; os
+        # índices de listagem incluem '-id' para evitar a ordenação em memória.
+        indexes = [
+            models.Index(fields=['name', '-id'], name='gm_name_idx'),
+            # Atende também às consultas do manager padrão (is_active=True): um
+            # índice parcial só de 'material_type' seria redundante.
+            models.Index(fields=['material_type', 'name', '-id'], name='gm_type_name_idx'),
+            models.Index(
+                fields=['is_epagri_material'],
+                condition=models.Q(is_active=True),
+                name='gm_active_epagri_idx'
+            ),
+            models.Index(
+                fields=['population'],
+                condition=models.Q(is_active=True),
+                name='gm_active_population_idx'
+            ),
+            models.Index(
+                fields=['ifo_status', 'ifo_sent_date'],
+                condition=models.Q(is_active=True),
+                name='gm_active_ifo_status_idx'
+            ),
+        ]
+
+class Disease(models.Model):
+    """Doença avaliada nas reações dos materiais (ex: Sarna, Mancha da Gala)."""
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name="Nome da Doença"
+    )
+    description = models.TextField(
+        blank=True,
+        verbose_name="Descrição"
+    )
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.name = ' '.join(self.name.split())
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Doença"
+        verbose_name_plural = "Doenças"
+        ordering = ['name']
+        constraints = [
+            # 'Sarna' e 'sarna' são a mesma doença.
+            models.UniqueConstraint(Lower('name'), name='unique_disease_name_ci')
+        ]
 
 class DiseaseReaction(BaseMaterial):
     """
@@ -327,9 +458,11 @@ class DiseaseReaction(BaseMaterial):
         related_name='disease_reactions',
         verbose_name="Material Genético"
     )
-    disease_name = models.CharField(
-        max_length=255,
-        verbose_name="Nome da Doença"
+    disease = models.ForeignKey(
+        Disease,
+        on_delete=models.PROTECT,
+        related_name='reactions',
+        verbose_name="Doença"
     )
     reaction = models.CharField(
         max_length=2,
@@ -339,14 +472,16 @@ class DiseaseReaction(BaseMaterial):
     )
 
     def __str__(self) -> str:
-        return f"{self.genetic_material.name} - {self.disease_name}: {self.get_reaction_display()}"
+        return f"{self.genetic_material.name} - {self.disease.name}: {self.get_reaction_display()}"
     
     class Meta:
         verbose_name = "Reação a Doença"
         verbose_name_plural = "Reações a Doenças"
         constraints = [
+            # Reações excluídas logicamente não impedem um novo registro.
             models.UniqueConstraint(
-                fields=['genetic_material', 'disease_name'],
+                fields=['genetic_material', 'disease'],
+                condition=models.Q(is_active=True),
                 name='unique_reaction_per_material_disease'
             )
         ]
@@ -363,8 +498,16 @@ class GeneticMaterialPhoto(BaseMaterial):
     )
     image = models.ImageField(
         upload_to=genetic_material_photo_path,
+        storage=ContentAddressedStorage(),
         verbose_name="Imagem"
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Hash do Conteúdo (SHA-256)",
+    )
     caption = models.CharField(
         max_length=255,
         blank=True,
@@ -375,9 +518,32 @@ class GeneticMaterialPhoto(BaseMaterial):
     def __str__(self):
         return f"Foto de {self.genetic_material.name}"
 
+    def save(self, *args, **kwargs):
+        """
+        Registra o hash do arquivo. Os upload handlers do projeto já entregam o
+        hash calculado durante o recebimento; outros arquivos são lidos em blocos.
+        """
+        if self.image and not self.image._committed:
+            upload = self.image.file
+            if not getattr(upload, 'content_hash', None):
+                upload.content_hash = content_hash(upload)
+            self.content_hash = upload.content_hash
+        elif self.image and not self.content_hash:
+            self.content_hash = hash_from_path(self.image.name)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Foto de Material Genético"
         verbose_name_plural = "Fotos de Materiais Genéticos"
+        indexes = [
+            models.Index(
+                fields=['genetic_material'],
+                condition=models.Q(is_active=True),
+                name='photo_active_material_idx'
+            ),
+            # Contagem de referências de um arquivo antes de apagá-lo.
+            models.Index(fields=['image'], name='photo_image_idx'),
+        ]
 
 class Location(models.Model):
     """Represents a physical location for phenological observations."""
@@ -402,16 +568,42 @@ class Location(models.Model):
     altitude = models.IntegerField(
         null=True,
         blank=True,
+        db_index=True,
         verbose_name="Altitude (metros)"
     )
+    geohash = models.CharField(
+        max_length=geohash.PRECISION,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Geohash",
+        help_text="Calculado a partir da latitude e longitude; usado nas buscas por proximidade."
+    )
 
     def __str__(self):
         return self.name
 
+    def compute_geohash(self) -> str:
+        if self.latitude is None or self.longitude is None:
+            return ''
+        return geohash.encode(float(self.latitude), float(self.longitude))
+
+    def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Local"
         verbose_name_plural = "Locais"
 
+MONTH_CHOICES = [
+    (1, "Janeiro"), (2, "Fevereiro"), (3, "Março"), (4, "Abril"), (5, "Maio"), (6, "Junho"),
+    (7, "Julho"), (8, "Agosto"), (9, "Setembro"), (10, "Outubro"), (11, "Novembro"), (12, "Dezembro"),
+]
+
 class PhenologicalEvent(models.Model):
     """Represents a type of phenological event (e.g., Budding, Flowering)."""
     name = models.CharField(
@@ -423,10 +615,40 @@ class PhenologicalEvent(models.Model):
         blank=True,
         verbose_name="Descrição"
     )
+    # Regras do controle de qualidade (ver ``phenology_qc.py``).
+    sequence = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Ordem na Safra",
+        help_text="Eventos de ordem menor devem ser observados antes (ou no mesmo dia) dos de ordem "
+                  "maior, no mesmo material, local e safra. Vazio: sem verificação de ordem."
+    )
+    first_month = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        choices=MONTH_CHOICES,
+        verbose_name="Primeiro Mês da Época",
+        help_text="Meses em que o evento pode ocorrer; a janela pode atravessar o ano (ex.: julho a fevereiro)."
+    )
+    last_month = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        choices=MONTH_CHOICES,
+        verbose_name="Último Mês da Época"
+    )
+    allow_repeats = models.BooleanField(
+        default=False,
+        verbose_name="Pode Repetir na Safra",
+        help_text="Se desmarcado, mais de uma observação do evento no mesmo material, local e safra é sinalizada."
+    )
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if (self.first_month is None) != (self.last_month is None):
+            raise ValidationError("Informe o primeiro e o último mês da época, ou nenhum dos dois.")
+
     class Meta:
         verbose_name = "Evento Fenológico"
         verbose_name_plural = "Eventos Fenológicos"
@@ -461,6 +683,11 @@ class PhenologyObservation(BaseMaterial):
         verbose_name = "Observação Fenológica"
         verbose_name_plural = "Observações Fenológicas"
         ordering = ['-observation_date']
+        indexes = [
+            models.Index(fields=['-observation_date', '-id'], name='pheno_date_idx'),
+            # Serve às observações ativas e às inativas (admin): sem cópia parcial.
+            models.Index(fields=['genetic_material', '-observation_date'], name='pheno_material_date_idx'),
+        ]
 
 class Planting(BaseMaterial):
     """
@@ -499,6 +726,116 @@ class Planting(BaseMaterial):
         verbose_name = "Local de Plantio"
         verbose_name_plural = "Locais de Plantio (Onde tem)"
         ordering = ['location', '-planting_date']
+        indexes = [
+            models.Index(fields=['location', '-planting_date'], name='planting_location_date_idx'),
+            models.Index(
+                fields=['genetic_material'],
+                condition=models.Q(is_active=True),
+                name='planting_active_material_idx'
+            ),
+        ]
+
+@contextmanager
+def allocation_atomic(using=None):
+    """
+    ``transaction.atomic`` for the transactions that allocate codes. SQLite
+    ignores ``select_for_update``: there the outermost block begins with
+    ``BEGIN IMMEDIATE``, taking the write lock before the first read (waiting
+    up to the connection's ``timeout``), so concurrent allocations wait for
+    each other instead of failing with "database is locked". Other
+    transactions keep SQLite's default deferred mode.
+    """
+    connection = transaction.get_connection(using)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    connection.ensure_connection()
+    mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+class CodeCounter(models.Model):
+    """
+    Last number allocated in a code sequence (the crosses of a pair of parents
+    in a year, the hybrids of a population, the mutants of a material).
+    """
+    key = models.CharField(max_length=150, primary_key=True, verbose_name="Sequência")
+    value = models.PositiveIntegerField(default=0, verbose_name="Último número")
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.value}"
+
+    @classmethod
+    def next_value(cls, key: str, floor=None, count: int = 1) -> int:
+        """
+        Allocates the next number of the sequence ``key`` (or the next
+        ``count`` numbers, returning the last one). The counter row is
+        locked (``select_for_update``) until the caller's transaction ends, so
+        concurrent allocations of the same sequence are serialized and never
+        return the same number (on SQLite, through ``allocation_atomic``).
+        ``floor`` is called once, when the counter is created, to return the
+        highest number already in use.
+        """
+        with allocation_atomic():
+            counter = cls.objects.select_for_update().filter(key=key).first()
+            if counter is None:
+                try:
+                    with transaction.atomic():
+                        counter = cls.objects.create(key=key, value=floor() if floor else 0)
+                except IntegrityError:
+                    # Criado por outra transação entre a leitura e o INSERT.
+                    counter = cls.objects.select_for_update().get(key=key)
+            counter.value += count
+            counter.save(update_fields=['value'])
+        return counter.value
+
+    class Meta:
+        verbose_name = "Contador de códigos"
+        verbose_name_plural = "Contadores de códigos"
+
+
+def highest_code_number(codes, prefix: str, marker: str, first: int = 0) -> int:
+    """
+    Highest ``n`` among the ``codes`` of the form ``{prefix}{marker}{n}``;
+    ``prefix`` alone counts as ``first``. Returns 0 when there is none.
+    """
+    pattern = re.compile(re.escape(prefix) + r'(?:' + re.escape(marker) + r'(\d+))?', re.IGNORECASE)
+    highest = 0
+    for code in codes:
+        match = pattern.fullmatch(code or '')
+        if match:
+            highest = max(highest, int(match.group(1)) if match.group(1) else first)
+    return highest
+
+
+def save_with_code(instance, field_name: str, allocate, save) -> None:
+    """
+    Sets ``field_name`` to ``allocate()`` and calls ``save()``, in a savepoint.
+    When the code is taken (IntegrityError) a new one is allocated, up to
+    ``CODE_ALLOCATION_ATTEMPTS`` times.
+    """
+    previous = getattr(instance, field_name)
+    for attempt in range(CODE_ALLOCATION_ATTEMPTS):
+        setattr(instance, field_name, allocate())
+        try:
+            with transaction.atomic():
+                save()
+            return
+        except IntegrityError:
+            taken = getattr(instance, field_name)
+            if (
+                attempt == CODE_ALLOCATION_ATTEMPTS - 1
+                or not type(instance)._base_manager.filter(**{field_name: taken}).exists()
+            ):
+                setattr(instance, field_name, previous)
+                raise
 
 class Population(BaseMaterial):
     """
@@ -574,16 +911,576 @@ class Population(BaseMaterial):
             )
 
     def save(self, *args, **kwargs) -> None:
-        if not self.code:
-            self.full_clean()
-            year_suffix = self.cross_date.strftime('%y')
-            p1_code = self.parent1.get_display_code()
-            p2_code = self.parent2.get_display_code()
-            self.code = f"{p1_code}X{p2_code}A{year_suffix}"
-        
-        super().save(*args, **kwargs)
+        if self.code:
+            super().save(*args, **kwargs)
+            return
+
+        self.full_clean()
+        year_suffix = self.cross_date.strftime('%y')
+        p1_code = self.parent1.get_display_code()
+        p2_code = self.parent2.get_display_code()
+        base = f"{p1_code}X{p2_code}A{year_suffix}"
+
+        def allocate():
+            # Cruzamentos repetidos no mesmo ano recebem R2, R3, ...
+            number = CodeCounter.next_value(
+                f'population:{base.upper()}',
+                floor=lambda: highest_code_number(
+                    Population.all_objects.filter(code__istartswith=base).values_list('code', flat=True),
+                    base, REPEATED_CROSS_MARKER, first=1,
+                ),
+            )
+            return base if number == 1 else f"{base}{REPEATED_CROSS_MARKER}{number}"
+
+        with allocation_atomic():
+            save_with_code(self, 'code', allocate, lambda: super(Population, self).save(*args, **kwargs))
     
     class Meta:
         verbose_name = "População"
         verbose_name_plural = "Populações"
         ordering = ['-cross_date']
+        indexes = [
+            models.Index(fields=['-cross_date', '-id'], name='population_cross_date_idx'),
+            models.Index(fields=['seplan_code', '-cross_date', '-id'], name='population_seplan_idx'),
+        ]
+
+class BreedingValueRun(models.Model):
+    """
+    A versioned execution of the pedigree BLUP over disease reactions.
+    The most recent run holds the current breeding values.
+    """
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        editable=False,
+        verbose_name="Data do Cálculo"
+    )
+    heritability = models.FloatField(
+        verbose_name="Herdabilidade (h²)"
+    )
+    num_materials = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Materiais na Genealogia"
+    )
+    num_records = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Reações Utilizadas"
+    )
+    means = models.JSONField(
+        default=dict,
+        verbose_name="Média por Doença",
+        help_text="Média da escala ordinal (R=1 ... S=4) estimada para cada doença."
+    )
+    duration_seconds = models.FloatField(
+        default=0,
+        verbose_name="Duração (s)"
+    )
+
+    def __str__(self) -> str:
+        return f"BLUP v{self.pk} ({self.created_at:%d/%m/%Y %H:%M})"
+
+    class Meta:
+        verbose_name = "Cálculo de Valores Genéticos"
+        verbose_name_plural = "Cálculos de Valores Genéticos"
+        ordering = ['-created_at']
+
+class BreedingValue(models.Model):
+    """
+    Estimated breeding value (EBV) of a genetic material for one disease,
+    on the ordinal reaction scale (R=1, MR=2, MS=3, S=4): negative values
+    indicate a tendency towards resistance.
+    """
+    run = models.ForeignKey(
+        BreedingValueRun,
+        on_delete=models.CASCADE,
+        related_name='breeding_values',
+        verbose_name="Cálculo"
+    )
+    genetic_material = models.ForeignKey(
+        GeneticMaterial,
+        on_delete=models.CASCADE,
+        related_name='breeding_values',
+        verbose_name="Material Genético"
+    )
+    disease_name = models.CharField(
+        max_length=255,
+        verbose_name="Nome da Doença"
+    )
+    ebv = models.FloatField(
+        verbose_name="Valor Genético (EBV)"
+    )
+    predicted_score = models.FloatField(
+        verbose_name="Reação Predita (escala 1-4)"
+    )
+
+    def get_predicted_reaction(self) -> str:
+        """Returns the reaction level closest to the predicted score."""
+        levels = list(DiseaseReaction.ReactionLevel)
+        position = min(max(round(self.predicted_score), 1), len(levels)) - 1
+        return levels[position].label
+
+    def __str__(self) -> str:
+        return f"{self.genetic_material.name} - {self.disease_name}: {self.ebv:+.3f}"
+
+    class Meta:
+        verbose_name = "Valor Genético Predito"
+        verbose_name_plural = "Valores Genéticos Preditos"
+        indexes = [
+            models.Index(fields=['run', 'disease_name', 'ebv'], name='bv_run_disease_ebv_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['run', 'genetic_material', 'disease_name'],
+                name='unique_breeding_value_per_run'
+            )
+        ]
+
+class PlantingInventory(models.Model):
+    """
+    Resumo do inventário de plantas por local, material e porta-enxerto.
+
+    Tabela derivada de Planting (apenas plantios e materiais ativos), mantida
+    pelos sinais a cada gravação e reconstruída pelo comando
+    ``rebuild_planting_inventory``. Não deve ser editada manualmente.
+    """
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='inventory',
+        verbose_name="Local"
+    )
+    genetic_material = models.ForeignKey(
+        GeneticMaterial,
+        on_delete=models.CASCADE,
+        related_name='inventory',
+        verbose_name="Material Genético"
+    )
+    material_type = models.CharField(
+        max_length=10,
+        choices=GeneticMaterial.MaterialType.choices,
+        verbose_name="Tipo de Material"
+    )
+    rootstock = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Porta-enxerto",
+        help_text="Normalizado em maiúsculas, sem espaços nas pontas."
+    )
+    num_plants = models.PositiveIntegerField(
+        verbose_name="Número de Plantas"
+    )
+    num_plantings = models.PositiveIntegerField(
+        verbose_name="Número de Plantios"
+    )
+    first_planting_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="Primeiro Plantio"
+    )
+    last_planting_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="Último Plantio"
+    )
+
+    def __str__(self) -> str:
+        rootstock = self.rootstock or "pé-franco/não informado"
+        return f"{self.num_plants} planta(s) de {self.genetic_material} em {self.location} ({rootstock})"
+
+    class Meta:
+        verbose_name = "Inventário de Plantas"
+        verbose_name_plural = "Inventário de Plantas"
+        ordering = ['location_id', 'genetic_material_id', 'rootstock']
+        indexes = [
+            models.Index(fields=['material_type', 'location'], name='inventory_type_location_idx'),
+            models.Index(fields=['rootstock', 'location'], name='inventory_rootstock_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'genetic_material', 'rootstock'],
+                name='unique_inventory_row'
+            )
+        ]
+
+class CompactJSONEncoder(DjangoJSONEncoder):
+    """JSON sem espaços entre itens, para as diferenças do histórico."""
+    def __init__(self, *args, **kwargs):
+        kwargs['separators'] = (',', ':')
+        super().__init__(*args, **kwargs)
+
+class AuditEntryQuerySet(models.QuerySet):
+    """
+    Histórico somente de inclusão: as exclusões e alterações em lote
+    (``delete``, ``update``, ``bulk_update``) são recusadas, como as de uma
+    instância.
+    """
+    def delete(self):
+        raise ValueError("O histórico de alterações não pode ser excluído.")
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def update(self, **kwargs):
+        raise ValueError("O histórico de alterações não pode ser modificado.")
+
+    update.alters_data = True
+
+class AuditEntry(models.Model):
+    """
+    Registro imutável (somente inclusão) de uma alteração em um material
+    genético, população ou registro relacionado a um material.
+
+    ``changes`` guarda ``{campo: [antes, depois]}`` nas alterações e o estado
+    do registro na criação (apenas campos preenchidos) e na exclusão (completo).
+    Os registros são gravados em lote pelo módulo ``audit``.
+    """
+    class Action(models.TextChoices):
+        CREATE = 'C', 'Criação'
+        UPDATE = 'U', 'Alteração'
+        DELETE = 'D', 'Exclusão'
+
+    timestamp = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Data/Hora"
+    )
+    model = models.CharField(
+        max_length=50,
+        verbose_name="Modelo",
+        help_text="Rótulo do modelo alterado (ex: germoplasm.geneticmaterial)."
+    )
+    object_id = models.BigIntegerField(
+        verbose_name="ID do Registro"
+    )
+    # Inteiro simples (sem chave estrangeira) para sobreviver à exclusão do material.
+    material_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="ID do Material Genético"
+    )
+    action = models.CharField(
+        max_length=1,
+        choices=Action.choices,
+        verbose_name="Ação"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Usuário"
+    )
+    changes = models.JSONField(
+        encoder=CompactJSONEncoder,
+        verbose_name="Alterações"
+    )
+
+    # O manager base (sem estas restrições) continua disponível ao Django,
+    # que anula ``user`` quando um usuário é excluído.
+    objects = AuditEntryQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        return f"{self.get_action_display()} de {self.model} #{self.object_id} em {self.timestamp:%d/%m/%Y %H:%M}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("O histórico de alterações não pode ser modificado.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("O histórico de alterações não pode ser excluído.")
+
+    class Meta:
+        verbose_name = "Registro de Histórico"
+        verbose_name_plural = "Histórico de Alterações"
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'timestamp'], name='audit_object_idx'),
+            models.Index(fields=['material_id', 'timestamp'], name='audit_material_idx'),
+        ]
+
+class ReactionProfile(models.Model):
+    """
+    Reações de um material a todas as doenças, codificadas em uma única linha
+    para a matriz material × doença (``reaction_matrix``).
+
+    ``codes`` tem um par ``Disease.pk:código`` por reação ativa, em ordem de
+    doença (ex: ``1:1,7:4``): 1 = R, 2 = MR, 3 = MS, 4 = S. Mantido pelos
+    sinais a cada gravação de DiseaseReaction; não deve ser editado manualmente.
+    """
+    genetic_material = models.OneToOneField(
+        GeneticMaterial,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reaction_profile',
+        verbose_name="Material Genético"
+    )
+    codes = models.TextField(
+        blank=True,
+        verbose_name="Códigos das Reações"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última Atualização"
+    )
+
+    def __str__(self) -> str:
+        return f"Perfil de reações de {self.genetic_material_id}"
+
+    class Meta:
+        verbose_name = "Perfil de Reações"
+        verbose_name_plural = "Perfis de Reações"
+
+
+class MaterialListing(models.Model):
+    """
+    Ficha desnormalizada de um material para a listagem, os filtros e a busca
+    do admin (``listing``): códigos dos parentais e da população, genótipo S
+    e contagens de fotos, plantios e descendentes numa única linha.
+
+    Mantida pelos sinais após cada gravação e reconstruída pelo comando
+    ``rebuild_material_listing``; não deve ser editada manualmente.
+    """
+    genetic_material = models.OneToOneField(
+        GeneticMaterial,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='listing',
+        verbose_name="Material Genético"
+    )
+    display_code = models.CharField(
+        max_length=255,
+        verbose_name="Código"
+    )
+    mother_code = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Mãe"
+    )
+    father_code = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Pai"
+    )
+    population_code = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="População"
+    )
+    s_genotype = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Genótipo S",
+        help_text="Alelos S ativos do material, em ordem alfabética (ex.: S1S3)."
+    )
+    num_photos = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Fotos"
+    )
+    num_plantings = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Plantios"
+    )
+    num_offspring = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Descendentes",
+        help_text="Filhos e mutações ativos."
+    )
+    search_text = models.TextField(
+        blank=True,
+        verbose_name="Texto de Busca",
+        help_text="Nome, códigos, parentais, população e genótipo S, para a busca do admin."
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última Atualização"
+    )
+
+    def __str__(self) -> str:
+        return f"Ficha de listagem de {self.genetic_material_id}"
+
+    class Meta:
+        verbose_name = "Ficha de Listagem"
+        verbose_name_plural = "Fichas de Listagem"
+        indexes = [
+            models.Index(fields=['display_code'], name='listing_code_idx'),
+            models.Index(fields=['population_code'], name='listing_population_idx'),
+        ]
+
+
+class GenotypeMatrix(models.Model):
+    """
+    Uma matriz de genótipos SNP importada (um lote de chips), gravada fora do
+    banco em ``GENOTYPE_ROOT/<id>/`` (ver ``genotypes.py``): dosagens 0/1/2
+    compactadas em 2 bits por genótipo, com as linhas ordenadas pelo id do
+    material e as colunas pelo id do marcador.
+    """
+    class SourceFormat(models.TextChoices):
+        FINAL_REPORT = 'final-report', 'Illumina Final Report'
+        MATRIX = 'matrix', 'Matriz (marcadores × amostras)'
+
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name="Nome"
+    )
+    source_format = models.CharField(
+        max_length=20,
+        choices=SourceFormat.choices,
+        verbose_name="Formato de Origem"
+    )
+    source_file = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Arquivo de Origem"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        editable=False,
+        verbose_name="Data da Importação"
+    )
+    num_materials = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Materiais"
+    )
+    num_markers = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Marcadores"
+    )
+    missing_rate = models.FloatField(
+        default=0,
+        verbose_name="Taxa de Dados Perdidos"
+    )
+    grm_computed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Matriz G Calculada em"
+    )
+
+    def __str__(self) -> str:
+        return self.name
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(settings.GENOTYPE_ROOT, str(self.pk))
+
+    class Meta:
+        verbose_name = "Matriz de Genótipos"
+        verbose_name_plural = "Matrizes de Genótipos"
+        ordering = ['-created_at']
+
+
+class WeatherSeries(models.Model):
+    """
+    Temperaturas de uma estação (local) em um ano, em colunas compactas (ver
+    ``weather.py``): um float32 por dia ou por hora a partir de 1º de janeiro,
+    com NaN nos dados ausentes. Séries diárias guardam mínima e máxima;
+    horárias, a temperatura do ar.
+    """
+    class Resolution(models.TextChoices):
+        DAILY = 'daily', 'Diária'
+        HOURLY = 'hourly', 'Horária'
+
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='weather_series',
+        verbose_name="Local"
+    )
+    year = models.PositiveSmallIntegerField(
+        verbose_name="Ano"
+    )
+    resolution = models.CharField(
+        max_length=10,
+        choices=Resolution.choices,
+        verbose_name="Resolução"
+    )
+    temperature_min = models.BinaryField(
+        blank=True,
+        default=b'',
+        verbose_name="Temperaturas Mínimas"
+    )
+    temperature_max = models.BinaryField(
+        blank=True,
+        default=b'',
+        verbose_name="Temperaturas Máximas"
+    )
+    temperature = models.BinaryField(
+        blank=True,
+        default=b'',
+        verbose_name="Temperaturas Horárias"
+    )
+    observed = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Registros",
+        help_text="Dias (ou horas) com dados."
+    )
+    source_file = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Arquivo de Origem"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última Atualização"
+    )
+
+    def __str__(self) -> str:
+        return f"{self.location} {self.year} ({self.get_resolution_display()})"
+
+    class Meta:
+        verbose_name = "Série Meteorológica"
+        verbose_name_plural = "Séries Meteorológicas"
+        ordering = ['location', 'year', 'resolution']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'year', 'resolution'], name='unique_weather_series'
+            ),
+        ]
+
+
+class PhenologyFlag(models.Model):
+    """
+    Inconsistência de uma observação fenológica encontrada pelo controle de
+    qualidade (``phenology_qc.py``). Os alertas de um grupo (material, local e
+    safra) são recriados a cada verificação; não devem ser editados manualmente.
+    """
+    class Rule(models.TextChoices):
+        ORDER = 'order', 'Fora de ordem'
+        SEASON = 'season', 'Fora da época'
+        DUPLICATE = 'duplicate', 'Evento repetido'
+        OUTLIER = 'outlier', 'Data atípica'
+
+    observation = models.ForeignKey(
+        PhenologyObservation,
+        on_delete=models.CASCADE,
+        related_name='qc_flags',
+        verbose_name="Observação"
+    )
+    rule = models.CharField(
+        max_length=10,
+        choices=Rule.choices,
+        verbose_name="Regra"
+    )
+    message = models.CharField(
+        max_length=255,
+        verbose_name="Mensagem"
+    )
+    score = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Escore z"
+    )
+    checked_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Verificado em"
+    )
+
+    def __str__(self) -> str:
+        return f"{self.get_rule_display()}: {self.message}"
+
+    class Meta:
+        verbose_name = "Alerta de Fenologia"
+        verbose_name_plural = "Alertas de Fenologia"
+        indexes = [
+            models.Index(fields=['rule', 'observation'], name='pheno_flag_rule_idx'),
+        ]
@@ -0,0 +1,239 @@
+"""
+Utilitários para carregar a genealogia do BAG em forma vetorizada.
+
+A genealogia é lida com uma única consulta e representada como arrays NumPy
+ordenados topologicamente (parentais sempre antes dos filhos), o que permite
+que os serviços de análise genética (BLUP, contribuição de fundadores,
+simulações) trabalhem com dezenas de milhares de materiais sem laços por
+registro no banco.
+"""
+import heapq
+from dataclasses import dataclass, field
+
+import numpy as np
+from scipy import sparse
+
+from .models import GeneticMaterial
+
+UNKNOWN = -1
+
+
+class PedigreeCycleError(ValueError):
+    """Raised when the mother/father graph contains a cycle."""
+
+
+@dataclass
+class Pedigree:
+    """
+    Pedigree in topological order.
+
+    ``ids`` holds the GeneticMaterial pk of each row, ``dam``/``sire`` the row
+    index of the mother/father (``UNKNOWN`` when missing) and ``generation``
+    the distance to the oldest known ancestor. Mutations are clones of their
+    origin, so ``index`` maps the pk of every mutation to the row of the
+    original genotype instead of creating a row of its own.
+    """
+    ids: np.ndarray
+    dam: np.ndarray
+    sire: np.ndarray
+    generation: np.ndarray
+    index: dict = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows_for(self, pks) -> np.ndarray:
+        """Returns the pedigree rows of the given pks (``UNKNOWN`` if absent)."""
+        return np.fromiter(
+            (self.index.get(pk, UNKNOWN) for pk in pks), dtype=np.int64
+        )
+
+    def generations(self):
+        """Yields the row indices of each generation, oldest first."""
+        if not len(self):
+            return
+        # As linhas já estão ordenadas por geração.
+        bounds = np.flatnonzero(np.diff(self.generation)) + 1
+        yield from np.split(np.arange(len(self)), bounds)
+
+
+def _resolve_clones(mutated_from: dict) -> dict:
+    """Maps every mutation pk to the pk of the original (non-mutant) material."""
+    resolved = {}
+    for pk in mutated_from:
+        chain = []
+        current = pk
+        while current in mutated_from and current not in resolved:
+            if current in chain:
+                raise PedigreeCycleError(
+                    f"Ciclo de mutações detectado envolvendo os materiais {sorted(chain)}."
+                )
+            chain.append(current)
+            current = mutated_from[current]
+        origin = resolved.get(current, current)
+        for item in chain:
+            resolved[item] = origin
+    return resolved
+
+
+def load_pedigree(queryset=None) -> Pedigree:
+    """
+    Loads the whole pedigree with a single query.
+
+    Inactive materials are kept on purpose: a material removed logically is
+    still an ancestor of its descendants.
+    """
+    if queryset is None:
+        queryset = GeneticMaterial.all_objects.all()
+    rows = list(
+        queryset.order_by().values_list('id', 'mother_id', 'father_id', 'mutated_from_id')
+    )
+
+    clones = _resolve_clones({pk: origin for pk, _, _, origin in rows if origin})
+    genotypes = [row for row in rows if row[0] not in clones]
+
+    n = len(genotypes)
+    pks = np.fromiter((row[0] for row in genotypes), dtype=np.int64, count=n)
+    position = {pk: i for i, pk in enumerate(pks.tolist())}
+
+    def parent_rows(column):
+        return np.fromiter(
+            (position.get(clones.get(row[column], row[column]), UNKNOWN) for row in genotypes),
+            dtype=np.int64,
+            count=n,
+        )
+
+    dam = parent_rows(1)
+    sire = parent_rows(2)
+
+    # Ordenação topológica por gerações (algoritmo de Kahn vetorizado): a cada
+    # passo entram os materiais cujos parentais já foram posicionados.
+    generation = np.full(n, UNKNOWN, dtype=np.int64)
+    placed = np.zeros(n + 1, dtype=bool)
+    placed[UNKNOWN] = True  # o índice -1 aponta para a sentinela "desconhecido"
+    level = 0
+    while not placed[:n].all():
+        ready = ~placed[:n] & placed[dam] & placed[sire]
+        if not ready.any():
+            stuck = sorted(pks[~placed[:n]].tolist())
+            raise PedigreeCycleError(
+                f"Ciclo na genealogia (mãe/pai) envolvendo os materiais {stuck[:20]}."
+            )
+        generation[ready] = level
+        placed[:n] |= ready
+        level += 1
+
+    order = np.argsort(generation, kind='stable')
+    remap = np.empty(n + 1, dtype=np.int64)
+    remap[order] = np.arange(n)
+    remap[UNKNOWN] = UNKNOWN
+
+    ids = pks[order]
+    index = {pk: i for i, pk in enumerate(ids.tolist())}
+    for clone, origin in clones.items():
+        if origin in index:
+            index[clone] = index[origin]
+
+    return Pedigree(
+        ids=ids,
+        dam=remap[dam[order]],
+        sire=remap[sire[order]],
+        generation=generation[order],
+        index=index,
+    )
+
+
+def inbreeding_coefficients(pedigree: Pedigree, parents_only: bool = False):
+    """
+    Computes inbreeding coefficients (F) with the Meuwissen & Luo (1992)
+    algorithm and the Mendelian sampling variances (D) used by Henderson's rules.
+
+    D only depends on the F of the parents: with ``parents_only`` the
+    coefficients of materials without offspring are left as NaN, which skips
+    most of the work on programs where seedlings are the bulk of the pedigree.
+
+    Returns a tuple ``(F, D)`` of float arrays.
+    """
+    n = len(pedigree)
+    dam = pedigree.dam.tolist()
+    sire = pedigree.sire.tolist()
+    if parents_only:
+        is_parent = np.zeros(n + 1, dtype=bool)
+        is_parent[pedigree.dam] = True
+        is_parent[pedigree.sire] = True
+        skip = (~is_parent[:n]).tolist()
+    else:
+        skip = [False] * n
+    # F[-1] = -1 faz com que pais desconhecidos entrem corretamente em D.
+    F = np.zeros(n + 1)
+    F[UNKNOWN] = -1.0
+    D = np.zeros(n)
+    L = np.zeros(n)
+
+    for i in range(n):
+        s, d = sire[i], dam[i]
+        D[i] = 0.5 - 0.25 * (F[s] + F[d])
+        if skip[i]:
+            F[i] = np.nan
+            continue
+        if s == UNKNOWN or d == UNKNOWN:
+            continue
+        if i > 0 and s == sire[i - 1] and d == dam[i - 1] and not skip[i - 1]:
+            # Irmãos completos têm o mesmo coeficiente de endogamia.
+            F[i] = F[i - 1]
+            continue
+
+        fi = -1.0
+        L[i] = 1.0
+        heap = [-i]
+        while heap:
+            j = -heapq.heappop(heap)
+            lj = L[j]
+            for parent in (sire[j], dam[j]):
+                if parent != UNKNOWN:
+                    if L[parent] == 0.0:
+                        heapq.heappush(heap, -parent)
+                    L[parent] += 0.5 * lj
+            fi += lj * lj * D[j]
+            L[j] = 0.0
+        F[i] = fi
+
+    return F[:n], D
+
+
+def relationship_inverse(pedigree: Pedigree, inbreeding: bool = True) -> sparse.csc_matrix:
+    """
+    Builds the inverse of the numerator relationship matrix (A⁻¹) directly
+    from the pedigree using Henderson's rules (Quaas, 1976, when
+    ``inbreeding`` is True).
+    """
+    n = len(pedigree)
+    if inbreeding:
+        _, D = inbreeding_coefficients(pedigree)
+    else:
+        known = (pedigree.dam != UNKNOWN).astype(float) + (pedigree.sire != UNKNOWN)
+        D = 1.0 - 0.25 * known
+
+    alpha = 1.0 / D
+    i = np.arange(n)
+    d, s = pedigree.dam, pedigree.sire
+    rows, cols, vals = [i], [i], [alpha]
+
+    for parent in (d, s):
+        has = parent != UNKNOWN
+        rows += [i[has], parent[has]]
+        cols += [parent[has], i[has]]
+        vals += [-0.5 * alpha[has], -0.5 * alpha[has]]
+
+    for p in (d, s):
+        for q in (d, s):
+            has = (p != UNKNOWN) & (q != UNKNOWN)
+            rows.append(p[has])
+            cols.append(q[has])
+            vals.append(0.25 * alpha[has])
+
+    # Entradas repetidas são somadas na conversão de COO para CSC.
+    return sparse.coo_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n, n),
+    ).tocsc()
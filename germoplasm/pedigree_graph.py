@@ -0,0 +1,272 @@
+"""
+Gráfico de genealogia (ascendentes e descendentes) renderizado em SVG.
+
+O grafo é montado por gerações, com uma consulta por nível de profundidade, e
+o SVG gerado fica em cache com uma chave que inclui o "token de genealogia" do
+material. Os sinais em ``signals.py`` trocam esse token apenas quando a
+genealogia (ou o rótulo) de algum material do grafo muda.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.html import escape
+
+from . import caching
+from .models import GeneticMaterial, Population
+
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 6
+SVG_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+NODE_WIDTH = 170
+NODE_HEIGHT = 40
+POPULATION_RADIUS = 14
+H_SPACING = 30
+ROW_HEIGHT = 55
+MARGIN = 20
+
+MATERIAL_FIELDS = (
+    'id', 'name', 'material_type', 'internal_code', 'accession_code',
+    'mother_id', 'father_id', 'mutated_from_id', 'population_id',
+)
+GENEALOGY_FIELDS = (
+    'name', 'material_type', 'internal_code', 'accession_code',
+    'mother_id', 'father_id', 'mutated_from_id', 'population_id',
+)
+
+
+@dataclass
+class PedigreeGraph:
+    root_id: int
+    # Materiais indexados pelo id; populações pela chave ('P', id).
+    materials: dict = field(default_factory=dict)
+    populations: dict = field(default_factory=dict)
+    rows: dict = field(default_factory=dict)
+    edges: set = field(default_factory=set)
+
+
+def version_key(material_id: int) -> str:
+    return f'germoplasm:pedigree-version:{material_id}'
+
+
+def _material_label(row: dict) -> tuple:
+    material = GeneticMaterial(
+        name=row['name'],
+        material_type=row['material_type'],
+        internal_code=row['internal_code'],
+        accession_code=row['accession_code'],
+    )
+    return row['name'], material.get_display_code()
+
+
+def _fetch(filter_q: Q) -> list:
+    return list(GeneticMaterial.all_objects.filter(filter_q).values(*MATERIAL_FIELDS))
+
+
+def build_graph(material_id: int, depth: int = DEFAULT_DEPTH) -> PedigreeGraph:
+    """
+    Collects ancestors and descendants of ``material_id`` up to ``depth``
+    generations, using at most ``2 * depth + 2`` queries.
+
+    Rows are laid out on a doubled grid: materials sit on even rows (negative
+    for ancestors) and populations on the odd row between parents and offspring.
+    """
+    graph = PedigreeGraph(root_id=material_id)
+
+    def add(row, layer):
+        if row['id'] not in graph.materials:
+            graph.materials[row['id']] = row
+            graph.rows[row['id']] = 2 * layer
+
+    roots = _fetch(Q(pk=material_id))
+    if not roots:
+        return graph
+    add(roots[0], 0)
+
+    # Ascendentes: uma consulta por geração.
+    frontier = [roots[0]]
+    for level in range(1, depth + 1):
+        parent_ids = {
+            row[parent]
+            for row in frontier
+            for parent in ('mother_id', 'father_id', 'mutated_from_id')
+            if row[parent] and row[parent] not in graph.materials
+        }
+        if not parent_ids:
+            break
+        frontier = _fetch(Q(pk__in=parent_ids))
+        for row in frontier:
+            add(row, -level)
+
+    # Descendentes: uma consulta por geração.
+    frontier_ids = {material_id}
+    for level in range(1, depth + 1):
+        children = _fetch(
+            Q(mother_id__in=frontier_ids) | Q(father_id__in=frontier_ids) |
+            Q(mutated_from_id__in=frontier_ids)
+        )
+        children = [row for row in children if row['id'] not in graph.materials]
+        if not children:
+            break
+        for row in children:
+            add(row, level)
+        frontier_ids = {row['id'] for row in children}
+
+    population_ids = {row['population_id'] for row in graph.materials.values() if row['population_id']}
+    for population in Population.all_objects.filter(pk__in=population_ids).values('id', 'code'):
+        graph.populations[('P', population['id'])] = population
+
+    for pk, row in graph.materials.items():
+        population_key = ('P', row['population_id'])
+        if row['population_id'] and population_key in graph.populations:
+            graph.rows.setdefault(population_key, graph.rows[pk] - 1)
+            graph.edges.add((population_key, pk, 'population'))
+            sources = (population_key, 'parent')
+        else:
+            sources = (pk, 'parent')
+        for parent in ('mother_id', 'father_id'):
+            if row[parent] in graph.materials:
+                graph.edges.add((row[parent], sources[0], sources[1]))
+        if row['mutated_from_id'] in graph.materials:
+            graph.edges.add((row['mutated_from_id'], pk, 'mutation'))
+
+    return graph
+
+
+def layout(graph: PedigreeGraph) -> dict:
+    """
+    Orders the nodes of each row with a few barycenter sweeps and returns
+    ``{node: (x, y)}`` with the center of each node.
+    """
+    rows = defaultdict(list)
+    for node, row in sorted(graph.rows.items(), key=lambda item: str(item[0])):
+        rows[row].append(node)
+    neighbours = defaultdict(list)
+    for source, target, _ in graph.edges:
+        neighbours[source].append(target)
+        neighbours[target].append(source)
+
+    order = sorted(rows)
+    position = {node: i for row in order for i, node in enumerate(rows[row])}
+    for sweep in range(4):
+        for row in (order if sweep % 2 == 0 else reversed(order)):
+            def barycenter(node):
+                linked = [position[n] for n in neighbours[node] if graph.rows.get(n) != row]
+                return sum(linked) / len(linked) if linked else position[node]
+            rows[row].sort(key=barycenter)
+            for i, node in enumerate(rows[row]):
+                position[node] = i
+
+    widest = max((len(nodes) for nodes in rows.values()), default=1)
+    total_width = widest * (NODE_WIDTH + H_SPACING)
+    top = order[0] if order else 0
+    coordinates = {}
+    for row in order:
+        nodes = rows[row]
+        offset = (total_width - len(nodes) * (NODE_WIDTH + H_SPACING)) / 2
+        for i, node in enumerate(nodes):
+            x = MARGIN + offset + i * (NODE_WIDTH + H_SPACING) + NODE_WIDTH / 2
+            y = MARGIN + (row - top) * ROW_HEIGHT + NODE_HEIGHT / 2
+            coordinates[node] = (x, y)
+    return coordinates
+
+
+def render_svg(graph: PedigreeGraph) -> str:
+    coordinates = layout(graph)
+    if not coordinates:
+        return ''
+    width = max(x for x, _ in coordinates.values()) + NODE_WIDTH / 2 + MARGIN
+    height = max(y for _, y in coordinates.values()) + NODE_HEIGHT / 2 + MARGIN
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'viewBox="0 0 {width:.0f} {height:.0f}" font-family="sans-serif" font-size="11">'
+    ]
+    for source, target, kind in sorted(graph.edges, key=str):
+        x1, y1 = coordinates[source]
+        x2, y2 = coordinates[target]
+        y1 += POPULATION_RADIUS if isinstance(source, tuple) else NODE_HEIGHT / 2
+        y2 -= POPULATION_RADIUS if isinstance(target, tuple) else NODE_HEIGHT / 2
+        middle = (y1 + y2) / 2
+        dash = ' stroke-dasharray="5,4"' if kind == 'mutation' else ''
+        parts.append(
+            f'<path d="M{x1:.1f},{y1:.1f} C{x1:.1f},{middle:.1f} {x2:.1f},{middle:.1f} {x2:.1f},{y2:.1f}" '
+            f'fill="none" stroke="#79aec8" stroke-width="1.5"{dash}/>'
+        )
+
+    for node, (x, y) in coordinates.items():
+        if isinstance(node, tuple):
+            code = escape(graph.populations[node]['code'])
+            parts.append(
+                f'<g><title>População {code}</title>'
+                f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{POPULATION_RADIUS}" fill="#f5dd5d" stroke="#c9a800"/>'
+                f'<text x="{x:.1f}" y="{y + 4:.1f}" text-anchor="middle" font-size="9">P</text></g>'
+            )
+            continue
+        name, code = (escape(text) for text in _material_label(graph.materials[node]))
+        fill = '#417690' if node == graph.root_id else '#ffffff'
+        color = '#ffffff' if node == graph.root_id else '#333333'
+        parts.append(
+            f'<g><title>{name} ({code})</title>'
+            f'<rect x="{x - NODE_WIDTH / 2:.1f}" y="{y - NODE_HEIGHT / 2:.1f}" width="{NODE_WIDTH}" '
+            f'height="{NODE_HEIGHT}" rx="4" fill="{fill}" stroke="#417690"/>'
+            f'<text x="{x:.1f}" y="{y - 3:.1f}" text-anchor="middle" fill="{color}" font-weight="bold">{name[:28]}</text>'
+            f'<text x="{x:.1f}" y="{y + 12:.1f}" text-anchor="middle" fill="{color}">{code[:30]}</text></g>'
+        )
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def get_pedigree_svg(material_id: int, depth: int = DEFAULT_DEPTH) -> str:
+    """Returns the cached SVG for the material, rendering it on a cache miss."""
+    depth = max(1, min(depth, MAX_DEPTH))
+    version = caching.get_version(version_key(material_id))
+    key = f'germoplasm:pedigree-svg:{material_id}:{depth}:{version}'
+    svg = cache.get(key)
+    if svg is None:
+        svg = render_svg(build_graph(material_id, depth))
+        cache.set(key, svg, SVG_CACHE_TIMEOUT)
+    return svg
+
+
+def related_material_ids(material_ids, depth: int = MAX_DEPTH) -> set:
+    """
+    Returns the given ids plus their ancestors and descendants up to ``depth``
+    generations: every material whose pedigree graph may contain them.
+    """
+    related = set(material_ids)
+
+    frontier = set(material_ids)
+    for _ in range(depth):
+        parents = set()
+        for row in GeneticMaterial.all_objects.filter(pk__in=frontier).values_list(
+            'mother_id', 'father_id', 'mutated_from_id'
+        ):
+            parents.update(pk for pk in row if pk and pk not in related)
+        if not parents:
+            break
+        related |= parents
+        frontier = parents
+
+    frontier = set(material_ids)
+    for _ in range(depth):
+        children = set(
+            GeneticMaterial.all_objects.filter(
+                Q(mother_id__in=frontier) | Q(father_id__in=frontier) | Q(mutated_from_id__in=frontier)
+            ).exclude(pk__in=related).values_list('pk', flat=True)
+        )
+        if not children:
+            break
+        related |= children
+        frontier = children
+
+    return related
+
+
+def invalidate(material_ids) -> None:
+    """Invalidates the cached graphs that may contain any of the given materials."""
+    material_ids = [pk for pk in material_ids if pk]
+    if material_ids:
+        caching.bump_versions(version_key(pk) for pk in related_material_ids(material_ids))
@@ -0,0 +1,447 @@
+"""
+Importação em lote de genealogias (registros históricos) a partir de um CSV.
+
+Colunas aceitas (cabeçalho, sem diferenciar maiúsculas):
+
+- ``name`` e/ou ``code`` (ao menos um por linha): ``code`` é o código
+  interno de cultivares e seleções, ou o código de acesso de híbridos e
+  mutantes; sem nome, o material recebe o código como nome;
+- ``mother``, ``father`` e ``mutated_from``: outra linha do arquivo ou um
+  material já cadastrado, pelo código ou pelo nome;
+- ``type``: ``CULTIVAR``, ``SELECTION``, ``HYBRID`` ou os rótulos (Cultivar,
+  Seleção, Híbrido); mutantes sem tipo herdam o da origem;
+- ``population``: código de uma população cadastrada ou nova (criada com a
+  mãe e o pai da linha, na data de ``cross_date`` quando informada).
+
+Linhas com parentais desconhecidos ou ambíguos, em ciclos ou que descendem de
+linhas rejeitadas são relatadas e não são importadas. As demais são
+ordenadas por gerações (Kahn vetorizado, como em ``pedigree.load_pedigree``)
+e inseridas uma geração por vez com ``bulk_create``: os parentais de cada
+geração já foram gravados, então as chaves estrangeiras são resolvidas em
+memória, sem ``save()`` por linha. Os códigos seguem ``GeneticMaterial.save()``
+e os serviços: ``C{id}``/``S{id}`` com um UPDATE por geração e tipo,
+``{população}H{n}`` e ``{origem}M{n}`` reservados em bloco nos contadores.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat
+from django.utils.dateparse import parse_date
+
+from . import audit, caching, detail_cache, diversity, gene_dropping, listing, pedigree_graph, services
+from .models import CodeCounter, GeneticMaterial, Population, allocation_atomic, highest_code_number
+
+BULK_BATCH_SIZE = 1000
+# Valores por consulta ao banco (o SQLite limita os parâmetros de uma consulta).
+LOOKUP_CHUNK_SIZE = 5000
+NONE = -1
+PARENT_COLUMNS = ('mother', 'father', 'mutated_from')
+COLUMN_LABELS = {'mother': "mãe", 'father': "pai", 'mutated_from': "origem da mutação"}
+INTERNAL_CODE_PREFIXES = {
+    GeneticMaterial.MaterialType.CULTIVAR: 'C',
+    GeneticMaterial.MaterialType.SELECTION: 'S',
+}
+
+
+@dataclass
+class PedigreeImportReport:
+    created: int = 0
+    populations: int = 0
+    generations: int = 0
+    # (linha da planilha, nome ou código, motivo)
+    rejects: list = field(default_factory=list)
+
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _material_type(text):
+    key = text.casefold()
+    for value, label in GeneticMaterial.MaterialType.choices:
+        if key in (value.casefold(), label.casefold()):
+            return value
+    return None
+
+
+def lookup_materials(values) -> dict:
+    """
+    Maps each value to the registered materials it names: by internal or
+    accession code, or by name when no code matches. Inactive materials are
+    included, since they are still ancestors.
+    """
+    by_code, by_name = defaultdict(list), defaultdict(list)
+    for chunk in _chunks(values):
+        queryset = GeneticMaterial.all_objects.filter(
+            Q(internal_code__in=chunk) | Q(accession_code__in=chunk) | Q(name__in=chunk)
+        ).only('pk', 'name', 'material_type', 'internal_code', 'accession_code')
+        for material in queryset:
+            for code in {material.internal_code, material.accession_code} - {None}:
+                by_code[code].append(material)
+            by_name[material.name].append(material)
+    return {value: by_code.get(value) or by_name.get(value, []) for value in values}
+
+
+def _existing_codes(codes) -> set:
+    existing = set()
+    for chunk in _chunks(codes):
+        for internal, accession in GeneticMaterial.all_objects.filter(
+            Q(internal_code__in=chunk) | Q(accession_code__in=chunk)
+        ).values_list('internal_code', 'accession_code'):
+            existing.update({internal, accession})
+    return existing & set(codes)
+
+
+def _cycle_rows(stuck, links, n):
+    """
+    Rows of the ``stuck`` mask that lie on a cycle (or between two): rows
+    without stuck children are peeled off until only cycles remain.
+    """
+    inside = stuck.copy()
+    while True:
+        children = np.zeros(n, dtype=np.int64)
+        for parent in links:
+            mask = inside & (parent != NONE)
+            np.add.at(children, parent[mask], 1)
+        leaves = inside & (children == 0)
+        if not leaves.any():
+            return inside
+        inside &= ~leaves
+
+
+class _Pedigree:
+    """Validated rows of the file: parents, types and populations by row index."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.n = n = len(rows)
+        self.names = [row.get('name', '') for row in rows]
+        self.codes = [row.get('code', '') for row in rows]
+        self.errors = {}
+        # Parentais na própria planilha (índice da linha) ou no banco (pk).
+        self.links = {column: np.full(n, NONE, dtype=np.int64) for column in PARENT_COLUMNS}
+        self.external = {column: {} for column in PARENT_COLUMNS}
+        self.origins = {}  # pk -> material cadastrado usado como origem de mutação
+        self.types = [None] * n
+        self.population_codes = [row.get('population', '') for row in rows]
+        self.populations = {}  # código -> população cadastrada
+        self.cross_dates = {}
+        self.generation = np.full(n, NONE, dtype=np.int64)
+
+    def reject(self, i, reason):
+        self.errors.setdefault(i, reason)
+
+    def label(self, i):
+        return self.codes[i] or self.names[i]
+
+    def ref(self, column, i):
+        """Parent of row ``i`` as ``('row', index)``, ``('db', pk)`` or None."""
+        if self.links[column][i] != NONE:
+            return 'row', int(self.links[column][i])
+        if i in self.external[column]:
+            return 'db', self.external[column][i]
+        return None
+
+    def set_ref(self, column, i, ref):
+        self.links[column][i] = NONE
+        self.external[column].pop(i, None)
+        if ref and ref[0] == 'row':
+            self.links[column][i] = ref[1]
+        elif ref:
+            self.external[column][i] = ref[1]
+
+    def identify(self):
+        self.by_code, self.by_name = {}, defaultdict(list)
+        for i, (name, code) in enumerate(zip(self.names, self.codes)):
+            if not name and not code:
+                self.reject(i, "nome e código vazios")
+                continue
+            if code:
+                if code in self.by_code:
+                    self.reject(i, f"código repetido no arquivo (linha {self.by_code[code] + 2})")
+                    continue
+                self.by_code[code] = i
+            if name:
+                self.by_name[name].append(i)
+        for code in _existing_codes(self.by_code):
+            self.reject(self.by_code[code], f"código '{code}' já cadastrado")
+
+    def resolve_parents(self):
+        pending = defaultdict(list)
+        for i, row in enumerate(self.rows):
+            if i in self.errors:
+                continue
+            for column in PARENT_COLUMNS:
+                value = row.get(column, '')
+                if not value:
+                    continue
+                target = self.by_code.get(value)
+                if target is None:
+                    same_name = self.by_name.get(value, [])
+                    if len(same_name) > 1:
+                        self.reject(i, f"{COLUMN_LABELS[column]} '{value}' é ambíguo(a): há {len(same_name)} linhas com esse nome")
+                        continue
+                    target = same_name[0] if same_name else None
+                if target is None:
+                    pending[value].append((i, column))
+                elif target == i:
+                    self.reject(i, "um material não pode ser seu próprio parental ou origem de mutação")
+                else:
+                    self.links[column][i] = target
+
+        for value, materials in lookup_materials(list(pending)).items():
+            for i, column in pending[value]:
+                if not materials:
+                    self.reject(i, f"{COLUMN_LABELS[column]} '{value}' não encontrado(a)")
+                elif len(materials) > 1:
+                    self.reject(i, f"{COLUMN_LABELS[column]} '{value}' é ambíguo(a): há {len(materials)} materiais com esse nome")
+                else:
+                    self.external[column][i] = materials[0].pk
+                    if column == 'mutated_from':
+                        self.origins[materials[0].pk] = materials[0]
+
+    def check_rows(self):
+        for i, row in enumerate(self.rows):
+            if i in self.errors:
+                continue
+            has_parents = self.ref('mother', i) or self.ref('father', i)
+            if self.ref('mutated_from', i) and (has_parents or self.population_codes[i]):
+                self.reject(i, "conflito de genealogia: mutantes não têm população nem mãe/pai")
+                continue
+            text = row.get('type', '')
+            self.types[i] = _material_type(text) if text else None
+            if text and self.types[i] is None:
+                self.reject(i, f"tipo de material inválido: '{text}'")
+            elif not text and not self.ref('mutated_from', i):
+                self.reject(i, "tipo de material ausente")
+            elif row.get('cross_date') and parse_date(row['cross_date']) is None:
+                self.reject(i, f"data de cruzamento inválida: '{row['cross_date']}'")
+
+    def check_populations(self):
+        codes = {code for code in self.population_codes if code}
+        for chunk in _chunks(codes):
+            for population in Population.all_objects.filter(code__in=chunk):
+                self.populations[population.code] = population
+
+        # Todos os materiais de uma população têm a mãe e o pai dela.
+        parents = {
+            code: (('db', population.parent1_id), ('db', population.parent2_id))
+            for code, population in self.populations.items()
+        }
+        for i, code in enumerate(self.population_codes):
+            if not code or i in self.errors:
+                continue
+            given = (self.ref('mother', i), self.ref('father', i))
+            if code not in parents and all(given):
+                parents[code] = given
+                if self.rows[i].get('cross_date'):
+                    self.cross_dates[code] = parse_date(self.rows[i]['cross_date'])
+        for i, code in enumerate(self.population_codes):
+            if not code or i in self.errors:
+                continue
+            if code not in parents:
+                self.reject(i, f"população '{code}' não cadastrada: informe a mãe e o pai para criá-la")
+                continue
+            given = (self.ref('mother', i), self.ref('father', i))
+            if any(ref and ref != expected for ref, expected in zip(given, parents[code])):
+                self.reject(i, f"mãe/pai diferentes dos parentais da população '{code}'")
+                continue
+            self.set_ref('mother', i, parents[code][0])
+            self.set_ref('father', i, parents[code][1])
+
+    def propagate_rejects(self):
+        """Rejects the descendants of rejected rows."""
+        n = self.n
+        ok = np.ones(n + 1, dtype=bool)  # o índice -1 aponta para a sentinela "sem parental"
+        ok[list(self.errors)] = False
+        while True:
+            bad = ok[:n].copy()
+            for parent in self.links.values():
+                bad &= ok[parent]
+            bad = ok[:n] & ~bad
+            if not bad.any():
+                return
+            for i in np.flatnonzero(bad).tolist():
+                column = next(column for column in PARENT_COLUMNS if not ok[self.links[column][i]])
+                parent = int(self.links[column][i])
+                self.reject(i, f"{COLUMN_LABELS[column]} rejeitado(a) (linha {parent + 2})")
+            ok[:n] &= ~bad
+
+    def sort(self):
+        """Assigns the generation of each valid row; rows on cycles are rejected."""
+        n = self.n
+        active = np.ones(n, dtype=bool)
+        active[list(self.errors)] = False
+        placed = np.zeros(n + 1, dtype=bool)
+        placed[NONE] = True
+        level = 0
+        while (active & ~placed[:n]).any():
+            ready = active & ~placed[:n]
+            for parent in self.links.values():
+                ready &= placed[parent]
+            if not ready.any():
+                stuck = active & ~placed[:n]
+                cycles = _cycle_rows(stuck, self.links.values(), n)
+                for i in np.flatnonzero(stuck).tolist():
+                    self.reject(i, "ciclo na genealogia" if cycles[i] else "descende de um ciclo na genealogia")
+                break
+            self.generation[ready] = level
+            placed[:n] |= ready
+            level += 1
+        return level
+
+
+def _assign_internal_codes(materials) -> None:
+    """``C{id}``/``S{id}`` for the cultivars and selections created without code."""
+    for material_type, prefix in INTERNAL_CODE_PREFIXES.items():
+        pending = [material for material in materials if material.material_type == material_type and not material.internal_code]
+        for chunk in _chunks(pending, BULK_BATCH_SIZE):
+            GeneticMaterial.all_objects.filter(pk__in=[material.pk for material in chunk]).update(
+                internal_code=Concat(Value(prefix), Cast('pk', CharField()))
+            )
+            for material in chunk:
+                material.internal_code = f'{prefix}{material.pk}'
+
+
+def _insert(pedigree, levels, batch_size, report):
+    instances = [None] * pedigree.n
+    populations = dict(pedigree.populations)
+    created = []
+    new_populations = []
+    fresh = set()  # populações e materiais criados nesta importação
+    counters = []
+
+    def parent_pk(column, i):
+        ref = pedigree.ref(column, i)
+        if ref is None:
+            return None
+        return instances[ref[1]].pk if ref[0] == 'row' else ref[1]
+
+    for level in range(levels):
+        members = np.flatnonzero(pedigree.generation == level).tolist()
+
+        batch = []
+        for i in members:
+            code = pedigree.population_codes[i]
+            if code and code not in populations:
+                population = Population(code=code, parent1_id=parent_pk('mother', i), parent2_id=parent_pk('father', i))
+                if code in pedigree.cross_dates:
+                    population.cross_date = pedigree.cross_dates[code]
+                populations[code] = population
+                batch.append(population)
+        new_populations += Population.all_objects.bulk_create(batch, batch_size=batch_size)
+        fresh.update(batch)
+
+        materials = []
+        hybrids, mutants = defaultdict(list), defaultdict(list)
+        given = defaultdict(list)  # códigos informados na planilha, por população/origem
+        for i in members:
+            population = populations.get(pedigree.population_codes[i])
+            origin_ref = pedigree.ref('mutated_from', i)
+            origin = None
+            if origin_ref:
+                origin = instances[origin_ref[1]] if origin_ref[0] == 'row' else pedigree.origins[origin_ref[1]]
+            material = GeneticMaterial(
+                name=pedigree.names[i] or pedigree.codes[i],
+                material_type=pedigree.types[i] or origin.material_type,
+                mother_id=parent_pk('mother', i),
+                father_id=parent_pk('father', i),
+                mutated_from=origin,
+                population=population,
+                is_epagri_material=population is not None,
+            )
+            material.ifo_status = material.compute_ifo_status()
+            code = pedigree.codes[i] or None
+            # Mesma regra de get_display_code(): híbridos e mutantes usam o código de acesso.
+            if material.material_type == GeneticMaterial.MaterialType.HYBRID or origin:
+                material.accession_code = code
+                owner = origin or population
+                if owner and code:
+                    given[owner].append(code)
+                elif owner:
+                    (mutants if origin else hybrids)[owner].append(material)
+            else:
+                material.internal_code = code
+            instances[i] = material
+            materials.append(material)
+
+        for pending, reserve, key, marker in (
+            (hybrids, services.reserve_hybrid_codes, services.hybrid_counter_key, services.HYBRID_MARKER),
+            (mutants, services.reserve_mutation_codes, services.mutation_counter_key, services.MUTATION_MARKER),
+        ):
+            for owner, group in pending.items():
+                if owner in fresh:
+                    # Criado nesta importação: o contador começa após os códigos da planilha.
+                    prefix = owner.code if isinstance(owner, Population) else owner.get_display_code()
+                    start = highest_code_number(given[owner], prefix, marker)
+                    codes = [f"{prefix}{marker}{number}" for number in range(start + 1, start + len(group) + 1)]
+                    counters.append(CodeCounter(key=key(owner), value=start + len(group)))
+                else:
+                    codes = reserve(owner, len(group))
+                for material, code in zip(group, codes):
+                    material.accession_code = code
+
+        created += GeneticMaterial.all_objects.bulk_create(materials, batch_size=batch_size)
+        _assign_internal_codes(materials)
+        fresh.update(materials)
+
+    CodeCounter.objects.bulk_create(counters, batch_size=batch_size)
+
+    report.created = len(created)
+    report.populations = len(new_populations)
+    audit.record_created([*new_populations, *created])
+    listing.refresh_materials(material.pk for material in created)
+    return new_populations
+
+
+def import_pedigree(rows, dry_run=False, batch_size=BULK_BATCH_SIZE) -> PedigreeImportReport:
+    """
+    Validates ``rows`` (dicts as returned by ``location_import.read_rows``) and creates
+    the valid materials ancestors first, in a single transaction.
+    """
+    report = PedigreeImportReport()
+    if not rows:
+        return report
+    if not set(rows[0]) & {'name', 'code'}:
+        report.rejects.append((1, '', "colunas 'name' e 'code' ausentes"))
+        return report
+
+    pedigree = _Pedigree(rows)
+    pedigree.identify()
+    pedigree.resolve_parents()
+    pedigree.check_rows()
+    pedigree.check_populations()
+    pedigree.propagate_rejects()
+    report.generations = pedigree.sort()
+    report.rejects = [
+        (i + 2, pedigree.label(i), reason)  # o cabeçalho é a linha 1
+        for i, reason in sorted(pedigree.errors.items())
+    ]
+
+    if dry_run:
+        report.created = pedigree.n - len(pedigree.errors)
+        report.populations = len({
+            code for i, code in enumerate(pedigree.population_codes)
+            if code and i not in pedigree.errors and code not in pedigree.populations
+        })
+        return report
+
+    with allocation_atomic():
+        new_populations = _insert(pedigree, report.generations, batch_size, report)
+        diversity.invalidate()
+        gene_dropping.invalidate()
+
+    # bulk_create não envia sinais: os caches dos materiais já cadastrados que
+    # ganharam descendentes são invalidados aqui.
+    registered = {pk for column in PARENT_COLUMNS for pk in pedigree.external[column].values()}
+    detail_cache.invalidate(registered)
+    pedigree_graph.invalidate(registered)
+    listing.refresh_materials(registered)
+    if new_populations:
+        caching.bump_versions([services.SEPLAN_CODES_VERSION_KEY])
+        detail_cache.invalidate_all()
+    return report
@@ -0,0 +1,339 @@
+"""
+Controle de qualidade das observações fenológicas.
+
+As observações ativas são agrupadas por material, local e safra (ano civil,
+ou a partir do mês ``PHENOLOGY_SEASON_START_MONTH``) e verificadas em
+passadas vetorizadas sobre todas as linhas de uma vez, sem laço por grupo:
+
+- ordem: um evento de ``sequence`` maior observado antes de um de
+  ``sequence`` menor do mesmo grupo (ex.: plena floração antes da brotação);
+- época: observação fora dos meses ``first_month`` a ``last_month`` do evento;
+- repetição: mais de uma observação do evento no grupo (``allow_repeats``);
+- data atípica: dia da safra com ``|z| > Z_LIMIT`` frente ao histórico do
+  evento no mesmo local, quando há ao menos ``MIN_HISTORY`` observações.
+
+Os alertas ficam em ``PhenologyFlag``. ``check_all`` refaz a tabela inteira
+(comando ``check_phenology``); depois de cada gravação, os sinais chamam
+``recheck_groups`` apenas para os grupos afetados. As médias do histórico
+usadas na data atípica são sempre calculadas com todas as observações do
+evento no local; como elas mudam a cada gravação, a verificação incremental
+refaz os alertas de data atípica de todo o par (evento, local) afetado.
+"""
+import datetime
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MONTH_CHOICES, PhenologicalEvent, PhenologyFlag, PhenologyObservation
+from .weather import EPOCH_ORDINAL, date_days
+
+Z_LIMIT = 3.0
+MIN_HISTORY = 10
+BULK_BATCH_SIZE = 5000
+# Grupos por consulta na verificação incremental; acima de FULL_RECHECK_GROUPS, tudo é refeito.
+GROUP_CHUNK_SIZE = 200
+FULL_RECHECK_GROUPS = 5000
+RULE_FIELDS = ('sequence', 'first_month', 'last_month', 'allow_repeats')
+MONTHS = dict(MONTH_CHOICES)
+
+
+@dataclass
+class QualityReport:
+    observations: int = 0
+    groups: int = 0
+    flags: Counter = field(default_factory=Counter)
+
+
+@dataclass
+class _Observations:
+    pk: np.ndarray
+    material: np.ndarray
+    location: np.ndarray
+    event: np.ndarray
+    day: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.pk)
+
+
+@dataclass
+class _Rules:
+    names: dict
+    # Indexados pelo pk do evento.
+    sequence: np.ndarray
+    first_month: np.ndarray
+    last_month: np.ndarray
+    allow_repeats: np.ndarray
+
+
+def _start_month() -> int:
+    return getattr(settings, 'PHENOLOGY_SEASON_START_MONTH', 1)
+
+
+def season_of(date: datetime.date) -> int:
+    """Season (year in which it starts) of a date."""
+    return date.year - (date.month < _start_month())
+
+
+def season_range(season: int) -> tuple:
+    """First day of ``season`` and first day of the next one."""
+    month = _start_month()
+    return datetime.date(season, month, 1), datetime.date(season + 1, month, 1)
+
+
+def group_of(material_id, location_id, date) -> tuple:
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return material_id, location_id, season_of(date)
+
+
+def _seasons(days: np.ndarray) -> tuple:
+    """Season, day of the season (0 = first day) and month of each date (days since 1970-01-01)."""
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    month = months % 12 + 1
+    first_month = months - (month - _start_month()) % 12
+    season = first_month // 12 + 1970
+    season_day = days - first_month.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    return season, season_day, month
+
+
+def _load(queryset) -> _Observations:
+    rows = list(
+        queryset.order_by().values_list('pk', 'genetic_material_id', 'location_id', 'event_id', 'observation_date')
+    )
+    columns = [np.fromiter((row[i] for row in rows), dtype=np.int64, count=len(rows)) for i in range(4)]
+    return _Observations(*columns, date_days([row[4] for row in rows]))
+
+
+def _rules() -> _Rules:
+    events = list(PhenologicalEvent.objects.values_list('pk', 'name', *RULE_FIELDS))
+    size = max((row[0] for row in events), default=0) + 1
+    rules = _Rules(
+        names={row[0]: row[1] for row in events},
+        sequence=np.full(size, -1, dtype=np.int64),
+        first_month=np.zeros(size, dtype=np.int64),
+        last_month=np.zeros(size, dtype=np.int64),
+        allow_repeats=np.zeros(size, dtype=bool),
+    )
+    for pk, _, sequence, first_month, last_month, allow_repeats in events:
+        rules.sequence[pk] = -1 if sequence is None else sequence
+        if first_month and last_month:
+            rules.first_month[pk], rules.last_month[pk] = first_month, last_month
+        rules.allow_repeats[pk] = allow_repeats
+    return rules
+
+
+def _format_day(day) -> str:
+    return datetime.date.fromordinal(int(day) + EPOCH_ORDINAL).strftime('%d/%m/%Y')
+
+
+def _groups(obs: _Observations, season: np.ndarray) -> np.ndarray:
+    """Dense group id (material, location, season) of every observation."""
+    if not len(obs):
+        return np.zeros(0, dtype=np.int64)
+    locations = int(obs.location.max()) + 1
+    seasons = season - season.min()
+    key = (obs.material * locations + obs.location) * (int(seasons.max()) + 1) + seasons
+    return np.unique(key, return_inverse=True)[1].reshape(-1)
+
+
+def _order_flags(obs, rules, group):
+    """Rows observed before an event that should precede them: ``(rows, earlier rows)``."""
+    sequence = rules.sequence[obs.event]
+    rows = np.flatnonzero(sequence >= 0)
+    rows = rows[np.lexsort((obs.day[rows], sequence[rows], group[rows]))]
+    n = len(rows)
+    if not n:
+        return rows, rows
+    g, s = group[rows], sequence[rows]
+    day = obs.day[rows] - obs.day[rows].min()
+    span = int(day.max()) + 1
+    # Máximo acumulado de (grupo, dia, posição): como os grupos estão em ordem
+    # crescente, o máximo recomeça em cada grupo e guarda a posição do dia mais tardio.
+    running = np.maximum.accumulate((g * span + day) * n + np.arange(n))
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = (g[1:] != g[:-1]) | (s[1:] != s[:-1])
+    previous = np.maximum.accumulate(np.where(new_run, np.arange(n), 0)) - 1
+    valid = previous >= 0
+    valid[valid] = g[previous[valid]] == g[valid]
+    best = running[np.maximum(previous, 0)]
+    late = valid & (day < (best // n) % span)
+    return rows[late], rows[best[late] % n]
+
+
+def _duplicate_flags(obs, rules, group):
+    """Repeated observations of an event in a group: ``(rows, first rows)``."""
+    rows = np.flatnonzero(~rules.allow_repeats[obs.event])
+    rows = rows[np.lexsort((obs.pk[rows], obs.day[rows], obs.event[rows], group[rows]))]
+    if not len(rows):
+        return rows, rows
+    same = np.zeros(len(rows), dtype=bool)
+    same[1:] = (group[rows[1:]] == group[rows[:-1]]) & (obs.event[rows[1:]] == obs.event[rows[:-1]])
+    first = np.maximum.accumulate(np.where(same, 0, np.arange(len(rows))))
+    return rows[same], rows[first[same]]
+
+
+def _season_flags(obs, rules, month):
+    first, last = rules.first_month[obs.event], rules.last_month[obs.event]
+    inside = np.where(first <= last, (month >= first) & (month <= last), (month >= first) | (month <= last))
+    return np.flatnonzero((first > 0) & ~inside)
+
+
+def _history_statistics(event, location, season_day, size):
+    """Count, mean and standard deviation of the day of the season per (event, location) key."""
+    keys, inverse = np.unique(event * size + location, return_inverse=True)
+    count = np.bincount(inverse)
+    mean = np.bincount(inverse, weights=season_day) / count
+    variance = np.bincount(inverse, weights=season_day * season_day) / count - mean * mean
+    deviation = np.sqrt(np.maximum(variance, 0) * count / np.maximum(count - 1, 1))
+    return keys, count, mean, deviation
+
+
+def _outlier_flags(obs, season_day):
+    """
+    Rows whose day of the season is atypical for the event at the location,
+    against all of ``obs`` as history: ``(rows, z, mean, sd)``.
+    """
+    if not len(obs):
+        return np.zeros(0, dtype=np.int64), *(np.zeros(0),) * 3
+    size = int(obs.location.max()) + 1
+    keys, count, mean, deviation = _history_statistics(obs.event, obs.location, season_day.astype(float), size)
+    position = np.searchsorted(keys, obs.event * size + obs.location)
+    known = (count[position] >= MIN_HISTORY) & (deviation[position] > 0)
+    z = np.zeros(len(obs))
+    z[known] = (season_day[known] - mean[position[known]]) / deviation[position[known]]
+    rows = np.flatnonzero(known & (np.abs(z) > Z_LIMIT))
+    return rows, z[rows], mean[position[rows]], deviation[position[rows]]
+
+
+def evaluate(obs: _Observations, rules: _Rules, group_checks: bool = True, outliers: bool = True) -> tuple:
+    """
+    Runs the checks over ``obs``: the order, season and repetition ones
+    (``group_checks``, which need complete groups) and the outlier one
+    (which needs every observation of each (event, location) pair, its own
+    history). Returns ``(flags, groups)``.
+    """
+    season, season_day, month = _seasons(obs.day)
+    group = _groups(obs, season)
+    now = timezone.now()
+    flags = []
+
+    def flag(row, rule, message, score=None):
+        flags.append(PhenologyFlag(
+            observation_id=int(obs.pk[row]), rule=rule, message=message[:255], score=score, checked_at=now,
+        ))
+
+    if group_checks:
+        for row, earlier in zip(*_order_flags(obs, rules, group)):
+            flag(row, PhenologyFlag.Rule.ORDER, (
+                f"Observado antes de {rules.names[obs.event[earlier]]} ({_format_day(obs.day[earlier])}), "
+                f"que deveria precedê-lo."
+            ))
+        for row in _season_flags(obs, rules, month):
+            event = obs.event[row]
+            flag(row, PhenologyFlag.Rule.SEASON, (
+                f"Observado em {MONTHS[month[row]].lower()}, fora da época do evento "
+                f"({MONTHS[rules.first_month[event]].lower()} a {MONTHS[rules.last_month[event]].lower()})."
+            ))
+        for row, first in zip(*_duplicate_flags(obs, rules, group)):
+            flag(row, PhenologyFlag.Rule.DUPLICATE, (
+                f"Evento já registrado na safra em {_format_day(obs.day[first])}."
+            ))
+    if outliers:
+        for row, z, mean, deviation in zip(*_outlier_flags(obs, season_day)):
+            flag(row, PhenologyFlag.Rule.OUTLIER, (
+                f"Dia {season_day[row] + 1} da safra; o histórico do evento neste local é "
+                f"{mean + 1:.0f} ± {deviation:.0f} dias (z = {z:+.1f})."
+            ), score=float(z))
+    return flags, int(group.max()) + 1 if len(group) else 0
+
+
+def _report(obs, groups, flags) -> QualityReport:
+    return QualityReport(len(obs), groups, Counter(flag.rule for flag in flags))
+
+
+def check_all(dry_run: bool = False) -> QualityReport:
+    """Checks every active observation and replaces the whole flag table."""
+    obs = _load(PhenologyObservation.objects.all())
+    flags, groups = evaluate(obs, _rules())
+    if not dry_run:
+        with transaction.atomic():
+            PhenologyFlag.objects.all().delete()
+            PhenologyFlag.objects.bulk_create(flags, batch_size=BULK_BATCH_SIZE)
+    return _report(obs, groups, flags)
+
+
+def _group_filter(keys) -> Q:
+    conditions = []
+    for material_id, location_id, season in keys:
+        start, end = season_range(season)
+        conditions.append(Q(
+            genetic_material_id=material_id, location_id=location_id,
+            observation_date__gte=start, observation_date__lt=end,
+        ))
+    return reduce(or_, conditions)
+
+
+def recheck_groups(keys) -> QualityReport:
+    """
+    Checks again only the observations of the ``(material, location,
+    season)`` groups in ``keys`` and replaces their flags (also those of
+    observations that were deactivated or left the group).
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return QualityReport()
+    if len(keys) > FULL_RECHECK_GROUPS:
+        return check_all()
+
+    parts, stored = [], []
+    for start in range(0, len(keys), GROUP_CHUNK_SIZE):
+        condition = _group_filter(keys[start:start + GROUP_CHUNK_SIZE])
+        parts.append(_load(PhenologyObservation.objects.filter(condition)))
+        stored.extend(PhenologyObservation.all_objects.filter(condition).values_list('pk', 'event_id', 'location_id'))
+    obs = _Observations(*(np.concatenate([getattr(part, name) for part in parts]) for name in (
+        'pk', 'material', 'location', 'event', 'day'
+    )))
+
+    rules = _rules()
+    flags, groups = evaluate(obs, rules, outliers=False)
+    # Data atípica: o histórico de cada par (evento, local) afetado mudou para todas as suas observações.
+    events = {event for _, event, _ in stored}
+    locations = {location for _, _, location in stored}
+    stored = [pk for pk, _, _ in stored]
+    pairs = PhenologyObservation.objects.filter(event_id__in=events, location_id__in=locations)
+    outliers, _ = evaluate(_load(pairs), rules, group_checks=False)
+    with transaction.atomic():
+        for start in range(0, len(stored), BULK_BATCH_SIZE):
+            PhenologyFlag.objects.filter(observation_id__in=stored[start:start + BULK_BATCH_SIZE]).delete()
+        if events:
+            PhenologyFlag.objects.filter(
+                rule=PhenologyFlag.Rule.OUTLIER, observation__event_id__in=events,
+                observation__location_id__in=locations,
+            ).delete()
+        PhenologyFlag.objects.bulk_create(flags + outliers, batch_size=BULK_BATCH_SIZE)
+    return _report(obs, groups, flags + outliers)
+
+
+def recheck_event(event_id: int) -> QualityReport:
+    """Checks again every group with observations of the event (after its rules change)."""
+    keys = {
+        group_of(material_id, location_id, date)
+        for material_id, location_id, date in PhenologyObservation.objects.filter(event_id=event_id)
+        .order_by().values_list('genetic_material_id', 'location_id', 'observation_date')
+    }
+    return recheck_groups(keys)
+
+
+def schedule_recheck(keys) -> None:
+    """Rechecks the groups after the current transaction commits."""
+    keys = set(keys)
+    if keys:
+        transaction.on_commit(lambda: recheck_groups(keys))
@@ -0,0 +1,268 @@
+"""
+Importação em lote de fotos a partir de um diretório ou arquivo ZIP.
+
+Os arquivos são associados aos materiais pelo ``internal_code`` ou
+``accession_code`` presente no nome (ex.: ``C1xS5A25H1_fruto.jpg``). A
+validação e a recodificação das imagens (decodificação, rotação EXIF, redução
+e JPEG) rodam em um pool de processos, ou no próprio processo com
+``workers=1``; o processo principal apenas grava os arquivos no storage
+deduplicado e cria as fotos com ``bulk_create``.
+"""
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+import django
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from . import audit, detail_cache, listing
+from .models import GeneticMaterial, GeneticMaterialPhoto
+from .storage import content_path
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp', '.bmp'}
+MAX_DIMENSION = 2048
+JPEG_QUALITY = 85
+BULK_BATCH_SIZE = 500
+# Início dos processos do pool; o comando usa 'fork', seguro fora do servidor web.
+START_METHOD = 'spawn'
+TOKEN_SEPARATORS = re.compile(r'[\s_\-().,]+')
+
+
+class PhotoTask(NamedTuple):
+    name: str
+    archive: str | None
+    member: str
+    max_dimension: int
+    material_id: int
+    caption: str
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    duplicates: int = 0
+    unmatched: list = field(default_factory=list)
+    ambiguous: list = field(default_factory=list)
+    invalid: list = field(default_factory=list)
+    ignored: list = field(default_factory=list)
+
+
+def _list_sources(path: str) -> list:
+    """
+    Returns ``(name, archive, member)`` for each image file: ``archive`` is the
+    ZIP path (or None) and ``member`` the file path or ZIP member name.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            return [
+                (os.path.basename(info.filename), path, info.filename)
+                for info in archive.infolist()
+                if not info.is_dir()
+            ]
+    sources = []
+    for root, _, files in os.walk(path):
+        for filename in sorted(files):
+            sources.append((filename, None, os.path.join(root, filename)))
+    return sources
+
+
+def _code_index() -> dict:
+    """Maps every upper-cased internal/accession code to the pks that use it."""
+    index = {}
+    rows = GeneticMaterial.objects.values_list('pk', 'internal_code', 'accession_code')
+    for pk, *codes in rows.iterator(chunk_size=5000):
+        for code in codes:
+            if code:
+                index.setdefault(code.upper(), set()).add(pk)
+    return index
+
+
+def match_filename(filename: str, index: dict):
+    """
+    Returns ``(pks, caption)`` for the code found in ``filename``: the whole
+    name is tried first, then each token; the remaining tokens form the caption.
+    """
+    stem = os.path.splitext(filename)[0].strip()
+    if stem.upper() in index:
+        return index[stem.upper()], ''
+    tokens = [token for token in TOKEN_SEPARATORS.split(stem) if token]
+    for position, token in enumerate(tokens):
+        if token.upper() in index:
+            caption = ' '.join(tokens[:position] + tokens[position + 1:])
+            return index[token.upper()], caption
+    return set(), ''
+
+
+# ZIPs abertos por cada processo do pool: reabrir o arquivo a cada foto
+# releria o diretório central inteiro.
+_archives = {}
+
+
+def _worker_archive(path):
+    if path not in _archives:
+        _archives[path] = zipfile.ZipFile(path)
+    return _archives[path]
+
+
+def encode_image(task: PhotoTask):
+    """
+    Worker: reads, validates and re-encodes one image as JPEG.
+
+    Returns ``(task, data, digest, error)``; runs in a separate process and
+    does not touch the database.
+    """
+    try:
+        if task.archive:
+            raw = _worker_archive(task.archive).read(task.member)
+        else:
+            with open(task.member, 'rb') as handle:
+                raw = handle.read()
+
+        with Image.open(io.BytesIO(raw)) as image:
+            image.verify()
+        with Image.open(io.BytesIO(raw)) as image:
+            # Em JPEGs, draft() decodifica já em escala reduzida (1/2, 1/4, 1/8),
+            # bem mais rápido que decodificar tudo e reduzir depois.
+            image.draft('RGB', (task.max_dimension, task.max_dimension))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((task.max_dimension, task.max_dimension))
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=JPEG_QUALITY)
+    except Exception as error:  # Pillow levanta exceções de vários tipos.
+        return task, None, None, str(error) or error.__class__.__name__
+
+    data = output.getvalue()
+    return task, data, hashlib.sha256(data).hexdigest(), None
+
+
+def _executor(workers, start_method):
+    """
+    Process pool for the image encoding. 'fork' avoids importing Django again
+    in each process but is only safe in a single-threaded process (the
+    management command); elsewhere the workers start clean and set up Django.
+    """
+    if start_method not in multiprocessing.get_all_start_methods():
+        start_method = 'spawn'
+    context = multiprocessing.get_context(start_method)
+    initializer = None if start_method == 'fork' else django.setup
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=initializer)
+
+
+def _encode_in_process(tasks):
+    """
+    Encodes the images in the current process, closing the ZIPs it opened.
+    """
+    opened = {task.archive for task in tasks if task.archive} - set(_archives)
+    try:
+        for task in tasks:
+            yield encode_image(task)
+    finally:
+        for path in opened:
+            archive = _archives.pop(path, None)
+            if archive is not None:
+                archive.close()
+
+
+def import_photos(path, workers=None, max_dimension=MAX_DIMENSION,
+                  batch_size=BULK_BATCH_SIZE, dry_run=False, start_method=START_METHOD) -> ImportReport:
+    """
+    Imports every image in the directory or ZIP at ``path``. With
+    ``workers=1`` the images are encoded in the current process, without a
+    pool. Only pass ``start_method='fork'`` from a single-threaded process:
+    forking a threaded web worker can leave locks held in the children.
+
+    Files whose content is already attached to the same material are counted
+    as duplicates and skipped, so re-running an import is harmless.
+    """
+    report = ImportReport()
+    index = _code_index()
+
+    tasks = []
+    for name, archive, member in _list_sources(path):
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            report.ignored.append(name)
+            continue
+        pks, caption = match_filename(name, index)
+        if not pks:
+            report.unmatched.append(name)
+        elif len(pks) > 1:
+            report.ambiguous.append(name)
+        else:
+            tasks.append(PhotoTask(name, archive, member, max_dimension, next(iter(pks)), caption))
+
+    if not tasks:
+        return report
+
+    storage = GeneticMaterialPhoto._meta.get_field('image').storage
+    material_ids = {task.material_id for task in tasks}
+    existing = set(
+        GeneticMaterialPhoto.all_objects
+        .filter(genetic_material_id__in=material_ids)
+        .exclude(content_hash='')
+        .values_list('genetic_material_id', 'content_hash')
+    )
+
+    pending = []
+    touched = set()
+
+    def flush():
+        if pending and not dry_run:
+            with transaction.atomic():
+                audit.record_created(GeneticMaterialPhoto.objects.bulk_create(pending, batch_size=batch_size))
+        report.created += len(pending)
+        pending.clear()
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    with contextlib.ExitStack() as stack:
+        if workers > 1:
+            if start_method == 'fork':
+                # Conexões abertas não podem ser herdadas pelos processos filhos: ao
+                # encerrar, eles fechariam a conexão do processo principal.
+                for connection in connections.all(initialized_only=True):
+                    if not connection.in_atomic_block:
+                        connection.close()
+            executor = stack.enter_context(_executor(workers, start_method))
+            results = executor.map(encode_image, tasks, chunksize=8)
+        else:
+            results = stack.enter_context(contextlib.closing(_encode_in_process(tasks)))
+        for task, data, digest, error in results:
+            if error:
+                report.invalid.append((task.name, error))
+                continue
+            if (task.material_id, digest) in existing:
+                report.duplicates += 1
+                continue
+            existing.add((task.material_id, digest))
+
+            image_name = content_path(digest, 'photo.jpg')
+            if not dry_run:
+                content = ContentFile(data)
+                content.content_hash = digest
+                image_name = storage.save(image_name, content)
+            pending.append(GeneticMaterialPhoto(
+                genetic_material_id=task.material_id,
+                image=image_name,
+                content_hash=digest,
+                caption=task.caption[:255],
+            ))
+            touched.add(task.material_id)
+            if len(pending) >= batch_size:
+                flush()
+    flush()
+
+    if not dry_run:
+        # bulk_create não dispara sinais.
+        detail_cache.invalidate(touched)
+        listing.refresh_materials(touched)
+    return report
@@ -0,0 +1,189 @@
+"""
+Matriz material × doença das reações registradas em ``DiseaseReaction``.
+
+Cada material tem um ``ReactionProfile`` com as suas reações em pares
+``doença:código`` (1 = R, 2 = MR, 3 = MS, 4 = S), de modo que o perfil cresce
+com o número de reações do material, e não com o maior id de doença. Os sinais
+recalculam apenas o perfil do material cuja reação mudou e trocam o token de
+versão da matriz. A matriz (NumPy, uint8, 0 = sem registro) é montada a partir
+dos perfis dos materiais ativos com uma única consulta, com uma coluna densa
+por doença que tem alguma reação, guardada no cache compartilhado sob o token
+atual e mantida também na memória do processo, de modo que os filtros por
+vários limiares de doença são operações vetorizadas sobre o banco inteiro.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from . import caching
+from .models import DiseaseReaction, GeneticMaterial, ReactionProfile
+
+Level = DiseaseReaction.ReactionLevel
+
+MISSING = 0
+CODES = {
+    Level.RESISTANT: 1,
+    Level.MODERATELY_RESISTANT: 2,
+    Level.MODERATELY_SUSCEPTIBLE: 3,
+    Level.SUSCEPTIBLE: 4,
+}
+LETTERS = {code: level.value for level, code in CODES.items()}
+MATRIX_VERSION_KEY = 'germoplasm:reaction-matrix-version'
+MATRIX_CACHE_TIMEOUT = 60 * 60 * 24
+BULK_BATCH_SIZE = 1000
+
+# Matriz da versão atual no processo: (versão, ReactionMatrix).
+_local = [None, None]
+
+
+def _position(ids: np.ndarray, pk: int):
+    """Index of ``pk`` in the sorted ``ids``, or None."""
+    position = int(np.searchsorted(ids, pk))
+    if position < len(ids) and ids[position] == pk:
+        return position
+    return None
+
+
+@dataclass(frozen=True)
+class ReactionMatrix:
+    # Ids dos materiais ativos com alguma reação, em ordem crescente.
+    material_ids: np.ndarray
+    # Ids das doenças com alguma reação, em ordem crescente: a coluna j é a de disease_ids[j].
+    disease_ids: np.ndarray
+    # (materiais × doenças)
+    codes: np.ndarray
+
+    def column(self, disease_id: int) -> np.ndarray:
+        position = _position(self.disease_ids, disease_id)
+        if position is None:
+            return np.zeros(len(self.material_ids), dtype=np.uint8)
+        return self.codes[:, position]
+
+    def row(self, material_id: int):
+        """Codes of one material, or None when it has no reaction."""
+        position = _position(self.material_ids, material_id)
+        return None if position is None else self.codes[position]
+
+    def levels(self, material_id: int, disease_ids) -> list:
+        """Reaction letters (R, MR, MS, S or '') of one material for ``disease_ids``."""
+        codes = self.row(material_id)
+        if codes is None:
+            return [''] * len(disease_ids)
+        positions = [_position(self.disease_ids, pk) for pk in disease_ids]
+        return ['' if position is None else LETTERS.get(int(codes[position]), '') for position in positions]
+
+    def matching(self, thresholds: dict) -> np.ndarray:
+        """
+        Ids of the materials whose reaction to every disease of ``thresholds``
+        (``{disease_id: worst accepted code}``) is recorded and at most that code.
+        """
+        mask = np.ones(len(self.material_ids), dtype=bool)
+        for disease_id, worst in thresholds.items():
+            column = self.column(disease_id)
+            mask &= (column != MISSING) & (column <= worst)
+        return self.material_ids[mask]
+
+
+def encode(codes_by_disease: dict) -> str:
+    """Encodes ``{disease_id: code}`` as ``disease:code`` pairs in disease order (``'1:1,7:4'``)."""
+    return ','.join(f'{disease_id}:{code}' for disease_id, code in sorted(codes_by_disease.items()))
+
+
+def decode(text: str) -> dict:
+    """Inverse of ``encode``."""
+    if not text:
+        return {}
+    return {int(disease_id): int(code) for disease_id, code in (pair.split(':') for pair in text.split(','))}
+
+
+def refresh_materials(material_ids) -> None:
+    """Recomputes the profiles of the given materials and invalidates the matrix."""
+    material_ids = {pk for pk in material_ids if pk}
+    if not material_ids:
+        return
+    material_ids = GeneticMaterial.all_objects.filter(pk__in=material_ids).values_list('pk', flat=True)
+    codes = {pk: {} for pk in material_ids}
+    reactions = (
+        DiseaseReaction.objects
+        .filter(genetic_material_id__in=codes)
+        .exclude(reaction='')
+        .values_list('genetic_material_id', 'disease_id', 'reaction')
+    )
+    for material_id, disease_id, reaction in reactions:
+        codes[material_id][disease_id] = CODES[reaction]
+    ReactionProfile.objects.bulk_create(
+        [
+            ReactionProfile(genetic_material_id=pk, codes=encode(by_disease))
+            for pk, by_disease in codes.items()
+        ],
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['genetic_material'],
+        update_fields=['codes', 'updated_at'],
+    )
+    invalidate()
+
+
+def rebuild() -> int:
+    """Recomputes the profiles of every material; returns how many have reactions."""
+    ids = list(GeneticMaterial.all_objects.values_list('pk', flat=True))
+    for start in range(0, len(ids), BULK_BATCH_SIZE):
+        refresh_materials(ids[start:start + BULK_BATCH_SIZE])
+    return ReactionProfile.objects.exclude(codes='').count()
+
+
+def invalidate() -> None:
+    # Após o commit: outro processo não pode remontar a matriz com dados antigos sob o token novo.
+    transaction.on_commit(lambda: caching.bump_versions([MATRIX_VERSION_KEY]))
+
+
+def _build() -> ReactionMatrix:
+    # Sempre do principal: a matriz fica no cache sob o token novo, e uma réplica
+    # atrasada a montaria sem a reação que acabou de trocar o token.
+    rows = list(
+        ReactionProfile.objects.using(DEFAULT_DB_ALIAS)
+        .filter(genetic_material__is_active=True)
+        .exclude(codes='')
+        .order_by('genetic_material_id')
+        .values_list('genetic_material_id', 'codes')
+    )
+    material_ids = np.fromiter((pk for pk, _ in rows), dtype=np.int64, count=len(rows))
+    # Uma entrada (linha, doença, código) por reação; as colunas são as doenças presentes.
+    entries = np.array(
+        [(i, disease_id, code) for i, (_, text) in enumerate(rows) for disease_id, code in decode(text).items()],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    disease_ids, columns = np.unique(entries[:, 1], return_inverse=True)
+    codes = np.zeros((len(rows), len(disease_ids)), dtype=np.uint8)
+    codes[entries[:, 0], columns] = entries[:, 2]
+    return ReactionMatrix(material_ids=material_ids, disease_ids=disease_ids, codes=codes)
+
+
+def get_matrix() -> ReactionMatrix:
+    """Returns the current matrix (process memory, then shared cache, then database)."""
+    version = caching.get_version(MATRIX_VERSION_KEY)
+    if _local[0] == version:
+        return _local[1]
+    key = f'germoplasm:reaction-matrix:{version}'
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = _build()
+        cache.set(key, matrix, MATRIX_CACHE_TIMEOUT)
+    _local[:] = [version, matrix]
+    return matrix
+
+
+def matching_materials(thresholds: dict, queryset=None):
+    """
+    Filters ``queryset`` (active materials by default) to the materials that
+    meet every threshold ``{disease_id: worst accepted level or code}``.
+    """
+    if queryset is None:
+        queryset = GeneticMaterial.objects.all()
+    thresholds = {
+        int(disease_id): CODES.get(worst, worst) for disease_id, worst in thresholds.items()
+    }
+    ids = get_matrix().matching(thresholds)
+    return queryset.filter(pk__in=ids.tolist())
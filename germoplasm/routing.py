@@ -0,0 +1,89 @@
+"""
+Roteamento das leituras para réplicas do banco.
+
+As requisições de relatórios, exportações e da API (``DATABASE_REPLICA_PATHS``)
+leem de uma das réplicas de ``DATABASE_REPLICAS``; todo o resto — gravações,
+o admin, leituras dentro de transações, sessões e usuários — usa o banco
+principal (``default``).
+
+Réplicas podem estar atrasadas: depois de uma requisição que grava (método
+não seguro), o cliente recebe um cookie que o mantém no banco principal por
+``DATABASE_REPLICA_PIN_SECONDS``, de modo que ele sempre lê o que acabou de
+gravar.
+
+Fora das requisições (comandos, tarefas) as leituras vão para o principal,
+exceto dentro de ``replica_reads()``.
+
+Caches derivados guardados sob um token de versão (a matriz de reações) são
+montados sempre a partir do principal: o token troca no commit do principal,
+e uma réplica atrasada deixaria o cache novo sem a alteração por todo o TTL.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary_pin'
+# Tabelas pequenas cuja leitura não pode estar atrasada (login, permissões).
+PRIMARY_ONLY_APPS = {'auth', 'sessions', 'contenttypes', 'admin'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replicas() -> list:
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def use_replicas(enabled: bool) -> None:
+    """Sets whether reads of the current request (or task) may use the replicas."""
+    _replica_reads.set(enabled)
+
+
+@contextmanager
+def replica_reads(enabled: bool = True):
+    """Reads inside the block go to the replicas (or to the primary with ``enabled=False``)."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def is_replica_path(path: str, method: str) -> bool:
+    if method not in SAFE_METHODS and not any(
+        path.startswith(prefix) for prefix in getattr(settings, 'DATABASE_REPLICA_READONLY_POST_PATHS', ())
+    ):
+        return False
+    return any(path.startswith(prefix) for prefix in getattr(settings, 'DATABASE_REPLICA_PATHS', ()))
+
+
+class ReplicaRouter:
+    """Sends reads to a random replica when allowed; writes always go to the primary."""
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or not _replica_reads.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        # Dentro de uma transação a leitura precisa ver o que ela gravou.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # As réplicas são cópias do principal: os objetos podem se relacionar.
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # O esquema chega às réplicas pela replicação (ou cópia) do principal.
+        if db in replicas():
+            return False
+        return None
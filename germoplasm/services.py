@@ -1,5 +1,122 @@
-from django.db import transaction
-from .models import GeneticMaterial
+import random
+import time
+
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, transaction
+
+from . import caching
+from .models import (
+    CodeCounter,
+    GeneticMaterial,
+    Population,
+    allocation_atomic,
+    highest_code_number,
+    save_with_code,
+)
+
+SEPLAN_CODES_VERSION_KEY = 'germoplasm:seplan-codes-version'
+SEPLAN_CODES_PAGE_SIZE = 20
+SEPLAN_CODES_CACHE_TIMEOUT = 60 * 60
+HYBRID_MARKER = 'H'
+MUTATION_MARKER = 'M'
+CONFLICT_RETRY_ATTEMPTS = 6
+CONFLICT_RETRY_DELAY = 0.05
+
+
+def retry_on_conflict(func, attempts: int = CONFLICT_RETRY_ATTEMPTS, delay: float = CONFLICT_RETRY_DELAY):
+    """
+    Runs ``func()`` in a transaction and returns its result, retrying with
+    exponential backoff when it fails with a lock, serialization or unique
+    conflict (OperationalError/IntegrityError). Inside an outer transaction
+    ``func`` runs once: a failed transaction can only be retried as a whole.
+    """
+    if transaction.get_connection().in_atomic_block:
+        return func()
+    for attempt in range(attempts):
+        try:
+            with allocation_atomic():
+                return func()
+        except (OperationalError, IntegrityError):
+            if attempt == attempts - 1:
+                raise
+            time.sleep(delay * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+@allocation_atomic()
+def create_hybrid(population: Population, **fields) -> GeneticMaterial:
+    """
+    Creates the next HYBRID of ``population``, coded ``{population.code}H{n}``
+    (also used as name when none is given). ``n`` comes from the population's
+    row-locked counter, so concurrent creations never share a number; codes
+    of inactive hybrids stay reserved.
+    """
+    hybrid = GeneticMaterial(
+        material_type=GeneticMaterial.MaterialType.HYBRID,
+        population=population,
+        mother=population.parent1,
+        father=population.parent2,
+        **fields,
+    )
+
+    def allocate():
+        code = reserve_hybrid_codes(population)[0]
+        if not fields.get('name'):
+            hybrid.name = code
+        return code
+
+    save_with_code(hybrid, 'accession_code', allocate, hybrid.save)
+    return hybrid
+
+
+def hybrid_counter_key(population: Population) -> str:
+    return f'hybrid:{population.pk}'
+
+
+def mutation_counter_key(origin: GeneticMaterial) -> str:
+    return f'mutation:{origin.pk}'
+
+
+def reserve_hybrid_codes(population: Population, count: int = 1) -> list:
+    """
+    Allocates the next ``count`` hybrid codes of ``population``
+    (``{population.code}H{n}``) from its row-locked counter.
+    """
+    last = CodeCounter.next_value(
+        hybrid_counter_key(population),
+        floor=lambda: highest_code_number(
+            GeneticMaterial.all_objects.filter(population=population).values_list('accession_code', flat=True),
+            population.code, HYBRID_MARKER,
+        ),
+        count=count,
+    )
+    return [f"{population.code}{HYBRID_MARKER}{number}" for number in range(last - count + 1, last + 1)]
+
+
+def reserve_mutation_codes(origin: GeneticMaterial, count: int = 1) -> list:
+    """
+    Allocates the codes of the next ``count`` mutants of ``origin``
+    (``{code}M{n}``) from its row-locked counter. Call it inside the
+    transaction that saves the mutants.
+    """
+    origin_code = origin.get_display_code()
+    last = CodeCounter.next_value(
+        mutation_counter_key(origin),
+        floor=lambda: highest_code_number(
+            GeneticMaterial.all_objects.filter(mutated_from=origin).values_list('accession_code', flat=True),
+            origin_code, MUTATION_MARKER,
+        ),
+        count=count,
+    )
+    return [f"{origin_code}{MUTATION_MARKER}{number}" for number in range(last - count + 1, last + 1)]
+
+
+def next_mutation_code(origin: GeneticMaterial) -> str:
+    """
+    Allocates the code of the next mutant of ``origin`` (``{code}M{n}``).
+    Call it inside the transaction that saves the mutant.
+    """
+    return reserve_mutation_codes(origin)[0]
+
 
 @transaction.atomic
 def promote_hybrid_to_selection(hybrid: GeneticMaterial) -> GeneticMaterial:
@@ -37,3 +154,33 @@ def promote_selection_to_cultivar(selection: GeneticMaterial) -> GeneticMaterial
     selection.save()
     
     return selection
+
+def search_seplan_codes(prefix: str = '', page: int = 1, page_size: int = SEPLAN_CODES_PAGE_SIZE):
+    """
+    Returns ``(codes, has_more)`` with one page of the distinct Seplan codes
+    starting with ``prefix``.
+
+    The prefix is applied as a range (``>= prefix`` and ``< prefix + U+10FFFF``),
+    which is served by the ``population_seplan_idx`` B-tree index on any
+    database, and only ``page_size + 1`` rows are read. Pages are cached until
+    the next Population save or delete.
+    """
+    prefix = prefix.strip()
+    page = max(page, 1)
+    version = caching.get_version(SEPLAN_CODES_VERSION_KEY)
+    key = f'germoplasm:seplan-codes:{version}:{page_size}:{page}:{prefix}'
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    qs = Population.all_objects.exclude(seplan_code__isnull=True).exclude(seplan_code__exact='')
+    if prefix:
+        qs = qs.filter(seplan_code__gte=prefix, seplan_code__lt=prefix + '\U0010ffff')
+    offset = (page - 1) * page_size
+    codes = list(
+        qs.order_by('seplan_code').values_list('seplan_code', flat=True)
+        .distinct()[offset:offset + page_size + 1]
+    )
+    result = (codes[:page_size], len(codes) > page_size)
+    cache.set(key, result, SEPLAN_CODES_CACHE_TIMEOUT)
+    return result
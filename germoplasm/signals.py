@@ -0,0 +1,442 @@
+"""
+Receptores de sinais do app germoplasm.
+
+Mantêm caches e estruturas derivadas coerentes com as gravações feitas pelo
+admin e pelos serviços.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import (
+    audit,
+    caching,
+    detail_cache,
+    diversity,
+    gene_dropping,
+    genotypes,
+    inventory,
+    listing,
+    pedigree_graph,
+    phenology_qc,
+    reaction_matrix,
+    services,
+    weather,
+)
+from .models import (
+    Disease,
+    DiseaseReaction,
+    GeneticMaterial,
+    GeneticMaterialPhoto,
+    GenotypeMatrix,
+    Location,
+    PhenologicalEvent,
+    PhenologyObservation,
+    Planting,
+    Population,
+    S_Allele,
+    WeatherSeries,
+)
+
+
+def remember_stored_state(sender, instance, raw=False, **kwargs):
+    """
+    Reads the stored row once per save (tracked fields of the history), so
+    the post_save receivers can tell what changed without further queries.
+    """
+    instance._stored_state = None if raw else audit.stored_state(instance)
+
+
+def _stored(instance, names):
+    """Stored values of ``names`` before the current save, or None for new rows."""
+    state = getattr(instance, '_stored_state', None)
+    if state is None:
+        return None
+    return {name: state[name] for name in names}
+
+
+for _model in audit.AUDITED_MODELS:
+    pre_save.connect(remember_stored_state, sender=_model, dispatch_uid=f'remember_stored_state_{_model.__name__}')
+
+
+@receiver(post_save, sender=GeneticMaterial)
+def invalidate_pedigree_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stored = _stored(instance, pedigree_graph.GENEALOGY_FIELDS)
+    current = {name: getattr(instance, name) for name in pedigree_graph.GENEALOGY_FIELDS}
+    if not created and stored == current:
+        return
+    # Os parentais antigos também perdem este material da sua descendência.
+    previous = [stored[name] for name in ('mother_id', 'father_id', 'mutated_from_id')] if stored else []
+    pedigree_graph.invalidate([instance.pk, *previous])
+
+
+@receiver(pre_delete, sender=GeneticMaterial)
+def invalidate_pedigree_on_delete(sender, instance, **kwargs):
+    # Executado antes da exclusão, enquanto os vínculos ainda podem ser percorridos.
+    pedigree_graph.invalidate([instance.pk])
+
+
+POPULATION_GRAPH_FIELDS = ('code', 'parent1_id', 'parent2_id')
+
+
+@receiver(post_save, sender=Population)
+@receiver(post_delete, sender=Population)
+def invalidate_pedigree_on_population_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = {name: getattr(instance, name) for name in POPULATION_GRAPH_FIELDS}
+    if kwargs.get('created') is False and _stored(instance, POPULATION_GRAPH_FIELDS) == current:
+        return
+    hybrids = GeneticMaterial.all_objects.filter(population=instance).values_list('pk', flat=True)
+    pedigree_graph.invalidate([instance.parent1_id, instance.parent2_id, *hybrids])
+
+
+@receiver(post_save, sender=Population)
+@receiver(post_delete, sender=Population)
+def invalidate_seplan_codes(sender, instance, raw=False, **kwargs):
+    caching.bump_versions([services.SEPLAN_CODES_VERSION_KEY])
+
+
+@receiver(post_save, sender=GeneticMaterial)
+def invalidate_detail_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    The material's own entry is keyed by ``updated_at``; parents and children
+    list this material, so they are invalidated when a field they show changes.
+    """
+    if raw:
+        return
+    stored = _stored(instance, detail_cache.RELATED_FIELDS)
+    current = {name: getattr(instance, name) for name in detail_cache.RELATED_FIELDS}
+    if not created and stored == current:
+        return
+    parents = [current[name] for name in ('mother_id', 'father_id', 'mutated_from_id')]
+    if stored:
+        parents += [stored[name] for name in ('mother_id', 'father_id', 'mutated_from_id')]
+    children = GeneticMaterial.all_objects.filter(
+        Q(mother=instance) | Q(father=instance) | Q(mutated_from=instance)
+    ).values_list('pk', flat=True)
+    detail_cache.invalidate([instance.pk, *parents, *children])
+
+
+@receiver(pre_delete, sender=GeneticMaterial)
+def invalidate_detail_on_delete(sender, instance, **kwargs):
+    detail_cache.invalidate([instance.mother_id, instance.father_id, instance.mutated_from_id])
+
+
+@receiver(post_save, sender=DiseaseReaction)
+@receiver(post_delete, sender=DiseaseReaction)
+@receiver(post_save, sender=GeneticMaterialPhoto)
+@receiver(post_delete, sender=GeneticMaterialPhoto)
+@receiver(post_save, sender=PhenologyObservation)
+@receiver(post_delete, sender=PhenologyObservation)
+@receiver(post_save, sender=Planting)
+@receiver(post_delete, sender=Planting)
+def invalidate_detail_on_related_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    detail_cache.invalidate([instance.genetic_material_id])
+
+
+@receiver(m2m_changed, sender=GeneticMaterial.s_alleles.through)
+def invalidate_detail_on_s_alleles_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        detail_cache.invalidate([instance.pk])
+    elif pk_set:
+        detail_cache.invalidate(pk_set)
+    else:
+        # Um clear() a partir do alelo não informa os materiais afetados.
+        detail_cache.invalidate_all()
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=PhenologicalEvent)
+@receiver(post_delete, sender=PhenologicalEvent)
+@receiver(post_save, sender=S_Allele)
+@receiver(post_delete, sender=S_Allele)
+@receiver(post_save, sender=Population)
+@receiver(post_delete, sender=Population)
+@receiver(post_save, sender=Disease)
+@receiver(post_delete, sender=Disease)
+def invalidate_detail_on_lookup_change(sender, instance, raw=False, **kwargs):
+    # Nomes de locais, eventos, alelos, populações e doenças aparecem em muitas representações.
+    if raw:
+        return
+    detail_cache.invalidate_all()
+
+
+@receiver(post_save, sender=GeneticMaterial)
+def refresh_inventory_on_material_change(sender, instance, created, raw=False, **kwargs):
+    # O resumo guarda o tipo do material e considera apenas materiais ativos.
+    stored = _stored(instance, ('material_type', 'is_active'))
+    if raw or created or stored is None:
+        return
+    if stored != {'material_type': instance.material_type, 'is_active': instance.is_active}:
+        inventory.refresh_materials([instance.pk])
+
+
+@receiver(post_save, sender=Planting)
+@receiver(post_delete, sender=Planting)
+def refresh_inventory_on_planting_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pairs = [(instance.location_id, instance.genetic_material_id)]
+    stored = _stored(instance, ('location_id', 'genetic_material_id'))
+    if stored:
+        pairs.append((stored['location_id'], stored['genetic_material_id']))
+    inventory.refresh_pairs(pairs)
+
+
+@receiver(post_save, sender=DiseaseReaction)
+@receiver(post_delete, sender=DiseaseReaction)
+def refresh_reaction_profile(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    materials = [instance.genetic_material_id]
+    stored = _stored(instance, ('genetic_material_id',))
+    if stored:
+        materials.append(stored['genetic_material_id'])
+    reaction_matrix.refresh_materials(materials)
+
+
+@receiver(post_save, sender=GeneticMaterial)
+@receiver(post_delete, sender=GeneticMaterial)
+def invalidate_reaction_matrix_on_material_change(sender, instance, raw=False, **kwargs):
+    # A matriz contém apenas materiais ativos.
+    if raw:
+        return
+    if 'created' in kwargs:  # post_save
+        stored = _stored(instance, ('is_active',))
+        if kwargs['created'] or (stored and stored['is_active'] == instance.is_active):
+            return
+    reaction_matrix.invalidate()
+
+
+DIVERSITY_MATERIAL_FIELDS = ('mother_id', 'father_id', 'mutated_from_id', 'population_id', 'material_type', 'is_active')
+DIVERSITY_POPULATION_FIELDS = ('parent1_id', 'parent2_id', 'cross_date', 'is_active')
+
+
+@receiver(post_save, sender=GeneticMaterial)
+@receiver(post_delete, sender=GeneticMaterial)
+@receiver(post_save, sender=Population)
+@receiver(post_delete, sender=Population)
+def invalidate_diversity(sender, instance, raw=False, **kwargs):
+    # As coortes dependem da genealogia, do tipo, da data de cruzamento e dos materiais ativos.
+    if raw:
+        return
+    fields = DIVERSITY_MATERIAL_FIELDS if sender is GeneticMaterial else DIVERSITY_POPULATION_FIELDS
+    if kwargs.get('created') is False and _stored(instance, fields) == {name: getattr(instance, name) for name in fields}:
+        return
+    diversity.invalidate()
+
+
+GENE_DROPPING_FIELDS = ('mother_id', 'father_id', 'mutated_from_id')
+
+
+@receiver(post_save, sender=GeneticMaterial)
+@receiver(post_delete, sender=GeneticMaterial)
+def invalidate_gene_dropping(sender, instance, raw=False, **kwargs):
+    # Materiais inativos continuam na genealogia: só os parentais importam. Um
+    # material novo sem parentais não muda nenhuma simulação já feita; a
+    # exclusão sempre invalida, pois o SET_NULL altera os filhos sem sinal.
+    if raw:
+        return
+    parents = {name: getattr(instance, name) for name in GENE_DROPPING_FIELDS}
+    created = kwargs.get('created')
+    if created and not any(parents.values()):
+        return
+    if created is False and _stored(instance, GENE_DROPPING_FIELDS) == parents:
+        return
+    gene_dropping.invalidate()
+
+
+@receiver(m2m_changed, sender=GeneticMaterial.s_alleles.through)
+def invalidate_gene_dropping_on_s_alleles_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        gene_dropping.invalidate()
+
+
+@receiver(post_save, sender=WeatherSeries)
+@receiver(post_delete, sender=WeatherSeries)
+def invalidate_weather(sender, instance, raw=False, **kwargs):
+    if not raw:
+        weather.invalidate()
+
+
+PHENOLOGY_GROUP_FIELDS = ('genetic_material_id', 'location_id', 'observation_date')
+
+
+@receiver(post_save, sender=PhenologyObservation)
+@receiver(post_delete, sender=PhenologyObservation)
+def recheck_phenology_quality(sender, instance, raw=False, **kwargs):
+    # O grupo atual e, se a observação mudou de material, local ou data, o anterior.
+    if raw:
+        return
+    keys = {phenology_qc.group_of(*(getattr(instance, name) for name in PHENOLOGY_GROUP_FIELDS))}
+    stored = _stored(instance, PHENOLOGY_GROUP_FIELDS)
+    if stored:
+        keys.add(phenology_qc.group_of(*(stored[name] for name in PHENOLOGY_GROUP_FIELDS)))
+    phenology_qc.schedule_recheck(keys)
+
+
+@receiver(pre_save, sender=PhenologicalEvent)
+def remember_phenology_rules(sender, instance, raw=False, **kwargs):
+    instance._stored_rules = None if raw or instance.pk is None else (
+        PhenologicalEvent.objects.filter(pk=instance.pk).values(*phenology_qc.RULE_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=PhenologicalEvent)
+def recheck_phenology_on_rules_change(sender, instance, created, raw=False, **kwargs):
+    stored = getattr(instance, '_stored_rules', None)
+    if raw or created or stored is None:
+        return
+    if stored != {name: getattr(instance, name) for name in phenology_qc.RULE_FIELDS}:
+        transaction.on_commit(lambda: phenology_qc.recheck_event(instance.pk))
+
+
+@receiver(post_save, sender=GeneticMaterial)
+def refresh_listing_on_material_save(sender, instance, created, raw=False, **kwargs):
+    """
+    The material's own listing, the offspring counts of its old and new
+    parents and, when its code changes, the parent codes of its children.
+    """
+    if raw:
+        return
+    stored = _stored(instance, listing.LISTED_FIELDS)
+    current = {name: getattr(instance, name) for name in listing.LISTED_FIELDS}
+    if not created and stored == current:
+        return
+    materials = [instance.pk, *(current[name] for name in listing.PARENT_FIELDS)]
+    if stored:
+        materials += [stored[name] for name in listing.PARENT_FIELDS]
+        if any(stored[name] != current[name] for name in listing.LABEL_FIELDS):
+            materials += listing.children_of([instance.pk])
+    listing.schedule_refresh(materials)
+
+
+@receiver(pre_delete, sender=GeneticMaterial)
+def refresh_listing_on_material_delete(sender, instance, **kwargs):
+    # Agendado antes da exclusão, enquanto os filhos ainda apontam para o material.
+    listing.schedule_refresh([
+        *(getattr(instance, name) for name in listing.PARENT_FIELDS),
+        *listing.children_of([instance.pk]),
+    ])
+
+
+@receiver(post_save, sender=GeneticMaterialPhoto)
+@receiver(post_delete, sender=GeneticMaterialPhoto)
+@receiver(post_save, sender=Planting)
+@receiver(post_delete, sender=Planting)
+def refresh_listing_counts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    materials = [instance.genetic_material_id]
+    stored = _stored(instance, ('genetic_material_id',))
+    if stored:
+        materials.append(stored['genetic_material_id'])
+    listing.schedule_refresh(materials)
+
+
+@receiver(m2m_changed, sender=GeneticMaterial.s_alleles.through)
+def refresh_listing_on_s_alleles_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            listing.schedule_refresh([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        listing.schedule_refresh(pk_set or ())
+    elif action == 'pre_clear':
+        # Um clear() a partir do alelo não informa os materiais afetados.
+        listing.schedule_refresh(
+            sender.objects.filter(s_allele_id=instance.pk).values_list('geneticmaterial_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=S_Allele)
+@receiver(pre_delete, sender=S_Allele)
+def refresh_listing_on_s_allele_change(sender, instance, raw=False, **kwargs):
+    # O nome e a exclusão lógica do alelo aparecem no genótipo dos seus materiais.
+    if raw or kwargs.get('created'):
+        return
+    listing.schedule_refresh(
+        GeneticMaterial.s_alleles.through.objects.filter(s_allele_id=instance.pk)
+        .values_list('geneticmaterial_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Population)
+@receiver(pre_delete, sender=Population)
+def refresh_listing_on_population_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    fields = ('code', 'seplan_code')
+    if kwargs.get('created') is not None and (
+        kwargs['created'] or _stored(instance, fields) == {name: getattr(instance, name) for name in fields}
+    ):
+        return
+    listing.schedule_refresh(GeneticMaterial.all_objects.filter(population=instance).values_list('pk', flat=True))
+
+
+def record_history_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    audit.record_save(instance, created, getattr(instance, '_stored_state', None), update_fields)
+
+
+def record_history_on_delete(sender, instance, **kwargs):
+    # pre_delete: os alelos S do material ainda existem para compor o estado final.
+    audit.record_delete(instance)
+
+
+for _model in audit.AUDITED_MODELS:
+    post_save.connect(record_history_on_save, sender=_model, dispatch_uid=f'record_history_on_save_{_model.__name__}')
+    pre_delete.connect(record_history_on_delete, sender=_model, dispatch_uid=f'record_history_on_delete_{_model.__name__}')
+
+
+@receiver(m2m_changed, sender=GeneticMaterial.s_alleles.through)
+def record_history_on_s_alleles_change(sender, instance, action, reverse, pk_set, **kwargs):
+    through = GeneticMaterial.s_alleles.through
+    if not reverse:
+        if action.startswith('pre_'):
+            instance._stored_s_alleles = set(
+                through.objects.filter(geneticmaterial_id=instance.pk).values_list('s_allele_id', flat=True)
+            )
+            return
+        old = getattr(instance, '_stored_s_alleles', set())
+        new = {'post_add': old | set(pk_set or ()), 'post_remove': old - set(pk_set or ())}.get(action, set())
+        audit.record_m2m(GeneticMaterial, 's_alleles', {instance.pk: (old, new)})
+        return
+
+    # A partir do alelo: pk_set são os materiais (no clear, lidos antes).
+    if action == 'pre_clear':
+        instance._stored_s_allele_materials = set(
+            through.objects.filter(s_allele_id=instance.pk).values_list('geneticmaterial_id', flat=True)
+        )
+        return
+    if not action.startswith('post_'):
+        return
+    materials = pk_set if action != 'post_clear' else getattr(instance, '_stored_s_allele_materials', set())
+    if not materials:
+        return
+    current = {}
+    for material_id, allele_id in through.objects.filter(geneticmaterial_id__in=materials).values_list(
+        'geneticmaterial_id', 's_allele_id'
+    ):
+        current.setdefault(material_id, set()).add(allele_id)
+    changes = {}
+    for material_id in materials:
+        new = current.get(material_id, set())
+        old = new - {instance.pk} if action == 'post_add' else new | {instance.pk}
+        changes[material_id] = (old, new)
+    audit.record_m2m(GeneticMaterial, 's_alleles', changes)
+
+
+@receiver(post_delete, sender=GenotypeMatrix)
+def delete_genotype_files(sender, instance, **kwargs):
+    # Os arquivos mapeados ficam fora do banco; somem com a matriz.
+    transaction.on_commit(lambda: genotypes.delete_files(instance))
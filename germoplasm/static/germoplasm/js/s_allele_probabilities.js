@@ -0,0 +1,22 @@
+// Carrega as probabilidades de alelos S só quando o usuário pede (a simulação é cara).
+if (window.django && window.django.jQuery) {
+    (function($) {
+        $(document).ready(function() {
+            const button = $('#s-allele-probabilities-button');
+            const target = $('#s-allele-probabilities');
+
+            button.on('click', function() {
+                button.prop('disabled', true).text('Calculando...');
+                $.get(button.data('url'))
+                    .done(function(html) {
+                        target.html(html);
+                        button.hide();
+                    })
+                    .fail(function() {
+                        target.text('Não foi possível calcular as probabilidades.');
+                        button.prop('disabled', false).text('Calcular probabilidades');
+                    });
+            });
+        });
+    })(django.jQuery);
+}
@@ -0,0 +1,36 @@
+// Filtro de código Seplan com busca e paginação sob demanda (select2).
+if (window.django && window.django.jQuery) {
+    (function($) {
+        $(document).ready(function() {
+            $('select.seplan-filter').each(function() {
+                const select = $(this);
+                const parameter = select.data('parameter');
+
+                select.select2({
+                    allowClear: true,
+                    minimumInputLength: 0,
+                    ajax: {
+                        url: select.data('url'),
+                        dataType: 'json',
+                        delay: 250,
+                        data: function(params) {
+                            return {term: params.term || '', page: params.page || 1};
+                        },
+                    },
+                });
+
+                // Ao escolher um código, recarrega a listagem com o filtro aplicado.
+                select.on('select2:select select2:clear', function(event) {
+                    const url = new URL(window.location.href);
+                    url.searchParams.delete('p');
+                    if (event.type === 'select2:select') {
+                        url.searchParams.set(parameter, event.params.data.id);
+                    } else {
+                        url.searchParams.delete(parameter);
+                    }
+                    window.location.href = url.toString();
+                });
+            });
+        });
+    })(django.jQuery);
+}
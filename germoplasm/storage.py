@@ -0,0 +1,123 @@
+"""
+Armazenamento endereçado por conteúdo para as fotos dos materiais.
+
+Cada foto é gravada em ``genetic_material_photos/sha256/<aa>/<hash><ext>``,
+onde ``hash`` é o SHA-256 do conteúdo. Fotos idênticas enviadas para materiais
+diferentes compartilham o mesmo arquivo; o django_cleanup continua responsável
+por apagar arquivos antigos, mas o storage só remove o arquivo quando nenhuma
+foto o referencia mais (contagem de referências no banco).
+
+O hash é calculado durante o recebimento do upload pelos ``upload handlers``
+abaixo, bloco a bloco, sem carregar o arquivo inteiro na memória.
+"""
+import hashlib
+import os
+import uuid
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.utils.deconstruct import deconstructible
+
+PHOTO_DIR = 'genetic_material_photos'
+HASH_DIR = 'sha256'
+CHUNK_SIZE = 64 * 1024
+# Sufixo dos arquivos ainda sendo gravados (movidos para o nome final ao terminar).
+TEMPORARY_SUFFIX = '.part'
+
+
+def content_hash(file) -> str:
+    """Computes the SHA-256 of ``file`` reading it in chunks."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def content_path(digest: str, filename: str) -> str:
+    """Storage name of a blob with the given hash; keeps the original extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(PHOTO_DIR, HASH_DIR, digest[:2], f"{digest}{ext}")
+
+
+def is_content_path(name: str) -> bool:
+    return name.startswith(os.path.join(PHOTO_DIR, HASH_DIR) + os.sep)
+
+
+def hash_from_path(name: str) -> str:
+    """Returns the hash encoded in a content-addressed name ('' for other names)."""
+    return os.path.splitext(os.path.basename(name))[0] if is_content_path(name) else ''
+
+
+class HashingUploadMixin:
+    """Updates a SHA-256 digest as the chunks of each uploaded file arrive."""
+
+    def new_file(self, *args, **kwargs):
+        self._digest = hashlib.sha256()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self._digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self._digest.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage for content-addressed blobs.
+
+    Every file is saved under the name given by its content hash, whatever
+    name the caller asked for. Saving a blob that already exists is a no-op
+    (same name, same content), and deleting a blob still referenced by some
+    photo is ignored.
+    """
+
+    def save(self, name, content, max_length=None):
+        if content is not None and not is_content_path(name):
+            if not hasattr(content, 'chunks'):
+                content = File(content, name)
+            if not getattr(content, 'content_hash', None):
+                content.content_hash = content_hash(content)
+            name = content_path(content.content_hash, name)
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        if is_content_path(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if not is_content_path(name):
+            return super()._save(name, content)
+        if self.exists(name):
+            return name
+        # Grava com um nome temporário e move atomicamente: uploads simultâneos
+        # do mesmo conteúdo não colidem nem deixam arquivos parciais.
+        temporary = super()._save(f"{name}.{uuid.uuid4().hex}{TEMPORARY_SUFFIX}", content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+    def delete(self, name):
+        photo_model = apps.get_model('germoplasm', 'GeneticMaterialPhoto')
+        if name and photo_model.all_objects.filter(image=name).exists():
+            return
+        super().delete(name)
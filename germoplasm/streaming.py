@@ -0,0 +1,251 @@
+"""
+Views assíncronas de streaming: exportações CSV grandes e download das fotos.
+
+Servidas pelo ``core.asgi``, cada resposta é um iterador assíncrono: as linhas
+das exportações são lidas em blocos com ``aiterator`` e os arquivos das fotos
+em blocos lidos fora do loop de eventos. Enquanto um cliente lento recebe os
+dados, o worker continua atendendo outras requisições; no WSGI a mesma
+resposta ocupa um worker síncrono até o fim (``benchmark_async_streaming``
+mede a diferença).
+
+As fotos aceitam requisições condicionais (``If-None-Match``/
+``If-Modified-Since``, com o SHA-256 do conteúdo como ETag) e intervalos
+(``Range``/``If-Range``, um intervalo por requisição).
+"""
+import asyncio
+import csv
+import mimetypes
+import os
+import re
+
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+
+from .models import GeneticMaterial, GeneticMaterialPhoto, PhenologyObservation
+from .storage import CHUNK_SIZE
+
+EXPORT_CHUNK_SIZE = 2000
+# Linhas de CSV agrupadas em cada bloco enviado ao cliente.
+LINES_PER_CHUNK = 500
+PHOTO_CACHE_MAX_AGE = 60 * 60
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+
+MATERIALS_HEADER = (
+    'ID', 'Nome', 'Código', 'Tipo de Material', 'Código Interno', 'Código de Acesso',
+    'Mãe', 'Pai', 'População', 'Mutante de', 'Material do Programa',
+)
+OBSERVATIONS_HEADER = ('ID', 'Material', 'Código', 'Evento', 'Local', 'Data')
+
+
+class Echo:
+    """Buffer do csv.writer que apenas devolve a linha escrita (para streaming)."""
+
+    def write(self, value):
+        return value
+
+
+async def _check_access(request, permission):
+    """Returns a response when the user may not see the data (None otherwise)."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path(), reverse('admin:login'))
+    if not (user.is_active and user.is_staff and await user.ahas_perm(permission)):
+        raise PermissionDenied
+    return None
+
+
+async def csv_lines(header, rows):
+    """Async iterator of CSV text blocks for ``header`` and the async ``rows``."""
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(header)]
+    async for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= LINES_PER_CHUNK:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def _csv_response(header, rows, filename):
+    response = StreamingHttpResponse(csv_lines(header, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _display_code(row, prefix):
+    # Mesma regra de GeneticMaterial.get_display_code().
+    if row[f'{prefix}material_type'] == GeneticMaterial.MaterialType.HYBRID:
+        code = row[f'{prefix}accession_code']
+    else:
+        code = row[f'{prefix}internal_code']
+    return code or row[f'{prefix}name']
+
+
+async def _material_rows(queryset):
+    # values() e não values_list(): o iterador de values_list() executa a
+    # consulta ao ser criado, o que o aiterator() não permite no loop de eventos.
+    rows = queryset.values(
+        'pk', 'name', 'material_type', 'internal_code', 'accession_code', 'mother__name',
+        'father__name', 'population__code', 'mutated_from__name', 'is_epagri_material',
+    ).order_by('pk')
+    types = dict(GeneticMaterial.MaterialType.choices)
+    async for row in rows.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (
+            row['pk'], row['name'], _display_code(row, ''), types.get(row['material_type'], row['material_type']),
+            row['internal_code'] or '', row['accession_code'] or '', row['mother__name'] or '',
+            row['father__name'] or '', row['population__code'] or '', row['mutated_from__name'] or '',
+            'Sim' if row['is_epagri_material'] else 'Não',
+        )
+
+
+async def export_materials_view(request):
+    """
+    CSV dos materiais ativos. Filtro opcional: ``?material_type=HYBRID``.
+    """
+    denied = await _check_access(request, 'germoplasm.view_geneticmaterial')
+    if denied:
+        return denied
+    queryset = GeneticMaterial.objects.all()
+    if request.GET.get('material_type'):
+        queryset = queryset.filter(material_type=request.GET['material_type'])
+    return _csv_response(MATERIALS_HEADER, _material_rows(queryset), 'materiais_geneticos.csv')
+
+
+async def _observation_rows(queryset):
+    rows = queryset.values(
+        'pk', 'genetic_material__name', 'genetic_material__material_type',
+        'genetic_material__internal_code', 'genetic_material__accession_code',
+        'event__name', 'location__name', 'observation_date',
+    ).order_by('pk')
+    async for row in rows.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (
+            row['pk'], row['genetic_material__name'], _display_code(row, 'genetic_material__'),
+            row['event__name'], row['location__name'], row['observation_date'].isoformat(),
+        )
+
+
+async def export_observations_view(request):
+    """
+    CSV das observações fenológicas ativas. Filtros opcionais: ``location``,
+    ``event`` (ids), ``start`` e ``end`` (datas ISO).
+    """
+    denied = await _check_access(request, 'germoplasm.view_phenologyobservation')
+    if denied:
+        return denied
+    queryset = PhenologyObservation.objects.filter(genetic_material__is_active=True)
+    for param, lookup in (('location', 'location_id'), ('event', 'event_id')):
+        if request.GET.get(param, '').isdigit():
+            queryset = queryset.filter(**{lookup: int(request.GET[param])})
+    for param, lookup in (('start', 'observation_date__gte'), ('end', 'observation_date__lte')):
+        date = parse_date(request.GET.get(param, ''))
+        if date:
+            queryset = queryset.filter(**{lookup: date})
+    return _csv_response(OBSERVATIONS_HEADER, _observation_rows(queryset), 'observacoes_fenologicas.csv')
+
+
+def requested_range(request, size, etag, last_modified):
+    """
+    Returns ``(start, end)`` (inclusive) for a satisfiable single ``Range``
+    header, ``False`` when it cannot be satisfied, and None when the whole file
+    must be sent (no header, several ranges, or ``If-Range`` not matching).
+    """
+    header = request.headers.get('Range')
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        return None
+    match = RANGE_RE.fullmatch(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        suffix = int(last)
+        if not suffix:
+            return False
+        start, end = max(size - suffix, 0), size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+async def file_chunks(path, start, length):
+    """Reads ``length`` bytes of ``path`` from ``start`` without blocking the event loop."""
+    file = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(file.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(file.read, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(file.close)
+
+
+async def photo_view(request, photo_id):
+    """Serves the file of an active photo, with conditional and range requests."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+    denied = await _check_access(request, 'germoplasm.view_geneticmaterialphoto')
+    if denied:
+        return denied
+    photo = await GeneticMaterialPhoto.objects.filter(pk=photo_id).only('image', 'content_hash').afirst()
+    if photo is None or not photo.image:
+        raise Http404("Foto não encontrada.")
+    path = photo.image.path
+    try:
+        stat = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        raise Http404("Arquivo da foto não encontrado.")
+
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    # O conteúdo é endereçado pelo hash: o mesmo hash é o mesmo arquivo.
+    etag = f'"{photo.content_hash}"' if photo.content_hash else f'"{size:x}-{stat.st_mtime_ns:x}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': f'private, max-age={PHOTO_CACHE_MAX_AGE}',
+    }
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    byte_range = requested_range(request, size, etag, last_modified)
+    if byte_range is False:
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+    start, end = byte_range or (0, size - 1)
+    length = max(end - start + 1, 0)
+    headers['Content-Length'] = str(length)
+    if byte_range:
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    status = 206 if byte_range else 200
+    if request.method == 'HEAD':
+        response = HttpResponse(status=status, content_type=content_type, headers=headers)
+        # O HttpResponse vazio recalcularia o tamanho.
+        response['Content-Length'] = headers['Content-Length']
+        return response
+    return StreamingHttpResponse(
+        file_chunks(path, start, length), status=status, content_type=content_type, headers=headers
+    )
+
+
+def photo_url(photo_id) -> str:
+    return reverse('germoplasm:photo', args=[photo_id])
@@ -0,0 +1,14 @@
+"""
+Rotas das views assíncronas de streaming (exportações e fotos).
+"""
+from django.urls import path
+
+from . import streaming
+
+app_name = 'germoplasm'
+
+urlpatterns = [
+    path('exports/materials.csv', streaming.export_materials_view, name='export-materials'),
+    path('exports/observations.csv', streaming.export_observations_view, name='export-observations'),
+    path('photos/<int:photo_id>', streaming.photo_view, name='photo'),
+]
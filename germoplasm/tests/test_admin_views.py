@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from germoplasm.models import GeneticMaterial
+
+
+class MaterialViewPermissionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.material = GeneticMaterial.objects.create(name='A', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+        cls.staff = User.objects.create_user('tecnico', is_staff=True)
+        cls.admin = User.objects.create_superuser('admin')
+
+    def get(self, user, view):
+        self.client.force_login(user)
+        return self.client.get(f'/admin/germoplasm/geneticmaterial/{self.material.pk}/{view}')
+
+    def test_pedigree_requires_view_permission(self):
+        self.assertEqual(self.get(self.staff, 'pedigree/').status_code, 403)
+        self.assertEqual(self.get(self.admin, 'pedigree/?format=svg').status_code, 200)
+
+    def test_detail_requires_view_permission(self):
+        self.assertEqual(self.get(self.staff, 'detail.json').status_code, 403)
+        response = self.get(self.admin, 'detail.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'A')
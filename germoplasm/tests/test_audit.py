@@ -0,0 +1,79 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from germoplasm import audit
+from germoplasm.models import AuditEntry, GeneticMaterial, S_Allele
+
+
+class AppendOnlyTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('tecnico')
+        self.entry = AuditEntry.objects.create(
+            model='germoplasm.geneticmaterial', object_id=1, material_id=1,
+            action=AuditEntry.Action.CREATE, user=self.user, changes={'name': 'A'},
+        )
+
+    def test_instance_cannot_change(self):
+        self.entry.changes = {}
+        with self.assertRaises(ValueError):
+            self.entry.save()
+        with self.assertRaises(ValueError):
+            self.entry.delete()
+
+    def test_queryset_cannot_change(self):
+        entries = AuditEntry.objects.filter(pk=self.entry.pk)
+        with self.assertRaises(ValueError):
+            entries.update(changes={})
+        with self.assertRaises(ValueError):
+            entries.delete()
+        with self.assertRaises(ValueError), transaction.atomic():
+            AuditEntry.objects.bulk_update([self.entry], ['changes'])
+        self.assertEqual(AuditEntry.objects.get().changes, {'name': 'A'})
+
+    def test_user_can_be_deleted(self):
+        self.user.delete()
+        self.assertIsNone(AuditEntry.objects.get().user_id)
+
+
+class StateAtTests(TestCase):
+
+    def change(self, function):
+        # O histórico é gravado no commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            function()
+        return timezone.now()
+
+    def state(self, when):
+        state = audit.state_at(GeneticMaterial, self.material.pk, when)
+        return state and (state['name'], state['s_alleles'])
+
+    def test_walks_back_updates_m2m_and_deletion(self):
+        allele = S_Allele.objects.create(name='S1')
+        before = timezone.now()
+        self.material = GeneticMaterial(name='A', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+        created = self.change(self.material.save)
+
+        def rename(name):
+            self.material.name = name
+            self.material.save()
+
+        renamed = self.change(lambda: rename('B'))
+        with_allele = self.change(lambda: self.material.s_alleles.add(allele))
+        renamed_again = self.change(lambda: rename('C'))
+
+        self.assertIsNone(self.state(before))
+        self.assertEqual(self.state(created), ('A', []))
+        self.assertEqual(self.state(renamed), ('B', []))
+        self.assertEqual(self.state(with_allele), ('B', [allele.pk]))
+        self.assertEqual(self.state(renamed_again), ('C', [allele.pk]))
+
+        deleted = self.change(lambda: GeneticMaterial.all_objects.filter(pk=self.material.pk).delete())
+        self.assertIsNone(self.state(deleted))
+        self.assertEqual(self.state(renamed), ('B', []))
+        self.assertEqual(
+            list(audit.object_history(GeneticMaterial, self.material.pk).values_list('action', flat=True)),
+            ['D', 'U', 'U', 'U', 'C'],
+        )
@@ -0,0 +1,114 @@
+import base64
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase
+
+from germoplasm import brapi
+from germoplasm.models import GeneticMaterial, Location
+
+PASSWORD = 'senha-de-teste'
+
+
+def basic(username, password=PASSWORD):
+    return {'Authorization': 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()}
+
+
+class BrapiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.materials = [
+            GeneticMaterial.objects.create(name=f'M{i}', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+            for i in range(5)
+        ]
+        Location.objects.create(name='Caçador')
+        cls.reader = User.objects.create_user('leitor', password=PASSWORD)
+        cls.reader.user_permissions.add(Permission.objects.get(codename='view_geneticmaterial'))
+        cls.outsider = User.objects.create_user('visitante', password=PASSWORD)
+
+    def ids(self, response):
+        return [int(row['germplasmDbId']) for row in response.json()['result']['data']]
+
+    def pagination(self, response):
+        return response.json()['metadata']['pagination']
+
+    def test_requires_credentials(self):
+        response = self.client.get('/brapi/v2/germplasm')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Basic realm="BrAPI"')
+        self.assertEqual(self.client.get('/brapi/v2/germplasm', headers=basic('leitor', 'errada')).status_code, 401)
+        self.assertEqual(self.client.post('/brapi/v2/search/germplasm').status_code, 401)
+
+    def test_requires_view_permission(self):
+        self.assertEqual(self.client.get('/brapi/v2/germplasm', headers=basic('visitante')).status_code, 403)
+        # A permissão é a do recurso: o leitor de materiais não vê os locais.
+        self.assertEqual(self.client.get('/brapi/v2/locations', headers=basic('leitor')).status_code, 403)
+
+    def test_basic_and_session_authentication(self):
+        response = self.client.get('/brapi/v2/germplasm', headers=basic('leitor'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(response), [material.pk for material in self.materials])
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get('/brapi/v2/germplasm').status_code, 200)
+
+    def test_pagination(self):
+        self.client.force_login(self.reader)
+        response = self.client.get('/brapi/v2/germplasm', {'page': 1, 'pageSize': 2})
+        self.assertEqual(self.ids(response), [material.pk for material in self.materials[2:4]])
+        self.assertEqual(
+            self.pagination(response), {'currentPage': 1, 'pageSize': 2, 'totalCount': 5, 'totalPages': 3},
+        )
+        response = self.client.get('/brapi/v2/germplasm', {'page': 3, 'pageSize': 2})
+        self.assertEqual((response.status_code, self.ids(response)), (200, []))
+
+    def test_pagination_bounds(self):
+        self.client.force_login(self.reader)
+        for params in (
+            {'page': -1}, {'pageSize': 0}, {'pageSize': brapi.MAX_PAGE_SIZE + 1}, {'page': 'um'},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/brapi/v2/germplasm', params).status_code, 400)
+        response = self.client.get('/brapi/v2/germplasm', {'pageSize': brapi.MAX_PAGE_SIZE})
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_round_trip(self):
+        self.client.force_login(self.reader)
+        response = self.client.post('/brapi/v2/search/germplasm', {'pageSize': 2}, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        search_id = response.json()['result']['searchResultsDbId']
+        # Materiais excluídos depois da busca ficam de fora das páginas.
+        self.materials[1].delete()
+        pages = [
+            self.client.get(f'/brapi/v2/search/germplasm/{search_id}', {'page': page, 'pageSize': 2})
+            for page in range(3)
+        ]
+        self.assertEqual(
+            [self.ids(page) for page in pages],
+            [[self.materials[0].pk], [material.pk for material in self.materials[2:4]], [self.materials[4].pk]],
+        )
+        self.assertEqual(self.pagination(pages[0])['totalCount'], 5)
+
+        # O id da busca é do recurso em que ela foi feita.
+        self.client.force_login(User.objects.create_superuser('admin'))
+        response = self.client.get(f'/brapi/v2/search/pedigree/{search_id}')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/brapi/v2/search/germplasm/inexistente').status_code, 404)
+
+    def test_small_search_returns_results(self):
+        self.client.force_login(self.reader)
+        response = self.client.post(
+            '/brapi/v2/search/germplasm', {'germplasmNames': ['M3', 'M1']}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(response), [self.materials[1].pk, self.materials[3].pk])
+
+    def test_search_expires(self):
+        self.client.force_login(self.reader)
+        with mock.patch.object(brapi, 'SEARCH_CACHE_TIMEOUT', 0):
+            response = self.client.post(
+                '/brapi/v2/search/germplasm', {'pageSize': 2}, content_type='application/json',
+            )
+        search_id = response.json()['result']['searchResultsDbId']
+        response = self.client.get(f'/brapi/v2/search/germplasm/{search_id}')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,130 @@
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+
+import django
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from germoplasm import services
+from germoplasm.models import (
+    REPEATED_CROSS_MARKER,
+    CodeCounter,
+    GeneticMaterial,
+    Population,
+    allocation_atomic,
+)
+
+WORKERS = 4
+POPULATIONS = 3
+HYBRIDS = 5
+
+
+def _register(database_name, parent1_id, parent2_id, population_id):
+    """Registers crosses and hybrids of the same parents; returns their codes."""
+    population_codes, hybrid_codes = [], []
+    # Os processos leem as configurações do projeto: aponta-os para o banco de testes.
+    connections['default'].settings_dict['NAME'] = database_name
+    try:
+        parent1 = GeneticMaterial.objects.get(pk=parent1_id)
+        parent2 = GeneticMaterial.objects.get(pk=parent2_id)
+        population = Population.objects.get(pk=population_id)
+        for i in range(max(POPULATIONS, HYBRIDS)):
+            if i < POPULATIONS:
+                created = services.retry_on_conflict(
+                    lambda: Population.objects.create(
+                        parent1=parent1, parent2=parent2, cross_date=date(2025, 9, 1), seplan_code='S1',
+                    )
+                )
+                population_codes.append(created.code)
+            if i < HYBRIDS:
+                hybrid = services.retry_on_conflict(lambda: services.create_hybrid(population))
+                hybrid_codes.append(hybrid.accession_code)
+    finally:
+        # Cada thread tem as suas conexões.
+        connections.close_all()
+    return population_codes, hybrid_codes
+
+
+def _parents_and_population():
+    parent1 = GeneticMaterial.objects.create(name='P1', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+    parent2 = GeneticMaterial.objects.create(name='P2', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+    population = Population.objects.create(
+        parent1=parent1, parent2=parent2, cross_date=date(2025, 9, 1), seplan_code='S1',
+    )
+    return parent1, parent2, population
+
+
+class ConcurrentCodeAllocationTests(TransactionTestCase):
+    """Several threads or processes register the same cross and hybrids of the same population."""
+
+    def setUp(self):
+        self.parent1, self.parent2, self.population = _parents_and_population()
+        self.arguments = (connection.settings_dict['NAME'], self.parent1.pk, self.parent2.pk, self.population.pk)
+
+    def assertContiguous(self, results):
+        population_codes = [code for codes, _ in results for code in codes]
+        hybrid_codes = [code for _, codes in results for code in codes]
+        base = self.population.code
+        self.assertEqual([code for code, n in Counter(population_codes + hybrid_codes).items() if n > 1], [])
+        self.assertEqual(
+            sorted(Population.all_objects.values_list('code', flat=True)),
+            sorted([base] + [f"{base}{REPEATED_CROSS_MARKER}{n}" for n in range(2, WORKERS * POPULATIONS + 2)]),
+        )
+        hybrids = GeneticMaterial.all_objects.filter(population=self.population)
+        self.assertEqual(
+            sorted(hybrids.values_list('accession_code', flat=True)),
+            sorted(f"{base}{services.HYBRID_MARKER}{n}" for n in range(1, WORKERS * HYBRIDS + 1)),
+        )
+
+    def test_threads(self):
+        with ThreadPoolExecutor(WORKERS) as executor:
+            results = list(executor.map(lambda _: _register(*self.arguments), range(WORKERS)))
+        self.assertContiguous(results)
+
+    def test_processes(self):
+        executor = ProcessPoolExecutor(
+            WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+        with executor:
+            results = [executor.submit(_register, *self.arguments) for _ in range(WORKERS)]
+            results = [future.result() for future in results]
+        self.assertContiguous(results)
+
+    def test_only_allocations_begin_immediate(self):
+        with CaptureQueriesContext(connection) as queries:
+            with allocation_atomic():
+                pass
+            with transaction.atomic():
+                pass
+        begins = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN IMMEDIATE', 'BEGIN'])
+
+
+class CodeCounterTests(TestCase):
+
+    def test_next_value_seeds_from_floor_and_counts(self):
+        self.assertEqual(CodeCounter.next_value('test', floor=lambda: 7), 8)
+        self.assertEqual(CodeCounter.next_value('test', floor=lambda: 100, count=3), 11)
+        self.assertEqual(CodeCounter.objects.get(key='test').value, 11)
+
+    def test_repeated_cross_gets_suffix(self):
+        _, _, population = _parents_and_population()
+        again = Population.objects.create(
+            parent1=population.parent1, parent2=population.parent2, cross_date=date(2025, 10, 1), seplan_code='S1',
+        )
+        self.assertEqual(population.code, 'C1XC2A25')
+        self.assertEqual(again.code, f'C1XC2A25{REPEATED_CROSS_MARKER}2')
+
+    def test_save_with_code_retries_taken_code(self):
+        _, _, population = _parents_and_population()
+        first = services.create_hybrid(population)
+        # Contador atrasado: o primeiro código alocado já está em uso.
+        CodeCounter.objects.filter(key=services.hybrid_counter_key(population)).update(value=0)
+        second = services.create_hybrid(population)
+        self.assertEqual(first.accession_code, f'{population.code}H1')
+        self.assertEqual(second.accession_code, f'{population.code}H2')
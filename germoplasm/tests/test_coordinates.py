@@ -0,0 +1,38 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from germoplasm import coordinates
+
+
+class ParseColumnTests(SimpleTestCase):
+
+    def test_decimal_and_dms_forms_agree(self):
+        texts = ['-27.586889', '27,586889 S', '27°35\'12.8"S', 'S 27 35 12.8', '-27°35\'12.8"', '+27°35\'12.8"']
+        values, errors = coordinates.parse_column(texts, 'lat')
+        self.assertEqual(errors, {})
+        np.testing.assert_allclose(values, [-27.586889] * 5 + [27.586889])
+
+    def test_invalid_texts(self):
+        values, errors = coordinates.parse_column(['S 27 35 12 N', '27 61 0', '95 0 0', '27 0 0 L', ''], 'lat')
+        self.assertEqual(sorted(errors), [0, 1, 2, 3])
+        self.assertTrue(np.isnan(values).all())
+
+    def test_sign_must_agree_with_direction(self):
+        values, errors = coordinates.parse_column(['-27.5 N', '+27.5 S', '-27°30\'N', 'S +27 30', '-27.5 S'], 'lat')
+        self.assertEqual(sorted(errors), [0, 1, 2, 3])
+        self.assertEqual(values[4], -27.5)
+        values, errors = coordinates.parse_column(['-51.2 L', '-51.2 E', '-51.2 O', '51.2 W'], 'lon')
+        self.assertEqual(sorted(errors), [0, 1])
+        np.testing.assert_allclose(values[2:], [-51.2, -51.2])
+
+
+class ConversionTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        values = np.array([-27.586889, 0.0, 49.999999, -179.5])
+        degrees, minutes, seconds, negative = coordinates.decimal_to_dms(values)
+        np.testing.assert_allclose(coordinates.dms_to_decimal(degrees, minutes, seconds, negative), values, atol=1e-5)
+
+    def test_seconds_carry_into_minutes(self):
+        degrees, minutes, seconds, negative = coordinates.decimal_to_dms([10.999999])
+        self.assertEqual((degrees[0], minutes[0], seconds[0], negative[0]), (11, 0, 0.0, False))
@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from germoplasm import detail_cache
+from germoplasm.models import GeneticMaterial
+
+
+class ParentDetailInvalidationTests(TestCase):
+    """The parent's cached detail lists its active offspring with their observations."""
+
+    def setUp(self):
+        cultivar = GeneticMaterial.MaterialType.CULTIVAR
+        self.parent = GeneticMaterial.objects.create(name='Mãe', material_type=cultivar)
+        self.child = GeneticMaterial.objects.create(name='Filho', material_type=cultivar, mother=self.parent)
+        self.mutant = GeneticMaterial.objects.create(
+            name='Mutante', material_type=GeneticMaterial.MaterialType.SELECTION, mutated_from=self.parent,
+        )
+
+    def cached_offspring(self):
+        parent = GeneticMaterial.all_objects.get(pk=self.parent.pk)
+        offspring = detail_cache.get_material_detail(parent)['offspring']
+        self.assertEqual(offspring, detail_cache.build_material_detail(parent)['offspring'])
+        return offspring
+
+    def test_deactivating_a_child(self):
+        self.assertEqual(len(self.cached_offspring()['as_mother']), 1)
+        self.child.is_active = False
+        self.child.save()
+        self.assertEqual(self.cached_offspring()['as_mother'], [])
+
+    def test_editing_a_mutant_observations(self):
+        self.assertEqual(self.cached_offspring()['mutations'][0]['observations'], '')
+        self.mutant.observations = 'Frutos mais vermelhos'
+        self.mutant.save()
+        self.assertEqual(self.cached_offspring()['mutations'][0]['observations'], 'Frutos mais vermelhos')
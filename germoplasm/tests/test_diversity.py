@@ -0,0 +1,74 @@
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from germoplasm import caching, diversity
+from germoplasm.models import GeneticMaterial
+from germoplasm.pedigree import UNKNOWN, Pedigree, inbreeding_coefficients, load_pedigree
+
+
+class CohortDiversityTests(TestCase):
+
+    def setUp(self):
+        # Token novo: o cache e a genealogia guardada no processo são de outro teste.
+        caching.bump_versions([diversity.VERSION_KEY])
+
+        def material(name, **parents):
+            return GeneticMaterial.objects.create(
+                name=name, material_type=GeneticMaterial.MaterialType.CULTIVAR, **parents,
+            )
+
+        f1, f2, f3 = material('F1'), material('F2'), material('F3')
+        x = material('X', mother=f1, father=f2)
+        y = material('Y', mother=f1, father=f3)
+        self.z = material('Z', mother=x, father=y)
+        # Meio-fundador (pai desconhecido) e mutante (clone de Z).
+        self.half = material('H', mother=x)
+        self.mutant = material('M', mutated_from=self.z)
+
+    def test_matches_tabular_relationships(self):
+        members = [self.z.pk, self.half.pk, self.mutant.pk]
+        result = diversity.analyze_cohorts({'cohort': ('Coorte', members)})['cohort']
+
+        pedigree = load_pedigree()
+        n = len(pedigree)
+        a = np.zeros((n, n))
+        genome = np.zeros((n, n))  # fração do genoma de i vinda do fundador k
+        for i in range(n):
+            d, s = pedigree.dam[i], pedigree.sire[i]
+            for j in range(i):
+                a[i, j] = a[j, i] = 0.5 * sum(a[j, p] for p in (d, s) if p != UNKNOWN)
+            a[i, i] = 1 + (0.5 * a[d, s] if UNKNOWN not in (d, s) else 0)
+            if d == UNKNOWN and s == UNKNOWN:
+                genome[i, i] = 1
+            else:
+                genome[i] = 0.5 * sum(genome[p] for p in (d, s) if p != UNKNOWN)
+        c = np.bincount(pedigree.rows_for(members), minlength=n) / len(members)
+
+        self.assertEqual(result.size, 3)
+        self.assertAlmostEqual(result.mean_coancestry, c @ a @ c / 2)
+        self.assertAlmostEqual(result.founder_genome_equivalents, 1 / (c @ a @ c))
+        expected = {int(pedigree.ids[k]): c @ genome[:, k] for k in range(n) if genome[k, k]}
+        self.assertEqual(dict(result.contributions).keys(), expected.keys())
+        for pk, contribution in result.contributions:
+            self.assertAlmostEqual(contribution, expected[pk])
+        self.assertAlmostEqual(result.unknown_share, 1 - sum(expected.values()))
+        q = np.array(list(expected.values())) / sum(expected.values())
+        self.assertAlmostEqual(result.effective_founders, 1 / (q @ q))
+
+
+class ParentsOnlyInbreedingTests(SimpleTestCase):
+    """The diversity analysis only needs the F of the parents for the D of A⁻¹."""
+
+    def test_parents_only_skips_leaves(self):
+        # Fundadores 0 e 1, meio-fundador 3, irmãos completos 5 e 6 e o seu filho 7.
+        dam = np.array([UNKNOWN, UNKNOWN, 0, 1, 0, 2, 2, 5])
+        sire = np.array([UNKNOWN, UNKNOWN, 1, UNKNOWN, 2, 4, 4, 6])
+        generation = np.array([0, 0, 1, 1, 2, 3, 3, 4])
+        pedigree = Pedigree(ids=np.arange(1, len(dam) + 1), dam=dam, sire=sire, generation=generation)
+
+        inbreeding, d = inbreeding_coefficients(pedigree, parents_only=True)
+        full, full_d = inbreeding_coefficients(pedigree)
+        parents = [0, 1, 2, 4, 5, 6]
+        self.assertTrue(np.isnan(inbreeding[[3, 7]]).all())
+        np.testing.assert_allclose(inbreeding[parents], full[parents])
+        np.testing.assert_allclose(d, full_d)
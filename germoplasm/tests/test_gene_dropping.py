@@ -0,0 +1,66 @@
+from django.test import TestCase
+
+from germoplasm import caching, gene_dropping
+from germoplasm.models import GeneticMaterial, S_Allele
+
+REPLICATES = 20_000
+TOLERANCE = 0.02
+
+
+class AlleleProbabilityTests(TestCase):
+
+    def setUp(self):
+        caching.bump_versions([gene_dropping.VERSION_KEY])
+        self.alleles = {name: S_Allele.objects.create(name=name) for name in ('S1', 'S2', 'S3', 'S4')}
+
+    def material(self, name, genotype=(), **parents):
+        material = GeneticMaterial.objects.create(
+            name=name, material_type=GeneticMaterial.MaterialType.CULTIVAR, **parents,
+        )
+        material.s_alleles.set([self.alleles[allele] for allele in genotype])
+        return material
+
+    def probabilities(self, material):
+        return gene_dropping.allele_probabilities(material, replicates=REPLICATES, workers=1)
+
+    def assertCarriers(self, result, expected):
+        carriers = dict(result.carriers)
+        for allele, probability in expected.items():
+            self.assertAlmostEqual(carriers.get(allele, 0.0), probability, delta=TOLERANCE, msg=allele)
+
+    def test_child_of_typed_parents(self):
+        mother = self.material('Mãe', ('S1', 'S2'))
+        father = self.material('Pai', ('S3', 'S4'))
+        result = self.probabilities(self.material('Filho', mother=mother, father=father))
+        self.assertCarriers(result, {'S1': 0.5, 'S2': 0.5, 'S3': 0.5, 'S4': 0.5})
+        for _, probability in result.genotypes:
+            self.assertAlmostEqual(probability, 0.25, delta=TOLERANCE)
+        self.assertEqual(result.typed_ancestors, 2)
+
+    def test_offspring_genotype_informs_untyped_founder(self):
+        # C = U x F só pode ter recebido S3 de U: o genótipo de U tem posterior
+        # ∝ f(a) f(b) × (cópias de S3) / 2, com f = S1 .5, S2 .25, S3 .25. Daí
+        # T = C x U recebe de U S3 com .625, S1 com .25 e S2 com .125.
+        untyped = self.material('U')
+        father = self.material('F', ('S1', 'S2'))
+        child = self.material('C', ('S1', 'S3'), mother=untyped, father=father)
+        result = self.probabilities(self.material('T', mother=child, father=untyped))
+        self.assertTrue(result.consistent)
+        self.assertCarriers(result, {'S1': 1 - 0.5 * 0.75, 'S2': 0.125, 'S3': 1 - 0.5 * 0.375, 'S4': 0.0})
+
+    def test_inconsistent_ancestors(self):
+        untyped = self.material('U')
+        father = self.material('F', ('S1', 'S2'))
+        # Nenhum dos alelos de C pode ter vindo de F.
+        child = self.material('C', ('S3', 'S4'), mother=untyped, father=father)
+        result = self.probabilities(self.material('T', mother=child, father=untyped))
+        self.assertFalse(result.consistent)
+        self.assertEqual(result.carriers, ())
+
+    def test_result_does_not_depend_on_workers(self):
+        mother = self.material('Mãe', ('S1', 'S2'))
+        child = self.material('Filho', mother=mother, father=self.material('Pai'))
+        serial = gene_dropping.allele_probabilities(child, replicates=4000, batch_size=1000, workers=1)
+        caching.bump_versions([gene_dropping.VERSION_KEY])
+        parallel = gene_dropping.allele_probabilities(child, replicates=4000, batch_size=1000, workers=2)
+        self.assertEqual(serial, parallel)
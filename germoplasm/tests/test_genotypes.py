@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from germoplasm import genotypes
+from germoplasm.models import GeneticMaterial
+
+CALLS = np.array(['AA', 'AB', 'BB', 'NC'])
+
+
+class GenomicRelationshipTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(GENOTYPE_ROOT=directory.name))
+
+        rng = np.random.default_rng(3)
+        self.materials = [
+            GeneticMaterial.objects.create(name=f'G{i}', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+            for i in range(7)
+        ]
+        # Amostras fora da ordem dos ids; 5% de dados perdidos e um marcador monomórfico.
+        self.samples = [self.materials[i] for i in (4, 0, 6, 2, 1, 5, 3)]
+        self.codes = rng.integers(0, 3, size=(len(self.samples), 40))
+        self.codes[rng.random(self.codes.shape) < 0.05] = genotypes.MISSING
+        self.codes[:, 7] = 2
+        path = os.path.join(directory.name, 'calls.txt')
+        with open(path, 'w') as file:
+            file.write('probeset_id\t' + '\t'.join(material.name for material in self.samples) + '\n')
+            for marker, column in enumerate(self.codes.T):
+                file.write(f'SNP{marker}\t' + '\t'.join(CALLS[column]) + '\n')
+        self.matrix = genotypes.import_genotypes(path, 'Chip').matrix
+
+    def test_pack_round_trip(self):
+        codes = np.random.default_rng(4).integers(0, 4, size=(5, 11)).astype(np.uint8)
+        np.testing.assert_array_equal(genotypes.unpack(genotypes.pack(codes), 11), codes)
+
+    def test_blockwise_grm_matches_vanraden(self):
+        # Blocos de 3 linhas: 7 materiais dão blocos na diagonal e fora dela.
+        grm = genotypes.compute_grm(self.matrix, block_size=3)
+
+        m = self.codes.astype(float)
+        m[self.codes == genotypes.MISSING] = np.nan
+        p = np.nanmean(m, axis=0) / 2
+        z = np.nan_to_num(m - 2 * p)
+        expected = z @ z.T / (2 * (p * (1 - p)).sum())
+
+        ids = [material.pk for material in self.samples]
+        np.testing.assert_allclose(grm.submatrix(ids), expected, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(grm.row(ids[0])[grm.rows_for(ids)], expected[0], rtol=1e-5, atol=1e-6)
+
+    def test_dosages_by_material(self):
+        store = genotypes.GenotypeStore(self.matrix)
+        dosages = store.dosages([self.samples[2].pk])[0]
+        expected = self.codes[2].astype(float)
+        expected[self.codes[2] == genotypes.MISSING] = np.nan
+        # Colunas da matriz na ordem dos ids dos marcadores (criados na ordem do arquivo).
+        np.testing.assert_array_equal(dosages, expected)
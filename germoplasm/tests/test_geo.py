@@ -0,0 +1,70 @@
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from germoplasm import geo, geohash
+from germoplasm.models import Location
+
+
+class GeohashTests(SimpleTestCase):
+
+    def test_encode(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_covering_cells_contain_every_point_in_radius(self):
+        rng = np.random.default_rng(1)
+        # Florianópolis, a linha de data e perto do polo.
+        for latitude, longitude in ((-27.5954, -48.548), (10.0, 179.9), (-84.0, 30.0)):
+            for radius in (0.5, 12.0, 300.0):
+                cells = geohash.covering_cells(latitude, longitude, radius)
+                self.assertLessEqual(len(cells), 9)
+                # Pontos na borda e no interior do círculo.
+                bearings = rng.uniform(0, 2 * np.pi, 200)
+                distances = radius * np.sqrt(rng.uniform(0, 1, 200))
+                distances[:50] = radius
+                for bearing, distance in zip(bearings, distances):
+                    point = self._destination(latitude, longitude, bearing, distance)
+                    code = geohash.encode(*point)
+                    self.assertTrue(any(code.startswith(cell) for cell in cells), (latitude, longitude, radius, point))
+
+    @staticmethod
+    def _destination(latitude, longitude, bearing, distance_km):
+        lat1, lon1 = np.radians(latitude), np.radians(longitude)
+        angle = distance_km / geohash.EARTH_RADIUS_KM * 0.999999
+        lat2 = np.arcsin(np.sin(lat1) * np.cos(angle) + np.cos(lat1) * np.sin(angle) * np.cos(bearing))
+        lon2 = lon1 + np.arctan2(
+            np.sin(bearing) * np.sin(angle) * np.cos(lat1), np.cos(angle) - np.sin(lat1) * np.sin(lat2)
+        )
+        return float(np.degrees(lat2)), float((np.degrees(lon2) + 180) % 360 - 180)
+
+
+class LocationsWithinTests(TestCase):
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(2)
+        for i, (latitude, longitude) in enumerate(zip(rng.uniform(-29.5, -26, 300), rng.uniform(-54, -48, 300))):
+            Location.objects.create(name=f'L{i}', latitude=round(latitude, 6), longitude=round(longitude, 6))
+        locations = list(Location.objects.all())
+        distances = geohash.haversine_km(
+            -27.6, -50.3, [location.latitude for location in locations], [location.longitude for location in locations],
+        )
+        for radius in (5.0, 40.0, 150.0):
+            expected = sorted(location.pk for location, distance in zip(locations, distances) if distance <= radius)
+            found = geo.locations_within(-27.6, -50.3, radius)
+            self.assertEqual(sorted(location.pk for location, _ in found), expected)
+            self.assertEqual([d for _, d in found], sorted(d for _, d in found))
+
+
+class AltitudeBandTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for altitude in (0, 499, 500, 899, 900, 1200, 1500):
+            Location.objects.create(name=f'Local {altitude}', altitude=altitude)
+
+    def test_each_altitude_falls_in_one_band(self):
+        found = [
+            sorted(geo.in_altitude_band(Location.objects.all(), low, high, lookup='altitude')
+                   .values_list('altitude', flat=True))
+            for low, high in geo.ALTITUDE_BANDS
+        ]
+        self.assertEqual(found, [[0, 499], [500, 899], [900], [1200, 1500]])
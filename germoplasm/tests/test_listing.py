@@ -0,0 +1,147 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from germoplasm import listing
+from germoplasm.models import GeneticMaterial, Location, MaterialListing, Planting, Population, S_Allele
+
+
+class MaterialSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin')
+        cultivar = GeneticMaterial.MaterialType.CULTIVAR
+        cls.mother = GeneticMaterial.objects.create(name='Mãe', material_type=cultivar)
+        cls.father = GeneticMaterial.objects.create(name='Pai', material_type=cultivar)
+        cls.child = GeneticMaterial.objects.create(
+            name='Filho', material_type=cultivar, mother=cls.mother, father=cls.father,
+        )
+        # Fichas fora dos sinais (que rodam após o commit): só a do filho existe.
+        MaterialListing.objects.create(
+            genetic_material=cls.child,
+            display_code=cls.child.internal_code,
+            mother_code=cls.mother.internal_code,
+            search_text=f'Filho {cls.child.internal_code} {cls.mother.internal_code}',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_changelist_searches_listing_and_own_codes(self):
+        response = self.client.get('/admin/germoplasm/geneticmaterial/', {'q': self.mother.internal_code})
+        self.assertEqual(
+            {material.pk for material in response.context['cl'].result_list}, {self.mother.pk, self.child.pk},
+        )
+
+    def test_autocomplete_searches_own_codes_only(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'term': self.mother.internal_code, 'app_label': 'germoplasm',
+            'model_name': 'geneticmaterial', 'field_name': 'mother',
+        })
+        self.assertEqual([int(result['id']) for result in response.json()['results']], [self.mother.pk])
+
+
+class ListingRefreshTests(TestCase):
+    """The signals keep each listing equal to a full rebuild."""
+
+    def setUp(self):
+        cultivar = GeneticMaterial.MaterialType.CULTIVAR
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mother = GeneticMaterial.objects.create(name='Mãe', material_type=cultivar)
+            self.father = GeneticMaterial.objects.create(name='Pai', material_type=cultivar)
+            self.population = Population.objects.create(
+                parent1=self.mother, parent2=self.father, cross_date=date(2025, 9, 1), seplan_code='S1',
+            )
+            self.child = GeneticMaterial.objects.create(
+                name='Filho', material_type=cultivar, mother=self.mother, father=self.father,
+                population=self.population,
+            )
+            self.location = Location.objects.create(name='Caçador')
+
+    def listing(self, material):
+        return MaterialListing.objects.get(genetic_material=material)
+
+    def assertMatchesRebuild(self):
+        fields = (
+            'genetic_material_id', 'display_code', 'mother_code', 'father_code', 'population_code',
+            's_genotype', 'num_photos', 'num_plantings', 'num_offspring', 'search_text',
+        )
+        refreshed = sorted(MaterialListing.objects.values_list(*fields))
+        listing.rebuild()
+        self.assertEqual(refreshed, sorted(MaterialListing.objects.values_list(*fields)))
+
+    def test_create_lists_material_and_parents(self):
+        child = self.listing(self.child)
+        self.assertEqual(child.mother_code, self.mother.get_display_code())
+        self.assertEqual(child.father_code, self.father.get_display_code())
+        self.assertEqual(child.population_code, self.population.code)
+        self.assertEqual(self.listing(self.mother).num_offspring, 1)
+        self.assertEqual(self.listing(self.father).num_offspring, 1)
+        self.assertMatchesRebuild()
+
+    def test_parent_code_change_refreshes_children(self):
+        self.mother.internal_code = 'MAE-1'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mother.save()
+        self.assertEqual(self.listing(self.child).mother_code, 'MAE-1')
+        self.assertIn('MAE-1', self.listing(self.child).search_text)
+        self.assertMatchesRebuild()
+
+    def test_parent_change_moves_offspring_count(self):
+        # O save() copia os parentais da população.
+        self.child.population = None
+        self.child.father = None
+        with self.captureOnCommitCallbacks(execute=True):
+            self.child.save()
+        child = self.listing(self.child)
+        self.assertEqual((child.father_code, child.population_code), ('', ''))
+        self.assertEqual(self.listing(self.father).num_offspring, 0)
+        self.assertEqual(self.listing(self.mother).num_offspring, 1)
+        self.assertMatchesRebuild()
+
+    def test_planting_counts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            planting = Planting.objects.create(genetic_material=self.child, location=self.location)
+            Planting.objects.create(genetic_material=self.child, location=self.location)
+        self.assertEqual(self.listing(self.child).num_plantings, 2)
+        planting.genetic_material = self.mother
+        with self.captureOnCommitCallbacks(execute=True):
+            planting.save()
+        self.assertEqual(self.listing(self.child).num_plantings, 1)
+        self.assertEqual(self.listing(self.mother).num_plantings, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            planting.delete()
+        self.assertEqual(self.listing(self.mother).num_plantings, 0)
+        self.assertMatchesRebuild()
+
+    def test_s_alleles_change_genotype(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            s1 = S_Allele.objects.create(name='S1')
+            s3 = S_Allele.objects.create(name='S3')
+            self.child.s_alleles.add(s3, s1)
+        self.assertEqual(self.listing(self.child).s_genotype, 'S1S3')
+        with self.captureOnCommitCallbacks(execute=True):
+            s3.genetic_materials.remove(self.child)
+        self.assertEqual(self.listing(self.child).s_genotype, 'S1')
+        s1.name = 'S9'
+        with self.captureOnCommitCallbacks(execute=True):
+            s1.save()
+        self.assertEqual(self.listing(self.child).s_genotype, 'S9')
+        self.assertMatchesRebuild()
+
+    def test_population_code_change(self):
+        self.population.code = 'POP-X'
+        self.population.seplan_code = 'S2'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.population.save()
+        child = self.listing(self.child)
+        self.assertEqual(child.population_code, 'POP-X')
+        self.assertIn('S2', child.search_text.split())
+        self.assertMatchesRebuild()
+
+    def test_refresh_materials_equals_rebuild(self):
+        MaterialListing.objects.all().delete()
+        listing.refresh_materials(GeneticMaterial.all_objects.values_list('pk', flat=True))
+        self.assertMatchesRebuild()
@@ -0,0 +1,65 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from germoplasm.breeding_values import solve_mixed_model
+from germoplasm.pedigree import UNKNOWN, Pedigree, inbreeding_coefficients, relationship_inverse
+
+U = UNKNOWN
+# Em ordem de geração: material de pai desconhecido (3), retrocruzamento (4),
+# irmãos completos (5, 6) e acasalamento entre eles (7).
+DAM = np.array([U, U, 0, 1, 0, 2, 2, 5])
+SIRE = np.array([U, U, 1, U, 2, 4, 4, 6])
+GENERATION = np.array([0, 0, 1, 1, 2, 3, 3, 4])
+
+
+def _pedigree():
+    return Pedigree(ids=np.arange(1, len(DAM) + 1), dam=DAM, sire=SIRE, generation=GENERATION)
+
+
+def _tabular_a(dam, sire):
+    """Numerator relationship matrix by the tabular method."""
+    n = len(dam)
+    a = np.zeros((n, n))
+    for i in range(n):
+        d, s = dam[i], sire[i]
+        for j in range(i):
+            a[i, j] = a[j, i] = 0.5 * ((a[j, d] if d != U else 0) + (a[j, s] if s != U else 0))
+        a[i, i] = 1 + (0.5 * a[d, s] if d != U and s != U else 0)
+    return a
+
+
+class RelationshipTests(SimpleTestCase):
+
+    def setUp(self):
+        self.pedigree = _pedigree()
+        self.a = _tabular_a(DAM, SIRE)
+
+    def test_inbreeding_matches_diagonal_of_a(self):
+        inbreeding, _ = inbreeding_coefficients(self.pedigree)
+        np.testing.assert_allclose(inbreeding, np.diag(self.a) - 1, atol=1e-12)
+        self.assertGreater(inbreeding[7], inbreeding[5])
+        self.assertGreater(inbreeding[5], 0)
+
+    def test_inverse_matches_tabular_a(self):
+        np.testing.assert_allclose(relationship_inverse(self.pedigree).toarray() @ self.a, np.eye(len(DAM)), atol=1e-10)
+
+
+class MixedModelTests(SimpleTestCase):
+
+    def test_matches_dense_solution(self):
+        pedigree = _pedigree()
+        a = _tabular_a(DAM, SIRE)
+        rows = np.array([0, 1, 2, 2, 3, 4, 6])
+        y = np.array([1.0, 4.0, 2.0, 3.0, 1.0, 4.0, 2.0])
+        lam = (1 - 0.3) / 0.3
+
+        n = len(DAM)
+        z = np.zeros((len(y), n))
+        z[np.arange(len(y)), rows] = 1
+        x = np.ones((len(y), 1))
+        lhs = np.block([[x.T @ x, x.T @ z], [z.T @ x, z.T @ z + lam * np.linalg.inv(a)]])
+        expected = np.linalg.solve(lhs, np.concatenate([x.T @ y, z.T @ y]))
+
+        mean, ebv = solve_mixed_model(relationship_inverse(pedigree), rows, y, lam)
+        self.assertAlmostEqual(mean, expected[0], places=6)
+        np.testing.assert_allclose(ebv, expected[1:], atol=1e-6)
@@ -0,0 +1,131 @@
+from datetime import date
+
+from django.test import TestCase
+
+from germoplasm import caching, detail_cache, pedigree_graph, services
+from germoplasm.models import GeneticMaterial, MaterialListing, Population
+from germoplasm.pedigree_import import import_pedigree
+
+CULTIVAR = GeneticMaterial.MaterialType.CULTIVAR
+
+
+def row(name='', code='', **columns):
+    return {'name': name, 'code': code, **columns}
+
+
+class PedigreeImportTests(TestCase):
+
+    def rejects(self, report):
+        return {label: reason for _, label, reason in report.rejects}
+
+    def material(self, name):
+        return GeneticMaterial.all_objects.get(name=name)
+
+    def test_cycles_and_their_descendants_are_rejected(self):
+        report = import_pedigree([
+            row('A', type='CULTIVAR', mother='B'),
+            row('B', type='CULTIVAR', mother='A'),
+            row('C', type='CULTIVAR', mother='A'),
+            row('D', type='CULTIVAR'),
+        ])
+        self.assertEqual(self.rejects(report), {
+            'A': "ciclo na genealogia",
+            'B': "ciclo na genealogia",
+            'C': "descende de um ciclo na genealogia",
+        })
+        self.assertEqual(report.created, 1)
+        self.assertEqual(list(GeneticMaterial.all_objects.values_list('name', flat=True)), ['D'])
+
+    def test_unknown_and_ambiguous_parents(self):
+        GeneticMaterial.objects.create(name='Gala', material_type=CULTIVAR)
+        GeneticMaterial.objects.create(name='Gala', material_type=CULTIVAR)
+        report = import_pedigree([
+            row('X', 'X1', type='CULTIVAR'),
+            row('X', 'X2', type='CULTIVAR'),
+            row('F1', type='CULTIVAR', mother='X'),
+            row('F2', type='CULTIVAR', mother='Gala'),
+            row('F3', type='CULTIVAR', father='Fuji'),
+            row('F4', type='CULTIVAR', mother='X1'),
+            # Descende de uma linha rejeitada.
+            row('F5', type='CULTIVAR', mother='F3'),
+        ])
+        rejects = self.rejects(report)
+        self.assertEqual(set(rejects), {'F1', 'F2', 'F3', 'F5'})
+        self.assertIn("ambíguo", rejects['F1'])
+        self.assertIn("há 2 materiais", rejects['F2'])
+        self.assertIn("não encontrado", rejects['F3'])
+        self.assertEqual(rejects['F5'], "mãe rejeitado(a) (linha 6)")
+        self.assertEqual(self.material('F4').mother.internal_code, 'X1')
+
+    def test_generation_order(self):
+        # Netos antes dos pais e dos avós na planilha.
+        report = import_pedigree([
+            row('Neto', type='SELECTION', mother='Filho', father='Avó'),
+            row('Filho', type='SELECTION', mother='Avó', father='Avô'),
+            row('Avó', type='CULTIVAR'),
+            row('Avô', type='CULTIVAR'),
+        ])
+        self.assertEqual((report.rejects, report.created, report.generations), ([], 4, 3))
+        grandmother, son, grandson = self.material('Avó'), self.material('Filho'), self.material('Neto')
+        self.assertEqual((son.mother, son.father), (grandmother, self.material('Avô')))
+        self.assertEqual((grandson.mother, grandson.father), (son, grandmother))
+        self.assertLess(grandmother.pk, son.pk)
+        self.assertLess(son.pk, grandson.pk)
+
+    def test_code_assignment(self):
+        report = import_pedigree([
+            row('Mãe', type='CULTIVAR'),
+            row('Pai', type='SELECTION'),
+            row('Origem', 'ORIG', type='CULTIVAR'),
+            row(code='P1H5', type='HYBRID', population='P1', mother='Mãe', father='Pai', cross_date='2020-10-01'),
+            row('Híbrido A', type='HYBRID', population='P1', mother='Mãe', father='Pai'),
+            row('Híbrido B', type='HYBRID', population='P1'),
+            row('Mutante A', mutated_from='ORIG'),
+            row(code='ORIGM2', mutated_from='Origem'),
+        ])
+        self.assertEqual((report.rejects, report.populations), ([], 1))
+        mother, father = self.material('Mãe'), self.material('Pai')
+        self.assertEqual(mother.internal_code, f'C{mother.pk}')
+        self.assertEqual(father.internal_code, f'S{father.pk}')
+        population = Population.all_objects.get(code='P1')
+        self.assertEqual((population.parent1, population.parent2), (mother, father))
+        self.assertEqual(population.cross_date, date(2020, 10, 1))
+        self.assertEqual(self.material('P1H5').population, population)
+        # Os códigos gerados continuam depois dos informados na planilha, e os contadores também.
+        self.assertEqual(
+            [self.material(name).accession_code for name in ('Híbrido A', 'Híbrido B', 'Mutante A')],
+            ['P1H6', 'P1H7', 'ORIGM3'],
+        )
+        self.assertEqual(self.material('Mutante A').material_type, CULTIVAR)
+        self.assertEqual(services.create_hybrid(population).accession_code, 'P1H8')
+        self.assertEqual(services.reserve_mutation_codes(self.material('Origem')), ['ORIGM4'])
+
+    def test_codes_of_registered_populations_continue_from_the_counter(self):
+        mother = GeneticMaterial.objects.create(name='Mãe', material_type=CULTIVAR)
+        father = GeneticMaterial.objects.create(name='Pai', material_type=CULTIVAR)
+        population = Population.objects.create(parent1=mother, parent2=father, cross_date=date(2025, 9, 1))
+        services.create_hybrid(population)
+        report = import_pedigree([
+            row('H2', type='HYBRID', population=population.code),
+            row('H3', type='HYBRID', population=population.code),
+        ])
+        self.assertEqual(report.rejects, [])
+        self.assertEqual(
+            [self.material(name).accession_code for name in ('H2', 'H3')],
+            [f'{population.code}H2', f'{population.code}H3'],
+        )
+
+    def test_existing_parents_caches_are_invalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            parent = GeneticMaterial.objects.create(name='Mãe', material_type=CULTIVAR)
+        self.assertEqual(detail_cache.get_material_detail(parent)['offspring']['as_mother'], [])
+        graph_version = caching.get_version(pedigree_graph.version_key(parent.pk))
+
+        import_pedigree([row('Filho', type='CULTIVAR', mother=parent.internal_code)])
+        parent.refresh_from_db()
+        offspring = detail_cache.get_material_detail(parent)['offspring']['as_mother']
+        self.assertEqual([child['name'] for child in offspring], ['Filho'])
+        self.assertNotEqual(caching.get_version(pedigree_graph.version_key(parent.pk)), graph_version)
+        self.assertEqual(MaterialListing.objects.get(genetic_material=parent).num_offspring, 1)
+        child = MaterialListing.objects.get(genetic_material=self.material('Filho'))
+        self.assertEqual(child.mother_code, parent.internal_code)
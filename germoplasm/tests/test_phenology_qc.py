@@ -0,0 +1,96 @@
+import datetime
+
+from django.test import TestCase, override_settings
+
+from germoplasm import phenology_qc
+from germoplasm.models import (
+    GeneticMaterial,
+    Location,
+    PhenologicalEvent,
+    PhenologyFlag,
+    PhenologyObservation,
+)
+
+Rule = PhenologyFlag.Rule
+
+
+class QualityCheckTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.budding = PhenologicalEvent.objects.create(name='Brotação', sequence=1, first_month=8, last_month=10)
+        cls.flowering = PhenologicalEvent.objects.create(name='Floração', sequence=2, first_month=9, last_month=11)
+        cls.harvest = PhenologicalEvent.objects.create(
+            name='Colheita', sequence=3, first_month=12, last_month=3, allow_repeats=True,
+        )
+        cls.location = Location.objects.create(name='Caçador')
+        cls.other_location = Location.objects.create(name='Fraiburgo')
+        cls.materials = [
+            GeneticMaterial.objects.create(name=f'M{i}', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+            for i in range(20)
+        ]
+
+    def observe(self, event, date, material=0, location=None):
+        # Os sinais verificam os grupos afetados após o commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            return PhenologyObservation.objects.create(
+                genetic_material=self.materials[material], location=location or self.location,
+                event=event, observation_date=date,
+            )
+
+    def flags(self):
+        return set(PhenologyFlag.objects.values_list('observation_id', 'rule'))
+
+    def test_rules(self):
+        late_flowering = self.observe(self.flowering, datetime.date(2024, 9, 5))
+        self.observe(self.budding, datetime.date(2024, 9, 20))
+        repeated = self.observe(self.flowering, datetime.date(2024, 10, 1))
+        winter_budding = self.observe(self.budding, datetime.date(2024, 6, 15), material=1)
+        # Época que vira o ano (dezembro a março) e repetições permitidas.
+        self.observe(self.harvest, datetime.date(2024, 1, 20), material=2)
+        self.observe(self.harvest, datetime.date(2024, 2, 3), material=2)
+        may_harvest = self.observe(self.harvest, datetime.date(2024, 5, 2), material=2)
+
+        self.assertEqual(self.flags(), {
+            (late_flowering.pk, Rule.ORDER),
+            (repeated.pk, Rule.DUPLICATE),
+            (winter_budding.pk, Rule.SEASON),
+            (may_harvest.pk, Rule.SEASON),
+        })
+
+    def test_outlier(self):
+        for i in range(19):
+            self.observe(self.flowering, datetime.date(2024, 9, 18 + i % 5), material=i, location=self.other_location)
+        self.assertEqual(self.flags(), set())
+        atypical = self.observe(self.flowering, datetime.date(2024, 11, 28), material=19, location=self.other_location)
+        flags = PhenologyFlag.objects.filter(rule=Rule.OUTLIER)
+        self.assertEqual([flag.observation_id for flag in flags], [atypical.pk])
+        self.assertGreater(flags[0].score, phenology_qc.Z_LIMIT)
+
+    def test_incremental_checks_match_full_check(self):
+        observations = [
+            self.observe(self.flowering, datetime.date(2024, 9, 18 + i % 5), material=i % 4)
+            for i in range(14)
+        ]
+        self.observe(self.budding, datetime.date(2024, 10, 15), material=1)
+        self.observe(self.flowering, datetime.date(2024, 11, 29), material=5)
+        # Mudança de data e desativação (a observação sai do grupo).
+        with self.captureOnCommitCallbacks(execute=True):
+            observations[0].observation_date = datetime.date(2024, 12, 1)
+            observations[0].save()
+        with self.captureOnCommitCallbacks(execute=True):
+            observations[1].is_active = False
+            observations[1].save()
+        incremental = self.flags()
+        phenology_qc.check_all()
+        self.assertEqual(self.flags(), incremental)
+        self.assertTrue(incremental)
+
+    @override_settings(PHENOLOGY_SEASON_START_MONTH=7)
+    def test_season_start_month(self):
+        self.assertEqual(phenology_qc.season_of(datetime.date(2025, 3, 1)), 2024)
+        self.assertEqual(phenology_qc.season_range(2024), (datetime.date(2024, 7, 1), datetime.date(2025, 7, 1)))
+        # Safra de julho a junho: a brotação de setembro precede a floração de janeiro.
+        self.observe(self.budding, datetime.date(2024, 9, 1))
+        flowering = self.observe(self.flowering, datetime.date(2025, 1, 10))
+        self.assertEqual(self.flags(), {(flowering.pk, Rule.SEASON)})
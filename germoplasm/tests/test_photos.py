@@ -0,0 +1,85 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from germoplasm import photo_import
+from germoplasm.models import GeneticMaterial, GeneticMaterialPhoto
+from germoplasm.storage import PHOTO_DIR
+
+
+class DeleteOrphansTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.directory = os.path.join(media_root, PHOTO_DIR, 'sha256', 'ab')
+        os.makedirs(self.directory)
+
+    def file(self, name, age_minutes):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as handle:
+            handle.write(b'x')
+        modified = time.time() - age_minutes * 60
+        os.utime(path, (modified, modified))
+        return path
+
+    def test_skips_temporary_and_recent_files(self):
+        material = GeneticMaterial.objects.create(name='A', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+        photo = GeneticMaterialPhoto.objects.create(
+            genetic_material=material, image=SimpleUploadedFile('foto.jpg', b'conteudo'),
+        )
+        orphan = self.file('ab01.jpg', age_minutes=120)
+        recent = self.file('ab02.jpg', age_minutes=5)
+        partial = self.file('ab03.jpg.0123abcd.part', age_minutes=120)
+
+        call_command('dedupe_photos', delete_orphans=True, stdout=io.StringIO())
+
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(recent))
+        self.assertTrue(os.path.exists(partial))
+        self.assertTrue(os.path.exists(photo.image.path))
+
+        call_command('dedupe_photos', delete_orphans=True, grace_minutes=0, stdout=io.StringIO())
+        self.assertFalse(os.path.exists(recent))
+        self.assertTrue(os.path.exists(partial))
+
+
+class AdminPhotoImportTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def archive(self, *names):
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, 'w') as archive:
+            for name in names:
+                image = io.BytesIO()
+                Image.new('RGB', (8, 8), 'red').save(image, format='PNG')
+                archive.writestr(name, image.getvalue())
+        return SimpleUploadedFile('fotos.zip', output.getvalue(), content_type='application/zip')
+
+    def test_encodes_in_the_request_without_a_pool(self):
+        material = GeneticMaterial.objects.create(name='A', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+        self.client.force_login(User.objects.create_superuser('admin'))
+        with mock.patch.object(photo_import, '_executor', side_effect=AssertionError('pool iniciado')):
+            response = self.client.post(
+                '/admin/germoplasm/geneticmaterial/import-photos/',
+                {'archive': self.archive(f'{material.internal_code}_fruto.png', 'XYZ.png')},
+            )
+        self.assertEqual(response.status_code, 200)
+        photo = GeneticMaterialPhoto.objects.get(genetic_material=material)
+        self.assertEqual(photo.caption, 'fruto')
+        self.assertEqual(photo_import._archives, {})
@@ -0,0 +1,137 @@
+import datetime
+
+import numpy as np
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from germoplasm import caching, reaction_matrix
+from germoplasm.models import Disease, DiseaseReaction, GeneticMaterial, ReactionProfile
+
+Level = DiseaseReaction.ReactionLevel
+
+
+class ReactionMatrixTests(TestCase):
+
+    def setUp(self):
+        caching.bump_versions([reaction_matrix.MATRIX_VERSION_KEY])
+        self.scab, self.blotch, self.rust = (
+            Disease.objects.create(name=name) for name in ('Sarna', 'Mancha', 'Ferrugem')
+        )
+        self.materials = {}
+        for name, reactions in {
+            'A': {self.scab: Level.RESISTANT, self.blotch: Level.SUSCEPTIBLE},
+            'B': {self.scab: Level.MODERATELY_RESISTANT, self.blotch: Level.RESISTANT},
+            'C': {self.scab: Level.SUSCEPTIBLE},
+            'D': {self.blotch: Level.MODERATELY_SUSCEPTIBLE},
+            'E': {},
+        }.items():
+            material = GeneticMaterial.objects.create(name=name, material_type=GeneticMaterial.MaterialType.CULTIVAR)
+            for disease, level in reactions.items():
+                DiseaseReaction.objects.create(genetic_material=material, disease=disease, reaction=level)
+            self.materials[name] = material
+
+    def matching(self, thresholds):
+        ids = reaction_matrix.get_matrix().matching(thresholds)
+        return {name for name, material in self.materials.items() if material.pk in ids}
+
+    def test_matching_thresholds(self):
+        self.assertEqual(self.matching({self.scab.pk: 1}), {'A'})
+        self.assertEqual(self.matching({self.scab.pk: 2}), {'A', 'B'})
+        # 4: qualquer reação registrada; sem registro não passa em nenhum limiar.
+        self.assertEqual(self.matching({self.scab.pk: 4}), {'A', 'B', 'C'})
+        self.assertEqual(self.matching({self.blotch.pk: 3}), {'B', 'D'})
+        self.assertEqual(self.matching({self.scab.pk: 2, self.blotch.pk: 2}), {'B'})
+        self.assertEqual(self.matching({self.rust.pk: 4}), set())
+        self.assertEqual(self.matching({}), {'A', 'B', 'C', 'D'})
+
+    def test_matching_materials_accepts_levels(self):
+        queryset = reaction_matrix.matching_materials({str(self.scab.pk): Level.MODERATELY_RESISTANT})
+        self.assertEqual(set(queryset.values_list('name', flat=True)), {'A', 'B'})
+
+    def test_levels(self):
+        matrix = reaction_matrix.get_matrix()
+        diseases = [self.blotch.pk, self.rust.pk, self.scab.pk]
+        self.assertEqual(matrix.levels(self.materials['A'].pk, diseases), ['S', '', 'R'])
+        self.assertEqual(matrix.levels(self.materials['E'].pk, diseases), ['', '', ''])
+
+    def test_columns_are_dense(self):
+        # Doenças excluídas e ids altos não criam colunas: só as doenças com reação.
+        unused = [Disease.objects.create(name=f'Doença {i}') for i in range(50)]
+        late = unused.pop()
+        Disease.objects.filter(pk__in=[disease.pk for disease in unused]).delete()
+        DiseaseReaction.objects.create(genetic_material=self.materials['E'], disease=late, reaction=Level.RESISTANT)
+
+        profile = ReactionProfile.objects.get(genetic_material=self.materials['E'])
+        self.assertEqual(profile.codes, f'{late.pk}:1')
+        matrix = reaction_matrix.get_matrix()
+        self.assertEqual(matrix.codes.shape, (5, 3))
+        np.testing.assert_array_equal(matrix.disease_ids, sorted([self.scab.pk, self.blotch.pk, late.pk]))
+        self.assertEqual(self.matching({late.pk: 1}), {'E'})
+
+    def test_encode_round_trip(self):
+        codes = {12: 4, 3: 1, 7: 2}
+        self.assertEqual(reaction_matrix.encode(codes), '3:1,7:2,12:4')
+        self.assertEqual(reaction_matrix.decode(reaction_matrix.encode(codes)), codes)
+        self.assertEqual(reaction_matrix.decode(''), {})
+
+
+class DiseaseMigrationTests(TransactionTestCase):
+    """Runs 0025 (diseases from the free-text names) and 0034 (profile pairs) on old-schema rows."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('germoplasm', target)])
+        return executor.loader.project_state([('germoplasm', target)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_disease_names_are_merged_and_duplicates_deactivated(self):
+        apps = self.migrate('0024_audit_entry')
+        Material = apps.get_model('germoplasm', 'GeneticMaterial')
+        Reaction = apps.get_model('germoplasm', 'DiseaseReaction')
+        first = Material.objects.create(name='A', material_type='CULTIVAR')
+        second = Material.objects.create(name='B', material_type='CULTIVAR')
+        now = timezone.now()
+        for material, name, level, is_active, age in (
+            (first, 'Sarna', 'S', True, 3),
+            (first, ' sarna ', 'R', True, 1),  # a mais recente do material permanece ativa
+            (first, 'SARNA', 'MR', False, 0),
+            (second, 'Sarna', 'MS', True, 2),
+            (second, 'Mancha  da   Gala', 'R', True, 2),
+        ):
+            reaction = Reaction.objects.create(
+                genetic_material=material, disease_name=name, reaction=level, is_active=is_active,
+            )
+            Reaction.objects.filter(pk=reaction.pk).update(updated_at=now - datetime.timedelta(days=age))
+
+        apps = self.migrate('0025_disease')
+        Disease = apps.get_model('germoplasm', 'Disease')
+        Reaction = apps.get_model('germoplasm', 'DiseaseReaction')
+        # A grafia mais usada de cada nome.
+        self.assertEqual(sorted(Disease.objects.values_list('name', flat=True)), ['Mancha da Gala', 'Sarna'])
+        self.assertEqual(
+            sorted(
+                Reaction.objects.filter(is_active=True)
+                .values_list('genetic_material__name', 'disease__name', 'reaction')
+            ),
+            [('A', 'Sarna', 'R'), ('B', 'Mancha da Gala', 'R'), ('B', 'Sarna', 'MS')],
+        )
+        self.assertFalse(Reaction.objects.filter(disease=None).exists())
+
+        apps = self.migrate('0033_drop_overlapping_indexes')
+        Profile = apps.get_model('germoplasm', 'ReactionProfile')
+        scab, blotch = (Disease.objects.get(name=name).pk for name in ('Sarna', 'Mancha da Gala'))
+        digits = dict(Profile.objects.values_list('genetic_material__name', 'codes'))
+        apps = self.migrate('0034_reaction_profile_pairs')
+        Profile = apps.get_model('germoplasm', 'ReactionProfile')
+        pairs = dict(Profile.objects.values_list('genetic_material__name', 'codes'))
+        self.assertEqual(pairs, {
+            'A': reaction_matrix.encode({scab: 1}),
+            'B': reaction_matrix.encode({scab: 3, blotch: 1}),
+        })
+        self.migrate('0033_drop_overlapping_indexes')
+        self.assertEqual(dict(Profile.objects.values_list('genetic_material__name', 'codes')), digits)
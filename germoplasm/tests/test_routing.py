@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import TransactionTestCase, override_settings
+
+from germoplasm import caching, reaction_matrix, routing
+from germoplasm.models import Disease, DiseaseReaction, GeneticMaterial, ReactionProfile
+
+# Réplica que não existe em DATABASES: qualquer leitura enviada a ela falha.
+LAGGING_REPLICA = 'replica-atrasada'
+
+
+@override_settings(DATABASE_REPLICAS=[LAGGING_REPLICA])
+class ReplicaRouterTests(TransactionTestCase):
+    # Fora de TestCase: o roteador mantém no principal as leituras dentro de transações.
+
+    def setUp(self):
+        self.router = routing.ReplicaRouter()
+
+    def test_reads_go_to_replicas_only_when_allowed(self):
+        self.assertEqual(self.router.db_for_read(GeneticMaterial), DEFAULT_DB_ALIAS)
+        with routing.replica_reads():
+            self.assertEqual(self.router.db_for_read(GeneticMaterial), LAGGING_REPLICA)
+            self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_write(GeneticMaterial), DEFAULT_DB_ALIAS)
+            with routing.replica_reads(False):
+                self.assertEqual(self.router.db_for_read(GeneticMaterial), DEFAULT_DB_ALIAS)
+
+    def test_reads_inside_transactions_stay_on_primary(self):
+        with routing.replica_reads(), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(GeneticMaterial), DEFAULT_DB_ALIAS)
+
+    def test_replica_paths(self):
+        with self.settings(
+            DATABASE_REPLICA_PATHS=['/brapi/'], DATABASE_REPLICA_READONLY_POST_PATHS=['/brapi/v2/search/'],
+        ):
+            self.assertTrue(routing.is_replica_path('/brapi/v2/germplasm', 'GET'))
+            self.assertTrue(routing.is_replica_path('/brapi/v2/search/germplasm', 'POST'))
+            self.assertFalse(routing.is_replica_path('/brapi/v2/germplasm', 'POST'))
+            self.assertFalse(routing.is_replica_path('/admin/', 'GET'))
+
+    def test_reaction_matrix_is_built_from_primary(self):
+        caching.bump_versions([reaction_matrix.MATRIX_VERSION_KEY])
+        disease = Disease.objects.create(name='Sarna')
+        material = GeneticMaterial.objects.create(name='M1', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+        DiseaseReaction.objects.create(
+            genetic_material=material, disease=disease, reaction=DiseaseReaction.ReactionLevel.RESISTANT,
+        )
+        self.assertTrue(ReactionProfile.objects.filter(genetic_material=material).exists())
+
+        # Requisição da página da matriz sem o cookie de fixação: as leituras podem ir
+        # para a réplica, mas a matriz guardada sob o token novo vem do principal.
+        with routing.replica_reads():
+            self.assertEqual(self.router.db_for_read(ReactionProfile), LAGGING_REPLICA)
+            matrix = reaction_matrix.get_matrix()
+        self.assertEqual(matrix.levels(material.pk, [disease.pk]), ['R'])
@@ -0,0 +1,122 @@
+import csv
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.http import http_date
+
+from germoplasm.models import GeneticMaterial, GeneticMaterialPhoto
+from germoplasm.streaming import requested_range
+
+SIZE = 100
+ETAG = '"abc"'
+LAST_MODIFIED = 1_700_000_000
+
+
+class RequestedRangeTests(SimpleTestCase):
+
+    def range(self, header=None, method='GET', **headers):
+        if header is not None:
+            headers['Range'] = header
+        request = RequestFactory().generic(method, '/photos/1', headers=headers)
+        return requested_range(request, SIZE, ETAG, LAST_MODIFIED)
+
+    def test_whole_file(self):
+        self.assertIsNone(self.range())
+        self.assertIsNone(self.range('bytes=0-9', method='POST'))
+        # Vários intervalos, intervalo invertido ou cabeçalho inválido: o arquivo inteiro.
+        self.assertIsNone(self.range('bytes=0-1,5-6'))
+        self.assertIsNone(self.range('bytes=5-2'))
+        self.assertIsNone(self.range('bytes=-'))
+        self.assertIsNone(self.range('items=0-9'))
+
+    def test_ranges(self):
+        self.assertEqual(self.range('bytes=0-9'), (0, 9))
+        self.assertEqual(self.range('bytes=90-'), (90, 99))
+        self.assertEqual(self.range('bytes=90-200'), (90, 99))
+
+    def test_suffix_ranges(self):
+        self.assertEqual(self.range('bytes=-10'), (90, 99))
+        self.assertEqual(self.range('bytes=-500'), (0, 99))
+        self.assertIs(self.range('bytes=-0'), False)
+
+    def test_unsatisfiable(self):
+        self.assertIs(self.range(f'bytes={SIZE}-'), False)
+        self.assertIs(self.range(f'bytes={SIZE + 10}-{SIZE + 20}'), False)
+
+    def test_if_range(self):
+        self.assertEqual(self.range('bytes=0-9', If_Range=ETAG), (0, 9))
+        self.assertEqual(self.range('bytes=0-9', If_Range=http_date(LAST_MODIFIED)), (0, 9))
+        self.assertIsNone(self.range('bytes=0-9', If_Range='"outro"'))
+        self.assertIsNone(self.range('bytes=0-9', If_Range=http_date(LAST_MODIFIED + 1)))
+
+
+class StreamingAccessTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.content = bytes(range(256)) * 4
+        cls.material = GeneticMaterial.objects.create(name='A', material_type=GeneticMaterial.MaterialType.CULTIVAR)
+        cls.photo = GeneticMaterialPhoto.objects.create(
+            genetic_material=cls.material, image=SimpleUploadedFile('foto.jpg', cls.content),
+        )
+        cls.staff = User.objects.create_user('tecnico', is_staff=True)
+        cls.admin = User.objects.create_superuser('admin')
+
+    async def get(self, path, user=None, **headers):
+        if user is not None:
+            await self.async_client.aforce_login(user)
+        response = await self.async_client.get(path, headers=headers)
+        if response.streaming:
+            response.body = b''.join([chunk async for chunk in response.streaming_content])
+        return response
+
+    async def test_exports_require_view_permission(self):
+        paths = ('/exports/materials.csv', '/exports/observations.csv')
+        for path in paths:
+            response = await self.get(path)
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response['Location'].startswith('/admin/login/'))
+        for path in paths:
+            self.assertEqual((await self.get(path, self.staff)).status_code, 403)
+
+    async def test_materials_export(self):
+        response = await self.get('/exports/materials.csv', self.admin)
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(response.body.decode())))
+        self.assertEqual([row[:2] for row in rows[1:]], [[str(self.material.pk), 'A']])
+
+    async def test_photo_requires_view_permission(self):
+        path = f'/photos/{self.photo.pk}'
+        self.assertEqual((await self.get(path)).status_code, 302)
+        self.assertEqual((await self.get(path, self.staff)).status_code, 403)
+
+    async def test_photo_ranges(self):
+        path = f'/photos/{self.photo.pk}'
+        size = len(self.content)
+        response = await self.get(path, self.admin)
+        self.assertEqual((response.status_code, response.body), (200, self.content))
+        self.assertEqual(response['ETag'], f'"{self.photo.content_hash}"')
+
+        response = await self.get(path, Range='bytes=-4')
+        self.assertEqual((response.status_code, response.body), (206, self.content[-4:]))
+        self.assertEqual(response['Content-Range'], f'bytes {size - 4}-{size - 1}/{size}')
+
+        response = await self.get(path, Range=f'bytes={size}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{size}'))
+
+        response = await self.get(path, Range='bytes=0-3', If_Range='"outro"')
+        self.assertEqual((response.status_code, response.body), (200, self.content))
+
+        response = await self.get(path, If_None_Match=f'"{self.photo.content_hash}"')
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,90 @@
+import datetime
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from germoplasm import caching, weather
+from germoplasm.models import Location
+
+FIRST_DAY = datetime.date(2024, 11, 1)
+DAYS = 120
+MISSING_DAY = datetime.date(2025, 2, 10)
+
+
+class AccumulationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(name='Caçador')
+        rng = np.random.default_rng(5)
+        cls.tmin = rng.uniform(5, 20, DAYS).round(1)
+        cls.tmax = (cls.tmin + rng.uniform(2, 18, DAYS)).round(1)
+        cls.dates = [FIRST_DAY + datetime.timedelta(days=i) for i in range(DAYS)]
+        rows = [
+            {
+                'data': f'{day:%d/%m/%Y}',
+                'tmin': f'{low}'.replace('.', ','),
+                'tmax': '' if day == MISSING_DAY else f'{high}',
+            }
+            for day, low, high in zip(cls.dates, cls.tmin, cls.tmax)
+        ]
+        cls.report = weather.import_weather(cls.location, rows)
+
+    def setUp(self):
+        caching.bump_versions([weather.VERSION_KEY])
+
+    def expected_gdd(self, start, end):
+        total = 0.0
+        for day, low, high in zip(self.dates, self.tmin, self.tmax):
+            if start <= day <= end:
+                if day == MISSING_DAY:
+                    return np.nan
+                total += max((low + min(high, weather.GDD_CEILING)) / 2 - weather.GDD_BASE, 0)
+        return total
+
+    def test_import_splits_years(self):
+        self.assertEqual((self.report.created, self.report.rejects), (2, []))
+        self.assertEqual(self.report.values, 2 * DAYS - 1)
+
+    def test_gdd_windows(self):
+        windows = [
+            (datetime.date(2024, 11, 1), datetime.date(2024, 11, 1)),
+            (datetime.date(2024, 12, 15), datetime.date(2025, 1, 20)),  # vira o ano
+            (datetime.date(2024, 11, 5), datetime.date(2025, 2, 9)),
+            (datetime.date(2025, 2, 1), datetime.date(2025, 2, 20)),  # dia sem máxima
+            (datetime.date(2024, 10, 30), datetime.date(2024, 11, 10)),  # antes da série
+        ]
+        starts, ends = zip(*windows)
+        values = weather.accumulate('gdd', [self.location.pk] * len(windows), list(starts), list(ends))
+        expected = [self.expected_gdd(*window) for window in windows]
+        expected[-1] = np.nan
+        np.testing.assert_allclose(values, expected, rtol=1e-5)
+        self.assertTrue(np.isnan(values[3]))
+
+    def test_location_without_series(self):
+        other = Location.objects.create(name='Sem estação')
+        values = weather.accumulate('gdd', [other.pk], [FIRST_DAY], [FIRST_DAY])
+        self.assertTrue(np.isnan(values).all())
+
+    def test_season_starts(self):
+        ends = ['2025-03-10', '2025-06-01', '2025-06-02']
+        starts = weather.season_starts(ends, 6, 1)
+        self.assertEqual([str(day) for day in starts], ['2024-06-01', '2025-06-01', '2025-06-01'])
+
+
+class DailyMetricTests(SimpleTestCase):
+
+    def test_hourly_chill_is_scaled_to_24_hours(self):
+        hours = np.full((2, 24), np.nan)
+        hours[0] = 5.0
+        hours[1, :20] = [5.0] * 10 + [10.0] * 10
+        metrics = weather.daily_metrics(np.full(2, np.nan), np.full(2, np.nan), hours)
+        np.testing.assert_allclose(metrics['chill_hours'], [24.0, 12.0])
+        np.testing.assert_allclose(metrics['chill_units'], [24.0, (10 * 1.0 + 10 * 0.5) * 24 / 20])
+
+    def test_extremes_estimate_hours_and_gdd(self):
+        tmin, tmax = np.array([5.0, 20.0, np.nan]), np.array([5.0, 36.0, np.nan])
+        metrics = weather.daily_metrics(tmin, tmax, np.full((3, 24), np.nan))
+        np.testing.assert_allclose(metrics['chill_hours'][:2], [24.0, 0.0])
+        np.testing.assert_allclose(metrics['gdd'][:2], [0.0, 15.0])
+        self.assertTrue(np.isnan(metrics['gdd'][2]) and np.isnan(metrics['chill_hours'][2]))
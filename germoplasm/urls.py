@@ -0,0 +1,24 @@
+"""
+Rotas da API BrAPI v2, incluídas em ``brapi/v2/`` por ``core/urls.py``.
+"""
+from django.urls import path
+
+from . import views
+from .brapi import DETAIL_PARAMS, RESOURCES
+
+app_name = 'brapi'
+
+urlpatterns = [path('serverinfo', views.serverinfo, name='serverinfo')]
+for entity in RESOURCES:
+    urlpatterns += [
+        path(entity, views.list_view, {'entity': entity}, name=entity),
+        path(f'search/{entity}', views.search_view, {'entity': entity}, name=f'search-{entity}'),
+        path(
+            f'search/{entity}/<str:search_id>', views.search_results_view, {'entity': entity},
+            name=f'search-{entity}-results',
+        ),
+    ]
+    if entity in DETAIL_PARAMS:
+        urlpatterns.append(
+            path(f'{entity}/<str:db_id>', views.detail_view, {'entity': entity}, name=f'{entity}-detail')
+        )
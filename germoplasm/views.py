@@ -1,3 +1,122 @@
-from django.shortcuts import render
+"""
+Views da API BrAPI v2 (ver ``brapi.py``).
 
-# Create your views here.
+Clientes externos autenticam-se com HTTP Basic (usuário e senha do sistema) ou
+pela sessão do admin, e precisam da permissão de visualização do modelo de
+cada recurso. As respostas seguem o envelope BrAPI (``metadata``/``result``).
+"""
+import base64
+import binascii
+import json
+from functools import wraps
+
+from django.contrib.auth import authenticate
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from . import brapi
+
+
+def _error(message, status):
+    return JsonResponse(brapi.envelope(None, messages=[message], message_type='ERROR'), status=status)
+
+
+def _user(request):
+    if request.user.is_authenticated:
+        return request.user
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        username, _, password = base64.b64decode(credentials).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    return authenticate(request, username=username, password=password)
+
+
+def brapi_view(methods):
+    """
+    Checks the method and the user's permission on the resource, and renders
+    the view's result (a body, or ``(body, status)``). ``BrapiError`` becomes
+    an error response.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, entity, *args, **kwargs):
+            if request.method not in methods:
+                return _error("Método não permitido.", 405)
+            try:
+                resource = brapi.get_resource(entity)
+                user = _user(request)
+                if user is None:
+                    response = _error("Autenticação necessária.", 401)
+                    response['WWW-Authenticate'] = 'Basic realm="BrAPI"'
+                    return response
+                if not user.has_perm(resource.permission):
+                    return _error("Permissão negada.", 403)
+                result = view(request, entity, resource, *args, **kwargs)
+            except brapi.BrapiError as error:
+                return _error(str(error), error.status)
+            body, status = result if isinstance(result, tuple) else (result, 200)
+            return JsonResponse(body, status=status)
+        return wrapper
+    return decorator
+
+
+def _query_params(request, resource) -> dict:
+    # Nos GET as listas vêm no singular: ?germplasmDbId=1&germplasmDbId=2.
+    params = {}
+    for name in resource.filters:
+        singular = name[:-1] if name.endswith('s') else name
+        params[name] = request.GET.getlist(singular) + request.GET.getlist(name)
+    return params
+
+
+def _body_params(request, resource) -> tuple:
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        raise brapi.BrapiError("Corpo da requisição não é um JSON válido.")
+    if not isinstance(body, dict):
+        raise brapi.BrapiError("O corpo da busca deve ser um objeto JSON.")
+    params = {}
+    for name in resource.filters:
+        value = body.get(name)
+        params[name] = value if isinstance(value, list) else [value]
+    return params, body
+
+
+def serverinfo(request):
+    return JsonResponse(brapi.server_info())
+
+
+@brapi_view(('GET',))
+def list_view(request, entity, resource):
+    page, page_size = brapi.paging(request.GET.get('page'), request.GET.get('pageSize'))
+    return brapi.list_page(resource, _query_params(request, resource), page, page_size)
+
+
+@brapi_view(('GET',))
+def detail_view(request, entity, resource, db_id):
+    return brapi.detail(resource, db_id)
+
+
+@brapi_view(('POST',))
+def search_view(request, entity, resource):
+    """
+    Starts a search. Results that fit in one page are returned right away
+    (200); larger ones get a ``searchResultsDbId`` (202) to be read page by page.
+    """
+    params, body = _body_params(request, resource)
+    page, page_size = brapi.paging(body.get('page'), body.get('pageSize'))
+    search_id, total = brapi.create_search(entity, params)
+    if total <= page_size:
+        return brapi.search_page(entity, search_id, 0, page_size)
+    return brapi.envelope({'searchResultsDbId': search_id}, total=total), 202
+
+
+@brapi_view(('GET',))
+def search_results_view(request, entity, resource, search_id):
+    page, page_size = brapi.paging(request.GET.get('page'), request.GET.get('pageSize'))
+    return brapi.search_page(entity, search_id, page, page_size)
@@ -0,0 +1,460 @@
+"""
+Séries meteorológicas dos locais e acumulação de frio e de graus-dia.
+
+Armazenamento: uma linha de ``WeatherSeries`` por local, ano e resolução, com
+as temperaturas em colunas float32 compactadas (um valor por dia ou por hora
+a partir de 1º de janeiro, NaN quando ausente). As séries vêm de planilhas de
+estação (``import_weather``), com as colunas (cabeçalho, sem diferenciar
+maiúsculas):
+
+- ``date`` (ou ``data``), em ``AAAA-MM-DD`` ou ``DD/MM/AAAA``;
+- séries horárias: ``hour`` (ou ``hora``, ex.: ``13``, ``13:00``, ``1300 UTC``)
+  e ``temperature`` (ou ``temperatura``);
+- séries diárias: ``tmin`` e ``tmax``.
+
+Motor: para cada local, as séries são convertidas em valores diários de cada
+métrica e acumuladas (soma cumulativa) uma única vez por versão. O acumulado
+entre duas datas é a diferença de duas posições desse vetor, de modo que a
+acumulação de milhares de janelas (ex.: GDD da quebra de dormência à plena
+floração de todas as observações da safra) é uma única operação vetorizada.
+
+Métricas:
+
+- ``gdd``: graus-dia pelo método da média, ``max((tmin + min(tmax, teto)) / 2 - base, 0)``;
+- ``chill_hours``: horas entre 0 e 7,2 °C (Weinberger, 1950);
+- ``chill_units``: unidades de frio do modelo Utah (Richardson et al., 1974),
+  com as unidades negativas das horas quentes.
+
+As métricas horárias usam a série horária do dia quando ela tem ao menos
+``MIN_HOURS`` horas (a soma é escalada para 24 h); senão, as horas são
+estimadas por uma senoide entre a mínima (2 h) e a máxima (14 h) diárias.
+Janelas com algum dia sem dados resultam em NaN.
+"""
+import calendar
+import datetime
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching
+from .models import PhenologyObservation, WeatherSeries
+
+VERSION_KEY = 'germoplasm:weather-version'
+BULK_BATCH_SIZE = 500
+DTYPE = np.dtype('<f4')
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+GDD_BASE = 10.0
+GDD_CEILING = 30.0
+CHILL_HOURS_MAX = 7.2
+# Limites (°C) e unidades das faixas do modelo Utah.
+UTAH_BOUNDS = (1.5, 2.5, 9.2, 12.5, 16.0, 18.0)
+UTAH_UNITS = np.array((0.0, 0.5, 1.0, 0.5, 0.0, -0.5, -1.0))
+MIN_HOURS = 20
+TEMPERATURE_RANGE = (-60.0, 60.0)
+
+METRICS = {
+    'gdd': "Graus-dia (GDD)",
+    'chill_hours': "Horas de frio (0 a 7,2 °C)",
+    'chill_units': "Unidades de frio (Utah)",
+}
+COLUMN_ALIASES = {
+    'date': ('date', 'data'),
+    'hour': ('hour', 'hora', 'hora utc', 'time'),
+    'temperature': ('temperature', 'temp', 'temperatura'),
+    'tmin': ('tmin', 'temp_min', 'temperatura mínima', 'temperatura minima'),
+    'tmax': ('tmax', 'temp_max', 'temperatura máxima', 'temperatura maxima'),
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d')
+
+# Séries diárias acumuladas da versão atual, por local: (versão, {local: LocationSeries}).
+_local = [None, {}]
+
+
+@dataclass
+class WeatherImportReport:
+    resolution: str = ''
+    created: int = 0
+    updated: int = 0
+    values: int = 0
+    # (linha da planilha, motivo)
+    rejects: list = field(default_factory=list)
+
+
+@dataclass
+class LocationSeries:
+    # Primeiro dia da série (dias desde 1970-01-01) e número de dias.
+    first_day: int
+    days: int
+    # Métrica -> soma cumulativa dos valores diários (dias + 1 posições, dias sem dado como 0).
+    cumulative: dict
+    # Métrica -> soma cumulativa dos dias sem dado.
+    missing: dict
+
+
+@dataclass
+class EventAccumulation:
+    observations: np.ndarray
+    material_ids: np.ndarray
+    location_ids: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    values: np.ndarray
+
+
+def invalidate() -> None:
+    transaction.on_commit(lambda: caching.bump_versions([VERSION_KEY]))
+
+
+def pack(values) -> bytes:
+    return np.asarray(values, dtype=DTYPE).tobytes()
+
+
+def unpack(data, length: int) -> np.ndarray:
+    """Float array of a stored column; empty columns read as all missing."""
+    if not data:
+        return np.full(length, np.nan)
+    # float32 guarda ~7 dígitos: o arredondamento devolve 9,2 °C (e não
+    # 9,1999998) para que os limites das faixas comparem como na planilha.
+    return np.round(np.frombuffer(bytes(data), dtype=DTYPE).astype(np.float64), 3)
+
+
+def days_in_year(year: int) -> int:
+    return 366 if calendar.isleap(year) else 365
+
+
+def steps_in_year(year: int, resolution: str) -> int:
+    days = days_in_year(year)
+    return days * 24 if resolution == WeatherSeries.Resolution.HOURLY else days
+
+
+def _epoch_day(year: int) -> int:
+    return int(np.datetime64(f'{year:04d}-01-01', 'D').astype(np.int64))
+
+
+# --- Importação -------------------------------------------------------------
+
+
+def _columns(header) -> dict:
+    found = {}
+    for name, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in header:
+                found[name] = alias
+                break
+    return found
+
+
+def _parse_date(text: str):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_hour(text: str):
+    digits = text.replace(':', '').split()[0] if text.strip() else ''
+    if not digits.isdigit():
+        return None
+    hour = int(digits) // 100 if len(digits) > 2 else int(digits)
+    return hour if 0 <= hour < 24 else None
+
+
+def _parse_temperature(text: str) -> float:
+    """Float value of a cell (decimal comma accepted); blank cells are missing."""
+    text = text.strip().replace(',', '.')
+    if not text:
+        return np.nan
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(text) from None
+    if not TEMPERATURE_RANGE[0] <= value <= TEMPERATURE_RANGE[1]:
+        raise ValueError(text)
+    return value
+
+
+def import_weather(location, rows, source_file: str = '', dry_run: bool = False) -> WeatherImportReport:
+    """
+    Validates ``rows`` (dicts as returned by ``location_import.read_rows``)
+    and merges them into the yearly series of ``location``: cells with data
+    overwrite the stored values, blank cells keep them.
+    """
+    report = WeatherImportReport()
+    if not rows:
+        return report
+    columns = _columns(rows[0])
+    hourly = 'temperature' in columns
+    if 'date' not in columns or not (hourly or {'tmin', 'tmax'} <= set(columns)):
+        report.rejects.append((1, "colunas 'date' e 'temperature' (horária) ou 'tmin' e 'tmax' (diária) ausentes"))
+        return report
+    if hourly and 'hour' not in columns:
+        report.rejects.append((1, "coluna 'hour' ausente para a temperatura horária"))
+        return report
+    resolution = WeatherSeries.Resolution.HOURLY if hourly else WeatherSeries.Resolution.DAILY
+    report.resolution = resolution
+    value_columns = ('temperature',) if hourly else ('tmin', 'tmax')
+
+    # (ano, posição no ano) e valores de cada linha válida.
+    years, positions, values = [], [], {name: [] for name in value_columns}
+    for line, row in enumerate(rows, start=2):
+        day = _parse_date(row.get(columns['date'], ''))
+        if day is None:
+            report.rejects.append((line, f"data inválida: '{row.get(columns['date'], '')}'"))
+            continue
+        position = day.timetuple().tm_yday - 1
+        if hourly:
+            hour = _parse_hour(row.get(columns['hour'], ''))
+            if hour is None:
+                report.rejects.append((line, f"hora inválida: '{row.get(columns['hour'], '')}'"))
+                continue
+            position = position * 24 + hour
+        try:
+            parsed = {name: _parse_temperature(row.get(columns[name], '')) for name in value_columns}
+        except ValueError as error:
+            report.rejects.append((line, f"temperatura inválida: '{error}'"))
+            continue
+        if not hourly and parsed['tmin'] > parsed['tmax']:
+            report.rejects.append((line, "temperatura mínima maior que a máxima"))
+            continue
+        years.append(day.year)
+        positions.append(position)
+        for name in value_columns:
+            values[name].append(parsed[name])
+
+    years = np.array(years, dtype=np.int64)
+    positions = np.array(positions, dtype=np.int64)
+    values = {name: np.array(column) for name, column in values.items()}
+    fields = {'temperature': 'temperature', 'tmin': 'temperature_min', 'tmax': 'temperature_max'}
+
+    existing = {
+        series.year: series
+        for series in WeatherSeries.objects.filter(
+            location=location, resolution=resolution, year__in=np.unique(years).tolist()
+        )
+    }
+    created, updated = [], []
+    for year in np.unique(years).tolist():
+        in_year = years == year
+        length = steps_in_year(year, resolution)
+        series = existing.get(year) or WeatherSeries(location=location, year=year, resolution=resolution)
+        observed = np.zeros(length, dtype=bool)
+        for name in value_columns:
+            column = unpack(getattr(series, fields[name]), length)
+            new = values[name][in_year]
+            has_value = ~np.isnan(new)
+            # Linhas repetidas: vale a última da planilha.
+            column[positions[in_year][has_value]] = new[has_value]
+            report.values += int(has_value.sum())
+            observed |= ~np.isnan(column)
+            setattr(series, fields[name], pack(column))
+        series.observed = int(observed.sum())
+        series.source_file = source_file[:255]
+        # bulk_update não preenche auto_now.
+        series.updated_at = timezone.now()
+        (updated if series.pk else created).append(series)
+
+    report.created, report.updated = len(created), len(updated)
+    if dry_run:
+        return report
+    with transaction.atomic():
+        WeatherSeries.objects.bulk_create(created, batch_size=BULK_BATCH_SIZE)
+        WeatherSeries.objects.bulk_update(
+            updated, [*(fields[name] for name in value_columns), 'observed', 'source_file', 'updated_at'],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        # bulk_create/bulk_update não enviam sinais.
+        invalidate()
+    return report
+
+
+# --- Métricas diárias -------------------------------------------------------
+
+
+def utah_units(temperatures: np.ndarray) -> np.ndarray:
+    units = UTAH_UNITS[np.digitize(np.nan_to_num(temperatures, nan=0.0), UTAH_BOUNDS)]
+    return np.where(np.isnan(temperatures), np.nan, units)
+
+
+def sine_hours(tmin: np.ndarray, tmax: np.ndarray) -> np.ndarray:
+    """Hourly temperatures (days × 24) estimated from daily extremes: minimum at 2 h, maximum at 14 h."""
+    shape = np.sin(2 * np.pi * (np.arange(24) - 8) / 24)
+    return ((tmin + tmax) / 2)[:, None] + ((tmax - tmin) / 2)[:, None] * shape
+
+
+def daily_metrics(tmin: np.ndarray, tmax: np.ndarray, hours: np.ndarray) -> dict:
+    """
+    Daily values of every metric from the daily extremes (days) and hourly
+    temperatures (days × 24) of a period; NaN marks days without data.
+    """
+    counts = (~np.isnan(hours)).sum(axis=1)
+    enough = counts >= MIN_HOURS
+    scale = np.divide(24.0, counts, out=np.zeros(len(counts)), where=enough)
+    with np.errstate(all='ignore'):
+        hourly_min = np.where(enough, np.nanmin(np.where(enough[:, None], hours, 0.0), axis=1), np.nan)
+        hourly_max = np.where(enough, np.nanmax(np.where(enough[:, None], hours, 0.0), axis=1), np.nan)
+    # Extremos diários registrados; na falta deles, os da série horária.
+    low = np.where(np.isnan(tmin), hourly_min, tmin)
+    high = np.where(np.isnan(tmax), hourly_max, tmax)
+
+    estimated = sine_hours(low, high)
+    valid = np.where(enough[:, None], hours, estimated)
+    cold = ((valid > 0) & (valid <= CHILL_HOURS_MAX)).astype(float)
+    units = np.nan_to_num(utah_units(valid))
+    has_hours = enough | (~np.isnan(low) & ~np.isnan(high))
+    hourly_scale = np.where(enough, scale, 1.0)
+
+    mean = (low + np.minimum(high, GDD_CEILING)) / 2
+    return {
+        'gdd': np.maximum(mean - GDD_BASE, 0.0),
+        'chill_hours': np.where(has_hours, cold.sum(axis=1) * hourly_scale, np.nan),
+        'chill_units': np.where(has_hours, units.sum(axis=1) * hourly_scale, np.nan),
+    }
+
+
+def _build_series(location_id: int) -> LocationSeries:
+    stored = list(
+        WeatherSeries.objects.filter(location_id=location_id).values_list(
+            'year', 'resolution', 'temperature_min', 'temperature_max', 'temperature'
+        )
+    )
+    if not stored:
+        zero = {metric: np.zeros(1) for metric in METRICS}
+        return LocationSeries(0, 0, zero, zero)
+
+    first, last = min(row[0] for row in stored), max(row[0] for row in stored)
+    first_day = _epoch_day(first)
+    days = _epoch_day(last + 1) - first_day
+    tmin, tmax = np.full(days, np.nan), np.full(days, np.nan)
+    hours = np.full((days, 24), np.nan)
+    for year, resolution, low, high, hourly in stored:
+        start = _epoch_day(year) - first_day
+        length = days_in_year(year)
+        if resolution == WeatherSeries.Resolution.HOURLY:
+            hours[start:start + length] = unpack(hourly, length * 24).reshape(length, 24)
+        else:
+            tmin[start:start + length] = unpack(low, length)
+            tmax[start:start + length] = unpack(high, length)
+
+    cumulative, missing = {}, {}
+    for metric, values in daily_metrics(tmin, tmax, hours).items():
+        absent = np.isnan(values)
+        cumulative[metric] = np.concatenate(([0.0], np.cumsum(np.where(absent, 0.0, values))))
+        missing[metric] = np.concatenate(([0], np.cumsum(absent)))
+    return LocationSeries(first_day, days, cumulative, missing)
+
+
+def location_series(location_ids) -> dict:
+    """Accumulated daily series of each location, built once per version."""
+    version = caching.get_version(VERSION_KEY)
+    if _local[0] != version:
+        _local[:] = [version, {}]
+    cached = _local[1]
+    for location_id in location_ids:
+        if location_id not in cached:
+            cached[location_id] = _build_series(location_id)
+    return {location_id: cached[location_id] for location_id in location_ids}
+
+
+def _days(dates) -> np.ndarray:
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def date_days(dates: list) -> np.ndarray:
+    """Days since 1970-01-01 of a list of ``date`` (much faster than converting it to datetime64)."""
+    return np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates)) - EPOCH_ORDINAL
+
+
+def accumulate(metric: str, location_ids, starts, ends) -> np.ndarray:
+    """
+    Sum of the daily ``metric`` from ``starts[i]`` to ``ends[i]`` (both
+    inclusive) at ``location_ids[i]``, for every window at once. Windows
+    with days without data, or outside the stored series, are NaN.
+    """
+    location_ids = np.asarray(location_ids, dtype=np.int64)
+    starts, ends = _days(starts), _days(ends)
+    result = np.full(len(location_ids), np.nan)
+    if not len(location_ids):
+        return result
+
+    unique = np.unique(location_ids)
+    series = location_series(unique.tolist())
+    # As somas cumulativas de todos os locais concatenadas: uma única indexação para todas as janelas.
+    cumulative = np.concatenate([series[pk].cumulative[metric] for pk in unique])
+    missing = np.concatenate([series[pk].missing[metric] for pk in unique])
+    lengths = np.array([series[pk].days for pk in unique])
+    offsets = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+    first_days = np.array([series[pk].first_day for pk in unique])
+
+    which = np.searchsorted(unique, location_ids)
+    low = starts - first_days[which]
+    high = ends - first_days[which] + 1
+    inside = (low >= 0) & (high <= lengths[which]) & (high > low)
+    low = offsets[which][inside] + low[inside]
+    high = offsets[which][inside] + high[inside]
+    values = cumulative[high] - cumulative[low]
+    values[missing[high] - missing[low] > 0] = np.nan
+    result[inside] = values
+    return result
+
+
+def season_starts(ends, month: int, day: int) -> np.ndarray:
+    """The last ``month``/``day`` on or before each end date (start of the season)."""
+    ends = np.asarray(ends, dtype='datetime64[D]')
+    years = ends.astype('datetime64[Y]')
+
+    def anniversary(years):
+        return (years.astype('datetime64[M]') + (month - 1)).astype('datetime64[D]') + (day - 1)
+
+    starts = anniversary(years)
+    return np.where(starts > ends, anniversary(years - 1), starts)
+
+
+def event_accumulation(event, metric: str, start_event=None, start=None, year: int = None) -> EventAccumulation:
+    """
+    ``metric`` accumulated up to every active observation of ``event`` (in
+    ``year`` when given), from the latest observation of ``start_event`` of
+    the same material and location in the previous 12 months or, without
+    ``start_event``, from the last ``start = (month, day)``.
+    """
+    queryset = PhenologyObservation.objects.filter(event=event)
+    if year:
+        queryset = queryset.filter(observation_date__year=year)
+    rows = list(queryset.order_by().values_list('pk', 'genetic_material_id', 'location_id', 'observation_date'))
+    pks, materials, locations = (np.array([row[i] for row in rows], dtype=np.int64) for i in range(3))
+    ends = date_days([row[3] for row in rows]).astype('datetime64[D]')
+
+    if start_event is None:
+        starts = season_starts(ends, *start)
+    else:
+        candidates = list(
+            PhenologyObservation.objects.filter(
+                event=start_event, genetic_material_id__in=set(materials.tolist())
+            ).order_by().values_list('genetic_material_id', 'location_id', 'observation_date')
+        )
+        # Chave (material, local, dia) ordenável: a busca binária acha o último início antes de cada fim.
+        groups = {}
+        candidate_groups = np.array(
+            [groups.setdefault((m, l), len(groups)) for m, l, _ in candidates], dtype=np.int64
+        )
+        candidate_days = date_days([d for _, _, d in candidates])
+        span = 1 << 32
+        keys = np.sort(candidate_groups * span + candidate_days)
+        group = np.array(
+            [groups.get(pair, -1) for pair in zip(materials.tolist(), locations.tolist())], dtype=np.int64
+        )
+        end_days = ends.astype(np.int64)
+        position = np.searchsorted(keys, group * span + end_days, side='right') - 1
+        found = (group >= 0) & (position >= 0)
+        found[found] &= keys[position[found]] // span == group[found]
+        start_days = np.where(found, keys[np.maximum(position, 0)] % span if len(keys) else 0, 0)
+        found &= end_days - start_days <= 366
+        starts = np.where(found, start_days, np.iinfo(np.int64).min).astype('datetime64[D]')
+
+    values = accumulate(metric, locations, np.where(np.isnat(starts), ends, starts), ends)
+    values[np.isnat(starts)] = np.nan
+    return EventAccumulation(pks, materials, locations, starts, ends, values)